@@ -0,0 +1 @@
+"""Performance benchmarks for the serving hot path"""
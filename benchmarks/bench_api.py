@@ -0,0 +1,41 @@
+"""End-to-end benchmarks through the FastAPI app (in-process ASGI, no network)"""
+import pytest
+
+from benchmarks.conftest import make_compact_payload
+
+
+def test_predict_endpoint(benchmark, asgi_client, event_loop_runner, request_payloads):
+    """POST /predict"""
+    payload = request_payloads[0]
+    
+    def call():
+        return event_loop_runner(asgi_client.post("/predict", json=payload))
+    
+    response = benchmark(call)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("batch_size", [1, 8, 64, 1000])
+def test_predict_batch_endpoint(benchmark, asgi_client, event_loop_runner, request_payloads, batch_size):
+    """POST /predict/batch (the schema caps batches at 1000 rows)"""
+    payload = {"predictions": request_payloads[:batch_size]}
+    
+    def call():
+        return event_loop_runner(asgi_client.post("/predict/batch", json=payload))
+    
+    response = benchmark(call)
+    assert response.status_code == 200
+    assert len(response.json()["predictions"]) == batch_size
+
+
+@pytest.mark.parametrize("batch_size", [1, 64, 1000, 10000])
+def test_predict_compact_endpoint(benchmark, asgi_client, event_loop_runner, request_payloads, batch_size):
+    """POST /predict/compact"""
+    payload = make_compact_payload(request_payloads[:batch_size])
+    
+    def call():
+        return event_loop_runner(asgi_client.post("/predict/compact", json=payload))
+    
+    response = benchmark(call)
+    assert response.status_code == 200
+    assert len(response.json()["predictions"]) == batch_size
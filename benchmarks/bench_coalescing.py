@@ -0,0 +1,18 @@
+"""Benchmarks for batch row deduplication"""
+import numpy as np
+import pytest
+
+from src.coalescing import BatchDeduplicator
+from src.model_loader import model_loader
+
+
+@pytest.mark.parametrize("distinct_fraction", [1.0, 0.25])
+def test_predict_deduplicated(benchmark, feature_matrix, distinct_fraction):
+    """1000-row batch where only a fraction of the rows are distinct"""
+    n_distinct = int(1000 * distinct_fraction)
+    rows = np.random.default_rng(0).integers(0, n_distinct, size=1000)
+    rows[:n_distinct] = np.arange(n_distinct)
+    features = feature_matrix[rows]
+    deduplicator = BatchDeduplicator(enabled=True, min_rows=2)
+    predictions = benchmark(deduplicator.predict, model_loader.predict, features)
+    assert len(predictions) == 1000
@@ -0,0 +1,37 @@
+"""Benchmarks for the S3 prediction sink (against an in-memory stub)"""
+import time
+
+import pytest
+
+from src.data_pipeline import save_prediction_to_s3, save_batch_predictions_to_s3
+
+
+def _records(request_payloads, n):
+    return [
+        {
+            "user_id": payload["user_id"],
+            "movie_id": payload["movie_id"],
+            "age": payload["age"],
+            "gender": payload["gender"],
+            "prediction": 0.5,
+            "prediction_class": 1,
+            "model_version": "benchmark",
+            "inference_time_ms": 1.0,
+            "timestamp": time.time()
+        }
+        for payload in request_payloads[:n]
+    ]
+
+
+def test_save_prediction_to_s3(benchmark, stub_s3, request_payloads):
+    """Single-record Parquet encode + put_object"""
+    record = _records(request_payloads, 1)[0]
+    assert benchmark(save_prediction_to_s3, record) is True
+    assert stub_s3.objects
+
+
+@pytest.mark.parametrize("batch_size", [8, 64, 1000, 10000])
+def test_save_batch_predictions_to_s3(benchmark, stub_s3, request_payloads, batch_size):
+    """Batch Parquet encode + put_object"""
+    records = _records(request_payloads, batch_size)
+    assert benchmark(save_batch_predictions_to_s3, records) is True
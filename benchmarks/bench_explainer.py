@@ -0,0 +1,24 @@
+"""Benchmarks for prediction explanations"""
+import numpy as np
+import pytest
+
+from src.explainer import ContributionExplainer
+
+
+@pytest.mark.parametrize("batch_size", [1, 64])
+def test_contributions_uncached(benchmark, feature_matrix, batch_size):
+    """Batched pred_contrib for rows not in the cache"""
+    features = np.ascontiguousarray(feature_matrix[:batch_size])
+    explainer = ContributionExplainer(max_cache_entries=0)
+    contributions, _ = benchmark(explainer.contributions, features)
+    assert contributions.shape == (batch_size, features.shape[1] + 1)
+
+
+@pytest.mark.parametrize("batch_size", [1, 64])
+def test_contributions_cached(benchmark, feature_matrix, batch_size):
+    """Contributions served entirely from the cache"""
+    features = np.ascontiguousarray(feature_matrix[:batch_size])
+    explainer = ContributionExplainer(max_cache_entries=1000)
+    explainer.contributions(features)
+    _, cached = benchmark(explainer.contributions, features)
+    assert cached == batch_size
@@ -0,0 +1,18 @@
+"""Benchmarks for feature extraction"""
+import pytest
+
+from src.feature_extractor import feature_extractor
+
+
+def test_extract_features(benchmark, prediction_requests):
+    """Single-request feature extraction"""
+    features = benchmark(feature_extractor.extract_features, prediction_requests[0])
+    assert features.shape == (1, 34)
+
+
+@pytest.mark.parametrize("batch_size", [1, 8, 64, 1000, 10000])
+def test_extract_batch_features(benchmark, prediction_requests, batch_size):
+    """Batch feature extraction"""
+    batch = prediction_requests[:batch_size]
+    features = benchmark(feature_extractor.extract_batch_features, batch)
+    assert features.shape == (batch_size, 34)
@@ -0,0 +1,52 @@
+"""Benchmarks for the gRPC scoring service over localhost"""
+import grpc
+import numpy as np
+import pytest
+
+from src.grpc_service import create_grpc_server
+from src.protos import prediction_pb2, prediction_pb2_grpc
+
+
+@pytest.fixture(scope="module")
+def grpc_stub(event_loop_runner):
+    """gRPC server and client channel on a free localhost port"""
+    async def start():
+        # grpc.aio objects bind to the running loop, so create them inside it
+        server, port = create_grpc_server(port=0, host="127.0.0.1")
+        await server.start()
+        return server, grpc.aio.insecure_channel(f"127.0.0.1:{port}")
+    
+    server, channel = event_loop_runner(start())
+    yield prediction_pb2_grpc.PredictionServiceStub(channel)
+    event_loop_runner(channel.close())
+    event_loop_runner(server.stop(None))
+
+
+@pytest.mark.parametrize("batch_size", [1, 64, 1000])
+def test_grpc_predict(benchmark, grpc_stub, event_loop_runner, feature_matrix, batch_size):
+    """Unary Predict with packed float32 features"""
+    request = prediction_pb2.PredictRequest(features=prediction_pb2.PackedFeatures(
+        num_features=feature_matrix.shape[1],
+        values=np.ascontiguousarray(feature_matrix[:batch_size]).astype('<f4').tobytes()
+    ))
+    response = benchmark(lambda: event_loop_runner(grpc_stub.Predict(request)))
+    assert len(response.predictions) == batch_size
+
+
+def test_grpc_predict_stream(benchmark, grpc_stub, event_loop_runner, feature_matrix):
+    """100 single-row requests over one bidirectional stream (time per 100 calls)"""
+    requests = [
+        prediction_pb2.PredictRequest(features=prediction_pb2.PackedFeatures(
+            num_features=feature_matrix.shape[1], values=feature_matrix[i:i + 1].astype('<f4').tobytes()
+        ))
+        for i in range(100)
+    ]
+    
+    async def stream():
+        call = grpc_stub.PredictStream()
+        for request in requests:
+            await call.write(request)
+            await call.read()
+        await call.done_writing()
+    
+    benchmark(lambda: event_loop_runner(stream()))
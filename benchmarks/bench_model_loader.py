@@ -0,0 +1,13 @@
+"""Benchmarks for model inference"""
+import numpy as np
+import pytest
+
+from src.model_loader import model_loader
+
+
+@pytest.mark.parametrize("batch_size", [1, 8, 64, 1000, 10000])
+def test_predict(benchmark, feature_matrix, batch_size):
+    """ModelLoader.predict on a contiguous float32 batch"""
+    features = np.ascontiguousarray(feature_matrix[:batch_size])
+    predictions = benchmark(model_loader.predict, features)
+    assert len(predictions) == batch_size
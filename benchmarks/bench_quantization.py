@@ -0,0 +1,32 @@
+"""Benchmarks for threshold-quantized feature codes"""
+import numpy as np
+import pytest
+
+from src.model_loader import model_loader
+from src.quantization import build_quantized_model
+
+BATCH_SIZES = [1, 100, 10000]
+
+
+def test_build_quantizer(benchmark):
+    """Deriving the quantizer from the loaded model (runs once per model load)"""
+    quantized = benchmark(build_quantized_model, model_loader.model)
+    benchmark.extra_info["table_bytes"] = quantized.memory_bytes()
+    benchmark.extra_info["code_dtype"] = np.dtype(quantized.code_dtype).name
+
+
+@pytest.mark.parametrize("batch_size", BATCH_SIZES)
+def test_quantize(benchmark, feature_matrix, batch_size):
+    """float32 features to bin codes"""
+    features = feature_matrix[:batch_size]
+    codes = benchmark(model_loader.quantize, features)
+    benchmark.extra_info["float32_bytes"] = features.astype(np.float32).nbytes
+    benchmark.extra_info["code_bytes"] = codes.nbytes
+
+
+@pytest.mark.parametrize("batch_size", BATCH_SIZES)
+def test_predict_quantized(benchmark, feature_matrix, batch_size):
+    """Scoring pre-quantized codes (compare with bench_model_loader's test_predict)"""
+    codes = model_loader.quantize(feature_matrix[:batch_size])
+    predictions = benchmark(model_loader.predict_quantized, codes)
+    assert len(predictions) == batch_size
@@ -0,0 +1,40 @@
+"""Benchmarks for /predict latency while a downstream AWS dependency is degraded"""
+import time
+
+import pytest
+
+from benchmarks.conftest import StubS3Client
+from src import data_pipeline
+from src.data_pipeline import prediction_capture
+from src.resilience import Dependency
+
+
+class SlowStubS3Client(StubS3Client):
+    """In-memory S3 stand-in that injects latency into every upload"""
+    
+    def __init__(self, latency_seconds: float):
+        super().__init__()
+        self.latency_seconds = latency_seconds
+    
+    def put_object(self, **kwargs):
+        time.sleep(self.latency_seconds)
+        return super().put_object(**kwargs)
+
+
+@pytest.mark.parametrize("s3_latency_ms", [0, 500])
+def test_predict_with_slow_s3(benchmark, asgi_client, event_loop_runner, request_payloads,
+                              stub_s3, monkeypatch, tmp_path, s3_latency_ms):
+    """POST /predict uploading every captured row, with S3 answering after s3_latency_ms"""
+    monkeypatch.setattr(data_pipeline, "_s3_client", SlowStubS3Client(s3_latency_ms / 1000))
+    monkeypatch.setattr(prediction_capture, "flush_rows", 1)
+    monkeypatch.setattr(prediction_capture, "dependency", Dependency(
+        "s3", replay=prediction_capture._replay, timeout_ms=100, spool_dir=str(tmp_path)
+    ))
+    payload = request_payloads[0]
+    
+    def call():
+        return event_loop_runner(asgi_client.post("/predict", json=payload))
+    
+    response = benchmark(call)
+    assert response.status_code == 200
+    prediction_capture.dependency.wait_idle(timeout_seconds=1)
@@ -0,0 +1,23 @@
+"""Benchmarks for request validation: named-field vs compact wire schema"""
+import json
+
+import pytest
+
+from src.schemas import BatchPredictionRequest, CompactPredictionRequest
+from benchmarks.conftest import make_compact_payload
+
+
+@pytest.mark.parametrize("batch_size", [1, 64, 1000])
+def test_validate_batch_request(benchmark, request_payloads, batch_size):
+    """Named-field BatchPredictionRequest parsed from JSON"""
+    body = json.dumps({"predictions": request_payloads[:batch_size]})
+    benchmark.extra_info["payload_bytes"] = len(body)
+    benchmark(BatchPredictionRequest.model_validate_json, body)
+
+
+@pytest.mark.parametrize("batch_size", [1, 64, 1000])
+def test_validate_compact_request(benchmark, request_payloads, batch_size):
+    """CompactPredictionRequest parsed from JSON"""
+    body = json.dumps(make_compact_payload(request_payloads[:batch_size]))
+    benchmark.extra_info["payload_bytes"] = len(body)
+    benchmark(CompactPredictionRequest.model_validate_json, body)
@@ -0,0 +1,30 @@
+"""Benchmarks for the memory-mapped score table"""
+import numpy as np
+import pytest
+
+from src.model_loader import model_loader
+from src.score_table import ScoreTable, row_fingerprints, write_score_table
+
+
+@pytest.mark.parametrize("hit_fraction", [1.0, 0.5])
+def test_predict_from_score_table(benchmark, tmp_path, feature_matrix, hit_fraction):
+    """1000-row batch against a 500,000-entry table; misses are scored live"""
+    features = feature_matrix[:1000]
+    n_hot = int(1000 * hit_fraction)
+    user_ids = np.repeat(np.arange(500), 1000)
+    movie_ids = np.tile(np.arange(1000), 500)
+    fingerprints = np.zeros(len(user_ids), dtype=np.uint64)
+    fingerprints[:n_hot] = row_fingerprints(features[:n_hot])
+    path = str(tmp_path / "scores.bin")
+    write_score_table(path, user_ids, movie_ids, fingerprints, np.zeros(len(user_ids)), model_loader.model_version)
+    table = ScoreTable(path=path)
+    table.enabled = True
+    table.load()
+    
+    # Row i is the pair (0, i): the first n_hot rows match their entries
+    predictions = benchmark(
+        table.predict, features, np.zeros(1000, dtype=np.int64), np.arange(1000),
+        model_loader.model_version, model_loader.predict
+    )
+    assert len(predictions) == 1000
+    assert table.hits >= n_hot
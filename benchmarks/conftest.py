@@ -0,0 +1,142 @@
+"""Shared fixtures for the benchmark suite
+
+Everything here runs offline: requests are synthesized from the model's
+feature ranges, the API is called in-process through an ASGI transport and
+S3 is replaced by an in-memory stub.
+"""
+import asyncio
+from typing import Dict, List
+
+import httpx
+import numpy as np
+import pytest
+
+from src import data_pipeline
+from src.config import settings
+from src.feature_extractor import FeatureExtractor, feature_extractor
+from src.model_loader import model_loader
+from src.schemas import PredictionRequest, COMPACT_GENRES, COMPACT_AGGREGATES
+
+GENRES = FeatureExtractor.FEATURE_ORDER[2:20]
+
+
+# Load the model once up front, as the API lifespan does at startup
+model_loader.load()
+
+
+def make_request_payloads(n: int, seed: int = 42) -> List[Dict]:
+    """
+    Synthesize prediction request payloads within the model's feature ranges
+    
+    Args:
+        n: Number of payloads to generate
+        seed: Random seed (fixed so runs are comparable between commits)
+    
+    Returns:
+        List of JSON-serializable request dictionaries
+    """
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for _ in range(n):
+        user_total = int(rng.integers(2, 636))
+        user_liked = int(rng.integers(0, user_total + 1))
+        movie_total = int(rng.integers(0, 582))
+        movie_liked = int(rng.integers(0, movie_total + 1))
+        occupation_total = int(rng.integers(2, 2000))
+        occupation_liked = int(rng.integers(0, occupation_total + 1))
+        genre_total = int(rng.integers(2, 1256))
+        genre_liked = int(rng.integers(0, genre_total + 1))
+        payload = {
+            "user_id": int(rng.integers(1, 944)),
+            "movie_id": int(rng.integers(1, 1683)),
+            "age": int(rng.integers(7, 71)),
+            "gender": str(rng.choice(["M", "F"])),
+            "occupation_new": str(rng.choice(FeatureExtractor.OCCUPATION_CATEGORIES)),
+            "release_year": float(rng.integers(1922, 1999)),
+            "user_total_ratings": user_total,
+            "user_liked_ratings": user_liked,
+            "movie_total_ratings": movie_total,
+            "movie_liked_ratings": movie_liked,
+            "occupation_movie_total": occupation_total,
+            "occupation_movie_liked": occupation_liked,
+            "user_genre_total": genre_total,
+            "user_genre_liked": genre_liked,
+            "user_like_rate": user_liked / user_total,
+            "user_genre_like_rate": genre_liked / genre_total,
+            "movie_like_rate": movie_liked / movie_total if movie_total else None,
+            "occupation_like_rate": occupation_liked / occupation_total
+        }
+        for genre in GENRES:
+            payload[genre] = int(rng.random() < 0.2)
+        payloads.append(payload)
+    return payloads
+
+
+def make_compact_payload(payloads: List[Dict]) -> Dict[str, List]:
+    """Encode request payloads in the compact columnar wire format"""
+    compact = {key: [] for key in ("user_ids", "movie_ids", "ages", "genders", "occupations", "genres", "aggregates")}
+    for payload in payloads:
+        compact["user_ids"].append(payload["user_id"])
+        compact["movie_ids"].append(payload["movie_id"])
+        compact["ages"].append(payload["age"])
+        compact["genders"].append(feature_extractor.gender_map[payload["gender"]])
+        compact["occupations"].append(feature_extractor.occupation_map.get(payload["occupation_new"], -1))
+        compact["genres"].append(sum(1 << i for i, genre in enumerate(COMPACT_GENRES) if payload.get(genre)))
+        compact["aggregates"].append([payload.get(name) or 0.0 for name in COMPACT_AGGREGATES])
+    return compact
+
+
+class StubS3Client:
+    """In-memory stand-in for the boto3 S3 client"""
+    
+    def __init__(self):
+        self.objects: Dict[str, bytes] = {}
+    
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs):
+        self.objects[f"{Bucket}/{Key}"] = Body
+        return {"ETag": '"stub"'}
+
+
+@pytest.fixture(scope="session")
+def request_payloads() -> List[Dict]:
+    """10k synthesized request payloads shared by all benchmarks"""
+    return make_request_payloads(10000)
+
+
+@pytest.fixture(scope="session")
+def prediction_requests(request_payloads) -> List[PredictionRequest]:
+    """Validated PredictionRequest objects for the synthesized payloads"""
+    return [PredictionRequest(**payload) for payload in request_payloads]
+
+
+@pytest.fixture(scope="session")
+def feature_matrix(prediction_requests) -> np.ndarray:
+    """Feature matrix of shape (10000, n_features)"""
+    return feature_extractor.extract_batch_features(prediction_requests)
+
+
+@pytest.fixture
+def stub_s3(monkeypatch) -> StubS3Client:
+    """Route the S3 sink to an in-memory stub"""
+    stub = StubS3Client()
+    monkeypatch.setattr(data_pipeline, "_s3_client", stub)
+    monkeypatch.setattr(settings, "s3_bucket", "benchmark-bucket")
+    return stub
+
+
+@pytest.fixture(scope="session")
+def event_loop_runner():
+    """Dedicated event loop for driving async calls from synchronous benchmarks"""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def asgi_client(event_loop_runner):
+    """In-process HTTP client talking to the FastAPI app over ASGI"""
+    from src.api import app
+    
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark")
+    yield client
+    event_loop_runner(client.aclose())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+Build the precomputed score table for hot (user, movie) pairs
+
+Takes the most frequent users and movies in a set of request bodies (e.g.
+captured traffic), scores their cross-product with the serving model and
+writes a memory-mapped score table tagged with the model version (see
+src/score_table.py). The serving path only answers from an entry when the
+request's feature row matches the one the entry was scored on, so:
+
+- a pair seen in the payloads is scored on its most recent request;
+- any other pair combines the user's and the movie's most recent requests:
+  user and user-genre columns from the user, movie and occupation-movie
+  columns from the movie;
+- with --feature-store, aggregates are then overwritten from a feature store
+  snapshot, as the serving path does.
+
+Usage:
+    python scripts/build_score_table.py --payloads payloads.jsonl --top-users 1000 --top-movies 500
+    python scripts/build_score_table.py --synthesize 50000 --score-dtype float16 --output score_table.bin
+    python scripts/build_score_table.py --payloads payloads.jsonl --feature-store feature_store.npz
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import load_payloads, synthesize_payloads  # noqa: E402
+from src.config import settings  # noqa: E402
+from src.feature_extractor import FeatureExtractor, feature_extractor  # noqa: E402
+from src.feature_store import FeatureStore  # noqa: E402
+from src.model_loader import model_loader  # noqa: E402
+from src.schemas import COMPACT_GENRES, PredictionRequest  # noqa: E402
+from src.score_table import row_fingerprints, write_score_table  # noqa: E402
+
+# Columns describing the movie (or the movie and the user's occupation); all others describe the user
+MOVIE_COLUMNS = [FeatureExtractor.FEATURE_ORDER.index(name) for name in COMPACT_GENRES + [
+    'release_year', 'movie_total_ratings', 'movie_liked_ratings', 'movie_like_rate',
+    'occupation_movie_total', 'occupation_movie_liked', 'occupation_like_rate'
+]]
+
+
+def featurize(payloads: List[Dict[str, Any]]) -> np.ndarray:
+    return feature_extractor.extract_batch_features([PredictionRequest(**p) for p in payloads])
+
+
+def build(payloads: List[Dict[str, Any]], top_users: int, top_movies: int, output: str,
+          score_dtype: str, feature_store_path: Optional[str] = None, chunk_rows: int = 500000) -> Dict[str, Any]:
+    """
+    Score the hot cross-product and write the score table
+    
+    Returns:
+        Summary of the build
+    """
+    start = time.perf_counter()
+    users = [u for u, _ in Counter(p['user_id'] for p in payloads).most_common(top_users)]
+    movies = [m for m, _ in Counter(p['movie_id'] for p in payloads).most_common(top_movies)]
+    latest_user = {p['user_id']: p for p in payloads}
+    latest_movie = {p['movie_id']: p for p in payloads}
+    latest_pair = {(p['user_id'], p['movie_id']): p for p in payloads}
+    user_rows = featurize([latest_user[u] for u in users])
+    movie_rows = featurize([latest_movie[m] for m in movies])
+    
+    # Observed pairs keep their own feature row
+    user_index = {u: i for i, u in enumerate(users)}
+    movie_index = {m: i for i, m in enumerate(movies)}
+    observed = [(user_index[u], movie_index[m], p) for (u, m), p in latest_pair.items()
+                if u in user_index and m in movie_index]
+    observed_entries = np.array([i * len(movies) + j for i, j, _ in observed], dtype=np.int64)
+    observed_rows = featurize([p for _, _, p in observed]) if observed else None
+    
+    store = None
+    if feature_store_path:
+        store = FeatureStore(snapshot_path=feature_store_path)
+        store.enabled = True
+        if not store.restore():
+            raise ValueError(f"Could not restore feature store snapshot {feature_store_path}")
+    
+    n_entries = len(users) * len(movies)
+    user_ids = np.repeat(np.asarray(users, dtype=np.int64), len(movies))
+    movie_ids = np.tile(np.asarray(movies, dtype=np.int64), len(users))
+    fingerprints = np.empty(n_entries, dtype=np.uint64)
+    scores = np.empty(n_entries, dtype=np.float64)
+    users_per_chunk = max(1, chunk_rows // max(1, len(movies)))
+    for first_user in range(0, len(users), users_per_chunk):
+        chunk_users = min(users_per_chunk, len(users) - first_user)
+        lo, hi = first_user * len(movies), (first_user + chunk_users) * len(movies)
+        features = np.repeat(user_rows[first_user:first_user + chunk_users], len(movies), axis=0)
+        features[:, MOVIE_COLUMNS] = np.tile(movie_rows[:, MOVIE_COLUMNS], (chunk_users, 1))
+        if observed_rows is not None:
+            in_chunk = (observed_entries >= lo) & (observed_entries < hi)
+            features[observed_entries[in_chunk] - lo] = observed_rows[in_chunk]
+        if store is not None:
+            store.enrich(features, user_ids[lo:hi], movie_ids[lo:hi])
+        fingerprints[lo:hi] = row_fingerprints(features)
+        scores[lo:hi] = model_loader.predict(features)
+    
+    meta = write_score_table(
+        output, user_ids, movie_ids, fingerprints, scores, model_loader.model_version, score_dtype
+    )
+    return {
+        "output": output,
+        "model_version": meta["model_version"],
+        "users": len(users),
+        "movies": len(movies),
+        "entries": meta["entries"],
+        "observed_pairs": len(observed),
+        "score_dtype": score_dtype,
+        "file_mb": round(os.path.getsize(output) / 1e6, 2),
+        "build_seconds": round(time.perf_counter() - start, 2)
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payloads', default=None, help='JSON-lines file of /predict request bodies')
+    parser.add_argument('--model', default='model.txt', help='Model file used to synthesize payloads')
+    parser.add_argument('--synthesize', type=int, default=10000, help='Number of payloads to synthesize')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for synthesized payloads')
+    parser.add_argument('--top-users', type=int, default=1000, help='Most frequent users to include')
+    parser.add_argument('--top-movies', type=int, default=500, help='Most frequent movies to include')
+    parser.add_argument('--score-dtype', choices=['float32', 'float16'], default='float32',
+                        help='Stored score precision (float16 is within 5e-4 of the model score)')
+    parser.add_argument('--feature-store', default=None, help='Feature store snapshot to enrich rows with')
+    parser.add_argument('--output', default=settings.score_table_path, help='Score table file to write')
+    args = parser.parse_args(argv)
+    
+    if args.payloads:
+        payloads = load_payloads(args.payloads)
+    else:
+        payloads = synthesize_payloads(args.model, args.synthesize, seed=args.seed)
+    if not model_loader.load():
+        print("Model failed to load", file=sys.stderr)
+        return 1
+    
+    summary = build(payloads, args.top_users, args.top_movies, args.output, args.score_dtype, args.feature_store)
+    for name, value in summary.items():
+        print(f"{name:>16}: {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Compact closed hourly prediction partitions
+
+Usage:
+    python scripts/compact_predictions.py --start 2024-12-01 --end 2024-12-01
+    python scripts/compact_predictions.py --start 2024-12-01T10 --end 2024-12-01T12 --local-root /data/bucket
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_pipeline import LocalObjectStore, S3ObjectStore, compact_closed_partitions  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact small Parquet prediction files per hourly partition")
+    yesterday = (datetime.utcnow() - timedelta(days=1)).strftime('%Y-%m-%d')
+    parser.add_argument('--start', default=yesterday, help='First hour/day to compact (default: yesterday)')
+    parser.add_argument('--end', default=yesterday, help='Last hour/day to compact, inclusive (default: yesterday)')
+    parser.add_argument('--prefix', default='predictions', help='Prediction key prefix')
+    parser.add_argument('--bucket', default=None, help='S3 bucket (default: S3_BUCKET)')
+    parser.add_argument('--local-root', default=None, help='Compact a local directory laid out like the bucket instead of S3')
+    parser.add_argument('--min-files', type=int, default=2, help='Skip partitions with fewer files')
+    args = parser.parse_args(argv)
+
+    store = LocalObjectStore(args.local_root) if args.local_root else S3ObjectStore(args.bucket)
+    results = compact_closed_partitions(store, args.start, args.end, args.prefix, min_files=args.min_files)
+    print(json.dumps(results, indent=2))
+    return 1 if any(r['status'] == 'failed' for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,7 +11,9 @@ CREATE EXTERNAL TABLE IF NOT EXISTS model_predictions (
     prediction_class int,
     model_version string,
     inference_time_ms double,
-    timestamp timestamp
+    timestamp timestamp,
+    capture_reason string,
+    sample_weight double
 )
 PARTITIONED BY (
     year int,
@@ -54,6 +56,14 @@ TBLPROPERTIES (
 -- ORDER BY prediction_count DESC 
 -- LIMIT 10;
 --
+-- Estimate hourly traffic and mean prediction from the sample
+-- (sample_weight re-weights sampled rows to the full traffic):
+-- SELECT hour, SUM(sample_weight) AS est_predictions,
+--        SUM(prediction * sample_weight) / SUM(sample_weight) AS est_mean_prediction
+-- FROM model_predictions
+-- WHERE year = 2024 AND month = 12 AND day = 1 AND capture_reason <> 'error'
+-- GROUP BY hour;
+--
 -- Get predictions for a specific user:
 -- SELECT * FROM model_predictions 
 -- WHERE user_id = 259 
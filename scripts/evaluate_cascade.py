@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Offline evaluation of early-exit cascade scoring
+
+Scores a set of request bodies with the full ensemble and with
+ModelLoader.predict_cascade for every combination of first-stage iterations
+(K) and uncertainty band, and reports agreement with full scoring, the share
+of rows that needed the full ensemble, the fraction of tree evaluations
+performed and the measured speedup.
+
+Usage:
+    python scripts/evaluate_cascade.py --payloads payloads.jsonl
+    python scripts/evaluate_cascade.py --synthesize 20000 --iterations 5 10 20 30 --bands 0.25 0.5 1.0
+    python scripts/evaluate_cascade.py --payloads payloads.jsonl --output cascade_report.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import load_payloads, synthesize_payloads  # noqa: E402
+from src.feature_extractor import feature_extractor  # noqa: E402
+from src.model_loader import model_loader  # noqa: E402
+from src.schemas import PredictionRequest  # noqa: E402
+
+
+def best_time(fn, repeats: int) -> float:
+    """Fastest of `repeats` runs in seconds"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    """Spearman rank correlation (ties broken by position)"""
+    rank_a = np.argsort(np.argsort(a))
+    rank_b = np.argsort(np.argsort(b))
+    return float(np.corrcoef(rank_a, rank_b)[0, 1])
+
+
+def evaluate(features: np.ndarray, iterations: List[int], bands: List[float], repeats: int) -> List[Dict[str, Any]]:
+    """
+    Compare cascade scoring against full scoring on a feature matrix
+    
+    Returns:
+        One result dictionary per (iterations, band) combination
+    """
+    total_iterations = model_loader.model.current_iteration()
+    full = model_loader.predict(features)
+    full_time = best_time(lambda: model_loader.predict(features), repeats)
+    
+    results = []
+    for first_iterations in iterations:
+        if not 0 < first_iterations < total_iterations:
+            print(f"Skipping K={first_iterations}: model has {total_iterations} iterations", file=sys.stderr)
+            continue
+        for band in bands:
+            predictions, finished = model_loader.predict_cascade(
+                features, first_iterations, band, return_mask=True
+            )
+            cascade_time = best_time(
+                lambda: model_loader.predict_cascade(features, first_iterations, band), repeats
+            )
+            full_fraction = float(finished.mean())
+            diff = np.abs(predictions - full)
+            results.append({
+                "iterations": first_iterations,
+                "band": band,
+                "full_fraction": round(full_fraction, 4),
+                "tree_evaluations": round(
+                    (first_iterations + full_fraction * (total_iterations - first_iterations)) / total_iterations, 4
+                ),
+                "class_agreement": round(float(((predictions >= 0.5) == (full >= 0.5)).mean()), 6),
+                "mean_abs_diff": round(float(diff.mean()), 6),
+                "max_abs_diff": round(float(diff.max()), 6),
+                "spearman": round(spearman(predictions, full), 6),
+                "full_ms": round(full_time * 1000, 3),
+                "cascade_ms": round(cascade_time * 1000, 3),
+                "speedup": round(full_time / cascade_time, 3) if cascade_time > 0 else None
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate early-exit cascade scoring against the full ensemble")
+    parser.add_argument('--payloads', default=None, help='JSON-lines file of /predict request bodies')
+    parser.add_argument('--model', default='model.txt', help='Model file used to synthesize payloads')
+    parser.add_argument('--synthesize', type=int, default=10000, help='Number of payloads to synthesize')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for synthesized payloads')
+    parser.add_argument('--iterations', type=int, nargs='+', default=[5, 10, 20, 30, 40], help='First-stage iterations (K)')
+    parser.add_argument('--bands', type=float, nargs='+', default=[0.25, 0.5, 1.0, 2.0], help='Uncertainty band half-widths (raw score)')
+    parser.add_argument('--repeats', type=int, default=5, help='Timing repetitions (best is reported)')
+    parser.add_argument('--output', default=None, help='Write the JSON report here instead of a table')
+    args = parser.parse_args(argv)
+    
+    if args.payloads:
+        payloads = load_payloads(args.payloads)
+    else:
+        payloads = synthesize_payloads(args.model, args.synthesize, seed=args.seed)
+    if not model_loader.load():
+        print("Model failed to load", file=sys.stderr)
+        return 1
+    
+    features = feature_extractor.extract_batch_features([PredictionRequest(**p) for p in payloads])
+    results = evaluate(features, args.iterations, args.bands, args.repeats)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"rows": len(features), "results": results}, f, indent=2)
+        print(f"Report written to {args.output}", file=sys.stderr)
+        return 0
+    
+    columns = ["iterations", "band", "full_fraction", "tree_evaluations", "class_agreement",
+               "max_abs_diff", "spearman", "speedup"]
+    print(f"{len(features)} rows")
+    print("  ".join(f"{c:>16}" for c in columns))
+    for result in results:
+        print("  ".join(f"{result[c]!s:>16}" for c in columns))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+"""
+Async load generator with latency-percentile reporting
+
+Drives the prediction API over pooled HTTP keep-alive connections in either
+closed-loop mode (N concurrent users, each sending its next request as soon
+as the previous one returns) or open-loop mode (requests fired at a fixed
+arrival rate regardless of how fast the server responds).
+
+Payloads are replayed from a JSON-lines file (one request body per line) or
+synthesized from the `feature_infos` ranges recorded in the model file.
+
+Usage:
+    python scripts/load_test.py --url http://localhost:8000/predict --mode closed --concurrency 32 --duration 30
+    python scripts/load_test.py --url http://localhost:8000/predict --mode open --rate 500 --duration 30 --output report.json
+    python scripts/load_test.py --payloads payloads.jsonl --mode closed --requests 10000
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Request fields sent as floats; every other model feature is an integer field
+FLOAT_FEATURES = {
+    'release_year', 'user_like_rate', 'user_genre_like_rate',
+    'movie_like_rate', 'occupation_like_rate'
+}
+# Genre flags are sparse in the training data, so sample them as 0/1 with low probability
+GENRE_PROBABILITY = 0.2
+
+
+def load_payloads(path: str) -> List[Dict[str, Any]]:
+    """Load request bodies from a JSON-lines file"""
+    payloads = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                payloads.append(json.loads(line))
+    if not payloads:
+        raise ValueError(f"No payloads found in {path}")
+    return payloads
+
+
+def read_feature_infos(model_path: str) -> Dict[str, Any]:
+    """
+    Read feature ranges and categorical values from a LightGBM model file
+    
+    Returns:
+        Dictionary mapping feature name to ("range", lo, hi), ("categorical", values)
+        or ("constant",), with categorical values decoded through pandas_categorical
+    """
+    feature_names: List[str] = []
+    feature_infos: List[str] = []
+    pandas_categorical: List[List[str]] = []
+    with open(model_path) as f:
+        for line in f:
+            if line.startswith('feature_names='):
+                feature_names = line.strip().split('=', 1)[1].split(' ')
+            elif line.startswith('feature_infos='):
+                feature_infos = line.strip().split('=', 1)[1].split(' ')
+            elif line.startswith('pandas_categorical:'):
+                pandas_categorical = json.loads(line.split(':', 1)[1]) or []
+    
+    infos = {}
+    categorical_index = 0
+    for name, info in zip(feature_names, feature_infos):
+        if info == 'none':
+            infos[name] = ('constant',)
+        elif info.startswith('['):
+            lo, hi = info[1:-1].split(':')
+            infos[name] = ('range', float(lo), float(hi))
+        else:
+            # Categorical codes; negative codes are missing values
+            codes = sorted(int(code) for code in info.split(':') if int(code) >= 0)
+            categories = pandas_categorical[categorical_index] if categorical_index < len(pandas_categorical) else None
+            categorical_index += 1
+            values = [categories[code] for code in codes] if categories else codes
+            infos[name] = ('categorical', values)
+    return infos
+
+
+def synthesize_payloads(model_path: str, n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Synthesize request bodies from the model's feature distributions
+    
+    Args:
+        model_path: Path to the LightGBM model file
+        n: Number of payloads to generate
+        seed: Random seed
+    
+    Returns:
+        List of /predict request bodies
+    """
+    rng = random.Random(seed)
+    infos = read_feature_infos(model_path)
+    payloads = []
+    for _ in range(n):
+        payload: Dict[str, Any] = {
+            'user_id': rng.randint(1, 943),
+            'movie_id': rng.randint(1, 1682)
+        }
+        for name, info in infos.items():
+            if info[0] == 'constant':
+                payload[name] = 0
+            elif info[0] == 'categorical':
+                payload[name] = rng.choice(info[1])
+            else:
+                lo, hi = info[1], info[2]
+                if name in FLOAT_FEATURES:
+                    value = rng.uniform(lo, hi)
+                    payload[name] = round(value) if name == 'release_year' else value
+                elif lo == 0 and hi == 1:
+                    payload[name] = int(rng.random() < GENRE_PROBABILITY)
+                else:
+                    payload[name] = rng.randint(int(lo), int(hi))
+        payloads.append(payload)
+    return payloads
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoadGenerator:
+    """Sends requests over a shared connection pool and records outcomes"""
+    
+    def __init__(self, url: str, payloads: List[Dict[str, Any]], connections: int, timeout: float,
+                 headers: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.payloads = payloads
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            timeout=httpx.Timeout(timeout),
+            headers=headers
+        )
+        self.latencies_ms: List[float] = []
+        self.errors: Counter = Counter()
+        self.recording = False
+        self._next_payload = 0
+    
+    def _payload(self) -> Dict[str, Any]:
+        payload = self.payloads[self._next_payload % len(self.payloads)]
+        self._next_payload += 1
+        return payload
+    
+    async def send(self, intended_start: Optional[float] = None):
+        """
+        Send one request
+        
+        Args:
+            intended_start: Scheduled send time (open loop). Latency is measured from
+                here, so time spent queued behind a slow server is not hidden.
+        """
+        start = intended_start if intended_start is not None else time.perf_counter()
+        error = None
+        try:
+            response = await self.client.post(self.url, json=self._payload())
+            if response.status_code >= 400:
+                error = f"http_{response.status_code}"
+        except httpx.TimeoutException:
+            error = "timeout"
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        latency_ms = (time.perf_counter() - start) * 1000
+        if self.recording:
+            if error:
+                self.errors[error] += 1
+            else:
+                self.latencies_ms.append(latency_ms)
+    
+    async def run_closed(self, concurrency: int, duration: float, total_requests: Optional[int]):
+        """Closed loop: `concurrency` users each send back-to-back requests"""
+        deadline = time.perf_counter() + duration
+        remaining = [total_requests]
+        
+        async def user():
+            while time.perf_counter() < deadline:
+                if remaining[0] is not None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                await self.send()
+        
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    
+    async def run_open(self, rate: float, duration: float, total_requests: Optional[int], max_in_flight: int):
+        """Open loop: fire requests at a fixed arrival rate"""
+        interval = 1.0 / rate
+        start = time.perf_counter()
+        n = int(duration * rate)
+        if total_requests is not None:
+            n = min(n, total_requests)
+        in_flight = set()
+        for i in range(n):
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= max_in_flight:
+                # The generator itself is saturated; count it instead of silently slowing down
+                if self.recording:
+                    self.errors["client_overloaded"] += 1
+                continue
+            task = asyncio.create_task(self.send(intended_start=scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+    
+    async def close(self):
+        await self.client.aclose()
+    
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """Summarize recorded outcomes"""
+        latencies = sorted(self.latencies_ms)
+        successes = len(latencies)
+        errors = sum(self.errors.values())
+        total = successes + errors
+        return {
+            "requests": total,
+            "successes": successes,
+            "errors": errors,
+            "error_rate": round(errors / total, 6) if total else 0.0,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_rps": round(successes / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms": {
+                "min": round(latencies[0], 3) if latencies else 0.0,
+                "mean": round(sum(latencies) / successes, 3) if latencies else 0.0,
+                "p50": round(percentile(latencies, 50), 3),
+                "p95": round(percentile(latencies, 95), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "p99.9": round(percentile(latencies, 99.9), 3),
+                "max": round(latencies[-1], 3) if latencies else 0.0
+            },
+            "error_breakdown": dict(self.errors)
+        }
+
+
+async def run(args) -> Dict[str, Any]:
+    """Run warm-up and the measured phase, returning the report"""
+    if args.payloads:
+        payloads = load_payloads(args.payloads)
+    else:
+        payloads = synthesize_payloads(args.model, args.synthesize, seed=args.seed)
+    
+    connections = args.connections or (args.concurrency if args.mode == 'closed' else args.max_in_flight)
+    headers = dict(header.split(':', 1) for header in args.header)
+    headers = {key.strip(): value.strip() for key, value in headers.items()}
+    generator = LoadGenerator(args.url, payloads, connections, args.timeout, headers)
+    
+    async def phase(duration: float, total_requests: Optional[int]):
+        if args.mode == 'closed':
+            await generator.run_closed(args.concurrency, duration, total_requests)
+        else:
+            await generator.run_open(args.rate, duration, total_requests, args.max_in_flight)
+    
+    try:
+        if args.warmup > 0:
+            await phase(args.warmup, None)
+        generator.recording = True
+        start = time.perf_counter()
+        await phase(args.duration, args.requests)
+        elapsed = time.perf_counter() - start
+    finally:
+        await generator.close()
+    
+    report = generator.report(elapsed)
+    report["config"] = {
+        "url": args.url,
+        "mode": args.mode,
+        "concurrency": args.concurrency if args.mode == 'closed' else None,
+        "target_rate_rps": args.rate if args.mode == 'open' else None,
+        "duration_seconds": args.duration,
+        "connections": connections,
+        "headers": headers,
+        "payload_source": args.payloads or f"synthesized:{args.model}",
+        "payload_count": len(payloads)
+    }
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Async load generator for the prediction API")
+    parser.add_argument('--url', default='http://localhost:8000/predict', help='Endpoint to load')
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed', help='Closed loop (concurrency) or open loop (arrival rate)')
+    parser.add_argument('--concurrency', type=int, default=10, help='Concurrent users in closed-loop mode')
+    parser.add_argument('--rate', type=float, default=100.0, help='Arrival rate (requests/second) in open-loop mode')
+    parser.add_argument('--max-in-flight', type=int, default=1000, help='Open-loop cap on outstanding requests')
+    parser.add_argument('--connections', type=int, default=None, help='Connection pool size (default: concurrency or max in flight)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Measured phase length in seconds')
+    parser.add_argument('--requests', type=int, default=None, help='Stop after this many requests')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Unrecorded warm-up phase in seconds')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Per-request timeout in seconds')
+    parser.add_argument('--header', action='append', default=[], help='Extra request header as "Name: value" (repeatable), e.g. "X-Request-Timeout-Ms: 200"')
+    parser.add_argument('--payloads', default=None, help='JSON-lines file of request bodies to replay')
+    parser.add_argument('--model', default='model.txt', help='Model file used to synthesize payloads')
+    parser.add_argument('--synthesize', type=int, default=1000, help='Number of payloads to synthesize')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for synthesized payloads')
+    parser.add_argument('--output', default=None, help='Write the JSON report here instead of stdout')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
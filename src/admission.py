@@ -0,0 +1,271 @@
+"""Latency and memory admission gate for candidate models"""
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.config import settings
+from src.monitoring import heap_in_use_bytes
+from src.threading_policy import sample_features
+
+logger = logging.getLogger(__name__)
+
+ACCEPTED = "accepted"
+FLAGGED = "flagged"
+REJECTED = "rejected"
+
+
+def model_structure(booster: Any) -> Dict[str, Any]:
+    """Tree and leaf counts of a LightGBM model, read from its text dump"""
+    leaves = [
+        int(line.split('=', 1)[1]) for line in booster.model_to_string().split('\n')
+        if line.startswith('num_leaves=')
+    ]
+    return {
+        "trees": len(leaves),
+        "total_leaves": int(sum(leaves)),
+        "max_leaves": max(leaves) if leaves else 0,
+        "features": booster.num_feature()
+    }
+
+
+def model_memory_bytes(booster: Any, repeats: int = 3) -> Optional[int]:
+    """
+    Native memory a LightGBM model takes
+    
+    Loads the model's text into a fresh Booster and measures how much the
+    malloc heap grew, keeping the smallest of `repeats` loads so that
+    allocations made meanwhile by requests are not counted. Measured this way,
+    rather than around the model's own load, the figure excludes one-time
+    library and OpenMP setup and is comparable between models.
+    
+    Returns:
+        Bytes, or None where the heap cannot be measured
+    """
+    import lightgbm as lgb
+    
+    model_string = booster.model_to_string()
+    sizes = []
+    for _ in range(repeats):
+        before = heap_in_use_bytes()
+        if before is None:
+            return None
+        copy = lgb.Booster(model_str=model_string)
+        sizes.append(heap_in_use_bytes() - before)
+        del copy
+    return max(0, min(sizes))
+
+
+def time_batches(
+    predict_fns: Dict[str, Callable[[np.ndarray], Any]],
+    features: np.ndarray,
+    batch_sizes: Sequence[int],
+    repeats: int,
+    timer: Callable[[], float] = time.perf_counter
+) -> Dict[int, Dict[str, Dict[str, float]]]:
+    """
+    Time several predict functions on the same batches
+    
+    Runs are interleaved (one of each function per repeat), so load from
+    other work on the host affects all of them alike.
+    
+    Returns:
+        {batch_size: {name: {"p50_ms", "p99_ms"}}}
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        batch = features[:batch_size]
+        runs: Dict[str, List[float]] = {name: [] for name in predict_fns}
+        for fn in predict_fns.values():
+            fn(batch)
+        for _ in range(repeats):
+            for name, fn in predict_fns.items():
+                t0 = timer()
+                fn(batch)
+                runs[name].append((timer() - t0) * 1000)
+        results[batch_size] = {
+            name: {
+                "p50_ms": round(float(np.percentile(times, 50)), 4),
+                "p99_ms": round(float(np.percentile(times, 99)), 4)
+            }
+            for name, times in runs.items()
+        }
+    return results
+
+
+class AdmissionGate:
+    """
+    Benchmarks a candidate model against budgets and the current model before it is installed
+    
+    Both models score the same reference rows at each batch size. The
+    candidate regresses if, at any batch size, its median latency exceeds
+    the current model's by more than `max_latency_ratio` or its p99 exceeds
+    the absolute budget for that size; or if the memory its load allocated
+    exceeds `max_memory_mb` or `max_memory_ratio` times the current model's
+    (differences under `memory_slack_mb` are ignored). Both models' memory
+    comes from `measure_memory()`, the candidate's when it was just loaded
+    and the current model's again at gate time. The median is used for
+    the relative check because it is stable over a few dozen runs; the cost
+    of more trees or leaves shows up in it as much as in the tail.
+    
+    In "enforce" mode a regressing candidate is rejected, in "warn" mode it
+    is installed and flagged.
+    """
+    
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        batch_sizes: Optional[Sequence[int]] = None,
+        repeats: Optional[int] = None,
+        max_latency_ratio: Optional[float] = None,
+        latency_budgets_ms: Optional[Dict[int, float]] = None,
+        max_memory_ratio: Optional[float] = None,
+        memory_slack_mb: Optional[float] = None,
+        max_memory_mb: Optional[float] = None,
+        reference_path: Optional[str] = None
+    ):
+        self.mode = mode or settings.admission_mode
+        self.batch_sizes = sorted(set(batch_sizes or settings.admission_batch_sizes))
+        self.repeats = repeats or settings.admission_repeats
+        self.max_latency_ratio = max_latency_ratio or settings.admission_max_latency_ratio
+        self.latency_budgets_ms = (
+            settings.admission_latency_budgets_ms if latency_budgets_ms is None else latency_budgets_ms
+        )
+        self.max_memory_ratio = max_memory_ratio or settings.admission_max_memory_ratio
+        self.memory_slack_mb = settings.admission_memory_slack_mb if memory_slack_mb is None else memory_slack_mb
+        self.max_memory_mb = settings.admission_max_memory_mb if max_memory_mb is None else max_memory_mb
+        self.reference_path = reference_path or settings.admission_reference_path
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.decisions = {ACCEPTED: 0, FLAGGED: 0, REJECTED: 0}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+    
+    def reference_features(self, booster: Any) -> np.ndarray:
+        """
+        Rows to benchmark on: the stored reference set if configured, else rows
+        sampled from the model's training ranges (fixed seed)
+        """
+        n_rows = max(self.batch_sizes)
+        if self.reference_path and os.path.exists(self.reference_path):
+            features = np.load(self.reference_path)
+            if len(features) < n_rows:
+                features = np.resize(features, (n_rows, features.shape[1]))
+            return features
+        return sample_features(booster.model_to_string(), n_rows)
+    
+    def evaluate(self, candidate: Any, current: Optional[Any] = None,
+                 features: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """
+        Benchmark a loaded candidate and decide whether it may replace the current model
+        
+        Args:
+            candidate: Loaded ModelLoader holding the candidate model
+            current: ModelLoader serving now (None on first load: budgets only)
+            features: Reference rows (default: reference_features())
+        
+        Returns:
+            Report with the decision, the reasons for it, latency per batch
+            size, memory and model structure of both models
+        """
+        start = time.perf_counter()
+        if features is None:
+            features = self.reference_features((current or candidate).model)
+        reasons = []
+        predict_fns = {"candidate": candidate.predict}
+        if current is not None:
+            predict_fns["current"] = current.predict
+        try:
+            timings = time_batches(predict_fns, features, self.batch_sizes, self.repeats)
+        except Exception as e:
+            timings = {}
+            reasons.append(f"candidate failed on the reference rows: {e}")
+        
+        latency = []
+        for batch_size, by_model in timings.items():
+            entry = {
+                "batch_size": batch_size,
+                "candidate_p50_ms": by_model["candidate"]["p50_ms"],
+                "candidate_p99_ms": by_model["candidate"]["p99_ms"],
+                "budget_p99_ms": self.latency_budgets_ms.get(batch_size)
+            }
+            if "current" in by_model:
+                entry["current_p50_ms"] = by_model["current"]["p50_ms"]
+                entry["current_p99_ms"] = by_model["current"]["p99_ms"]
+                entry["p50_ratio"] = round(entry["candidate_p50_ms"] / max(entry["current_p50_ms"], 1e-6), 3)
+                if entry["p50_ratio"] > self.max_latency_ratio:
+                    reasons.append(
+                        f"{batch_size}-row median latency {entry['p50_ratio']}x the current model's "
+                        f"(limit {self.max_latency_ratio}x)"
+                    )
+            if entry["budget_p99_ms"] is not None and entry["candidate_p99_ms"] > entry["budget_p99_ms"]:
+                reasons.append(
+                    f"{batch_size}-row p99 {entry['candidate_p99_ms']}ms over the {entry['budget_p99_ms']}ms budget"
+                )
+            latency.append(entry)
+        
+        memory = {
+            "candidate_mb": _mb(candidate.memory_bytes),
+            "current_mb": _mb(current.measure_memory()) if current is not None else None,
+            "budget_mb": self.max_memory_mb or None
+        }
+        if memory["candidate_mb"] is not None:
+            if self.max_memory_mb and memory["candidate_mb"] > self.max_memory_mb:
+                reasons.append(f"model memory {memory['candidate_mb']}MB over the {self.max_memory_mb}MB budget")
+            current_mb = memory["current_mb"]
+            if current_mb is not None and memory["candidate_mb"] > max(
+                current_mb * self.max_memory_ratio, current_mb + self.memory_slack_mb
+            ):
+                reasons.append(
+                    f"model memory {memory['candidate_mb']}MB vs {current_mb}MB for the current model "
+                    f"(limit {self.max_memory_ratio}x)"
+                )
+        
+        if not reasons:
+            decision = ACCEPTED
+        elif self.mode == "enforce":
+            decision = REJECTED
+        else:
+            decision = FLAGGED
+        report = {
+            "decision": decision,
+            "mode": self.mode,
+            "reasons": reasons,
+            "candidate_version": candidate.model_version,
+            "current_version": current.model_version if current is not None else None,
+            "structure": {
+                "candidate": model_structure(candidate.model),
+                "current": model_structure(current.model) if current is not None else None
+            },
+            "latency": latency,
+            "memory": memory,
+            "reference_rows": len(features),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "evaluated_at": time.time()
+        }
+        self.last_report = report
+        self.decisions[decision] += 1
+        if decision == ACCEPTED:
+            logger.info(f"Model {candidate.model_version} admitted in {report['duration_ms']:.0f}ms")
+        else:
+            logger.warning(f"Model {candidate.model_version} {decision}: " + "; ".join(reasons))
+        return report
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Decision counts and the last report for the /metrics endpoint"""
+        return {
+            "mode": self.mode,
+            "decisions": dict(self.decisions),
+            "last": self.last_report
+        }
+
+
+def _mb(n_bytes: Optional[int]) -> Optional[float]:
+    return round(n_bytes / 1e6, 2) if n_bytes is not None else None
+
+
+# Global admission gate instance
+admission_gate = AdmissionGate()
@@ -1,10 +1,13 @@
 """FastAPI application for model serving"""
+import asyncio
+import hmac
 import logging
 import time
-from typing import List
+from typing import List, Optional, Tuple
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, status
+import numpy as np
+from fastapi import FastAPI, Header, HTTPException, Query, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -12,12 +15,25 @@ from src.config import settings
 from src.schemas import (
     PredictionRequest, BatchPredictionRequest,
     PredictionResponse, BatchPredictionResponse,
-    HealthResponse, MetricsResponse
+    CompactPredictionRequest, CompactPredictionResponse,
+    ExplanationResponse, BatchExplanationResponse, FeatureContribution,
+    FeedbackEvent, FeedbackResponse, LabelBatch, LabelResponse, HealthResponse, MetricsResponse
 )
 from src.model_loader import model_loader
+from src.admission import admission_gate
 from src.feature_extractor import feature_extractor
-from src.monitoring import metrics_collector, cloudwatch_logger
-from src.data_pipeline import save_prediction_to_s3, save_batch_predictions_to_s3
+from src.monitoring import metrics_collector, cloudwatch_metrics, cloudwatch_logger, drift_monitor
+from src.data_pipeline import prediction_capture
+from src.scheduling import scheduler, parse_priority, parse_deadline, Overloaded, DeadlineExceeded, PRIORITIES
+from src.explainer import explainer, explain_scheduler, top_contributions
+from src.feature_store import feature_store
+from src.coalescing import single_flight, batch_deduplicator
+from src.threading_policy import thread_policy
+from src.quality_monitor import quality_monitor
+from src.score_table import score_table
+from src.resilience import dependency_states, get_metrics as resilience_metrics
+from src.saturation import saturation_monitor, InFlightMiddleware
+from src.profiling import memory_profiler, object_bytes
 
 # Configure logging
 logging.basicConfig(
@@ -27,21 +43,125 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def warm_up(n_rows: int) -> float:
+    """
+    Run a synthetic batch through the whole prediction path
+    
+    Featurization, the inference pool, the model and response serialization all
+    pay one-time costs (lazy imports, thread start-up, first-call allocations)
+    that would otherwise land on the first real requests. Metrics and the drift
+    monitor are bypassed so warm-up traffic is never reported.
+    
+    Args:
+        n_rows: Number of rows in the warm-up batch
+    
+    Returns:
+        Warm-up time in milliseconds
+    """
+    start_time = time.time()
+    example = PredictionRequest.model_config["json_schema_extra"]["example"]
+    requests = [PredictionRequest(**{**example, "user_id": i + 1}) for i in range(max(1, n_rows))]
+    
+    def score():
+        features = feature_extractor.extract_batch_features(requests)
+        model_loader.predict(features[:1])
+        return model_loader.predict(features)
+    
+    predictions = await scheduler.run(score, PRIORITIES["bulk"], cost=len(requests))
+    BatchPredictionResponse(
+        predictions=[
+            PredictionResponse(
+                user_id=r.user_id, movie_id=r.movie_id, prediction=float(p),
+                prediction_class=int(p >= 0.5), model_version=model_loader.model_version or "unknown",
+                inference_time_ms=0.0
+            )
+            for r, p in zip(requests, predictions)
+        ],
+        total_time_ms=0.0,
+        avg_time_per_prediction_ms=0.0
+    ).model_dump_json()
+    return (time.time() - start_time) * 1000
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     # Startup
+    app.state.ready = False
     logger.info(f"Starting {settings.app_name} v{settings.app_version}")
     logger.info(f"Environment: {settings.environment}")
+    
+    if feature_store.enabled:
+        feature_store.restore()
+    if score_table.enabled:
+        score_table.load()
+    
+    # The model is loaded here rather than at import so lightgbm is only imported by serving processes
+    model_loader.load()
     logger.info(f"Model loaded: {model_loader.model_loaded}")
     
     if not model_loader.model_loaded:
         logger.error("Model failed to load! Service may not work correctly.")
+    else:
+        if drift_monitor.enabled:
+            drift_monitor.configure_from_model(model_loader.model)
+        if settings.enable_thread_calibration:
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, thread_policy.calibrate_model, model_loader.model
+                )
+            except Exception as e:
+                logger.error(f"Thread calibration failed: {e}", exc_info=True)
+        if settings.warmup_rows > 0:
+            try:
+                warmup_ms = await warm_up(settings.warmup_rows)
+                logger.info(f"Warm-up of {settings.warmup_rows} rows took {warmup_ms:.1f}ms")
+            except Exception as e:
+                logger.error(f"Warm-up failed: {e}", exc_info=True)
+    
+    # gRPC scoring service on the same event loop, sharing model and metrics
+    grpc_server = None
+    if settings.enable_grpc:
+        from src.grpc_service import create_grpc_server
+        grpc_server, grpc_port = create_grpc_server()
+        await grpc_server.start()
+        logger.info(f"gRPC server listening on port {grpc_port}")
+    
+    app.state.ready = model_loader.model_loaded
+    
+    if saturation_monitor.enabled:
+        saturation_monitor.queue_sources = {
+            "inference": lambda: scheduler.queue_depth,
+            "explain": lambda: explain_scheduler.queue_depth
+        }
+        saturation_monitor.start()
+    
+    # AWS clients are created off the request path once serving has started
+    if settings.enable_cloudwatch:
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(None, cloudwatch_metrics.initialize)
+        loop.run_in_executor(None, cloudwatch_logger.initialize)
     
     yield
     
+    app.state.ready = False
+    
     # Shutdown
     logger.info("Shutting down application")
+    await saturation_monitor.stop()
+    if grpc_server is not None:
+        await grpc_server.stop(grace=5)
+    scheduler.shutdown()
+    explain_scheduler.shutdown()
+    if feature_store.enabled and feature_store.events_since_snapshot:
+        feature_store.snapshot()
+    if settings.s3_bucket:
+        # Spooled locally if S3 is unavailable; in-flight writes get up to 10s,
+        # waited for on a worker thread so the loop keeps serving the shutdown
+        prediction_capture.submit(prediction_capture.take(force=True))
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: prediction_capture.dependency.wait_idle(timeout_seconds=10)
+        )
 
 
 app = FastAPI(
@@ -60,6 +180,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Requests in flight, for load-aware readiness
+if saturation_monitor.enabled:
+    app.add_middleware(InFlightMiddleware, monitor=saturation_monitor)
+
+# Memory held by each subsystem, reported by /admin/memory
+# (the model's native memory and quantizer tables are measured at load)
+memory_profiler.subsystems = {
+    "model": lambda: model_loader.memory_bytes if model_loader.memory_bytes is not None else object_bytes(model_loader),
+    "metrics": lambda: object_bytes(metrics_collector),
+    "drift_monitor": lambda: object_bytes(drift_monitor),
+    "quality_monitor": lambda: object_bytes(quality_monitor),
+    "feature_store": lambda: object_bytes(feature_store),
+    "explain_cache": lambda: object_bytes(explainer),
+    "prediction_capture": lambda: object_bytes(prediction_capture),
+    "coalescing": lambda: object_bytes(single_flight) + object_bytes(batch_deduplicator),
+    "score_table": lambda: object_bytes(score_table)
+}
+
+
+def _scheduling_params(priority: Optional[str], timeout_ms: Optional[float],
+                       default_priority: str) -> Tuple[int, Optional[float]]:
+    """Read the X-Priority and X-Request-Timeout-Ms headers"""
+    try:
+        return parse_priority(priority, default_priority), parse_deadline(timeout_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _scheduling_error(e: Exception) -> HTTPException:
+    """Map a shed or expired request to a fast 503/504 response"""
+    if isinstance(e, Overloaded):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after_seconds)}
+        )
+    return HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+
+
+def _bulk_predict(features: np.ndarray, user_ids: List[int], movie_ids: List[int]) -> np.ndarray:
+    """
+    Score a bulk batch: hot pairs from the score table, the rest once per
+    distinct row, with the early-exit cascade when it is enabled
+    """
+    predict_fn = model_loader.predict_cascade if settings.enable_cascade else model_loader.predict
+    return score_table.predict(
+        features, user_ids, movie_ids, model_loader.model_version,
+        lambda rows: batch_deduplicator.predict(predict_fn, rows)
+    )
+
 
 @app.get("/", response_model=HealthResponse)
 async def root():
@@ -74,20 +244,64 @@ async def root():
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint"""
+    """
+    Health check endpoint
+    
+    `dependencies` has the circuit-breaker state of each downstream AWS
+    service; an open circuit marks the service degraded (predictions are
+    still served, their logging is spooled or dropped).
+    """
+    dependencies = dependency_states()
+    healthy = model_loader.model_loaded and all(state == "closed" for state in dependencies.values())
     return HealthResponse(
-        status="ok" if model_loader.model_loaded else "degraded",
+        status="ok" if healthy else "degraded",
         model_loaded=model_loader.model_loaded,
         model_version=model_loader.model_version,
-        environment=settings.environment
+        environment=settings.environment,
+        dependencies=dependencies
     )
 
 
+@app.get("/ready", response_model=HealthResponse)
+async def readiness_check():
+    """
+    Readiness check endpoint
+    
+    Returns 503 until the model is loaded and warmed up, so load balancers
+    only route traffic to pods that can serve it at full speed. Also returns
+    503 ("saturated", with the exceeded thresholds in `saturation`) while
+    event-loop lag, in-flight requests, queue depth or CPU use is over its
+    threshold, so traffic moves to less loaded replicas until this one recovers.
+    """
+    started = getattr(app.state, "ready", False) and model_loader.model_loaded
+    saturated = started and saturation_monitor.enabled and saturation_monitor.evaluate()
+    ready = started and not saturated
+    response = HealthResponse(
+        status="ready" if ready else ("saturated" if saturated else "starting"),
+        model_loaded=model_loader.model_loaded,
+        model_version=model_loader.model_version,
+        environment=settings.environment,
+        saturation=saturation_monitor.reasons if saturated else None
+    )
+    if not ready:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=response.model_dump())
+    return response
+
+
 @app.post("/predict", response_model=PredictionResponse)
-async def predict(request: PredictionRequest):
+async def predict(
+    request: PredictionRequest,
+    x_priority: Optional[str] = Header(None),
+    x_request_timeout_ms: Optional[float] = Header(None)
+):
     """
     Make a single prediction
     
+    Optional headers: `X-Priority` (interactive|bulk, default interactive) and
+    `X-Request-Timeout-Ms`. Requests that cannot finish in time get a 503 with
+    Retry-After, or a 504 if they expire while queued. Identical requests that
+    arrive while one is being scored share its result (and its scheduling outcome).
+    
     Returns:
         PredictionResponse with prediction probability and class
     """
@@ -97,15 +311,32 @@ async def predict(request: PredictionRequest):
             detail="Model not loaded"
         )
     
+    priority, deadline = _scheduling_params(x_priority, x_request_timeout_ms, "interactive")
     metrics_collector.record_request()
     start_time = time.time()
     
+    def score():
+        # Extract features and predict on the inference pool
+        with memory_profiler.stage("features"):
+            features = feature_extractor.extract_features(request)
+            feature_store.enrich(features, [request.user_id], [request.movie_id])
+        with memory_profiler.stage("drift"):
+            drift_monitor.update(features)
+        with memory_profiler.stage("model"):
+            predictions = score_table.predict(
+                features, [request.user_id], [request.movie_id], model_loader.model_version, model_loader.predict
+            )
+        if quality_monitor.enabled:
+            with memory_profiler.stage("quality"):
+                quality_monitor.record(
+                    [request.user_id], [request.movie_id], predictions, model_loader.model_version or "unknown"
+                )
+        return predictions
+    
     try:
-        # Extract features
-        features = feature_extractor.extract_features(request)
-        
-        # Make prediction
-        predictions = model_loader.predict(features)
+        # Identical bodies produce identical feature rows for the same model
+        key = (model_loader.model_version, request.model_dump_json())
+        predictions = await single_flight.run(key, lambda: scheduler.run(score, priority, deadline))
         prediction_prob = float(predictions[0])
         prediction_class = 1 if prediction_prob >= 0.5 else 0
         
@@ -121,21 +352,13 @@ async def predict(request: PredictionRequest):
             inference_time_ms, model_loader.model_version or "unknown"
         )
         
-        # Save to S3 for analytics (async, non-blocking)
-        # This data can be queried via Athena
+        # Capture a sample to S3 for analytics (queried via Athena)
         if settings.s3_bucket:
-            prediction_data = {
-                "user_id": request.user_id,
-                "movie_id": request.movie_id,
-                "age": request.age,
-                "gender": request.gender,
-                "prediction": prediction_prob,
-                "prediction_class": prediction_class,
-                "model_version": model_loader.model_version or "unknown",
-                "inference_time_ms": inference_time_ms,
-                "timestamp": time.time()
-            }
-            save_prediction_to_s3(prediction_data)
+            prediction_capture.record(
+                "predict", model_loader.model_version or "unknown", [request.user_id], [prediction_prob],
+                lambda i: _capture_row(request, prediction_prob, inference_time_ms)
+            )
+            _flush_capture_if_due()
         
         return PredictionResponse(
             user_id=request.user_id,
@@ -146,11 +369,16 @@ async def predict(request: PredictionRequest):
             inference_time_ms=round(inference_time_ms, 3)
         )
     
+    except (Overloaded, DeadlineExceeded) as e:
+        raise _scheduling_error(e)
     except Exception as e:
         inference_time_ms = (time.time() - start_time) * 1000
         request_time_ms = inference_time_ms
         metrics_collector.record_prediction(inference_time_ms, success=False, request_time_ms=request_time_ms)
         logger.error(f"Prediction error: {e}", exc_info=True)
+        if settings.s3_bucket:
+            prediction_capture.record_error(_capture_row(request, None, inference_time_ms))
+            _flush_capture_if_due()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Prediction failed: {str(e)}"
@@ -158,10 +386,16 @@ async def predict(request: PredictionRequest):
 
 
 @app.post("/predict/batch", response_model=BatchPredictionResponse)
-async def predict_batch(request: BatchPredictionRequest):
+async def predict_batch(
+    request: BatchPredictionRequest,
+    x_priority: Optional[str] = Header(None),
+    x_request_timeout_ms: Optional[float] = Header(None)
+):
     """
     Make batch predictions
     
+    Scheduled as bulk work unless `X-Priority: interactive` is sent.
+    
     Returns:
         BatchPredictionResponse with list of predictions
     """
@@ -171,30 +405,45 @@ async def predict_batch(request: BatchPredictionRequest):
             detail="Model not loaded"
         )
     
+    priority, deadline = _scheduling_params(x_priority, x_request_timeout_ms, "bulk")
     metrics_collector.record_request()
     start_time = time.time()
     
+    def score():
+        with memory_profiler.stage("features"):
+            features = feature_extractor.extract_batch_features(request.predictions)
+            feature_store.enrich(
+                features, [r.user_id for r in request.predictions], [r.movie_id for r in request.predictions]
+            )
+        with memory_profiler.stage("drift"):
+            drift_monitor.update(features)
+        user_ids = [r.user_id for r in request.predictions]
+        movie_ids = [r.movie_id for r in request.predictions]
+        with memory_profiler.stage("model"):
+            predictions = _bulk_predict(features, user_ids, movie_ids)
+        if quality_monitor.enabled:
+            with memory_profiler.stage("quality"):
+                quality_monitor.record(user_ids, movie_ids, predictions, model_loader.model_version or "unknown")
+        return predictions
+    
     try:
-        # Extract features for all requests
-        features = feature_extractor.extract_batch_features(request.predictions)
-        
-        # Make batch predictions
-        predictions = model_loader.predict(features)
+        predictions = await scheduler.run(score, priority, deadline, cost=len(request.predictions))
         
         # Build response
-        response_predictions = []
-        for i, pred_request in enumerate(request.predictions):
-            prediction_prob = float(predictions[i])
-            prediction_class = 1 if prediction_prob >= 0.5 else 0
-            
-            response_predictions.append(PredictionResponse(
-                user_id=pred_request.user_id,
-                movie_id=pred_request.movie_id,
-                prediction=prediction_prob,
-                prediction_class=prediction_class,
-                model_version=model_loader.model_version or "unknown",
-                inference_time_ms=0.0  # Batch inference time is in total_time_ms
-            ))
+        with memory_profiler.stage("response"):
+            response_predictions = []
+            for i, pred_request in enumerate(request.predictions):
+                prediction_prob = float(predictions[i])
+                prediction_class = 1 if prediction_prob >= 0.5 else 0
+                
+                response_predictions.append(PredictionResponse(
+                    user_id=pred_request.user_id,
+                    movie_id=pred_request.movie_id,
+                    prediction=prediction_prob,
+                    prediction_class=prediction_class,
+                    model_version=model_loader.model_version or "unknown",
+                    inference_time_ms=0.0  # Batch inference time is in total_time_ms
+                ))
         
         total_time_ms = (time.time() - start_time) * 1000
         avg_time_per_prediction_ms = total_time_ms / len(request.predictions)
@@ -203,24 +452,14 @@ async def predict_batch(request: BatchPredictionRequest):
         for _ in request.predictions:
             metrics_collector.record_prediction(avg_time_per_prediction_ms, success=True, request_time_ms=avg_time_per_prediction_ms)
         
-        # Save batch predictions to S3 for analytics (async, non-blocking)
+        # Capture a sample to S3 for analytics
         if settings.s3_bucket:
-            batch_data = []
-            for i, pred_request in enumerate(request.predictions):
-                prediction_prob = float(predictions[i])
-                prediction_class = 1 if prediction_prob >= 0.5 else 0
-                batch_data.append({
-                    "user_id": pred_request.user_id,
-                    "movie_id": pred_request.movie_id,
-                    "age": pred_request.age,
-                    "gender": pred_request.gender,
-                    "prediction": prediction_prob,
-                    "prediction_class": prediction_class,
-                    "model_version": model_loader.model_version or "unknown",
-                    "inference_time_ms": avg_time_per_prediction_ms,
-                    "timestamp": time.time()
-                })
-            save_batch_predictions_to_s3(batch_data)
+            prediction_capture.record(
+                "predict_batch", model_loader.model_version or "unknown",
+                [r.user_id for r in request.predictions], predictions,
+                lambda i: _capture_row(request.predictions[i], float(predictions[i]), avg_time_per_prediction_ms)
+            )
+            _flush_capture_if_due()
         
         return BatchPredictionResponse(
             predictions=response_predictions,
@@ -228,36 +467,446 @@ async def predict_batch(request: BatchPredictionRequest):
             avg_time_per_prediction_ms=round(avg_time_per_prediction_ms, 3)
         )
     
+    except (Overloaded, DeadlineExceeded) as e:
+        raise _scheduling_error(e)
     except Exception as e:
         total_time_ms = (time.time() - start_time) * 1000
         avg_time_per_prediction_ms = total_time_ms / len(request.predictions) if request.predictions else 0
         metrics_collector.record_prediction(avg_time_per_prediction_ms, success=False, request_time_ms=avg_time_per_prediction_ms)
         logger.error(f"Batch prediction error: {e}", exc_info=True)
+        if settings.s3_bucket:
+            for pred_request in request.predictions:
+                prediction_capture.record_error(_capture_row(pred_request, None, avg_time_per_prediction_ms))
+            _flush_capture_if_due()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Batch prediction failed: {str(e)}"
         )
 
 
+@app.post("/predict/compact", response_model=CompactPredictionResponse)
+async def predict_compact(
+    request: CompactPredictionRequest,
+    x_priority: Optional[str] = Header(None),
+    x_request_timeout_ms: Optional[float] = Header(None)
+):
+    """
+    Make predictions from the compact columnar request format
+    
+    Scheduled as bulk work unless `X-Priority: interactive` is sent.
+    
+    Returns:
+        CompactPredictionResponse with probabilities in request row order
+    """
+    if not model_loader.model_loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded"
+        )
+    
+    priority, deadline = _scheduling_params(x_priority, x_request_timeout_ms, "bulk")
+    metrics_collector.record_request()
+    start_time = time.time()
+    n_rows = len(request.user_ids)
+    
+    def score():
+        with memory_profiler.stage("features"):
+            features = feature_extractor.extract_compact_features(request)
+            feature_store.enrich(features, request.user_ids, request.movie_ids)
+        with memory_profiler.stage("drift"):
+            drift_monitor.update(features)
+        with memory_profiler.stage("model"):
+            predictions = _bulk_predict(features, request.user_ids, request.movie_ids)
+        if quality_monitor.enabled:
+            with memory_profiler.stage("quality"):
+                quality_monitor.record(
+                    request.user_ids, request.movie_ids, predictions, model_loader.model_version or "unknown"
+                )
+        return predictions
+    
+    try:
+        predictions = await scheduler.run(score, priority, deadline, cost=n_rows)
+        
+        total_time_ms = (time.time() - start_time) * 1000
+        metrics_collector.record_batch(n_rows, total_time_ms / n_rows, success=True)
+        
+        if settings.s3_bucket:
+            model_version = model_loader.model_version or "unknown"
+            timestamp = time.time()
+            prediction_capture.record(
+                "predict_compact", model_version, request.user_ids, predictions,
+                lambda i: {
+                    "user_id": request.user_ids[i],
+                    "movie_id": request.movie_ids[i],
+                    "age": request.ages[i],
+                    "gender": 'M' if request.genders[i] else 'F',
+                    "prediction": float(predictions[i]),
+                    "prediction_class": int(predictions[i] >= 0.5),
+                    "model_version": model_version,
+                    "inference_time_ms": total_time_ms / n_rows,
+                    "timestamp": timestamp
+                }
+            )
+            _flush_capture_if_due()
+        
+        return CompactPredictionResponse(
+            predictions=predictions.tolist(),
+            model_version=model_loader.model_version or "unknown",
+            total_time_ms=round(total_time_ms, 3)
+        )
+    
+    except (Overloaded, DeadlineExceeded) as e:
+        raise _scheduling_error(e)
+    except Exception as e:
+        total_time_ms = (time.time() - start_time) * 1000
+        metrics_collector.record_batch(n_rows, total_time_ms / n_rows, success=False)
+        logger.error(f"Compact prediction error: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Compact prediction failed: {str(e)}"
+        )
+
+
+async def _explain_requests(
+    requests: List[PredictionRequest],
+    top_n: Optional[int],
+    priority: int,
+    deadline: Optional[float]
+) -> Tuple[List[ExplanationResponse], int]:
+    """Featurize, compute contributions for the whole batch at once and pick the top-N features"""
+    top_n = top_n or settings.explain_top_n
+    
+    def compute():
+        features = feature_extractor.extract_batch_features(requests)
+        feature_store.enrich(features, [r.user_id for r in requests], [r.movie_id for r in requests])
+        contributions, cached_rows = explainer.contributions(features)
+        return features, contributions, cached_rows
+    
+    features, contributions, cached_rows = await explain_scheduler.run(
+        compute, priority, deadline, cost=len(requests)
+    )
+    raw_scores = contributions.sum(axis=1)
+    probabilities = 1.0 / (1.0 + np.exp(-raw_scores))
+    top = top_contributions(contributions, features, model_loader.model.feature_name(), top_n)
+    model_version = model_loader.model_version or "unknown"
+    
+    explanations = [
+        ExplanationResponse(
+            user_id=request.user_id,
+            movie_id=request.movie_id,
+            prediction=float(probabilities[i]),
+            base_value=float(contributions[i, -1]),
+            contributions=[FeatureContribution(**item) for item in top[i]],
+            model_version=model_version
+        )
+        for i, request in enumerate(requests)
+    ]
+    return explanations, cached_rows
+
+
+@app.post("/explain", response_model=ExplanationResponse)
+async def explain(
+    request: PredictionRequest,
+    top_n: Optional[int] = Query(None, ge=1, le=100, description="Number of features to return"),
+    x_priority: Optional[str] = Header(None),
+    x_request_timeout_ms: Optional[float] = Header(None)
+):
+    """
+    Explain a single prediction with per-feature SHAP contributions
+    
+    Returns:
+        ExplanationResponse with the top-N features by absolute contribution
+    """
+    if not model_loader.model_loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded"
+        )
+    
+    priority, deadline = _scheduling_params(x_priority, x_request_timeout_ms, "interactive")
+    start_time = time.time()
+    
+    try:
+        explanations, _ = await _explain_requests([request], top_n, priority, deadline)
+        metrics_collector.record_explanation(1, (time.time() - start_time) * 1000, success=True)
+        return explanations[0]
+    
+    except (Overloaded, DeadlineExceeded) as e:
+        raise _scheduling_error(e)
+    except Exception as e:
+        metrics_collector.record_explanation(1, (time.time() - start_time) * 1000, success=False)
+        logger.error(f"Explanation error: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Explanation failed: {str(e)}"
+        )
+
+
+@app.post("/explain/batch", response_model=BatchExplanationResponse)
+async def explain_batch(
+    request: BatchPredictionRequest,
+    top_n: Optional[int] = Query(None, ge=1, le=100, description="Number of features to return per row"),
+    x_priority: Optional[str] = Header(None),
+    x_request_timeout_ms: Optional[float] = Header(None)
+):
+    """
+    Explain a batch of predictions in one vectorized contribution call
+    
+    Scheduled as bulk work unless `X-Priority: interactive` is sent.
+    
+    Returns:
+        BatchExplanationResponse with one explanation per request row
+    """
+    if not model_loader.model_loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded"
+        )
+    
+    priority, deadline = _scheduling_params(x_priority, x_request_timeout_ms, "bulk")
+    start_time = time.time()
+    n_rows = len(request.predictions)
+    
+    try:
+        explanations, cached_rows = await _explain_requests(request.predictions, top_n, priority, deadline)
+        total_time_ms = (time.time() - start_time) * 1000
+        metrics_collector.record_explanation(n_rows, total_time_ms, success=True)
+        return BatchExplanationResponse(
+            explanations=explanations,
+            cached_rows=cached_rows,
+            total_time_ms=round(total_time_ms, 3)
+        )
+    
+    except (Overloaded, DeadlineExceeded) as e:
+        raise _scheduling_error(e)
+    except Exception as e:
+        metrics_collector.record_explanation(n_rows, (time.time() - start_time) * 1000, success=False)
+        logger.error(f"Batch explanation error: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch explanation failed: {str(e)}"
+        )
+
+
+def _require_feature_store():
+    if not feature_store.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Feature store is disabled (set ENABLE_FEATURE_STORE=true)"
+        )
+
+
+def _require_admin(token: Optional[str]):
+    if not settings.admin_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled (set ADMIN_TOKEN)"
+        )
+    if token is None or not hmac.compare_digest(token, settings.admin_token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token")
+
+
+async def _read_body(request: Request, max_bytes: int) -> bytes:
+    """Read a request body, with a 413 as soon as it is known to exceed max_bytes"""
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Request body over {max_bytes} bytes"
+    )
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _capture_row(pred_request: PredictionRequest, prediction: Optional[float], inference_time_ms: float) -> dict:
+    """Prediction log record; a failed request has a NaN prediction and class -1"""
+    return {
+        "user_id": pred_request.user_id,
+        "movie_id": pred_request.movie_id,
+        "age": pred_request.age,
+        "gender": pred_request.gender,
+        "prediction": float('nan') if prediction is None else prediction,
+        "prediction_class": -1 if prediction is None else int(prediction >= 0.5),
+        "model_version": model_loader.model_version or "unknown",
+        "inference_time_ms": inference_time_ms,
+        "timestamp": time.time()
+    }
+
+
+def _flush_capture_if_due():
+    """Hand captured predictions that are ready to the S3 dependency for upload"""
+    if prediction_capture.flush_due():
+        prediction_capture.submit(prediction_capture.take())
+
+
+def _snapshot_feature_store_if_due():
+    """Write a feature store snapshot off the event loop once the interval has elapsed"""
+    if feature_store.snapshot_due():
+        # Mark the attempt so concurrent requests do not start another one
+        feature_store.last_snapshot = time.time()
+        asyncio.get_running_loop().run_in_executor(None, feature_store.snapshot)
+
+
+def _ingest_ndjson(body: bytes, max_errors: int = 20) -> FeedbackResponse:
+    """Validate and record newline-delimited FeedbackEvent JSON objects"""
+    events, errors = [], []
+    rejected = 0
+    for line_number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            events.append(FeedbackEvent.model_validate_json(line))
+        except ValueError as e:
+            rejected += 1
+            if len(errors) < max_errors:
+                errors.append(f"line {line_number}: {str(e).splitlines()[0]}")
+    accepted = feature_store.record_events(events) if events else 0
+    if events and quality_monitor.enabled:
+        quality_monitor.label([e.user_id for e in events], [e.movie_id for e in events], [e.liked for e in events])
+    return FeedbackResponse(accepted=accepted, rejected=rejected, errors=errors)
+
+
+@app.post("/feedback", response_model=FeedbackResponse)
+async def feedback(event: FeedbackEvent):
+    """
+    Record one rating event in the online aggregate features
+    
+    Returns:
+        FeedbackResponse with the number of events accepted
+    """
+    _require_feature_store()
+    feature_store.record_events([event])
+    if quality_monitor.enabled:
+        quality_monitor.label([event.user_id], [event.movie_id], [event.liked])
+    _snapshot_feature_store_if_due()
+    return FeedbackResponse(accepted=1)
+
+
+@app.post("/labels", response_model=LabelResponse)
+async def ingest_labels(batch: LabelBatch):
+    """
+    Join delayed outcomes to recent predictions for the online quality metrics
+    
+    Labels are matched on (user_id, movie_id) to the latest prediction still
+    held by the quality monitor; the sliding-window AUC, log-loss and
+    calibration per model version appear under `quality` in /metrics.
+    `/feedback` events are used as labels as well.
+    
+    Returns:
+        LabelResponse with the number of labels received and matched
+    """
+    if not quality_monitor.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Quality monitor is disabled (set ENABLE_QUALITY_MONITOR=true)"
+        )
+    labels = batch.labels
+    matched = quality_monitor.label(
+        [l.user_id for l in labels], [l.movie_id for l in labels], [l.liked for l in labels]
+    )
+    return LabelResponse(received=len(labels), matched=matched)
+
+
+@app.post("/feedback/bulk", response_model=FeedbackResponse)
+async def feedback_bulk(request: Request):
+    """
+    Record rating events sent as newline-delimited JSON (application/x-ndjson)
+    
+    Each line is one FeedbackEvent. Invalid lines are skipped and reported;
+    the rest are recorded.
+    
+    Returns:
+        FeedbackResponse with accepted/rejected counts and the first errors
+    """
+    _require_feature_store()
+    body = await _read_body(request, int(settings.feedback_max_body_mb * 1024 * 1024))
+    loop = asyncio.get_running_loop()
+    response = await loop.run_in_executor(None, _ingest_ndjson, body)
+    _snapshot_feature_store_if_due()
+    return response
+
+
 @app.get("/metrics", response_model=MetricsResponse)
 async def get_metrics():
     """Get application metrics"""
     metrics = metrics_collector.get_metrics()
+    if drift_monitor.enabled and drift_monitor.configured:
+        metrics["feature_drift"] = drift_monitor.get_metrics()
+    if scheduler.enabled:
+        metrics["scheduler"] = scheduler.get_metrics()
+    if metrics_collector.total_explanations:
+        metrics["explanations"] = {
+            **metrics_collector.get_explanation_metrics(),
+            **explainer.get_cache_stats(),
+            "scheduler": explain_scheduler.get_metrics()
+        }
+    metrics["coalescing"] = {
+        **single_flight.get_metrics(),
+        "batch_dedup": batch_deduplicator.get_metrics()
+    }
+    metrics["threading"] = thread_policy.get_metrics()
+    if feature_store.enabled:
+        metrics["feature_store"] = feature_store.get_metrics()
+    if settings.s3_bucket:
+        metrics["capture"] = prediction_capture.get_metrics()
+    if quality_monitor.enabled:
+        metrics["quality"] = quality_monitor.get_metrics()
+    if score_table.enabled:
+        metrics["score_table"] = score_table.get_metrics()
+    if admission_gate.enabled:
+        metrics["admission"] = admission_gate.get_metrics()
+    if saturation_monitor.enabled:
+        metrics["saturation"] = saturation_monitor.get_metrics()
+    metrics["resilience"] = resilience_metrics()
     return MetricsResponse(**metrics)
 
 
 @app.post("/model/reload")
 async def reload_model():
-    """Reload model (useful for model updates)"""
+    """
+    Reload model (useful for model updates)
+    
+    The new model is benchmarked by the admission gate before it replaces the
+    current one. The gate's report is returned as `admission`; a rejected
+    model gets a 409 and the current model keeps serving.
+    """
     try:
-        model_loader.reload_model()
-        if model_loader.model_loaded:
-            return {"status": "success", "message": "Model reloaded successfully"}
+        installed, admission = await asyncio.get_running_loop().run_in_executor(None, model_loader.reload_model)
+        if installed:
+            if drift_monitor.enabled:
+                drift_monitor.configure_from_model(model_loader.model)
+            if score_table.enabled:
+                # A table built for the previous model is ignored until it is rebuilt
+                score_table.load()
+            if settings.enable_thread_calibration:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, thread_policy.calibrate_model, model_loader.model
+                )
+            if settings.warmup_rows > 0:
+                await warm_up(settings.warmup_rows)
+            return {"status": "success", "message": "Model reloaded successfully", "admission": admission}
+        elif admission is not None:
+            return JSONResponse(
+                status_code=status.HTTP_409_CONFLICT,
+                content={
+                    "status": "rejected",
+                    "message": "Candidate model rejected by the admission gate; the current model is still serving",
+                    "admission": admission
+                }
+            )
         else:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to reload model"
             )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Model reload error: {e}", exc_info=True)
         raise HTTPException(
@@ -266,6 +915,61 @@ async def reload_model():
         )
 
 
+@app.post("/admin/profiling/start")
+async def start_profiling(
+    frames: Optional[int] = Query(None, ge=1, le=100),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Start tracemalloc (requires `X-Admin-Token`)
+    
+    Tracing slows allocation-heavy code noticeably, so stop it when done.
+    `frames` is the stack depth kept per allocation (more gives fuller
+    tracebacks in snapshot diffs, at a higher cost).
+    """
+    _require_admin(x_admin_token)
+    return await asyncio.get_running_loop().run_in_executor(None, memory_profiler.start, frames)
+
+
+@app.post("/admin/profiling/stop")
+async def stop_profiling(x_admin_token: Optional[str] = Header(None)):
+    """Stop tracemalloc; returns the final traced totals and per-stage allocations"""
+    _require_admin(x_admin_token)
+    return memory_profiler.stop()
+
+
+@app.get("/admin/profiling/snapshot")
+async def profiling_snapshot(
+    top: Optional[int] = Query(None, ge=1, le=500),
+    group_by: str = Query("lineno"),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Top allocation sites by growth since the previous snapshot (requires `X-Admin-Token`)
+    
+    The first call after start compares against the snapshot taken at start.
+    `group_by` is lineno, filename or traceback.
+    """
+    _require_admin(x_admin_token)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, memory_profiler.snapshot_diff, top, group_by
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.get("/admin/memory")
+async def memory_report(x_admin_token: Optional[str] = Header(None)):
+    """
+    RSS broken down by mapping and subsystem, with per-stage allocations while profiling (requires `X-Admin-Token`)
+    """
+    _require_admin(x_admin_token)
+    return await asyncio.get_running_loop().run_in_executor(None, memory_profiler.memory_report)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
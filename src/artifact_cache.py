@@ -0,0 +1,256 @@
+"""Persistent on-disk cache for model artifacts downloaded from S3"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# A single-part, non-KMS S3 ETag is the MD5 of the object
+_MD5_ETAG = re.compile(r'^[0-9a-f]{32}$')
+_HASH_CHUNK_BYTES = 1 << 20
+
+
+class ChecksumMismatch(Exception):
+    """Raised when a downloaded or cached artifact does not match its expected checksum"""
+
+
+def _file_digest(path: str, algorithm: str) -> bytes:
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+class ArtifactCache:
+    """
+    Local cache of S3 objects keyed by bucket, key, ETag and version ID
+    
+    One HEAD request returns the ETag, version ID, size and (when the object
+    was uploaded with one) its SHA-256 checksum; if a verified copy of exactly
+    that object is already on disk, nothing is downloaded. Otherwise the object
+    is fetched with parallel ranged GETs pinned to the same ETag (IfMatch) and
+    version, written into a temporary file, verified and atomically renamed
+    into place, so a crash never leaves a partial artifact behind.
+    
+    If S3 cannot be reached at all, the most recently verified copy of the key
+    is used, so restarts do not depend on S3 being available.
+    """
+    
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        part_size_bytes: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.cache_dir = cache_dir if cache_dir is not None else settings.model_cache_dir
+        self.part_size_bytes = part_size_bytes or settings.model_download_part_mb * 1024 * 1024
+        self.max_workers = max_workers or settings.model_download_concurrency
+        self.max_entries = settings.model_cache_max_entries if max_entries is None else max_entries
+        self.hits = 0
+        self.misses = 0
+        self.last_fetch: Dict[str, Any] = {}
+    
+    @staticmethod
+    def _entry_name(bucket: str, key: str, etag: str, version_id: Optional[str]) -> str:
+        identity = json.dumps([bucket, key, etag, version_id or ""])
+        return hashlib.sha256(identity.encode()).hexdigest()[:32]
+    
+    @staticmethod
+    def _expected_checksum(head: Dict[str, Any], etag: str) -> Optional[Tuple[str, str]]:
+        """(algorithm, hex digest) S3 vouches for, if any"""
+        sha256 = head.get('ChecksumSHA256')
+        if sha256 and '-' not in sha256:
+            return 'sha256', base64.b64decode(sha256).hex()
+        if _MD5_ETAG.match(etag) and not str(head.get('ServerSideEncryption', '')).startswith('aws:kms'):
+            return 'md5', etag
+        return None
+    
+    def _paths(self, name: str) -> Tuple[str, str]:
+        return os.path.join(self.cache_dir, f"{name}.bin"), os.path.join(self.cache_dir, f"{name}.json")
+    
+    def _load_verified(self, name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Path and manifest of a cached entry whose size and SHA-256 still match"""
+        path, manifest_path = self._paths(name)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if os.path.getsize(path) != manifest["size"] or _file_digest(path, 'sha256').hex() != manifest["sha256"]:
+                logger.warning(f"Cached artifact {path} is corrupt; discarding it")
+                self._remove(name)
+                return None
+            # Refresh the mtime used for eviction and offline fallback
+            os.utime(manifest_path)
+            return path, manifest
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Unreadable cache entry {name}: {e}")
+            self._remove(name)
+            return None
+    
+    def _remove(self, name: str):
+        for path in self._paths(name):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+    
+    def _latest_for(self, bucket: str, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Most recently used verified entry for an S3 key"""
+        candidates = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.cache_dir, filename)) as f:
+                    manifest = json.load(f)
+            except Exception:
+                continue
+            if manifest.get("bucket") == bucket and manifest.get("key") == key:
+                candidates.append((os.path.getmtime(os.path.join(self.cache_dir, filename)), filename[:-5]))
+        for _, name in sorted(candidates, reverse=True):
+            entry = self._load_verified(name)
+            if entry is not None:
+                return entry
+        return None
+    
+    def _download(self, client, bucket: str, key: str, head: Dict[str, Any], path: str):
+        """Fetch the object into `path` with parallel ranged GETs pinned to one ETag/version"""
+        size = head['ContentLength']
+        pin = {'IfMatch': head['ETag']}
+        if head.get('VersionId'):
+            pin['VersionId'] = head['VersionId']
+        ranges = [(start, min(start + self.part_size_bytes, size) - 1) for start in range(0, size, self.part_size_bytes)]
+        
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            
+            def fetch(byte_range: Tuple[int, int]) -> int:
+                start, end = byte_range
+                response = client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", **pin)
+                data = response['Body'].read()
+                if len(data) != end - start + 1:
+                    raise IOError(f"Short read for bytes {start}-{end}: got {len(data)}")
+                os.pwrite(fd, data, start)
+                return len(data)
+            
+            if len(ranges) <= 1:
+                written = sum(fetch(r) for r in ranges)
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(ranges)),
+                                        thread_name_prefix="artifact-download") as pool:
+                    written = sum(pool.map(fetch, ranges))
+            if written != size:
+                raise IOError(f"Downloaded {written} bytes, expected {size}")
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def fetch(self, client, bucket: str, key: str) -> Tuple[str, str]:
+        """
+        Get a local path for an S3 object, downloading it only if it is not cached
+        
+        Args:
+            client: S3 client
+            bucket: S3 bucket
+            key: S3 object key
+        
+        Returns:
+            Tuple of (local file path, version string: the object's ETag)
+        """
+        from botocore.exceptions import BotoCoreError
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        start_time = time.time()
+        try:
+            head = client.head_object(Bucket=bucket, Key=key, ChecksumMode='ENABLED')
+        except BotoCoreError as e:
+            # Connection-level failure (not an S3 error response such as 403/404)
+            entry = self._latest_for(bucket, key)
+            if entry is None:
+                raise
+            logger.warning(f"S3 unavailable ({e}); using cached s3://{bucket}/{key} version {entry[1]['etag']}")
+            self.hits += 1
+            self.last_fetch = {"source": "cache-offline", "etag": entry[1]["etag"], "time_ms": 0.0}
+            return entry[0], entry[1]["etag"]
+        
+        etag = head['ETag']
+        version_id = head.get('VersionId')
+        name = self._entry_name(bucket, key, etag, version_id)
+        entry = self._load_verified(name)
+        if entry is not None:
+            self.hits += 1
+            elapsed_ms = (time.time() - start_time) * 1000
+            self.last_fetch = {"source": "cache", "etag": etag, "time_ms": round(elapsed_ms, 3)}
+            logger.info(f"Model artifact s3://{bucket}/{key} ({etag}) served from cache in {elapsed_ms:.1f}ms")
+            return entry[0], etag
+        
+        self.misses += 1
+        path, manifest_path = self._paths(name)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            self._download(client, bucket, key, head, tmp_path)
+            expected = self._expected_checksum(head, etag.strip('"'))
+            if expected is not None:
+                algorithm, digest = expected
+                actual = _file_digest(tmp_path, algorithm).hex()
+                if actual != digest:
+                    raise ChecksumMismatch(f"{algorithm} of s3://{bucket}/{key} is {actual}, expected {digest}")
+            manifest = {
+                "bucket": bucket,
+                "key": key,
+                "etag": etag,
+                "version_id": version_id,
+                "size": head['ContentLength'],
+                "sha256": _file_digest(tmp_path, 'sha256').hex(),
+                "verified_with": expected[0] if expected else "size",
+                "downloaded_at": time.time()
+            }
+            os.replace(tmp_path, path)
+            tmp_manifest = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_manifest, 'w') as f:
+                json.dump(manifest, f)
+            # The manifest appears last, so an entry is only ever visible once complete
+            os.replace(tmp_manifest, manifest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        
+        elapsed_ms = (time.time() - start_time) * 1000
+        self.last_fetch = {"source": "s3", "etag": etag, "time_ms": round(elapsed_ms, 3)}
+        logger.info(
+            f"Downloaded s3://{bucket}/{key} ({head['ContentLength']} bytes, {etag}) "
+            f"in {elapsed_ms:.1f}ms with {self.max_workers} parallel ranges"
+        )
+        self._evict(keep=name)
+        return path, etag
+    
+    def _evict(self, keep: str):
+        """Keep the max_entries most recently used entries"""
+        if self.max_entries <= 0:
+            return
+        manifests = [f for f in os.listdir(self.cache_dir) if f.endswith('.json')]
+        by_age = sorted(manifests, key=lambda f: os.path.getmtime(os.path.join(self.cache_dir, f)), reverse=True)
+        for filename in by_age[self.max_entries:]:
+            if filename[:-5] != keep:
+                self._remove(filename[:-5])
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Cache hits/misses and the source of the last fetch"""
+        return {"hits": self.hits, "misses": self.misses, "last_fetch": self.last_fetch}
+
+
+# Global artifact cache instance
+artifact_cache = ArtifactCache()
@@ -0,0 +1,109 @@
+"""Shared AWS client factory"""
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# One client per service, shared by the event loop and all executor threads
+_clients: Dict[str, Any] = {}
+_session: Optional[Any] = None
+_lock = threading.Lock()
+
+
+def client_config(service: str, timeout_seconds: Optional[float] = None):
+    """
+    Build the botocore Config used for every client
+    
+    Args:
+        service: AWS service name (e.g. 's3', 'athena', 'cloudwatch', 'logs')
+        timeout_seconds: Call budget of a guarded dependency. When set, the read
+            timeout is the budget, the connect timeout is capped by it and calls
+            are attempted once (the dependency's spool retries them instead), so
+            a hung call frees its worker thread close to the budget.
+    
+    Returns:
+        botocore.config.Config with pool size, retries, timeouts and keep-alive from Settings
+    """
+    from botocore.config import Config
+    
+    options = {
+        "region_name": settings.aws_region,
+        "max_pool_connections": settings.aws_max_pool_connections,
+        "retries": {"mode": settings.aws_retry_mode, "total_max_attempts": settings.aws_max_attempts},
+        "connect_timeout": settings.aws_connect_timeout_seconds,
+        "read_timeout": settings.aws_read_timeout_seconds,
+        "tcp_keepalive": settings.aws_tcp_keepalive
+    }
+    if service == 's3' and settings.aws_s3_addressing_style:
+        options["s3"] = {"addressing_style": settings.aws_s3_addressing_style}
+    if timeout_seconds is not None:
+        options["connect_timeout"] = min(settings.aws_connect_timeout_seconds, timeout_seconds)
+        options["read_timeout"] = timeout_seconds
+        options["retries"] = {"mode": settings.aws_retry_mode, "total_max_attempts": 1}
+    return Config(**options)
+
+
+def endpoint_url(service: str) -> Optional[str]:
+    """Endpoint override for a service: AWS_ENDPOINT_URL_<SERVICE>, then AWS_ENDPOINT_URL"""
+    return os.getenv(f"AWS_ENDPOINT_URL_{service.upper()}") or settings.aws_endpoint_url
+
+
+def create_client(service: str, timeout_seconds: Optional[float] = None):
+    """
+    Create a new client for a service
+    
+    Prefer get_client(); this is for callers that need a client of their own.
+    """
+    global _session
+    import boto3
+    
+    with _lock:
+        # boto3's default session is not safe to create clients from concurrently
+        if _session is None:
+            _session = boto3.session.Session(
+                aws_access_key_id=settings.aws_access_key_id,
+                aws_secret_access_key=settings.aws_secret_access_key,
+                region_name=settings.aws_region
+            )
+        session = _session
+        return session.client(
+            service, config=client_config(service, timeout_seconds), endpoint_url=endpoint_url(service)
+        )
+
+
+def get_client(service: str, timeout_seconds: Optional[float] = None):
+    """
+    Get the shared client for a service, creating it on first use
+    
+    botocore clients are thread-safe, so one client (and its connection pool)
+    serves every thread; connections are reused across requests instead of
+    paying a new TCP/TLS handshake per call.
+    
+    Args:
+        service: AWS service name
+        timeout_seconds: Call budget for clients used behind a resilience
+            Dependency (see client_config); each budget gets its own client
+    
+    Returns:
+        boto3 client
+    """
+    key = service if timeout_seconds is None else f"{service}@{timeout_seconds:g}s"
+    client = _clients.get(key)
+    if client is None:
+        client = create_client(service, timeout_seconds)
+        with _lock:
+            client = _clients.setdefault(key, client)
+        logger.debug(f"Created shared AWS client for {service} (endpoint: {client.meta.endpoint_url})")
+    return client
+
+
+def reset_clients():
+    """Drop all shared clients and the session (e.g. after credentials or settings change)"""
+    global _session
+    with _lock:
+        _clients.clear()
+        _session = None
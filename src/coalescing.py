@@ -0,0 +1,139 @@
+"""Single-flight request coalescing and intra-batch row deduplication"""
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def unique_rows(features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the distinct rows of a feature matrix
+    
+    Rows are compared as raw bytes through a void view, so identical rows
+    (including identical NaN patterns) collapse exactly, with no hashing
+    collisions to guard against.
+    
+    Args:
+        features: Array of shape (n_samples, n_features)
+    
+    Returns:
+        Tuple of (index of the first occurrence of each distinct row,
+        inverse index mapping every row to its distinct row)
+    """
+    features = np.ascontiguousarray(features)
+    rows = features.view(np.dtype((np.void, features.dtype.itemsize * features.shape[1]))).ravel()
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    return first, inverse.reshape(-1)
+
+
+class BatchDeduplicator:
+    """Scores only the distinct rows of a batch and scatters the results back"""
+    
+    def __init__(self, enabled: Optional[bool] = None, min_rows: Optional[int] = None):
+        self.enabled = settings.enable_batch_dedup if enabled is None else enabled
+        self.min_rows = settings.batch_dedup_min_rows if min_rows is None else min_rows
+        # Called from the inference pool threads
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.duplicate_rows = 0
+    
+    def predict(self, predict_fn: Callable[[np.ndarray], np.ndarray], features: np.ndarray) -> np.ndarray:
+        """
+        Predict a batch, computing each distinct row once
+        
+        Args:
+            predict_fn: Function scoring a feature matrix
+            features: Array of shape (n_samples, n_features)
+        
+        Returns:
+            Predictions in the original row order
+        """
+        if not self.enabled or len(features) < max(2, self.min_rows):
+            return predict_fn(features)
+        
+        first, inverse = unique_rows(features)
+        duplicates = len(features) - len(first)
+        with self._lock:
+            self.batches += 1
+            self.rows += len(features)
+            self.duplicate_rows += duplicates
+        if not duplicates:
+            return predict_fn(features)
+        return predict_fn(features[first])[inverse]
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Rows seen and duplicate rows not scored"""
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "rows": self.rows,
+                "duplicate_rows_saved": self.duplicate_rows,
+                "duplicate_rate": round(self.duplicate_rows / self.rows, 4) if self.rows else 0.0
+            }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution
+    
+    The first caller for a key starts the work; callers arriving while it is in
+    flight await the same result (or exception) instead of repeating it. The
+    shared work runs as its own task, so a cancelled caller does not cancel it
+    for the others. All bookkeeping happens on the event loop.
+    """
+    
+    def __init__(self, enabled: Optional[bool] = None):
+        self.enabled = settings.enable_coalescing if enabled is None else enabled
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+    
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `fn` once per concurrent key and share its result
+        
+        Args:
+            key: Identity of the work (equal keys must produce equal results)
+            fn: Coroutine function doing the work
+        
+        Returns:
+            Result of fn
+        """
+        if not self.enabled:
+            return await fn()
+        
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        self._in_flight.pop(key, None)
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Calls seen, calls served by another in-flight call, and current keys in flight"""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight)
+        }
+
+
+# Global instances
+batch_deduplicator = BatchDeduplicator()
+single_flight = SingleFlight()
@@ -1,6 +1,6 @@
 """Configuration management for the application"""
 import os
-from typing import Optional
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -18,19 +18,144 @@ class Settings:
     
     # Model
     model_path: str = os.getenv("MODEL_PATH", "model.txt")
+    warmup_rows: int = int(os.getenv("WARMUP_ROWS", "64"))
+    
+    # LightGBM threads per predict call (0 = cores allowed by the cgroup CPU quota)
+    lgbm_max_threads: int = int(os.getenv("LGBM_MAX_THREADS", "0"))
+    enable_thread_calibration: bool = os.getenv("ENABLE_THREAD_CALIBRATION", "true").lower() == "true"
+    thread_calibration_batch_sizes: List[int] = [
+        int(v) for v in os.getenv("THREAD_CALIBRATION_BATCH_SIZES", "1,16,128,1024,4096").split(",")
+    ]
+    
+    # Early-exit cascade scoring for bulk endpoints
+    enable_cascade: bool = os.getenv("ENABLE_CASCADE", "false").lower() == "true"
+    cascade_iterations: int = int(os.getenv("CASCADE_ITERATIONS", "20"))
+    cascade_band: float = float(os.getenv("CASCADE_BAND", "0.5"))
+    
+    # Threshold-quantized feature codes (built at model load)
+    enable_quantizer: bool = os.getenv("ENABLE_QUANTIZER", "true").lower() == "true"
+    
+    # Request coalescing and batch row deduplication
+    enable_coalescing: bool = os.getenv("ENABLE_COALESCING", "true").lower() == "true"
+    enable_batch_dedup: bool = os.getenv("ENABLE_BATCH_DEDUP", "true").lower() == "true"
+    batch_dedup_min_rows: int = int(os.getenv("BATCH_DEDUP_MIN_ROWS", "2"))
+    
+    # Online aggregate features from /feedback events (enabled by ENABLE_FEATURE_STORE, under "Feature Store")
+    feature_store_snapshot_path: str = os.getenv("FEATURE_STORE_SNAPSHOT_PATH", "feature_store.npz")
+    feature_store_snapshot_interval_seconds: float = float(os.getenv("FEATURE_STORE_SNAPSHOT_INTERVAL_SECONDS", "300"))
+    feedback_max_body_mb: float = float(os.getenv("FEEDBACK_MAX_BODY_MB", "8"))
+    
+    # Online model quality from delayed labels
+    enable_quality_monitor: bool = os.getenv("ENABLE_QUALITY_MONITOR", "true").lower() == "true"
+    quality_buffer_size: int = int(os.getenv("QUALITY_BUFFER_SIZE", "100000"))
+    quality_window_seconds: float = float(os.getenv("QUALITY_WINDOW_SECONDS", "900"))
+    quality_bucket_seconds: float = float(os.getenv("QUALITY_BUCKET_SECONDS", "60"))
+    quality_score_bins: int = int(os.getenv("QUALITY_SCORE_BINS", "100"))
+    quality_calibration_bins: int = int(os.getenv("QUALITY_CALIBRATION_BINS", "10"))
+    
+    # Precomputed scores for hot (user, movie) pairs (built by scripts/build_score_table.py)
+    enable_score_table: bool = os.getenv("ENABLE_SCORE_TABLE", "true").lower() == "true"
+    score_table_path: str = os.getenv("SCORE_TABLE_PATH", "score_table.bin")
+    score_table_check_interval_seconds: float = float(os.getenv("SCORE_TABLE_CHECK_INTERVAL_SECONDS", "30"))
+    
+    # Explanations
+    explain_top_n: int = int(os.getenv("EXPLAIN_TOP_N", "5"))
+    explain_cache_max_entries: int = int(os.getenv("EXPLAIN_CACHE_MAX_ENTRIES", "50000"))
+    explain_max_concurrency: int = int(os.getenv("EXPLAIN_MAX_CONCURRENCY", "1"))
+    
+    # Admission gate for candidate models on /model/reload
+    # ("enforce" keeps the current model when a budget is exceeded, "warn" only flags it, "off" skips the gate)
+    admission_mode: str = os.getenv("ADMISSION_MODE", "enforce")
+    admission_batch_sizes: List[int] = [int(v) for v in os.getenv("ADMISSION_BATCH_SIZES", "1,100,1000").split(",")]
+    admission_repeats: int = int(os.getenv("ADMISSION_REPEATS", "30"))
+    admission_reference_path: Optional[str] = os.getenv("ADMISSION_REFERENCE_PATH")
+    admission_max_latency_ratio: float = float(os.getenv("ADMISSION_MAX_LATENCY_RATIO", "1.5"))
+    # p99 budgets per batch size, "batch_size=ms,..."
+    admission_latency_budgets_ms: Dict[int, float] = {
+        int(size): float(ms)
+        for size, ms in (item.split("=", 1) for item in os.getenv("ADMISSION_LATENCY_BUDGETS_MS", "").split(",") if item)
+    }
+    admission_max_memory_ratio: float = float(os.getenv("ADMISSION_MAX_MEMORY_RATIO", "2.0"))
+    admission_memory_slack_mb: float = float(os.getenv("ADMISSION_MEMORY_SLACK_MB", "16"))
+    admission_max_memory_mb: float = float(os.getenv("ADMISSION_MAX_MEMORY_MB", "0"))
     
     # Server
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "8000"))
+    enable_grpc: bool = os.getenv("ENABLE_GRPC", "false").lower() == "true"
+    grpc_port: int = int(os.getenv("GRPC_PORT", "50051"))
+    grpc_max_message_mb: int = int(os.getenv("GRPC_MAX_MESSAGE_MB", "64"))
+    
+    # Saturation monitoring and load-aware readiness (a threshold of 0 disables that signal)
+    enable_saturation_monitor: bool = os.getenv("ENABLE_SATURATION_MONITOR", "true").lower() == "true"
+    saturation_interval_ms: float = float(os.getenv("SATURATION_INTERVAL_MS", "100"))
+    saturation_window_seconds: float = float(os.getenv("SATURATION_WINDOW_SECONDS", "10"))
+    saturation_max_loop_lag_ms: float = float(os.getenv("SATURATION_MAX_LOOP_LAG_MS", "250"))
+    saturation_max_in_flight: int = int(os.getenv("SATURATION_MAX_IN_FLIGHT", "0"))
+    saturation_max_queue_depth: int = int(os.getenv("SATURATION_MAX_QUEUE_DEPTH", "200"))
+    saturation_max_cpu_utilization: float = float(os.getenv("SATURATION_MAX_CPU_UTILIZATION", "0"))
+    
+    # Request scheduling and load shedding
+    enable_scheduler: bool = os.getenv("ENABLE_SCHEDULER", "true").lower() == "true"
+    scheduler_max_concurrency: int = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "2"))
+    scheduler_max_queue: int = int(os.getenv("SCHEDULER_MAX_QUEUE", "1000"))
+    scheduler_default_timeout_ms: float = float(os.getenv("SCHEDULER_DEFAULT_TIMEOUT_MS", "0"))
     
     # AWS Configuration
     aws_region: str = os.getenv("AWS_REGION", "eu-central-1")
     aws_access_key_id: Optional[str] = os.getenv("AWS_ACCESS_KEY_ID")
     aws_secret_access_key: Optional[str] = os.getenv("AWS_SECRET_ACCESS_KEY")
+    aws_endpoint_url: Optional[str] = os.getenv("AWS_ENDPOINT_URL")
+    aws_max_pool_connections: int = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+    aws_retry_mode: str = os.getenv("AWS_RETRY_MODE", "adaptive")
+    aws_max_attempts: int = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+    aws_connect_timeout_seconds: float = float(os.getenv("AWS_CONNECT_TIMEOUT_SECONDS", "3"))
+    aws_read_timeout_seconds: float = float(os.getenv("AWS_READ_TIMEOUT_SECONDS", "20"))
+    aws_tcp_keepalive: bool = os.getenv("AWS_TCP_KEEPALIVE", "true").lower() == "true"
+    aws_s3_addressing_style: Optional[str] = os.getenv("AWS_S3_ADDRESSING_STYLE")
+    
+    # Downstream AWS calls: circuit breakers, call budgets and local spool
+    # (RESILIENCE_MODE_<NAME> / RESILIENCE_TIMEOUT_MS_<NAME> override per dependency: s3, cloudwatch, logs)
+    resilience_mode: str = os.getenv("RESILIENCE_MODE", "spool")
+    resilience_timeout_ms: float = float(os.getenv("RESILIENCE_TIMEOUT_MS", "2000"))
+    resilience_failure_threshold: int = int(os.getenv("RESILIENCE_FAILURE_THRESHOLD", "5"))
+    resilience_reset_seconds: float = float(os.getenv("RESILIENCE_RESET_SECONDS", "30"))
+    resilience_max_pending: int = int(os.getenv("RESILIENCE_MAX_PENDING", "1000"))
+    resilience_workers: int = int(os.getenv("RESILIENCE_WORKERS", "2"))
+    resilience_spool_dir: str = os.getenv("RESILIENCE_SPOOL_DIR", ".spool")
+    resilience_spool_max_mb: float = float(os.getenv("RESILIENCE_SPOOL_MAX_MB", "100"))
     
     # S3 Configuration
     s3_bucket: Optional[str] = os.getenv("S3_BUCKET")
     s3_model_path: Optional[str] = os.getenv("S3_MODEL_PATH", "models/model.txt")
+    model_cache_dir: str = os.getenv("MODEL_CACHE_DIR", ".model_cache")
+    model_cache_max_entries: int = int(os.getenv("MODEL_CACHE_MAX_ENTRIES", "3"))
+    model_download_part_mb: int = int(os.getenv("MODEL_DOWNLOAD_PART_MB", "8"))
+    model_download_concurrency: int = int(os.getenv("MODEL_DOWNLOAD_CONCURRENCY", "8"))
+    s3_sort_by_user: bool = os.getenv("S3_SORT_BY_USER", "true").lower() == "true"
+    
+    # Prediction capture sampling ("name=rate,..." lists; version rates take precedence)
+    capture_sample_rate: float = float(os.getenv("CAPTURE_SAMPLE_RATE", "1.0"))
+    capture_endpoint_rates: Dict[str, float] = {
+        name.strip(): float(rate)
+        for name, rate in (item.split("=", 1) for item in os.getenv("CAPTURE_ENDPOINT_RATES", "").split(",") if item)
+    }
+    capture_version_rates: Dict[str, float] = {
+        name.strip(): float(rate)
+        for name, rate in (item.split("=", 1) for item in os.getenv("CAPTURE_VERSION_RATES", "").split(",") if item)
+    }
+    capture_hash_salt: str = os.getenv("CAPTURE_HASH_SALT", "")
+    capture_reservoir_size: int = int(os.getenv("CAPTURE_RESERVOIR_SIZE", "0"))
+    capture_low_confidence_margin: float = float(os.getenv("CAPTURE_LOW_CONFIDENCE_MARGIN", "0.05"))
+    capture_errors: bool = os.getenv("CAPTURE_ERRORS", "true").lower() == "true"
+    capture_flush_rows: int = int(os.getenv("CAPTURE_FLUSH_ROWS", "1000"))
+    capture_flush_interval_seconds: float = float(os.getenv("CAPTURE_FLUSH_INTERVAL_SECONDS", "60"))
+    
+    # Prediction log compaction
+    compaction_target_rows_per_file: int = int(os.getenv("COMPACTION_TARGET_ROWS_PER_FILE", "2000000"))
+    compaction_row_group_size: int = int(os.getenv("COMPACTION_ROW_GROUP_SIZE", "131072"))
+    compaction_compression: str = os.getenv("COMPACTION_COMPRESSION", "zstd")
+    compaction_grace_minutes: float = float(os.getenv("COMPACTION_GRACE_MINUTES", "15"))
     
     # CloudWatch Configuration
     cloudwatch_log_group: str = os.getenv("CLOUDWATCH_LOG_GROUP", "model-deployment-tutorial")
@@ -41,6 +166,9 @@ class Settings:
     athena_database: Optional[str] = os.getenv("ATHENA_DATABASE")
     athena_table: Optional[str] = os.getenv("ATHENA_TABLE", "model_predictions")
     athena_s3_output: Optional[str] = os.getenv("ATHENA_S3_OUTPUT")
+    athena_poll_timeout_seconds: float = float(os.getenv("ATHENA_POLL_TIMEOUT_SECONDS", "300"))
+    athena_cache_ttl_seconds: float = float(os.getenv("ATHENA_CACHE_TTL_SECONDS", "300"))
+    athena_cache_max_entries: int = int(os.getenv("ATHENA_CACHE_MAX_ENTRIES", "128"))
     
     # Redis Configuration
     redis_host: str = os.getenv("REDIS_HOST", "localhost")
@@ -53,6 +181,21 @@ class Settings:
     enable_metrics: bool = os.getenv("ENABLE_METRICS", "true").lower() == "true"
     metrics_port: int = int(os.getenv("METRICS_PORT", "9090"))
     
+    # Admin endpoints (/admin/*) require this token in X-Admin-Token; unset disables them
+    admin_token: Optional[str] = os.getenv("ADMIN_TOKEN")
+    
+    # On-demand memory profiling (tracemalloc frames per allocation, sites per snapshot diff)
+    profiling_frames: int = int(os.getenv("PROFILING_FRAMES", "1"))
+    profiling_top_n: int = int(os.getenv("PROFILING_TOP_N", "25"))
+    
+    # Feature drift monitoring
+    enable_drift_monitor: bool = os.getenv("ENABLE_DRIFT_MONITOR", "true").lower() == "true"
+    drift_bins: int = int(os.getenv("DRIFT_BINS", "10"))
+    drift_interval_seconds: float = float(os.getenv("DRIFT_INTERVAL_SECONDS", "60"))
+    drift_min_rows: int = int(os.getenv("DRIFT_MIN_ROWS", "1000"))
+    drift_psi_threshold: float = float(os.getenv("DRIFT_PSI_THRESHOLD", "0.2"))
+    drift_baseline_path: Optional[str] = os.getenv("DRIFT_BASELINE_PATH")
+    
     # Feature Store
     enable_feature_store: bool = os.getenv("ENABLE_FEATURE_STORE", "false").lower() == "true"
 
@@ -2,21 +2,33 @@
 Data pipeline components for storing predictions and metrics
 Enhanced with S3 Parquet storage and Athena integration
 """
+import asyncio
+import csv
+import hashlib
+import io
+import json
 import logging
 import os
-from datetime import datetime
-from typing import Dict, Any, Optional, List
-import boto3
-from botocore.exceptions import ClientError
-import pandas as pd
+import random
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from typing import Callable, Dict, Any, Optional, List, Iterator, Sequence, Tuple
 
+import numpy as np
+
+from src.aws import get_client
 from src.config import settings
+from src.resilience import dependency
 
 logger = logging.getLogger(__name__)
 
-# S3 and Athena clients (lazy initialization)
-_s3_client: Optional[boto3.client] = None
-_athena_client: Optional[boto3.client] = None
+# S3 and Athena clients (lazy initialization; shared through src.aws, boto3 is imported on first use)
+_s3_client: Optional[Any] = None
+_athena_client: Optional[Any] = None
 
 
 def get_s3_client():
@@ -24,12 +36,7 @@ def get_s3_client():
     global _s3_client
     if _s3_client is None:
         try:
-            _s3_client = boto3.client(
-                's3',
-                region_name=settings.aws_region,
-                aws_access_key_id=settings.aws_access_key_id,
-                aws_secret_access_key=settings.aws_secret_access_key
-            )
+            _s3_client = get_client('s3')
         except Exception as e:
             logger.warning(f"Failed to create S3 client: {e}")
             _s3_client = None
@@ -41,12 +48,7 @@ def get_athena_client():
     global _athena_client
     if _athena_client is None:
         try:
-            _athena_client = boto3.client(
-                'athena',
-                region_name=settings.aws_region,
-                aws_access_key_id=settings.aws_access_key_id,
-                aws_secret_access_key=settings.aws_secret_access_key
-            )
+            _athena_client = get_client('athena')
         except Exception as e:
             logger.warning(f"Failed to create Athena client: {e}")
             _athena_client = None
@@ -81,6 +83,7 @@ def save_prediction_to_s3(
             return False
         
         # Create DataFrame from prediction data
+        import pandas as pd
         df = pd.DataFrame([prediction_data])
         
         # Generate S3 key with timestamp for partitioning
@@ -111,7 +114,9 @@ def save_prediction_to_s3(
 def save_batch_predictions_to_s3(
     predictions: List[Dict[str, Any]],
     s3_bucket: Optional[str] = None,
-    s3_prefix: str = "predictions"
+    s3_prefix: str = "predictions",
+    partition_time: Optional[datetime] = None,
+    s3_client: Optional[Any] = None
 ) -> bool:
     """
     Save batch predictions to S3 in Parquet format
@@ -120,6 +125,8 @@ def save_batch_predictions_to_s3(
         predictions: List of prediction dictionaries
         s3_bucket: S3 bucket name (uses config if not provided)
         s3_prefix: S3 prefix (folder path)
+        partition_time: UTC time whose hourly partition receives the file (default: now)
+        s3_client: Client to write with (default: the shared S3 client)
     
     Returns:
         True if successful, False otherwise
@@ -130,7 +137,7 @@ def save_batch_predictions_to_s3(
             logger.warning("S3 bucket not configured, skipping save")
             return False
         
-        s3 = get_s3_client()
+        s3 = s3_client or get_s3_client()
         if s3 is None:
             logger.warning("S3 client not available, skipping save")
             return False
@@ -140,12 +147,18 @@ def save_batch_predictions_to_s3(
             return False
         
         # Create DataFrame from predictions
+        import pandas as pd
         df = pd.DataFrame(predictions)
+        if settings.s3_sort_by_user and 'user_id' in df.columns:
+            # Sorted user_id gives tight per-row-group min/max statistics, so
+            # per-user queries can skip row groups instead of reading them
+            df = df.sort_values('user_id', kind='stable')
         
         # Generate S3 key with timestamp for partitioning
         timestamp = datetime.utcnow()
-        date_partition = timestamp.strftime("%Y/%m/%d")
-        hour_partition = timestamp.strftime("%H")
+        partition_time = partition_time or timestamp
+        date_partition = partition_time.strftime("%Y/%m/%d")
+        hour_partition = partition_time.strftime("%H")
         s3_key = f"{s3_prefix}/{date_partition}/{hour_partition}/batch_predictions_{timestamp.strftime('%Y%m%d_%H%M%S_%f')}.parquet"
         
         # Convert DataFrame to Parquet bytes
@@ -167,70 +180,1124 @@ def save_batch_predictions_to_s3(
         return False
 
 
+def _salt_value(salt: str) -> int:
+    return int.from_bytes(hashlib.sha256(salt.encode('utf-8')).digest()[:8], 'little')
+
+
+def user_sample_fraction(user_ids: Sequence[int], salt: str = "") -> np.ndarray:
+    """
+    Map user ids to deterministic, uniformly distributed values in [0, 1)
+    
+    splitmix64 of the (salted) id: the same user always gets the same value, so
+    comparing it with a sampling rate keeps or drops a user consistently across
+    requests, processes and restarts.
+    """
+    z = np.asarray(user_ids, dtype=np.int64).astype(np.uint64) + np.uint64(_salt_value(salt))
+    z = z + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+class CapturePolicy:
+    """
+    Decides which predictions are captured for analytics
+    
+    The sampling rate of a row is the rate configured for its model version,
+    else for its endpoint, else the default. A row is sampled when its user's
+    hash falls below that rate, so a user is in the sample on every request or
+    on none. Low-confidence predictions (probability within
+    `low_confidence_margin` of 0.5) are always captured.
+    """
+    
+    def __init__(
+        self,
+        default_rate: Optional[float] = None,
+        endpoint_rates: Optional[Dict[str, float]] = None,
+        version_rates: Optional[Dict[str, float]] = None,
+        low_confidence_margin: Optional[float] = None,
+        capture_errors: Optional[bool] = None,
+        salt: Optional[str] = None
+    ):
+        self.default_rate = settings.capture_sample_rate if default_rate is None else default_rate
+        self.endpoint_rates = settings.capture_endpoint_rates if endpoint_rates is None else endpoint_rates
+        self.version_rates = settings.capture_version_rates if version_rates is None else version_rates
+        self.low_confidence_margin = (
+            settings.capture_low_confidence_margin if low_confidence_margin is None else low_confidence_margin
+        )
+        self.capture_errors = settings.capture_errors if capture_errors is None else capture_errors
+        self.salt = settings.capture_hash_salt if salt is None else salt
+    
+    def rate_for(self, endpoint: str, model_version: str) -> float:
+        """Sampling rate for an endpoint and model version"""
+        if model_version in self.version_rates:
+            return self.version_rates[model_version]
+        return self.endpoint_rates.get(endpoint, self.default_rate)
+    
+    def select(
+        self,
+        endpoint: str,
+        model_version: str,
+        user_ids: Sequence[int],
+        predictions: Sequence[float]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Choose the rows of a request to capture
+        
+        Returns:
+            Tuple of (indices of sampled rows, indices of always-captured low-confidence rows);
+            the two are disjoint
+        """
+        n_rows = len(user_ids)
+        if self.low_confidence_margin > 0:
+            always = np.abs(np.asarray(predictions, dtype=np.float64) - 0.5) < self.low_confidence_margin
+        else:
+            always = np.zeros(n_rows, dtype=bool)
+        rate = self.rate_for(endpoint, model_version)
+        if rate >= 1:
+            sampled = ~always
+        elif rate <= 0:
+            sampled = np.zeros(n_rows, dtype=bool)
+        else:
+            sampled = (user_sample_fraction(user_ids, self.salt) < rate) & ~always
+        return np.flatnonzero(sampled), np.flatnonzero(always)
+
+
+class PredictionCapture:
+    """
+    Sampled, buffered capture of predictions to S3
+    
+    Sampled rows go into a reservoir per (hour, endpoint, model version) of at
+    most `reservoir_size` rows (Algorithm R), so every stratum is represented
+    in each hour however skewed the traffic. A reservoir is written to its
+    hour's partition once the hour has ended; each row carries a
+    `sample_weight` (inverse inclusion probability) so sums and means can be
+    re-weighted to the full traffic. Always-captured rows (low confidence,
+    errors) and, with no reservoir limit, all sampled rows are buffered and
+    written every `flush_rows` rows or `flush_interval_seconds`.
+    
+    A row dict is only built for rows that are kept, so capture cost follows
+    the sampled volume rather than the request volume.
+    """
+    
+    def __init__(
+        self,
+        policy: Optional[CapturePolicy] = None,
+        reservoir_size: Optional[int] = None,
+        flush_rows: Optional[int] = None,
+        flush_interval_seconds: Optional[float] = None,
+        writer: Optional[Callable[..., bool]] = None,
+        seed: Optional[int] = None
+    ):
+        self.policy = policy or CapturePolicy()
+        self.reservoir_size = settings.capture_reservoir_size if reservoir_size is None else reservoir_size
+        self.flush_rows = flush_rows or settings.capture_flush_rows
+        self.flush_interval_seconds = (
+            settings.capture_flush_interval_seconds if flush_interval_seconds is None else flush_interval_seconds
+        )
+        self.dependency = dependency('s3', replay=self._replay)
+        self.writer = writer or self._write_s3
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # (hour, endpoint, model_version) -> {"rate", "seen", "rows"}
+        self._reservoirs: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        # hour -> rows written as they are (weights already set)
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._pending_rows = 0
+        self.last_flush = time.time()
+        self.rows_seen = 0
+        self.rows_captured = {"sample": 0, "low_confidence": 0, "error": 0}
+        self.rows_written = 0
+        self.write_failures = 0
+    
+    @staticmethod
+    def _hour(now: float) -> str:
+        return datetime.utcfromtimestamp(now).strftime("%Y%m%d%H")
+    
+    def _add_pending(self, hour: str, rows: List[Dict[str, Any]], reason: str, weight: float):
+        for row in rows:
+            row["capture_reason"] = reason
+            row["sample_weight"] = weight
+        self._pending.setdefault(hour, []).extend(rows)
+        self._pending_rows += len(rows)
+        self.rows_captured[reason] += len(rows)
+    
+    def record(
+        self,
+        endpoint: str,
+        model_version: str,
+        user_ids: Sequence[int],
+        predictions: Sequence[float],
+        make_row: Callable[[int], Dict[str, Any]],
+        now: Optional[float] = None
+    ) -> int:
+        """
+        Offer the rows of a successful request for capture
+        
+        Args:
+            endpoint: Endpoint name (e.g. 'predict', 'predict_batch')
+            model_version: Version of the model that produced the predictions
+            user_ids: User id per row
+            predictions: Probability per row
+            make_row: make_row(i) builds the record for row i; only called for kept rows
+            now: Current time (for testing)
+        
+        Returns:
+            Number of rows captured or admitted to a reservoir
+        """
+        sampled, always = self.policy.select(endpoint, model_version, user_ids, predictions)
+        hour = self._hour(now or time.time())
+        with self._lock:
+            self.rows_seen += len(user_ids)
+            if len(always):
+                self._add_pending(hour, [make_row(i) for i in always.tolist()], "low_confidence", 1.0)
+            if len(sampled) == 0:
+                return len(always)
+            rate = self.policy.rate_for(endpoint, model_version)
+            if self.reservoir_size <= 0:
+                self._add_pending(hour, [make_row(i) for i in sampled.tolist()], "sample", 1.0 / min(rate, 1.0))
+                return len(always) + len(sampled)
+            
+            reservoir = self._reservoirs.setdefault(
+                (hour, endpoint, model_version), {"rate": rate, "seen": 0, "rows": []}
+            )
+            rows = reservoir["rows"]
+            kept = 0
+            for i in sampled.tolist():
+                reservoir["seen"] += 1
+                if len(rows) < self.reservoir_size:
+                    rows.append(make_row(i))
+                    kept += 1
+                else:
+                    slot = self._rng.randrange(reservoir["seen"])
+                    if slot < self.reservoir_size:
+                        rows[slot] = make_row(i)
+                        kept += 1
+            return len(always) + kept
+    
+    def record_error(self, row: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Capture the record of a failed request (always kept unless error capture is off)"""
+        if not self.policy.capture_errors:
+            return False
+        with self._lock:
+            self._add_pending(self._hour(now or time.time()), [row], "error", 1.0)
+        return True
+    
+    def flush_due(self, now: Optional[float] = None) -> bool:
+        """Whether a reservoir's hour has ended or the buffered rows are due to be written"""
+        now = now or time.time()
+        hour = self._hour(now)
+        # Request threads add reservoirs concurrently; iterating them unlocked can fail mid-loop
+        with self._lock:
+            if any(key[0] < hour for key in self._reservoirs):
+                return True
+            return self._pending_rows >= self.flush_rows or (
+                self._pending_rows > 0 and now - self.last_flush >= self.flush_interval_seconds
+            )
+    
+    def take(self, force: bool = False, now: Optional[float] = None) -> List[Tuple[datetime, List[Dict[str, Any]]]]:
+        """
+        Remove the rows that are ready to be written
+        
+        Buffered rows are always taken; reservoirs only once their hour has
+        ended (or with force, e.g. at shutdown).
+        
+        Returns:
+            List of (partition hour, rows)
+        """
+        now = now or time.time()
+        hour = self._hour(now)
+        batches = []
+        with self._lock:
+            for key in [key for key in self._reservoirs if force or key[0] < hour]:
+                reservoir = self._reservoirs.pop(key)
+                rows = reservoir["rows"]
+                weight = reservoir["seen"] / len(rows) / min(reservoir["rate"], 1.0)
+                for row in rows:
+                    row["capture_reason"] = "sample"
+                    row["sample_weight"] = weight
+                self.rows_captured["sample"] += len(rows)
+                batches.append((datetime.strptime(key[0], "%Y%m%d%H"), rows))
+            for pending_hour, rows in self._pending.items():
+                batches.append((datetime.strptime(pending_hour, "%Y%m%d%H"), rows))
+            self._pending = {}
+            self._pending_rows = 0
+            self.last_flush = now
+        return batches
+    
+    def _write_s3(self, rows: List[Dict[str, Any]], partition_time: datetime) -> bool:
+        # The dependency's client times out within its budget instead of botocore's defaults
+        try:
+            s3 = self.dependency.client('s3')
+        except Exception as e:
+            logger.warning(f"Failed to create S3 client: {e}")
+            return False
+        return save_batch_predictions_to_s3(rows, partition_time=partition_time, s3_client=s3)
+    
+    def write_batch(self, partition_time: datetime, rows: List[Dict[str, Any]]) -> bool:
+        """Write one batch to its hourly partition (blocking); returns False on failure"""
+        ok = self.writer(rows, partition_time=partition_time)
+        with self._lock:
+            if ok:
+                self.rows_written += len(rows)
+            else:
+                self.write_failures += 1
+        return ok
+    
+    def write(self, batches: List[Tuple[datetime, List[Dict[str, Any]]]]) -> int:
+        """
+        Write batches returned by take() (blocking; run it off the event loop)
+        
+        Returns:
+            Number of rows written
+        """
+        written = 0
+        for partition_time, rows in batches:
+            if self.write_batch(partition_time, rows):
+                written += len(rows)
+            else:
+                logger.warning(f"Dropped {len(rows)} captured predictions for {partition_time:%Y-%m-%d %H}:00")
+        return written
+    
+    def submit(self, batches: List[Tuple[datetime, List[Dict[str, Any]]]]):
+        """
+        Hand batches returned by take() to the S3 dependency without waiting
+        
+        While S3 is failing or slow (circuit open) the batches go to the local
+        spool and are written once S3 recovers.
+        """
+        for partition_time, rows in batches:
+            self.dependency.submit(
+                self.write_batch, partition_time, rows,
+                record={"partition_time": partition_time.isoformat(), "rows": rows}
+            )
+    
+    def _replay(self, record: Dict[str, Any]) -> bool:
+        return self.write_batch(datetime.fromisoformat(record["partition_time"]), record["rows"])
+    
+    def flush(self, force: bool = False, now: Optional[float] = None) -> int:
+        """Take and write everything that is ready; returns the number of rows written"""
+        return self.write(self.take(force, now))
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Capture volume for the /metrics endpoint"""
+        with self._lock:
+            in_reservoirs = sum(len(r["rows"]) for r in self._reservoirs.values())
+            return {
+                "rows_seen": self.rows_seen,
+                "rows_captured": dict(self.rows_captured),
+                "rows_written": self.rows_written,
+                "rows_buffered": self._pending_rows + in_reservoirs,
+                "write_failures": self.write_failures,
+                "capture_ratio": round(
+                    (sum(self.rows_captured.values()) + in_reservoirs) / self.rows_seen, 6
+                ) if self.rows_seen else None
+            }
+
+
+class AthenaQueryError(RuntimeError):
+    """Raised when an Athena query fails, is cancelled or does not finish in time"""
+
+
+def format_athena_parameter(value: Any) -> str:
+    """
+    Render a Python value as an Athena execution parameter literal
+    
+    Athena substitutes execution parameters as SQL literals, so strings must be
+    quoted (with embedded quotes doubled) while numbers are passed bare.
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, datetime):
+        return f"timestamp '{value.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}'"
+    if isinstance(value, date):
+        return f"date '{value.isoformat()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# Athena result types that are converted from their string representation
+_ATHENA_INT_TYPES = {'tinyint', 'smallint', 'integer', 'int', 'bigint'}
+_ATHENA_FLOAT_TYPES = {'float', 'real', 'double', 'decimal'}
+
+
+def _convert_athena_value(value: Optional[str], column_type: str) -> Any:
+    """Convert an Athena VarCharValue to a Python value based on its column type"""
+    if value is None:
+        return None
+    if column_type in _ATHENA_INT_TYPES:
+        return int(value)
+    if column_type in _ATHENA_FLOAT_TYPES:
+        return float(value)
+    if column_type == 'boolean':
+        return value.lower() == 'true'
+    return value
+
+
+class AthenaQueryClient:
+    """
+    Runs parameterized Athena queries to completion and streams their results
+    
+    Finished result sets are cached by query hash, so dashboards that repeatedly
+    ask for the same window are answered without another S3 scan.
+    """
+    
+    def __init__(
+        self,
+        client: Any = None,
+        database: Optional[str] = None,
+        output_location: Optional[str] = None,
+        poll_timeout_seconds: Optional[float] = None,
+        poll_initial_delay: float = 0.2,
+        poll_max_delay: float = 5.0,
+        cache_ttl_seconds: Optional[float] = None,
+        cache_max_entries: Optional[int] = None
+    ):
+        self._client = client
+        self.database = database
+        self.output_location = output_location
+        self.poll_timeout_seconds = poll_timeout_seconds if poll_timeout_seconds is not None else settings.athena_poll_timeout_seconds
+        self.poll_initial_delay = poll_initial_delay
+        self.poll_max_delay = poll_max_delay
+        self.cache_ttl_seconds = cache_ttl_seconds if cache_ttl_seconds is not None else settings.athena_cache_ttl_seconds
+        self.cache_max_entries = cache_max_entries if cache_max_entries is not None else settings.athena_cache_max_entries
+        self._cache: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    @property
+    def client(self):
+        """Athena client (injected, or the shared lazily-created client)"""
+        return self._client if self._client is not None else get_athena_client()
+    
+    def _database(self) -> Optional[str]:
+        return self.database or settings.athena_database
+    
+    def _output_location(self) -> str:
+        return self.output_location or settings.athena_s3_output or f"s3://{settings.s3_bucket}/athena-results/"
+    
+    def query_hash(self, query: str, parameters: Optional[Sequence[Any]] = None) -> str:
+        """Stable hash identifying a query and its parameters"""
+        key = json.dumps([self._database(), query, [format_athena_parameter(p) for p in parameters or []]])
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+    
+    def start_query(self, query: str, parameters: Optional[Sequence[Any]] = None) -> str:
+        """
+        Start a query execution
+        
+        Args:
+            query: SQL with `?` placeholders
+            parameters: Values bound to the placeholders, in order
+        
+        Returns:
+            Query execution ID
+        """
+        kwargs: Dict[str, Any] = {
+            'QueryString': query,
+            'ResultConfiguration': {'OutputLocation': self._output_location()}
+        }
+        database = self._database()
+        if database:
+            kwargs['QueryExecutionContext'] = {'Database': database}
+        if parameters:
+            kwargs['ExecutionParameters'] = [format_athena_parameter(p) for p in parameters]
+        
+        response = self.client.start_query_execution(**kwargs)
+        query_execution_id = response['QueryExecutionId']
+        logger.info(f"Started Athena query: {query_execution_id}")
+        return query_execution_id
+    
+    def _backoff_delays(self) -> Iterator[float]:
+        """Exponential polling delays, capped at poll_max_delay"""
+        delay = self.poll_initial_delay
+        while True:
+            yield delay
+            delay = min(delay * 2, self.poll_max_delay)
+    
+    def _check_state(self, query_execution_id: str) -> Optional[Dict[str, Any]]:
+        """Return the execution info once finished, None while still running"""
+        execution = self.client.get_query_execution(QueryExecutionId=query_execution_id)['QueryExecution']
+        state = execution['Status']['State']
+        if state == 'SUCCEEDED':
+            return execution
+        if state in ('FAILED', 'CANCELLED'):
+            reason = execution['Status'].get('StateChangeReason', 'unknown reason')
+            raise AthenaQueryError(f"Athena query {query_execution_id} {state}: {reason}")
+        return None
+    
+    async def wait_for_query(self, query_execution_id: str) -> Dict[str, Any]:
+        """
+        Poll a query until it finishes, backing off between polls
+        
+        Each poll runs in the default executor so the event loop is not
+        blocked by the Athena API call.
+        
+        Returns:
+            QueryExecution description of the finished query
+        
+        Raises:
+            AthenaQueryError: If the query fails, is cancelled or exceeds the poll timeout
+        """
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.poll_timeout_seconds
+        for delay in self._backoff_delays():
+            execution = await loop.run_in_executor(None, self._check_state, query_execution_id)
+            if execution is not None:
+                return execution
+            if time.monotonic() + delay > deadline:
+                break
+            await asyncio.sleep(delay)
+        raise AthenaQueryError(f"Athena query {query_execution_id} did not finish within {self.poll_timeout_seconds}s")
+    
+    def iter_results(self, query_execution_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the rows of a finished query page by page
+        
+        Yields:
+            One dictionary per result row, with numeric and boolean columns converted
+        """
+        paginator = self.client.get_paginator('get_query_results')
+        columns: Optional[List[Tuple[str, str]]] = None
+        for page in paginator.paginate(QueryExecutionId=query_execution_id):
+            result_set = page['ResultSet']
+            rows = result_set['Rows']
+            if columns is None:
+                columns = [
+                    (column['Name'], column['Type'].lower())
+                    for column in result_set['ResultSetMetadata']['ColumnInfo']
+                ]
+                # The first row of the first page repeats the column names
+                rows = rows[1:]
+            for row in rows:
+                values = [datum.get('VarCharValue') for datum in row['Data']]
+                yield {
+                    name: _convert_athena_value(value, column_type)
+                    for (name, column_type), value in zip(columns, values)
+                }
+    
+    def iter_results_from_output(self, execution: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Stream rows straight from the result CSV in the output location
+        
+        Avoids the 1000-rows-per-call limit of GetQueryResults for large result sets.
+        Values are returned as strings, exactly as written by Athena.
+        """
+        output = execution['ResultConfiguration']['OutputLocation']
+        bucket, key = output[len('s3://'):].split('/', 1)
+        s3 = get_s3_client()
+        if s3 is None:
+            raise AthenaQueryError("S3 client not available to read query results")
+        body = s3.get_object(Bucket=bucket, Key=key)['Body']
+        lines = (line.decode('utf-8') for line in body.iter_lines())
+        for row in csv.DictReader(lines):
+            yield {name: (value if value != '' else None) for name, value in row.items()}
+    
+    def _cache_get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored_at, rows = entry
+        if time.monotonic() - stored_at > self.cache_ttl_seconds:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return rows
+    
+    def _cache_put(self, key: str, rows: List[Dict[str, Any]]):
+        if self.cache_ttl_seconds <= 0 or self.cache_max_entries <= 0:
+            return
+        self._cache[key] = (time.monotonic(), rows)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_max_entries:
+            self._cache.popitem(last=False)
+    
+    def clear_cache(self):
+        """Drop all cached result sets"""
+        self._cache.clear()
+    
+    async def execute(
+        self,
+        query: str,
+        parameters: Optional[Sequence[Any]] = None,
+        use_cache: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Run a query to completion and return all rows
+        
+        The Athena API calls (start, polls, result pages) run in the default
+        executor; only the cache lookup and the backoff sleeps run on the loop.
+        
+        Args:
+            query: SQL with `?` placeholders
+            parameters: Values bound to the placeholders, in order
+            use_cache: Serve (and store) results from the query-hash cache
+        
+        Returns:
+            List of result rows
+        """
+        key = self.query_hash(query, parameters)
+        if use_cache:
+            cached = self._cache_get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+        
+        loop = asyncio.get_running_loop()
+        query_execution_id = await loop.run_in_executor(None, self.start_query, query, parameters)
+        await self.wait_for_query(query_execution_id)
+        rows = await loop.run_in_executor(None, lambda: list(self.iter_results(query_execution_id)))
+        if use_cache:
+            self._cache_put(key, rows)
+        return rows
+    
+    def execute_sync(
+        self,
+        query: str,
+        parameters: Optional[Sequence[Any]] = None,
+        use_cache: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Blocking wrapper around execute for scripts and worker threads
+        
+        Raises:
+            RuntimeError: If called on a thread whose event loop is running
+                (e.g. from a request handler); await execute() there instead
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.execute(query, parameters, use_cache))
+        raise RuntimeError("execute_sync() called from a running event loop; await execute() instead")
+
+
+# Columns of the predictions table (scripts/create_athena_table.sql)
+PREDICTION_COLUMNS = [
+    'user_id', 'movie_id', 'age', 'gender', 'prediction', 'prediction_class',
+    'model_version', 'inference_time_ms', 'timestamp'
+]
+PARTITION_COLUMNS = ['year', 'month', 'day', 'hour']
+
+
+def _parse_partition_time(value: Any, end: bool = False) -> datetime:
+    """
+    Parse a range bound to an hour-aligned datetime
+    
+    Date-only bounds ('YYYY-MM-DD' or date objects) cover the whole day, so as an
+    end bound they resolve to 23:00 of that day.
+    """
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, date):
+        parsed = datetime(value.year, value.month, value.day, 23 if end else 0)
+    elif isinstance(value, str) and len(value) == 10:
+        parsed = datetime.strptime(value, "%Y-%m-%d")
+        if end:
+            parsed = parsed.replace(hour=23)
+    else:
+        parsed = datetime.fromisoformat(str(value))
+    return parsed.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def _next_month(dt: datetime) -> datetime:
+    return dt.replace(year=dt.year + 1, month=1) if dt.month == 12 else dt.replace(month=dt.month + 1)
+
+
+def build_partition_predicate(start: Any, end: Any) -> Tuple[str, List[int]]:
+    """
+    Turn an hour range into a predicate over the year/month/day/hour partitions
+    
+    The range is split into the coarsest aligned blocks (whole years, months,
+    days, then leftover hours) so Athena only enumerates partitions inside the
+    window. Both bounds are inclusive and hour-granular.
+    
+    Args:
+        start: First hour of the window (datetime, date or ISO string)
+        end: Last hour of the window (datetime, date or ISO string)
+    
+    Returns:
+        Tuple of (SQL predicate with `?` placeholders, parameter values)
+    """
+    start_dt = _parse_partition_time(start)
+    end_dt = _parse_partition_time(end, end=True)
+    if end_dt < start_dt:
+        raise ValueError(f"Empty partition range: {start_dt} > {end_dt}")
+    
+    clauses: List[str] = []
+    parameters: List[int] = []
+    hour = timedelta(hours=1)
+    current = start_dt
+    while current <= end_dt:
+        if current.month == 1 and current.day == 1 and current.hour == 0 and \
+                current.replace(year=current.year + 1) - hour <= end_dt:
+            # Whole years
+            last = current.year
+            while datetime(last + 2, 1, 1) - hour <= end_dt:
+                last += 1
+            clauses.append("year BETWEEN ? AND ?")
+            parameters += [current.year, last]
+            current = datetime(last + 1, 1, 1)
+        elif current.day == 1 and current.hour == 0 and _next_month(current) - hour <= end_dt:
+            # Whole months within one year
+            last = current
+            while last.month < 12 and _next_month(_next_month(last)) - hour <= end_dt:
+                last = _next_month(last)
+            clauses.append("(year = ? AND month BETWEEN ? AND ?)")
+            parameters += [current.year, current.month, last.month]
+            current = _next_month(last)
+        elif current.hour == 0 and current + timedelta(days=1) - hour <= end_dt:
+            # Whole days within one month
+            last = current
+            while (last + timedelta(days=1)).month == current.month and last + timedelta(days=2) - hour <= end_dt:
+                last += timedelta(days=1)
+            clauses.append("(year = ? AND month = ? AND day BETWEEN ? AND ?)")
+            parameters += [current.year, current.month, current.day, last.day]
+            current = last + timedelta(days=1)
+        else:
+            # Leftover hours within one day
+            last_hour = 23 if end_dt.date() > current.date() else end_dt.hour
+            clauses.append("(year = ? AND month = ? AND day = ? AND hour BETWEEN ? AND ?)")
+            parameters += [current.year, current.month, current.day, current.hour, last_hour]
+            current = current.replace(hour=last_hour) + hour
+    
+    predicate = clauses[0] if len(clauses) == 1 else "(" + " OR ".join(clauses) + ")"
+    return predicate, parameters
+
+
+def build_predictions_query(
+    database: str,
+    table: str,
+    start: Any = None,
+    end: Any = None,
+    user_id: Optional[int] = None,
+    columns: Optional[Sequence[str]] = None,
+    limit: Optional[int] = 100,
+    order_by_timestamp: bool = True
+) -> Tuple[str, List[Any]]:
+    """
+    Build a partition-pruned, column-projected predictions query
+    
+    Args:
+        database: Athena database name
+        table: Athena table name
+        start: Window start (hour-granular); defaults to `end` minus one day
+        end: Window end (hour-granular, inclusive); defaults to the current hour
+        user_id: Optional user ID filter
+        columns: Columns to read (default: all prediction columns). Parquet is
+            columnar, so fewer columns means fewer bytes scanned.
+        limit: Maximum number of rows (None for no limit)
+        order_by_timestamp: Return newest predictions first
+    
+    Returns:
+        Tuple of (SQL with `?` placeholders, parameter values)
+    """
+    selected = list(columns) if columns else PREDICTION_COLUMNS
+    unknown = [c for c in selected if c not in PREDICTION_COLUMNS and c not in PARTITION_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown prediction columns: {unknown}")
+    
+    if start is None and end is None:
+        end = datetime.utcnow()
+    if start is None:
+        start = _parse_partition_time(end, end=True) - timedelta(days=1)
+    if end is None:
+        end = datetime.utcnow()
+    
+    predicate, parameters = build_partition_predicate(start, end)
+    query = f"SELECT {', '.join(selected)} FROM {database}.{table} WHERE {predicate}"
+    parameters = list(parameters)
+    
+    if user_id is not None:
+        query += " AND user_id = ?"
+        parameters.append(int(user_id))
+    if order_by_timestamp:
+        query += " ORDER BY timestamp DESC"
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
+    return query, parameters
+
+
+def _predictions_query(
+    database: Optional[str],
+    table: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    user_id: Optional[int],
+    limit: int,
+    columns: Optional[Sequence[str]]
+) -> Optional[Tuple[str, List[Any]]]:
+    """Query and parameters for query_predictions_from_athena, or None if Athena is not set up"""
+    db = database or settings.athena_database
+    tbl = table or settings.athena_table
+    
+    if not db or not tbl:
+        logger.warning("Athena database or table not configured")
+        return None
+    
+    if get_athena_client() is None:
+        logger.warning("Athena client not available")
+        return None
+    
+    # Only the year/month/day/hour partitions inside the window are scanned
+    return build_predictions_query(
+        db, tbl, start=start_date, end=end_date, user_id=user_id,
+        columns=columns, limit=limit
+    )
+
+
+async def query_predictions_from_athena_async(
+    database: Optional[str] = None,
+    table: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    user_id: Optional[int] = None,
+    limit: int = 100,
+    columns: Optional[Sequence[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Query predictions from Athena without blocking the event loop
+    
+    Same arguments and result as query_predictions_from_athena; use this one
+    from request handlers and other coroutines.
+    """
+    prepared = _predictions_query(database, table, start_date, end_date, user_id, limit, columns)
+    if prepared is None:
+        return []
+    return await athena_query_client.execute(*prepared)
+
+
 def query_predictions_from_athena(
     database: Optional[str] = None,
     table: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     user_id: Optional[int] = None,
-    limit: int = 100
+    limit: int = 100,
+    columns: Optional[Sequence[str]] = None
 ) -> List[Dict[str, Any]]:
     """
-    Query predictions from Athena
+    Query predictions from Athena (blocking; from async code use query_predictions_from_athena_async)
     
     Args:
         database: Athena database name (uses config if not provided)
         table: Athena table name (uses config if not provided)
-        start_date: Start date filter (YYYY-MM-DD)
-        end_date: End date filter (YYYY-MM-DD)
+        start_date: Start of the window (YYYY-MM-DD or ISO hour, default: one day before end)
+        end_date: End of the window, inclusive (YYYY-MM-DD or ISO hour, default: now)
         user_id: Optional user ID filter
         limit: Maximum number of results
+        columns: Columns to return (default: all prediction columns)
     
     Returns:
-        List of prediction records or query execution info
+        List of prediction records; empty if Athena is not configured
+    
+    Raises:
+        AthenaQueryError: If the query fails or times out
+        ValueError: If the window or columns are invalid
+        RuntimeError: If called from a running event loop
     """
-    try:
-        db = database or settings.athena_database
-        tbl = table or settings.athena_table
-        
-        if not db or not tbl:
-            logger.warning("Athena database or table not configured")
-            return []
-        
-        athena = get_athena_client()
-        if athena is None:
-            logger.warning("Athena client not available")
-            return []
-        
-        # Build query
-        query = f"SELECT * FROM {db}.{tbl} WHERE 1=1"
-        
-        if start_date:
-            query += f" AND date >= '{start_date}'"
-        if end_date:
-            query += f" AND date <= '{end_date}'"
-        if user_id:
-            query += f" AND user_id = {user_id}"
-        
-        query += f" ORDER BY timestamp DESC LIMIT {limit}"
-        
-        # Execute query
-        output_location = settings.athena_s3_output or f"s3://{settings.s3_bucket}/athena-results/"
+    prepared = _predictions_query(database, table, start_date, end_date, user_id, limit, columns)
+    if prepared is None:
+        return []
+    return athena_query_client.execute_sync(*prepared)
+
+
+class LocalObjectStore:
+    """
+    Local filesystem stand-in for an S3 bucket
+    
+    Keys map to paths under `root`; writes go through a temporary file and an
+    atomic rename, like a completed S3 PUT.
+    """
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+    
+    def list(self, prefix: str) -> List[str]:
+        """List keys under a prefix"""
+        base = self._path(prefix.rstrip('/'))
+        keys = []
+        for dirpath, _, filenames in os.walk(base):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                keys.append(os.path.relpath(path, self.root).replace(os.sep, '/'))
+        return sorted(keys)
+    
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+    
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+    
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    
+    def copy(self, source: str, dest: str):
+        path = self._path(dest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(self._path(source), tmp_path)
+        os.replace(tmp_path, path)
+    
+    def delete(self, keys: Sequence[str]):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+class S3ObjectStore:
+    """Thin key/value view of an S3 bucket used by the compaction job"""
+    
+    def __init__(self, bucket: Optional[str] = None, client: Any = None):
+        self.bucket = bucket or settings.s3_bucket
+        self._client = client
+    
+    @property
+    def client(self):
+        return self._client if self._client is not None else get_s3_client()
+    
+    def list(self, prefix: str) -> List[str]:
+        keys = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        return sorted(keys)
+    
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
         
-        response = athena.start_query_execution(
-            QueryString=query,
-            QueryExecutionContext={'Database': db},
-            ResultConfiguration={'OutputLocation': output_location}
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+    
+    def get(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+    
+    def put(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType='application/octet-stream')
+    
+    def copy(self, source: str, dest: str):
+        """Server-side copy within the bucket (objects up to 5GB; compacted files are far smaller)"""
+        self.client.copy_object(Bucket=self.bucket, Key=dest, CopySource={'Bucket': self.bucket, 'Key': source})
+    
+    def delete(self, keys: Sequence[str]):
+        keys = list(keys)
+        # DeleteObjects accepts at most 1000 keys per call
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in keys[i:i + 1000]], 'Quiet': True}
+            )
+
+
+COMPACTION_MANIFEST = "_compaction_manifest.json"
+
+
+def partition_prefix(partition_time: datetime, s3_prefix: str = "predictions") -> str:
+    """S3 prefix of the hourly partition containing `partition_time`"""
+    return f"{s3_prefix}/{partition_time.strftime('%Y/%m/%d')}/{partition_time.strftime('%H')}/"
+
+
+def _read_manifest(store: Any, prefix: str) -> Optional[Dict[str, Any]]:
+    key = prefix + COMPACTION_MANIFEST
+    if not store.exists(key):
+        return None
+    return json.loads(store.get(key))
+
+
+def _finish_swap(store: Any, prefix: str, manifest: Dict[str, Any]):
+    """
+    Delete replaced inputs, then move staged outputs into place
+    
+    Inputs go first so that readers listing the prefix directly (Athena) may
+    briefly miss the partition's rows but never count them twice. Idempotent,
+    so an interrupted compaction is completed by the next run.
+    """
+    store.delete(manifest['inputs'])
+    for staged_key, final_key in zip(manifest['staged'], manifest['outputs']):
+        if not store.exists(final_key):
+            store.copy(staged_key, final_key)
+    store.delete(manifest['staged'])
+    manifest['state'] = 'complete'
+    store.put(prefix + COMPACTION_MANIFEST, json.dumps(manifest).encode('utf-8'))
+
+
+def list_partition_files(store: Any, partition_time: datetime, s3_prefix: str = "predictions") -> List[str]:
+    """
+    List the live Parquet files of an hourly partition
+    
+    Staging files and metadata (underscore-prefixed, which Athena also skips)
+    are excluded. While a committed compaction is mid-swap, its inputs are
+    hidden and its outputs (staged or final) are listed instead, so readers
+    using this listing see every row exactly once throughout the swap.
+    """
+    prefix = partition_prefix(partition_time, s3_prefix)
+    keys = [
+        key for key in store.list(prefix)
+        if key.endswith('.parquet') and not any(part.startswith('_') for part in key[len(prefix):].split('/'))
+    ]
+    manifest = _read_manifest(store, prefix)
+    if manifest and manifest['state'] == 'committed':
+        replaced = set(manifest['inputs'])
+        keys = [key for key in keys if key not in replaced]
+        keys += [
+            final if store.exists(final) else staged
+            for staged, final in zip(manifest['staged'], manifest['outputs'])
+            if final not in keys
+        ]
+    return sorted(keys)
+
+
+def compact_prediction_partition(
+    store: Any,
+    partition_time: datetime,
+    s3_prefix: str = "predictions",
+    target_rows_per_file: Optional[int] = None,
+    row_group_size: Optional[int] = None,
+    compression: Optional[str] = None,
+    min_files: int = 2,
+    grace_minutes: Optional[float] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Merge the small Parquet files of a closed hourly partition into a few large ones
+    
+    Output files are sorted by user_id (then timestamp), zstd-compressed and
+    written with tuned row groups. Outputs are staged under `_staging/`, the
+    manifest is written as the commit point, then the inputs are deleted and
+    the outputs copied into place (server-side on S3). A crash after the
+    commit is finished by the next run.
+    
+    The swap is atomic only for readers using list_partition_files, which
+    follows the manifest. Athena lists the prefix directly: between deleting
+    the inputs and the last output copy (a few server-side copies) it sees
+    the partition with rows missing, never with rows counted twice.
+    
+    Args:
+        store: LocalObjectStore or S3ObjectStore
+        partition_time: Any time inside the hour to compact
+        s3_prefix: Prefix the predictions are written under
+        target_rows_per_file: Rows per output file
+        row_group_size: Rows per Parquet row group
+        compression: Parquet compression codec
+        min_files: Skip partitions with fewer live files than this
+        grace_minutes: Minutes after the hour ends before it counts as closed
+        now: Current UTC time (for testing)
+    
+    Returns:
+        Summary of the compaction ('status' is compacted, skipped or recovered)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    target_rows_per_file = target_rows_per_file or settings.compaction_target_rows_per_file
+    row_group_size = row_group_size or settings.compaction_row_group_size
+    compression = compression or settings.compaction_compression
+    grace_minutes = settings.compaction_grace_minutes if grace_minutes is None else grace_minutes
+    now = now or datetime.utcnow()
+    
+    hour_start = partition_time.replace(minute=0, second=0, microsecond=0)
+    prefix = partition_prefix(hour_start, s3_prefix)
+    
+    if now < hour_start + timedelta(hours=1, minutes=grace_minutes):
+        return {'status': 'skipped', 'reason': 'partition still open', 'partition': prefix}
+    
+    manifest = _read_manifest(store, prefix)
+    if manifest and manifest['state'] == 'committed':
+        logger.info(f"Finishing interrupted compaction {manifest['run_id']} of {prefix}")
+        _finish_swap(store, prefix, manifest)
+        return {'status': 'recovered', 'partition': prefix, 'run_id': manifest['run_id'],
+                'input_files': len(manifest['inputs']), 'output_files': len(manifest['outputs']),
+                'rows': manifest['rows']}
+    
+    inputs = list_partition_files(store, hour_start, s3_prefix)
+    if len(inputs) < min_files:
+        return {'status': 'skipped', 'reason': f'{len(inputs)} file(s) below min_files', 'partition': prefix}
+    
+    tables = [pq.read_table(io.BytesIO(store.get(key))) for key in inputs]
+    # Single-row files can infer narrower types (e.g. int64 for a float column)
+    table = pa.concat_tables(tables, promote_options='permissive')
+    sort_keys = [(column, 'ascending') for column in ('user_id', 'timestamp') if column in table.column_names]
+    if sort_keys:
+        table = table.sort_by(sort_keys)
+    
+    run_id = f"{now.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    staged, outputs = [], []
+    for i, offset in enumerate(range(0, max(table.num_rows, 1), target_rows_per_file)):
+        buffer = io.BytesIO()
+        pq.write_table(
+            table.slice(offset, target_rows_per_file), buffer,
+            compression=compression, row_group_size=row_group_size, write_statistics=True
         )
-        
-        query_execution_id = response['QueryExecutionId']
-        logger.info(f"Started Athena query: {query_execution_id}")
-        
-        # Note: In production, you would poll for query completion
-        # For demo purposes, we'll just return the query ID
-        return [{'query_execution_id': query_execution_id, 'status': 'RUNNING', 'query': query}]
-        
-    except Exception as e:
-        logger.error(f"Failed to query Athena: {e}", exc_info=True)
-        return []
+        staged_key = f"{prefix}_staging/{run_id}/part-{i:05d}.parquet"
+        store.put(staged_key, buffer.getvalue())
+        staged.append(staged_key)
+        outputs.append(f"{prefix}compacted_{run_id}_{i:05d}.parquet")
+    
+    # Commit point: from here on the compaction is completed, never rolled back
+    manifest = {
+        'run_id': run_id,
+        'state': 'committed',
+        'created_at': now.isoformat(),
+        'rows': table.num_rows,
+        'inputs': inputs,
+        'staged': staged,
+        'outputs': outputs
+    }
+    store.put(prefix + COMPACTION_MANIFEST, json.dumps(manifest).encode('utf-8'))
+    _finish_swap(store, prefix, manifest)
+    
+    logger.info(f"Compacted {len(inputs)} files ({table.num_rows} rows) in {prefix} into {len(outputs)} file(s)")
+    return {'status': 'compacted', 'partition': prefix, 'run_id': run_id,
+            'input_files': len(inputs), 'output_files': len(outputs), 'rows': table.num_rows}
+
+
+def compact_closed_partitions(
+    store: Any,
+    start: Any,
+    end: Any,
+    s3_prefix: str = "predictions",
+    **kwargs
+) -> List[Dict[str, Any]]:
+    """
+    Compact every closed hourly partition in an inclusive hour range
+    
+    Returns:
+        One compaction summary per hour
+    """
+    current = _parse_partition_time(start)
+    last = _parse_partition_time(end, end=True)
+    results = []
+    while current <= last:
+        try:
+            results.append(compact_prediction_partition(store, current, s3_prefix, **kwargs))
+        except Exception as e:
+            logger.error(f"Failed to compact {partition_prefix(current, s3_prefix)}: {e}", exc_info=True)
+            results.append({'status': 'failed', 'partition': partition_prefix(current, s3_prefix), 'error': str(e)})
+        current += timedelta(hours=1)
+    return results
+
+
+# Global prediction capture (sampling policy and buffers for the S3 prediction log)
+prediction_capture = PredictionCapture()
 
+# Global Athena query client (shares the lazily-created Athena client)
+athena_query_client = AthenaQueryClient()
@@ -0,0 +1,159 @@
+"""Per-prediction feature contributions (TreeSHAP) with a per-row cache"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import settings
+from src.model_loader import model_loader
+from src.scheduling import PriorityScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class ContributionExplainer:
+    """
+    Computes SHAP feature contributions with LightGBM's `pred_contrib`
+    
+    Contributions are in log-odds space: for each row they sum, together with
+    the base value in the last column, to the raw score whose sigmoid is the
+    predicted probability. Rows are cached by (model version, feature bytes),
+    and all uncached rows of a batch are computed in a single call.
+    """
+    
+    def __init__(self, max_cache_entries: Optional[int] = None):
+        self.max_cache_entries = settings.explain_cache_max_entries if max_cache_entries is None else max_cache_entries
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._cache_version: Optional[str] = None
+        # Called from the inference pool threads
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    def _lookup(self, keys: List[bytes], model_version: Optional[str]) -> Dict[bytes, np.ndarray]:
+        with self._lock:
+            if model_version != self._cache_version:
+                # Contributions from another model version are never valid again
+                self._cache.clear()
+                self._cache_version = model_version
+            found = {}
+            for key in keys:
+                row = self._cache.get(key)
+                if row is not None:
+                    self._cache.move_to_end(key)
+                    found[key] = row
+            return found
+    
+    def _store(self, rows: Dict[bytes, np.ndarray], model_version: Optional[str]):
+        if self.max_cache_entries <= 0:
+            return
+        with self._lock:
+            if model_version != self._cache_version:
+                return
+            for key, row in rows.items():
+                self._cache[key] = row
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+    
+    def contributions(self, features: np.ndarray) -> Tuple[np.ndarray, int]:
+        """
+        Get feature contributions for a batch
+        
+        Args:
+            features: Feature array of shape (n_samples, n_features)
+        
+        Returns:
+            Tuple of (contributions of shape (n_samples, n_features + 1) with the
+            base value in the last column, number of rows served from cache)
+        """
+        model_version = model_loader.model_version
+        features = np.ascontiguousarray(features)
+        keys = [row.tobytes() for row in features]
+        cached = self._lookup(keys, model_version)
+        
+        # Compute each distinct uncached row once, all in one call
+        missing: Dict[bytes, int] = {}
+        for i, key in enumerate(keys):
+            if key not in cached and key not in missing:
+                missing[key] = i
+        computed: Dict[bytes, np.ndarray] = {}
+        if missing:
+            rows = features[list(missing.values())]
+            values = model_loader.predict_contributions(rows)
+            computed = dict(zip(missing.keys(), values))
+            self._store(computed, model_version)
+        
+        hits = sum(1 for key in keys if key in cached)
+        with self._lock:
+            self.cache_hits += hits
+            self.cache_misses += len(keys) - hits
+        
+        result = np.empty((len(keys), features.shape[1] + 1), dtype=np.float64)
+        for i, key in enumerate(keys):
+            result[i] = cached[key] if key in cached else computed[key]
+        return result, hits
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit rate"""
+        with self._lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "cache_entries": len(self._cache),
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "cache_hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def top_contributions(
+    contributions: np.ndarray,
+    features: np.ndarray,
+    feature_names: List[str],
+    top_n: int
+) -> List[List[Dict[str, Any]]]:
+    """
+    Select the top-N features by absolute contribution for each row
+    
+    Args:
+        contributions: Output of ContributionExplainer.contributions
+        features: Feature values the contributions were computed for
+        feature_names: Model feature names, in column order
+        top_n: Number of features to return per row
+    
+    Returns:
+        Per row, a list of {"feature", "value", "contribution"} sorted by
+        decreasing absolute contribution
+    """
+    values = contributions[:, :-1]
+    n_features = values.shape[1]
+    top_n = min(top_n, n_features)
+    magnitude = np.abs(values)
+    if top_n < n_features:
+        top = np.argpartition(-magnitude, top_n - 1, axis=1)[:, :top_n]
+    else:
+        top = np.tile(np.arange(n_features), (len(values), 1))
+    order = np.take_along_axis(magnitude, top, axis=1).argsort(axis=1)[:, ::-1]
+    top = np.take_along_axis(top, order, axis=1)
+    
+    explanations = []
+    for i, columns in enumerate(top):
+        explanations.append([
+            {
+                "feature": feature_names[j],
+                "value": None if np.isnan(features[i, j]) else float(features[i, j]),
+                "contribution": float(values[i, j])
+            }
+            for j in columns
+        ])
+    return explanations
+
+
+# Global explainer instance
+explainer = ContributionExplainer()
+
+# Explanations cost orders of magnitude more per row than scoring, so they run on
+# their own bounded pool and cannot crowd plain predictions out of theirs
+explain_scheduler = PriorityScheduler(max_concurrency=settings.explain_max_concurrency)
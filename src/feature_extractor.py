@@ -2,9 +2,8 @@
 import logging
 from typing import Dict, Any, List
 import numpy as np
-import pandas as pd
 
-from src.schemas import PredictionRequest
+from src.schemas import PredictionRequest, CompactPredictionRequest, COMPACT_GENRES, COMPACT_AGGREGATES
 
 logger = logging.getLogger(__name__)
 
@@ -24,9 +23,23 @@ class FeatureExtractor:
         'occupation_like_rate', 'release_year'
     ]
     
+    # Category order matching the model (from model.txt pandas_categorical)
+    OCCUPATION_CATEGORIES = [
+        'administrator', 'educator', 'engineer', 'librarian',
+        'other', 'programmer', 'student', 'writer'
+    ]
+    
     def __init__(self):
         # Gender encoding: M=1, F=0
         self.gender_map = {'M': 1, 'F': 0}
+        # Occupation encoding: category code, unknown occupations = -1 (treated as missing by LightGBM)
+        self.occupation_map = {name: code for code, name in enumerate(self.OCCUPATION_CATEGORIES)}
+        # Column positions used to decode compact requests
+        self._age_index = self.FEATURE_ORDER.index('age')
+        self._gender_index = self.FEATURE_ORDER.index('gender')
+        self._occupation_index = self.FEATURE_ORDER.index('occupation_new')
+        self._genre_indices = [self.FEATURE_ORDER.index(name) for name in COMPACT_GENRES]
+        self._aggregate_indices = [self.FEATURE_ORDER.index(name) for name in COMPACT_AGGREGATES]
     
     def extract_features(self, request: PredictionRequest) -> np.ndarray:
         """
@@ -50,13 +63,10 @@ class FeatureExtractor:
             for feature_name in self.FEATURE_ORDER:
                 if feature_name == 'gender':
                     features.append(gender_value)
-                elif feature_name == "Children's":
-                    features.append(data.get('Childrens', 0))
-                elif feature_name == 'Film-Noir':
-                    features.append(data.get('FilmNoir', 0))
-                elif feature_name == 'Sci-Fi':
-                    features.append(data.get('SciFi', 0))
+                elif feature_name == 'occupation_new':
+                    features.append(self.occupation_map.get(data.get('occupation_new'), -1))
                 else:
+                    # Dumped by alias, so "Children's", "Film-Noir" and "Sci-Fi" match the model names
                     value = data.get(feature_name, 0)
                     # Handle None values
                     if value is None:
@@ -92,6 +102,46 @@ class FeatureExtractor:
             feature_arrays.append(features)
         
         return np.vstack(feature_arrays)
+    
+    def extract_compact_features(self, request: CompactPredictionRequest) -> np.ndarray:
+        """
+        Decode a compact columnar request straight into a feature matrix
+        
+        Args:
+            request: CompactPredictionRequest object
+            
+        Returns:
+            Feature array of shape (n_samples, n_features)
+        """
+        return self.features_from_compact_columns(
+            request.ages, request.genders, request.occupations,
+            request.genres, request.aggregates
+        )
+    
+    def features_from_compact_columns(self, ages, genders, occupations, genres, aggregates) -> np.ndarray:
+        """
+        Build a feature matrix from compact columns
+        
+        Args:
+            ages, genders, occupations, genres: One value per row (genres as bitmasks)
+            aggregates: Array-like of shape (n_samples, len(COMPACT_AGGREGATES))
+            
+        Returns:
+            Feature array of shape (n_samples, n_features)
+        """
+        n = len(ages)
+        features = np.empty((n, len(self.FEATURE_ORDER)), dtype=np.float32)
+        features[:, self._age_index] = ages
+        features[:, self._gender_index] = genders
+        features[:, self._occupation_index] = occupations
+        
+        # Unpack the genre bitmask: little-endian bytes, little bit order => bit i is genre i
+        masks = np.asarray(genres, dtype='<u4').view(np.uint8).reshape(n, 4)
+        bits = np.unpackbits(masks, axis=1, bitorder='little')[:, :len(COMPACT_GENRES)]
+        features[:, self._genre_indices] = bits
+        
+        features[:, self._aggregate_indices] = np.asarray(aggregates, dtype=np.float32).reshape(n, len(COMPACT_AGGREGATES))
+        return features
 
 
 # Global feature extractor instance
@@ -0,0 +1,298 @@
+"""Online aggregate features maintained from feedback events"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from src.config import settings
+from src.feature_extractor import FeatureExtractor, feature_extractor
+from src.schemas import COMPACT_GENRES
+
+logger = logging.getLogger(__name__)
+
+N_GENRES = len(COMPACT_GENRES)
+SNAPSHOT_FORMAT = 1
+
+
+class CounterTable:
+    """
+    Integer counters for one key type
+    
+    Keys map to rows of a preallocated int64 array through a dict, so an update
+    is one dict lookup and an in-place add. The array doubles when it fills up.
+    """
+    
+    def __init__(self, n_columns: int, capacity: int = 1024):
+        self.n_columns = n_columns
+        self.counts = np.zeros((capacity, n_columns), dtype=np.int64)
+        self._rows: Dict[Hashable, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._rows)
+    
+    def row(self, key: Hashable) -> int:
+        """Row of a key, allocating one for new keys"""
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self.counts):
+                grown = np.zeros((2 * len(self.counts), self.n_columns), dtype=np.int64)
+                grown[:row] = self.counts
+                self.counts = grown
+            self._rows[key] = row
+        return row
+    
+    def lookup(self, keys: Iterable[Hashable]) -> np.ndarray:
+        """Rows of the given keys, -1 for unknown keys"""
+        get = self._rows.get
+        return np.fromiter((get(key, -1) for key in keys), dtype=np.int64)
+    
+    def keys_array(self) -> np.ndarray:
+        """Keys in row order (tuple keys become the rows of a 2-D array)"""
+        return np.array(list(self._rows), dtype=np.int64)
+    
+    def restore(self, keys: np.ndarray, counts: np.ndarray):
+        """Replace the contents with arrays produced by keys_array() and counts"""
+        keys = [tuple(k) for k in keys.tolist()] if keys.ndim == 2 else keys.tolist()
+        self._rows = {key: row for row, key in enumerate(keys)}
+        self.counts = np.zeros((max(1024, 2 * len(keys)), self.n_columns), dtype=np.int64)
+        self.counts[:len(keys)] = counts[:len(keys)]
+
+
+class FeatureStore:
+    """
+    Per-user, per-movie, per-occupation-movie and per-user-genre rating counters
+    
+    Each feedback event is O(1): a handful of dict lookups and counter
+    increments. The counters start empty at deploy time and only hold events
+    received since, so they are added to the historical aggregates sent with
+    the request rather than replacing them; the *_like_rate features are
+    derived from the sums at read time. Predictions use fresh aggregates
+    without a batch recompute. Keys the store has not seen keep the request's
+    values unchanged.
+    
+    `user_genre_total`/`user_genre_liked` are summed over the genres of the
+    scored movie, matching how the request fields are built upstream.
+    """
+    
+    def __init__(self, snapshot_path: Optional[str] = None, snapshot_interval_seconds: Optional[float] = None):
+        self.enabled = settings.enable_feature_store
+        self.snapshot_path = snapshot_path if snapshot_path is not None else settings.feature_store_snapshot_path
+        self.snapshot_interval_seconds = (
+            settings.feature_store_snapshot_interval_seconds
+            if snapshot_interval_seconds is None else snapshot_interval_seconds
+        )
+        self.users = CounterTable(2)
+        self.movies = CounterTable(2)
+        self.occupation_movies = CounterTable(2)
+        # Totals for each genre, then liked counts for each genre
+        self.user_genres = CounterTable(2 * N_GENRES)
+        self._lock = threading.Lock()
+        self.events_ingested = 0
+        self.events_since_snapshot = 0
+        self.last_snapshot: Optional[float] = None
+        
+        order = FeatureExtractor.FEATURE_ORDER
+        self._occupation_index = order.index('occupation_new')
+        self._genre_indices = [order.index(name) for name in COMPACT_GENRES]
+        self._columns = {name: order.index(name) for name in order}
+    
+    def record(self, user_id: int, movie_id: int, liked: bool,
+               occupation_code: Optional[int] = None, genre_indices: Sequence[int] = ()):
+        """
+        Count one rating event
+        
+        Args:
+            user_id: User who rated
+            movie_id: Movie rated
+            liked: Whether the rating counts as a like
+            occupation_code: User occupation category code, or None if unknown
+            genre_indices: Positions in COMPACT_GENRES of the movie's genres
+        """
+        with self._lock:
+            self._record(user_id, movie_id, int(liked), occupation_code, genre_indices)
+            self.events_ingested += 1
+            self.events_since_snapshot += 1
+    
+    def _record(self, user_id, movie_id, liked, occupation_code, genre_indices):
+        for table, key in ((self.users, user_id), (self.movies, movie_id)):
+            row = table.row(key)
+            table.counts[row, 0] += 1
+            table.counts[row, 1] += liked
+        if occupation_code is not None and occupation_code >= 0:
+            row = self.occupation_movies.row((occupation_code, movie_id))
+            self.occupation_movies.counts[row, 0] += 1
+            self.occupation_movies.counts[row, 1] += liked
+        if len(genre_indices):
+            row = self.user_genres.row(user_id)
+            counts = self.user_genres.counts[row]
+            for genre in genre_indices:
+                counts[genre] += 1
+                counts[N_GENRES + genre] += liked
+    
+    def record_events(self, events: List[Any]) -> int:
+        """
+        Count a batch of FeedbackEvent objects under a single lock acquisition
+        
+        Returns:
+            Number of events recorded
+        """
+        decoded = [
+            (
+                event.user_id,
+                event.movie_id,
+                int(event.liked),
+                feature_extractor.occupation_map.get(event.occupation_new) if event.occupation_new else None,
+                [COMPACT_GENRES.index(genre) for genre in event.genres]
+            )
+            for event in events
+        ]
+        with self._lock:
+            for args in decoded:
+                self._record(*args)
+            self.events_ingested += len(decoded)
+            self.events_since_snapshot += len(decoded)
+        return len(decoded)
+    
+    def _set_pair(self, features: np.ndarray, mask: np.ndarray, counts: np.ndarray,
+                  total_name: str, liked_name: str, rate_name: str):
+        # The request carries the historical aggregates; the counters add the events since
+        total = features[mask, self._columns[total_name]] + counts[:, 0]
+        liked = features[mask, self._columns[liked_name]] + counts[:, 1]
+        features[mask, self._columns[total_name]] = total
+        features[mask, self._columns[liked_name]] = liked
+        # A missing rate is encoded as 0.0, as in FeatureExtractor
+        features[mask, self._columns[rate_name]] = np.divide(
+            liked, total, out=np.zeros(len(total)), where=total > 0
+        )
+    
+    def enrich(self, features: np.ndarray, user_ids: Sequence[int], movie_ids: Sequence[int]) -> np.ndarray:
+        """
+        Add the store's counters to the request's aggregate columns, in place
+        
+        Args:
+            features: Writable feature array of shape (n_samples, n_features)
+            user_ids: User ID of each row
+            movie_ids: Movie ID of each row
+        
+        Returns:
+            The same array
+        """
+        if not self.enabled or not self.events_ingested:
+            return features
+        occupations = features[:, self._occupation_index].astype(np.int64).tolist()
+        genres = features[:, self._genre_indices] > 0
+        
+        with self._lock:
+            user_rows = self.users.lookup(user_ids)
+            movie_rows = self.movies.lookup(movie_ids)
+            occupation_rows = self.occupation_movies.lookup(zip(occupations, movie_ids))
+            genre_rows = self.user_genres.lookup(user_ids)
+            user_counts = self.users.counts[user_rows[user_rows >= 0]]
+            movie_counts = self.movies.counts[movie_rows[movie_rows >= 0]]
+            occupation_counts = self.occupation_movies.counts[occupation_rows[occupation_rows >= 0]]
+            genre_counts = self.user_genres.counts[genre_rows[genre_rows >= 0]]
+        
+        self._set_pair(features, user_rows >= 0, user_counts,
+                       'user_total_ratings', 'user_liked_ratings', 'user_like_rate')
+        self._set_pair(features, movie_rows >= 0, movie_counts,
+                       'movie_total_ratings', 'movie_liked_ratings', 'movie_like_rate')
+        self._set_pair(features, occupation_rows >= 0, occupation_counts,
+                       'occupation_movie_total', 'occupation_movie_liked', 'occupation_like_rate')
+        known = genre_rows >= 0
+        movie_genres = genres[known]
+        genre_pair = np.stack([
+            (genre_counts[:, :N_GENRES] * movie_genres).sum(axis=1),
+            (genre_counts[:, N_GENRES:] * movie_genres).sum(axis=1)
+        ], axis=1)
+        self._set_pair(features, known, genre_pair,
+                       'user_genre_total', 'user_genre_liked', 'user_genre_like_rate')
+        return features
+    
+    def _tables(self) -> Dict[str, CounterTable]:
+        return {
+            "users": self.users,
+            "movies": self.movies,
+            "occupation_movies": self.occupation_movies,
+            "user_genres": self.user_genres
+        }
+    
+    def snapshot_due(self) -> bool:
+        """Whether new events arrived and the snapshot interval has elapsed"""
+        if not self.enabled or not self.snapshot_path or not self.events_since_snapshot:
+            return False
+        return self.last_snapshot is None or time.time() - self.last_snapshot >= self.snapshot_interval_seconds
+    
+    def snapshot(self, path: Optional[str] = None) -> bool:
+        """
+        Write all counters to an .npz file (atomically, via a temporary file)
+        
+        Returns:
+            True if the snapshot was written
+        """
+        path = path or self.snapshot_path
+        events = 0
+        try:
+            with self._lock:
+                arrays: Dict[str, np.ndarray] = {"format": np.array(SNAPSHOT_FORMAT)}
+                for name, table in self._tables().items():
+                    arrays[f"{name}_keys"] = table.keys_array()
+                    arrays[f"{name}_counts"] = table.counts[:len(table)].copy()
+                events = self.events_since_snapshot
+                self.events_since_snapshot = 0
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+            self.last_snapshot = time.time()
+            logger.info(f"Feature store snapshot written to {path} ({events} new events)")
+            return True
+        except Exception as e:
+            with self._lock:
+                self.events_since_snapshot += events
+            logger.error(f"Error writing feature store snapshot: {e}", exc_info=True)
+            return False
+    
+    def restore(self, path: Optional[str] = None) -> bool:
+        """
+        Load counters written by snapshot()
+        
+        Returns:
+            True if a snapshot was loaded
+        """
+        path = path or self.snapshot_path
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                if int(data["format"]) != SNAPSHOT_FORMAT:
+                    logger.warning(f"Ignoring feature store snapshot {path}: unknown format {int(data['format'])}")
+                    return False
+                with self._lock:
+                    for name, table in self._tables().items():
+                        table.restore(data[f"{name}_keys"], data[f"{name}_counts"])
+                    self.events_ingested = int(self.users.counts[:len(self.users), 0].sum())
+                    self.events_since_snapshot = 0
+            self.last_snapshot = os.path.getmtime(path)
+            logger.info(f"Feature store restored from {path} ({len(self.users)} users, {len(self.movies)} movies)")
+            return True
+        except Exception as e:
+            logger.error(f"Error restoring feature store snapshot: {e}", exc_info=True)
+            return False
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Table sizes and ingestion counters for the /metrics endpoint"""
+        return {
+            "events_ingested": self.events_ingested,
+            "events_since_snapshot": self.events_since_snapshot,
+            "last_snapshot": self.last_snapshot,
+            "keys": {name: len(table) for name, table in self._tables().items()},
+            "table_bytes": int(sum(table.counts.nbytes for table in self._tables().values()))
+        }
+
+
+# Global feature store instance
+feature_store = FeatureStore()
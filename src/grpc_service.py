@@ -0,0 +1,170 @@
+"""gRPC scoring service sharing the inference core of the HTTP API"""
+import logging
+import time
+from typing import Optional, Tuple
+
+import grpc
+import numpy as np
+
+from src.config import settings
+from src.model_loader import model_loader
+from src.feature_extractor import feature_extractor, FeatureExtractor
+from src.monitoring import metrics_collector, drift_monitor
+from src.feature_store import feature_store
+from src.coalescing import batch_deduplicator
+from src.quality_monitor import quality_monitor
+from src.score_table import score_table
+from src.saturation import saturation_monitor
+from src.schemas import COMPACT_AGGREGATES, MAX_ID
+from src.scheduling import scheduler, parse_priority, parse_deadline, Overloaded, DeadlineExceeded
+from src.protos import prediction_pb2, prediction_pb2_grpc
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = len(FeatureExtractor.FEATURE_ORDER)
+
+
+class InvalidRequest(ValueError):
+    """Raised for requests that cannot be decoded into a feature matrix"""
+
+
+def decode_features(request: prediction_pb2.PredictRequest) -> np.ndarray:
+    """
+    Decode a PredictRequest into a float32 feature matrix
+    
+    Packed features are wrapped without copying; compact rows go through the
+    same decoder as POST /predict/compact.
+    """
+    payload = request.WhichOneof('payload')
+    if payload == 'features':
+        packed = request.features
+        if packed.num_features != N_FEATURES:
+            raise InvalidRequest(f"Expected {N_FEATURES} features per row, got {packed.num_features}")
+        if len(packed.values) % (4 * N_FEATURES):
+            raise InvalidRequest("Packed feature bytes are not a whole number of rows")
+        features = np.frombuffer(packed.values, dtype='<f4').reshape(-1, N_FEATURES)
+    elif payload == 'compact':
+        compact = request.compact
+        n = len(compact.ages)
+        if not (len(compact.genders) == len(compact.occupations) == len(compact.genres) == n):
+            raise InvalidRequest("Compact columns must have one entry per row")
+        aggregates = np.frombuffer(compact.aggregates, dtype='<f4')
+        if len(aggregates) != n * len(COMPACT_AGGREGATES):
+            raise InvalidRequest(f"Expected {len(COMPACT_AGGREGATES)} packed aggregates per row")
+        features = feature_extractor.features_from_compact_columns(
+            compact.ages, compact.genders, compact.occupations, compact.genres, aggregates
+        )
+    else:
+        raise InvalidRequest("Request has no features")
+    
+    if len(features) == 0:
+        raise InvalidRequest("Request has no rows")
+    if request.user_ids and len(request.user_ids) != len(features):
+        raise InvalidRequest("user_ids must have one entry per row")
+    for name in ('user_ids', 'movie_ids'):
+        ids = getattr(request, name)
+        if ids and (min(ids) < 0 or max(ids) >= MAX_ID):
+            raise InvalidRequest(f"{name} must be in [0, {MAX_ID})")
+    return features
+
+
+def request_rows(request: prediction_pb2.PredictRequest) -> int:
+    """Number of rows in a PredictRequest, read from its payload without decoding it"""
+    payload = request.WhichOneof('payload')
+    if payload == 'features':
+        return len(request.features.values) // (4 * N_FEATURES)
+    if payload == 'compact':
+        return len(request.compact.ages)
+    return 0
+
+
+class PredictionServicer(prediction_pb2_grpc.PredictionServiceServicer):
+    """Serves predictions over gRPC with the same model, features and metrics as the HTTP API"""
+    
+    def _predict(self, request: prediction_pb2.PredictRequest) -> prediction_pb2.PredictResponse:
+        start_time = time.time()
+        features = decode_features(request)
+        n_rows = len(features)
+        if feature_store.enabled and len(request.user_ids) == len(request.movie_ids) == n_rows:
+            # Packed features wrap the read-only request buffer
+            features = feature_store.enrich(np.array(features), request.user_ids, request.movie_ids)
+        try:
+            drift_monitor.update(features)
+            if len(request.user_ids) == len(request.movie_ids) == n_rows:
+                predictions = score_table.predict(
+                    features, request.user_ids, request.movie_ids, model_loader.model_version,
+                    lambda rows: batch_deduplicator.predict(model_loader.predict, rows)
+                )
+            else:
+                predictions = batch_deduplicator.predict(model_loader.predict, features)
+        except Exception:
+            metrics_collector.record_batch(n_rows, (time.time() - start_time) * 1000 / n_rows, success=False)
+            raise
+        
+        if quality_monitor.enabled and len(request.user_ids) == len(request.movie_ids) == n_rows:
+            quality_monitor.record(
+                request.user_ids, request.movie_ids, predictions, model_loader.model_version or "unknown"
+            )
+        
+        inference_time_ms = (time.time() - start_time) * 1000
+        metrics_collector.record_batch(n_rows, inference_time_ms / n_rows, success=True)
+        return prediction_pb2.PredictResponse(
+            request_id=request.request_id,
+            predictions=predictions,
+            model_version=model_loader.model_version or "unknown",
+            inference_time_ms=inference_time_ms
+        )
+    
+    async def _handle(self, request, context) -> prediction_pb2.PredictResponse:
+        if not model_loader.model_loaded:
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "Model not loaded")
+        metrics_collector.record_request()
+        metadata = dict(context.invocation_metadata() or ())
+        remaining = context.time_remaining()
+        try:
+            priority = parse_priority(metadata.get('x-priority'))
+            deadline = parse_deadline(remaining * 1000 if remaining is not None else None)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        try:
+            with saturation_monitor.track():
+                # Costed by rows so large batches do not skew the per-row service time estimate
+                return await scheduler.run(
+                    lambda: self._predict(request), priority, deadline, cost=max(1, request_rows(request))
+                )
+        except Overloaded as e:
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(e))
+        except DeadlineExceeded as e:
+            await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e))
+        except InvalidRequest as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        except Exception as e:
+            logger.error(f"gRPC prediction error: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, f"Prediction failed: {str(e)}")
+    
+    async def Predict(self, request, context):
+        return await self._handle(request, context)
+    
+    async def PredictStream(self, request_iterator, context):
+        async for request in request_iterator:
+            yield await self._handle(request, context)
+
+
+def create_grpc_server(port: Optional[int] = None, host: str = "[::]") -> Tuple[grpc.aio.Server, int]:
+    """
+    Create the gRPC server on the current event loop
+    
+    Args:
+        port: Port to listen on (default: settings.grpc_port, 0 picks a free port)
+        host: Interface to bind
+    
+    Returns:
+        Tuple of (server, bound port); call `await server.start()` to serve
+    """
+    server = grpc.aio.server(options=[
+        ('grpc.max_receive_message_length', settings.grpc_max_message_mb * 1024 * 1024),
+        ('grpc.max_send_message_length', settings.grpc_max_message_mb * 1024 * 1024),
+    ])
+    prediction_pb2_grpc.add_PredictionServiceServicer_to_server(PredictionServicer(), server)
+    bound_port = server.add_insecure_port(f"{host}:{settings.grpc_port if port is None else port}")
+    return server, bound_port
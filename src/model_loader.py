@@ -1,29 +1,60 @@
 """Model loading and inference utilities"""
 import logging
+import threading
 import time
 import os
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, TYPE_CHECKING
 import numpy as np
-import lightgbm as lgb
-import boto3
-from botocore.exceptions import ClientError
 
+from src.admission import REJECTED, admission_gate, model_memory_bytes
+from src.artifact_cache import artifact_cache
+from src.aws import get_client
 from src.config import settings
+from src.quantization import QuantizedModel, build_quantized_model
+from src.threading_policy import thread_policy
+
+if TYPE_CHECKING:
+    import lightgbm as lgb
 
 logger = logging.getLogger(__name__)
 
 
 class ModelLoader:
-    """Handles model loading and inference"""
+    """
+    Handles model loading and inference
+    
+    Nothing is loaded at import time; the API lifespan calls `load()` so that
+    lightgbm (and the pandas/sklearn modules it pulls in) and boto3 are only
+    imported when the process actually starts serving.
+    """
     
     def __init__(self):
-        self.model: Optional[lgb.Booster] = None
+        self.model: Optional["lgb.Booster"] = None
         self.model_version: Optional[str] = None
         self.model_loaded: bool = False
-        self._load_model()
+        self.quantized_model: Optional[QuantizedModel] = None
+        # Native memory of the model and its quantizer tables (see measure_memory)
+        self.memory_bytes: Optional[int] = None
+        # Most recent admission gate report (None until the gate has run)
+        self.last_admission: Optional[Dict[str, Any]] = None
+        # Reloads run one at a time: concurrent candidates would skew each other's benchmark
+        self._reload_lock = threading.Lock()
     
-    def _load_model_from_local(self, model_path: str) -> Optional[lgb.Booster]:
+    def load(self) -> bool:
+        """
+        Load the model if it is not loaded yet
+        
+        Returns:
+            True if a model is loaded
+        """
+        if not self.model_loaded:
+            self._load_model()
+        return self.model_loaded
+    
+    def _load_model_from_local(self, model_path: str) -> Optional["lgb.Booster"]:
         """Load model from local file system"""
+        import lightgbm as lgb
+        
         try:
             if not os.path.exists(model_path):
                 logger.error(f"Model file not found: {model_path}")
@@ -38,35 +69,17 @@ class ModelLoader:
             logger.error(f"Error loading model from local path: {e}", exc_info=True)
             return None
     
-    def _load_model_from_s3(self, bucket: str, key: str) -> Optional[lgb.Booster]:
-        """Load model from S3"""
+    def _load_model_from_s3(self, bucket: str, key: str) -> Optional["lgb.Booster"]:
+        """Load model from S3 through the local artifact cache"""
+        import lightgbm as lgb
+        from botocore.exceptions import ClientError
+        
         try:
             logger.info(f"Loading model from S3: s3://{bucket}/{key}")
-            s3_client = boto3.client(
-                's3',
-                region_name=settings.aws_region,
-                aws_access_key_id=settings.aws_access_key_id,
-                aws_secret_access_key=settings.aws_secret_access_key
-            )
-            
-            # Download model to temporary file
-            import tempfile
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.txt') as tmp_file:
-                s3_client.download_fileobj(bucket, key, tmp_file)
-                tmp_path = tmp_file.name
-            
-            # Load model from temporary file
-            model = lgb.Booster(model_file=tmp_path)
-            
-            # Get model version from S3 object metadata
-            try:
-                response = s3_client.head_object(Bucket=bucket, Key=key)
-                self.model_version = response.get('ETag', 'unknown')
-            except:
-                self.model_version = f"s3-{bucket}-{key}"
-            
-            # Clean up temporary file
-            os.unlink(tmp_path)
+            # Unchanged models are read from disk; the version comes from the same HEAD response
+            model_path, version = artifact_cache.fetch(get_client('s3'), bucket, key)
+            model = lgb.Booster(model_file=model_path)
+            self.model_version = version
             
             logger.info(f"Model loaded successfully from S3. Version: {self.model_version}")
             return model
@@ -82,26 +95,83 @@ class ModelLoader:
         # Try S3 first if configured
         if settings.s3_bucket and settings.s3_model_path:
             self.model = self._load_model_from_s3(settings.s3_bucket, settings.s3_model_path)
-            if self.model:
-                self.model_loaded = True
-                return
         
         # Fall back to local file
-        model_path = settings.model_path
-        self.model = self._load_model_from_local(model_path)
+        if not self.model:
+            model_path = settings.model_path
+            self.model = self._load_model_from_local(model_path)
         if self.model:
             self.model_loaded = True
+            self._build_quantizer()
+            self.measure_memory()
         else:
             logger.error("Failed to load model from both S3 and local path")
             self.model_loaded = False
     
-    def reload_model(self):
-        """Reload model (useful for model updates)"""
-        logger.info("Reloading model...")
-        self.model = None
-        self.model_version = None
-        self.model_loaded = False
-        self._load_model()
+    def _build_quantizer(self):
+        """Derive the threshold quantizer from the loaded model"""
+        if not settings.enable_quantizer:
+            return
+        start = time.perf_counter()
+        self.quantized_model = build_quantized_model(self.model)
+        if self.quantized_model is not None:
+            logger.info(
+                f"Quantizer built in {(time.perf_counter() - start) * 1000:.1f}ms "
+                f"({np.dtype(self.quantized_model.code_dtype).name} codes, "
+                f"{self.quantized_model.memory_bytes() / 1e6:.1f}MB of tables)"
+            )
+    
+    def measure_memory(self) -> Optional[int]:
+        """
+        Measure the memory the loaded model takes and store it in `memory_bytes`
+        
+        The Booster is measured by loading a fresh copy of it (see
+        admission.model_memory_bytes), and the quantizer tables by their size.
+        
+        Returns:
+            Bytes, or None if no model is loaded or the heap cannot be measured
+        """
+        model_bytes = model_memory_bytes(self.model) if self.model is not None else None
+        if model_bytes is not None and self.quantized_model is not None:
+            model_bytes += self.quantized_model.memory_bytes()
+        self.memory_bytes = model_bytes
+        return model_bytes
+    
+    def reload_model(self) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Reload model (useful for model updates)
+        
+        The new model is loaded as a candidate next to the current one, which
+        keeps serving. If the admission gate is enabled the candidate is
+        benchmarked against it first; a rejected candidate, or one that fails
+        to load, leaves the current model in place. Concurrent calls wait for
+        each other, so every candidate is benchmarked against whatever model
+        the previous reload left serving.
+        
+        Returns:
+            (installed, report): True if the new model was installed, and this
+            reload's admission gate report (None if the gate did not run)
+        """
+        with self._reload_lock:
+            logger.info("Reloading model...")
+            candidate = ModelLoader()
+            candidate._load_model()
+            if not candidate.model_loaded:
+                return False, None
+            report = None
+            if admission_gate.enabled:
+                report = admission_gate.evaluate(candidate, self if self.model_loaded else None)
+                self.last_admission = report
+                if report["decision"] == REJECTED:
+                    return False, report
+            
+            self.quantized_model = candidate.quantized_model
+            self.model = candidate.model
+            self.model_version = candidate.model_version
+            self.memory_bytes = candidate.memory_bytes
+            self.model_loaded = True
+            logger.info(f"Model {self.model_version} installed")
+            return True, report
     
     def predict(self, features: np.ndarray) -> np.ndarray:
         """
@@ -117,12 +187,125 @@ class ModelLoader:
             raise RuntimeError("Model not loaded")
         
         try:
-            predictions = self.model.predict(features)
+            predictions = self.model.predict(features, num_threads=thread_policy.threads_for(len(features)))
             return predictions
         except Exception as e:
             logger.error(f"Error during prediction: {e}", exc_info=True)
             raise
     
+    def predict_cascade(
+        self,
+        features: np.ndarray,
+        first_iterations: Optional[int] = None,
+        band: Optional[float] = None,
+        return_mask: bool = False
+    ):
+        """
+        Early-exit cascade prediction
+        
+        All rows are scored with the first `first_iterations` boosting rounds.
+        Only rows whose partial margin lies within `band` of the decision
+        boundary (raw score 0, probability 0.5) are finished with the remaining
+        trees; the rest keep the probability of their partial margin. A band of
+        0 skips the second stage entirely, a large band reproduces `predict`.
+        
+        Args:
+            features: Feature array of shape (n_samples, n_features)
+            first_iterations: Rounds in the first stage (default: settings.cascade_iterations)
+            band: Half-width of the uncertainty band in raw-score units (default: settings.cascade_band)
+            return_mask: Also return the boolean mask of rows scored with the full ensemble
+            
+        Returns:
+            Prediction probabilities, and the mask if return_mask is set
+        """
+        if not self.model_loaded or self.model is None:
+            raise RuntimeError("Model not loaded")
+        
+        first_iterations = settings.cascade_iterations if first_iterations is None else first_iterations
+        band = settings.cascade_band if band is None else band
+        total_iterations = self.model.current_iteration()
+        if self.model.params.get('objective') != 'binary' or not 0 < first_iterations < total_iterations:
+            # The cascade is defined on binary margins; anything else is scored in full
+            predictions = self.predict(features)
+            return (predictions, np.ones(len(predictions), dtype=bool)) if return_mask else predictions
+        
+        try:
+            margins = self.model.predict(
+                features, num_iteration=first_iterations, raw_score=True,
+                num_threads=thread_policy.threads_for(len(features))
+            )
+            uncertain = np.abs(margins) < band
+            if uncertain.any():
+                n_uncertain = int(uncertain.sum())
+                margins[uncertain] += self.model.predict(
+                    features[uncertain], start_iteration=first_iterations, raw_score=True,
+                    num_threads=thread_policy.threads_for(n_uncertain)
+                )
+            sigmoid = float(self.model.params.get('sigmoid', 1.0))
+            predictions = 1.0 / (1.0 + np.exp(-sigmoid * margins))
+            return (predictions, uncertain) if return_mask else predictions
+        except Exception as e:
+            logger.error(f"Error during cascade prediction: {e}", exc_info=True)
+            raise
+    
+    def predict_contributions(self, features: np.ndarray) -> np.ndarray:
+        """
+        Compute SHAP feature contributions with the model
+        
+        Args:
+            features: Feature array of shape (n_samples, n_features)
+            
+        Returns:
+            Array of shape (n_samples, n_features + 1); the last column is the
+            expected raw score (base value)
+        """
+        if not self.model_loaded or self.model is None:
+            raise RuntimeError("Model not loaded")
+        
+        try:
+            # Explain workers share the core budget with scoring, so they get the same per-call cap
+            return self.model.predict(
+                features, pred_contrib=True, num_threads=thread_policy.threads_for(len(features))
+            )
+        except Exception as e:
+            logger.error(f"Error computing contributions: {e}", exc_info=True)
+            raise
+    
+    def quantize(self, features: np.ndarray) -> np.ndarray:
+        """
+        Convert features into the model's compact bin codes
+        
+        Args:
+            features: Feature array of shape (n_samples, n_features)
+            
+        Returns:
+            uint8 (or uint16) code array of the same shape, for predict_quantized
+        """
+        if self.quantized_model is None:
+            raise RuntimeError("Quantizer not available")
+        return self.quantized_model.quantize(features)
+    
+    def predict_quantized(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Make predictions from bin codes produced by quantize()
+        
+        Codes are only valid for the model version they were produced with.
+        
+        Args:
+            codes: Code array of shape (n_samples, n_features)
+            
+        Returns:
+            Prediction probabilities, identical to predict() on the original features
+        """
+        if self.quantized_model is None:
+            raise RuntimeError("Quantizer not available")
+        
+        try:
+            return self.quantized_model.predict_codes(codes)
+        except Exception as e:
+            logger.error(f"Error during quantized prediction: {e}", exc_info=True)
+            raise
+    
     def predict_batch(self, features_list: List[np.ndarray]) -> List[np.ndarray]:
         """
         Make batch predictions
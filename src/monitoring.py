@@ -1,17 +1,63 @@
 """Monitoring and metrics collection"""
+import ctypes
+import json
 import logging
+import os
+import threading
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from collections import deque
+from itertools import repeat
 from datetime import datetime
-import boto3
-from botocore.exceptions import ClientError
+import numpy as np
 
 from src.config import settings
+from src.resilience import dependency
 
 logger = logging.getLogger(__name__)
 
 
+def resident_memory_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux), or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _MallInfo2(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_size_t) for name in (
+        "arena", "ordblks", "smblks", "hblks", "hblkhd", "usmblks", "fsmblks", "uordblks", "fordblks", "keepcost"
+    )]
+
+
+# glibc's mallinfo2, resolved on first use (False where it is unavailable)
+_mallinfo2 = None
+
+
+def heap_in_use_bytes() -> Optional[int]:
+    """
+    Bytes currently allocated through malloc (glibc mallinfo2), or None elsewhere
+    
+    Unlike RSS this does not depend on what the allocator has kept or returned
+    to the OS, so the difference around an allocation is its actual size.
+    Covers native allocations (LightGBM, numpy) but not Python's small-object arenas.
+    """
+    global _mallinfo2
+    if _mallinfo2 is None:
+        try:
+            libc = ctypes.CDLL("libc.so.6")
+            libc.mallinfo2.restype = _MallInfo2
+            _mallinfo2 = libc.mallinfo2
+        except (OSError, AttributeError):
+            _mallinfo2 = False
+    if not _mallinfo2:
+        return None
+    info = _mallinfo2()
+    return info.uordblks + info.hblkhd
+
+
 class MetricsCollector:
     """Collects and stores application metrics"""
     
@@ -20,6 +66,10 @@ class MetricsCollector:
         self.total_predictions = 0
         self.total_errors = 0
         self.inference_times = deque(maxlen=10000)  # Keep last 10k inference times
+        # Explanations are tracked separately so they can be sized apart from scoring
+        self.total_explanations = 0
+        self.total_explain_errors = 0
+        self.explain_times = deque(maxlen=10000)
         self.start_time = time.time()
     
     def record_prediction(self, inference_time_ms: float, success: bool = True, request_time_ms: Optional[float] = None):
@@ -39,10 +89,48 @@ class MetricsCollector:
             if not success:
                 cloudwatch_metrics.put_metric('ErrorCount', 1, 'Count')
     
+    def record_batch(self, n_predictions: int, avg_inference_time_ms: float, success: bool = True):
+        """Record a batch of predictions sharing one timing measurement"""
+        self.total_predictions += n_predictions
+        if success:
+            self.inference_times.extend(repeat(avg_inference_time_ms, n_predictions))
+        else:
+            self.total_errors += n_predictions
+        
+        if cloudwatch_metrics.enabled:
+            cloudwatch_metrics.put_metric('InferenceTime', avg_inference_time_ms, 'Milliseconds')
+            cloudwatch_metrics.put_metric('RequestCount', n_predictions, 'Count')
+            if not success:
+                cloudwatch_metrics.put_metric('ErrorCount', n_predictions, 'Count')
+    
     def record_request(self):
         """Record a request"""
         self.total_requests += 1
     
+    def record_explanation(self, n_rows: int, request_time_ms: float, success: bool = True):
+        """Record an explanation request (latency is per request, not per row)"""
+        self.total_explanations += n_rows
+        if success:
+            self.explain_times.append(request_time_ms)
+        else:
+            self.total_explain_errors += n_rows
+        
+        if cloudwatch_metrics.enabled:
+            cloudwatch_metrics.put_metric('ExplainTime', request_time_ms, 'Milliseconds')
+            cloudwatch_metrics.put_metric('ExplainCount', n_rows, 'Count')
+    
+    def get_explanation_metrics(self) -> Dict[str, Any]:
+        """Get explanation latency percentiles and counts"""
+        sorted_times = sorted(self.explain_times)
+        n = len(sorted_times)
+        return {
+            "total_explanations": self.total_explanations,
+            "total_errors": self.total_explain_errors,
+            "avg_request_time_ms": round(sum(sorted_times) / n, 3) if n else 0.0,
+            "p95_request_time_ms": round(sorted_times[int(n * 0.95)], 3) if n else 0.0,
+            "p99_request_time_ms": round(sorted_times[int(n * 0.99)], 3) if n else 0.0
+        }
+    
     def get_metrics(self) -> Dict[str, Any]:
         """Get current metrics"""
         if not self.inference_times:
@@ -85,125 +173,386 @@ class MetricsCollector:
         self.total_predictions = 0
         self.total_errors = 0
         self.inference_times.clear()
+        self.total_explanations = 0
+        self.total_explain_errors = 0
+        self.explain_times.clear()
         self.start_time = time.time()
 
 
 class CloudWatchMetrics:
-    """CloudWatch metrics publisher"""
+    """CloudWatch metrics publisher (client created on first use)"""
     
     def __init__(self):
         self.enabled = settings.enable_cloudwatch
         self.namespace = "ModelDeployment"
         self.client = None
-        
-        if self.enabled:
-            try:
-                self.client = boto3.client(
-                    'cloudwatch',
-                    region_name=settings.aws_region,
-                    aws_access_key_id=settings.aws_access_key_id,
-                    aws_secret_access_key=settings.aws_secret_access_key
-                )
-                logger.info(f"CloudWatch metrics enabled: {self.namespace}")
-            except Exception as e:
-                logger.warning(f"Failed to initialize CloudWatch metrics: {e}")
-                self.enabled = False
+        self.dependency = dependency('cloudwatch', replay=self._send)
+    
+    def initialize(self):
+        """Create the CloudWatch client; disables publishing if that fails"""
+        if not self.enabled or self.client is not None:
+            return
+        try:
+            self.client = self.dependency.client('cloudwatch')
+            logger.info(f"CloudWatch metrics enabled: {self.namespace}")
+        except Exception as e:
+            logger.warning(f"Failed to initialize CloudWatch metrics: {e}")
+            self.enabled = False
     
     def put_metric(self, metric_name: str, value: float, unit: str = 'Count'):
         """
         Put a custom metric to CloudWatch
         
+        The call runs on the cloudwatch dependency's workers, never on the
+        request path; while CloudWatch is failing or slow the metric is spooled
+        locally (or dropped in fail-fast mode).
+        
         Args:
             metric_name: Name of the metric
             value: Metric value
             unit: Unit of measurement (Count, Seconds, Milliseconds, Percent, etc.)
         """
-        if not self.enabled or not self.client:
+        if not self.enabled:
             return
-        
-        try:
-            self.client.put_metric_data(
-                Namespace=self.namespace,
-                MetricData=[
-                    {
-                        'MetricName': metric_name,
-                        'Value': value,
-                        'Unit': unit,
-                        'Timestamp': datetime.utcnow()
-                    }
-                ]
-            )
-        except Exception as e:
-            logger.debug(f"Failed to put metric to CloudWatch: {e}")
+        datum = {'MetricName': metric_name, 'Value': value, 'Unit': unit, 'Timestamp': time.time()}
+        self.dependency.submit(self._send, datum, record=datum)
+    
+    def _send(self, datum: Dict[str, Any]) -> bool:
+        """Publish one metric datum (raises on failure, for the circuit breaker)"""
+        if self.client is None:
+            self.initialize()
+            if self.client is None:
+                return False
+        self.client.put_metric_data(
+            Namespace=self.namespace,
+            MetricData=[{**datum, 'Timestamp': datetime.utcfromtimestamp(datum['Timestamp'])}]
+        )
+        return True
 
 
 class CloudWatchLogger:
-    """CloudWatch logging handler"""
+    """CloudWatch logging handler (client and log group created on first use)"""
     
     def __init__(self):
         self.enabled = settings.enable_cloudwatch
         self.log_group = settings.cloudwatch_log_group
         self.log_stream = settings.cloudwatch_log_stream
         self.client = None
-        
-        if self.enabled:
-            try:
-                self.client = boto3.client(
-                    'logs',
-                    region_name=settings.aws_region,
-                    aws_access_key_id=settings.aws_access_key_id,
-                    aws_secret_access_key=settings.aws_secret_access_key
-                )
-                self._ensure_log_group_exists()
-                logger.info(f"CloudWatch logging enabled: {self.log_group}/{self.log_stream}")
-            except Exception as e:
-                logger.warning(f"Failed to initialize CloudWatch: {e}")
-                self.enabled = False
-    
-    def _ensure_log_group_exists(self):
+        self.dependency = dependency('logs', replay=self._send)
+    
+    def initialize(self):
+        """Create the CloudWatch Logs client and log group; disables logging if that fails"""
+        if not self.enabled or self.client is not None:
+            return
+        try:
+            client = self.dependency.client('logs')
+            self._ensure_log_group_exists(client)
+            self.client = client
+            logger.info(f"CloudWatch logging enabled: {self.log_group}/{self.log_stream}")
+        except Exception as e:
+            logger.warning(f"Failed to initialize CloudWatch: {e}")
+            self.enabled = False
+    
+    def _ensure_log_group_exists(self, client):
         """Ensure CloudWatch log group exists"""
+        from botocore.exceptions import ClientError
+        
         try:
-            self.client.create_log_group(logGroupName=self.log_group)
+            client.create_log_group(logGroupName=self.log_group)
         except ClientError as e:
             if e.response['Error']['Code'] != 'ResourceAlreadyExistsException':
                 raise
     
     def log_prediction(self, user_id: int, movie_id: int, prediction: float, 
                       inference_time_ms: float, model_version: str):
-        """Log prediction to CloudWatch"""
-        if not self.enabled or not self.client:
+        """Log prediction to CloudWatch (queued on the logs dependency, like put_metric)"""
+        if not self.enabled:
             return
         
-        try:
-            log_message = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "event_type": "prediction",
-                "user_id": user_id,
-                "movie_id": movie_id,
-                "prediction": prediction,
-                "inference_time_ms": inference_time_ms,
-                "model_version": model_version
+        log_message = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "event_type": "prediction",
+            "user_id": user_id,
+            "movie_id": movie_id,
+            "prediction": prediction,
+            "inference_time_ms": inference_time_ms,
+            "model_version": model_version
+        }
+        event = {'timestamp': int(time.time() * 1000), 'message': str(log_message)}
+        self.dependency.submit(self._send, event, record=event)
+    
+    def _send(self, event: Dict[str, Any]) -> bool:
+        """Write one log event (raises on failure, for the circuit breaker)"""
+        if self.client is None:
+            self.initialize()
+            if self.client is None:
+                return False
+        self.client.put_log_events(
+            logGroupName=self.log_group,
+            logStreamName=self.log_stream,
+            logEvents=[event]
+        )
+        return True
+
+
+class FeatureDriftMonitor:
+    """
+    Streaming per-feature input histograms compared against a stored baseline
+    
+    Bins come from the model's feature_infos: numeric features get fixed-width
+    bins over their training range (plus underflow/overflow bins), categorical
+    features one bin per training value (plus one for unseen values). Rows are
+    buffered and folded into the histograms with a single vectorized bincount,
+    so the per-row cost stays in the microsecond range.
+    """
+    
+    def __init__(
+        self,
+        n_bins: Optional[int] = None,
+        interval_seconds: Optional[float] = None,
+        min_rows: Optional[int] = None,
+        baseline_path: Optional[str] = None,
+        buffer_rows: int = 256
+    ):
+        self.enabled = settings.enable_drift_monitor
+        self.n_bins = n_bins or settings.drift_bins
+        self.interval_seconds = settings.drift_interval_seconds if interval_seconds is None else interval_seconds
+        self.min_rows = settings.drift_min_rows if min_rows is None else min_rows
+        self.baseline_path = baseline_path if baseline_path is not None else settings.drift_baseline_path
+        self.buffer_rows = buffer_rows
+        self.configured = False
+        self._lock = threading.Lock()
+        self.rows_observed = 0
+        self.last_computed: Optional[float] = None
+        self.last_result: Dict[str, Dict[str, float]] = {}
+    
+    def configure(self, feature_names: List[str], feature_infos: Dict[str, Dict[str, Any]]):
+        """
+        Build the bin layout from the model's feature_infos
+        
+        Args:
+            feature_names: Model feature names, in column order
+            feature_infos: `Booster.dump_model()['feature_infos']`; constant
+                features are absent and are not monitored
+        """
+        numeric_columns, numeric_lo, numeric_width = [], [], []
+        categorical = []
+        for column, name in enumerate(feature_names):
+            info = feature_infos.get(name)
+            if info is None:
+                continue
+            if info.get('values'):
+                values = np.array(sorted(v for v in info['values'] if v >= 0), dtype=np.float32)
+                categorical.append((column, values))
+            else:
+                lo, hi = float(info['min_value']), float(info['max_value'])
+                numeric_columns.append(column)
+                numeric_lo.append(lo)
+                numeric_width.append((hi - lo) / self.n_bins if hi > lo else 1.0)
+        
+        # Histogram layout: numeric features first, then categorical ones
+        sizes = [self.n_bins + 2] * len(numeric_columns) + [len(values) + 1 for _, values in categorical]
+        with self._lock:
+            self.feature_names = [feature_names[c] for c in numeric_columns] + [feature_names[c] for c, _ in categorical]
+            self.n_features = len(feature_names)
+            self._numeric_columns = np.array(numeric_columns, dtype=np.intp)
+            self._numeric_lo = np.array(numeric_lo, dtype=np.float32)
+            self._numeric_inv_width = 1.0 / np.array(numeric_width, dtype=np.float32)
+            self._categorical = categorical
+            self._sizes = np.array(sizes, dtype=np.intp)
+            self._offsets = np.concatenate([[0], np.cumsum(self._sizes)[:-1]]).astype(np.intp)
+            self._counts = np.zeros(int(self._sizes.sum()), dtype=np.int64)
+            self._baseline: Optional[np.ndarray] = None
+            # Features the loaded baseline had no histogram for; not compared until one is captured
+            self._unbaselined: set = set()
+            self._buffer = np.empty((self.buffer_rows, self.n_features), dtype=np.float32)
+            self._buffered = 0
+            self.configured = True
+        
+        if self.baseline_path and os.path.exists(self.baseline_path):
+            self.load_baseline(self.baseline_path)
+    
+    def configure_from_model(self, booster: Any):
+        """Configure from a loaded LightGBM Booster"""
+        # Dumping a single tree is enough to get the feature_infos header
+        dump = booster.dump_model(num_iteration=1)
+        self.configure(dump['feature_names'], dump['feature_infos'])
+    
+    def _bin_codes(self, features: np.ndarray) -> np.ndarray:
+        """Map a feature matrix to flat histogram indices"""
+        numeric = features[:, self._numeric_columns]
+        scaled = np.nan_to_num((numeric - self._numeric_lo) * self._numeric_inv_width, nan=-1.0)
+        codes = np.empty((features.shape[0], len(self._sizes)), dtype=np.intp)
+        np.clip(np.floor(scaled) + 1, 0, self.n_bins + 1, out=scaled)
+        codes[:, :len(self._numeric_columns)] = scaled
+        for i, (column, values) in enumerate(self._categorical, start=len(self._numeric_columns)):
+            column_values = features[:, column]
+            idx = np.searchsorted(values, column_values)
+            known = values[np.minimum(idx, len(values) - 1)] == column_values
+            codes[:, i] = np.where(known, idx, len(values))
+        codes += self._offsets
+        return codes.ravel()
+    
+    def _flush(self):
+        if self._buffered:
+            codes = self._bin_codes(self._buffer[:self._buffered])
+            self._counts += np.bincount(codes, minlength=len(self._counts))
+            self._buffered = 0
+    
+    def update(self, features: np.ndarray):
+        """
+        Record a batch of feature rows
+        
+        Args:
+            features: Feature matrix of shape (n_samples, n_features)
+        """
+        if not self.enabled or not self.configured:
+            return
+        n = features.shape[0]
+        with self._lock:
+            if n >= self.buffer_rows:
+                self._flush()
+                self._counts += np.bincount(self._bin_codes(features), minlength=len(self._counts))
+            else:
+                if self._buffered + n > self.buffer_rows:
+                    self._flush()
+                self._buffer[self._buffered:self._buffered + n] = features
+                self._buffered += n
+            self.rows_observed += n
+        if self.last_computed is None or time.time() - self.last_computed >= self.interval_seconds:
+            self.compute()
+    
+    @staticmethod
+    def _divergences(current: np.ndarray, baseline: np.ndarray, eps: float = 1e-4):
+        p = (current + eps) / (current.sum() + eps * len(current))
+        q = (baseline + eps) / (baseline.sum() + eps * len(baseline))
+        log_ratio = np.log(p / q)
+        return float(np.sum((p - q) * log_ratio)), float(np.sum(p * log_ratio))
+    
+    def compute(self) -> Dict[str, Dict[str, float]]:
+        """
+        Compare the current window against the baseline and start a new window
+        
+        The first window with at least `min_rows` rows becomes the baseline when
+        none was stored. Windows with fewer rows keep accumulating.
+        
+        Returns:
+            Mapping of feature name to {"psi": ..., "kl": ...}
+        """
+        if not self.configured:
+            return {}
+        with self._lock:
+            self._flush()
+            self.last_computed = time.time()
+            if self._counts.sum() < self.min_rows * len(self._sizes):
+                return self.last_result
+            current = self._counts.copy()
+            self._counts[:] = 0
+            if self._baseline is None:
+                self._baseline = current
+                logger.info("Feature drift baseline captured from live traffic")
+                if self.baseline_path:
+                    self.save_baseline(self.baseline_path)
+                return self.last_result
+            baseline = self._baseline
+            captured = self._unbaselined
+            if captured:
+                for name, offset, size in zip(self.feature_names, self._offsets, self._sizes):
+                    if name in captured:
+                        baseline[offset:offset + size] = current[offset:offset + size]
+                self._unbaselined = set()
+                logger.info(f"Feature drift baseline captured from live traffic for {', '.join(sorted(captured))}")
+                if self.baseline_path:
+                    self.save_baseline(self.baseline_path)
+        
+        result = {}
+        for name, offset, size in zip(self.feature_names, self._offsets, self._sizes):
+            if name in captured:
+                continue
+            psi, kl = self._divergences(current[offset:offset + size], baseline[offset:offset + size])
+            result[name] = {"psi": round(psi, 6), "kl": round(kl, 6)}
+        self.last_result = result
+        
+        if cloudwatch_metrics.enabled and result:
+            cloudwatch_metrics.put_metric('FeatureDriftMaxPSI', max(r["psi"] for r in result.values()), 'None')
+        return result
+    
+    def set_baseline(self, counts: Optional[np.ndarray] = None):
+        """Use the given histogram (default: the current window) as the baseline"""
+        with self._lock:
+            self._flush()
+            self._baseline = (counts if counts is not None else self._counts).copy()
+            self._unbaselined = set()
+    
+    def save_baseline(self, path: str):
+        """Store the baseline histograms as JSON"""
+        data = {
+            "n_bins": self.n_bins,
+            "features": {
+                name: self._baseline[offset:offset + size].tolist()
+                for name, offset, size in zip(self.feature_names, self._offsets, self._sizes)
+                if name not in self._unbaselined
             }
-            
-            self.client.put_log_events(
-                logGroupName=self.log_group,
-                logStreamName=self.log_stream,
-                logEvents=[{
-                    'timestamp': int(time.time() * 1000),
-                    'message': str(log_message)
-                }]
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f)
+    
+    def load_baseline(self, path: str):
+        """
+        Load baseline histograms stored by save_baseline
+        
+        Features the file has no histogram for, or one with a different number
+        of bins (e.g. added or re-binned by a new model), are left out of
+        PSI/KL and the drift alert; the next full window becomes their baseline.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("n_bins") != self.n_bins:
+            logger.warning(f"Ignoring drift baseline {path}: built with {data.get('n_bins')} bins, expected {self.n_bins}")
+            return
+        baseline = np.zeros_like(self._counts)
+        skipped = []
+        for name, offset, size in zip(self.feature_names, self._offsets, self._sizes):
+            counts = data["features"].get(name)
+            if counts is not None and len(counts) == size:
+                baseline[offset:offset + size] = counts
+            else:
+                skipped.append(name)
+        if len(skipped) == len(self.feature_names):
+            logger.warning(f"Ignoring drift baseline {path}: no histogram matches the current features")
+            return
+        with self._lock:
+            self._baseline = baseline
+            self._unbaselined = set(skipped)
+        if skipped:
+            logger.warning(
+                f"Drift baseline {path} has no usable histogram for {', '.join(skipped)}; "
+                "they are not compared until a baseline is captured for them"
             )
-        except Exception as e:
-            logger.debug(f"Failed to log to CloudWatch: {e}")
+        logger.info(f"Loaded feature drift baseline from {path}")
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Drift summary for the /metrics endpoint"""
+        threshold = settings.drift_psi_threshold
+        return {
+            "rows_observed": self.rows_observed,
+            "baseline_ready": self.configured and self._baseline is not None,
+            "features_without_baseline": sorted(self._unbaselined) if self.configured else [],
+            "last_computed": self.last_computed,
+            "max_psi": max((r["psi"] for r in self.last_result.values()), default=0.0),
+            "drifted_features": sorted(n for n, r in self.last_result.items() if r["psi"] >= threshold),
+            "features": self.last_result
+        }
 
 
 # Note: Athena integration is handled via S3 storage in data_pipeline.py
-# Predictions are saved to S3 using save_prediction_to_s3(), which can then be
-# queried via Athena using the table created with scripts/create_athena_table.sql
+# A sample of predictions (see PredictionCapture) is saved to S3 with
+# save_batch_predictions_to_s3(), which can then be queried via Athena using the table created with scripts/create_athena_table.sql
 
 
 # Global instances
 metrics_collector = MetricsCollector()
 cloudwatch_metrics = CloudWatchMetrics()
 cloudwatch_logger = CloudWatchLogger()
+drift_monitor = FeatureDriftMonitor()
 
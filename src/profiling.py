@@ -0,0 +1,326 @@
+"""On-demand memory profiling: tracemalloc snapshots, per-stage allocations and RSS by subsystem"""
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from src.config import settings
+from src.monitoring import heap_in_use_bytes, resident_memory_bytes
+
+logger = logging.getLogger(__name__)
+
+# Objects whose references lead into other subsystems (or everything) rather than data they hold
+_OPAQUE = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    types.CodeType, types.FrameType, threading.Thread
+)
+
+_NO_STAGE = nullcontext()
+
+
+def object_bytes(obj: Any, max_objects: int = 2_000_000) -> int:
+    """
+    Approximate bytes held by an object graph
+    
+    Sums sys.getsizeof over the instances and containers reachable from
+    `obj`, counting each object once. numpy arrays count their buffer only
+    if they own it, so views of memory-mapped files add just their header.
+    Native memory behind Python objects (e.g. a LightGBM Booster) is not seen.
+    
+    Args:
+        obj: Root object, typically a module-level service instance
+        max_objects: Stop after this many objects (the result is then a lower bound)
+    
+    Returns:
+        Total size in bytes
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < max_objects:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, _OPAQUE):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, (np.ndarray, str, bytes, bytearray, int, float, memoryview)):
+            continue
+        try:
+            if isinstance(o, dict):
+                stack.extend(list(o.keys()))
+                stack.extend(list(o.values()))
+            elif isinstance(o, (list, tuple, set, frozenset, deque)):
+                stack.extend(list(o))
+            else:
+                if hasattr(o, "__dict__"):
+                    stack.append(o.__dict__)
+                for slot in getattr(type(o), "__slots__", ()):
+                    if hasattr(o, slot):
+                        stack.append(getattr(o, slot))
+        except RuntimeError:
+            # Container changed size while being walked by a serving thread
+            continue
+    return total
+
+
+def mapping_resident_bytes(path: str = "/proc/self/smaps") -> Dict[str, int]:
+    """
+    Resident bytes per memory mapping of this process (Linux), grouped by what backs it
+    
+    Anonymous mappings and the brk heap are "anonymous" (malloc, Python
+    objects, numpy buffers), "[stack]" is thread stacks, and file-backed
+    mappings are grouped by file name (shared libraries, memory-mapped data
+    such as the score table).
+    
+    Returns:
+        {group: bytes}, largest first; empty where smaps is unavailable
+    """
+    groups: Dict[str, int] = {}
+    name = "anonymous"
+    try:
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if not fields:
+                    continue
+                if "-" in fields[0] and not fields[0].endswith(":"):
+                    # Mapping header: address perms offset dev inode [pathname]
+                    pathname = fields[5] if len(fields) > 5 else ""
+                    if not pathname or pathname in ("[heap]", "[anon]") or pathname.startswith("[anon:"):
+                        name = "anonymous"
+                    elif pathname.startswith("["):
+                        name = "[stack]" if pathname.startswith("[stack") else pathname
+                    else:
+                        name = os.path.basename(pathname)
+                elif fields[0] == "Rss:":
+                    groups[name] = groups.get(name, 0) + int(fields[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return {}
+    return dict(sorted(groups.items(), key=lambda item: item[1], reverse=True))
+
+
+def _site(filename: str, lineno: Optional[int] = None) -> str:
+    """Short source location: path inside site-packages, the standard library or the working directory"""
+    marker = "site-packages" + os.sep
+    stdlib = os.path.dirname(os.__file__) + os.sep
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    elif filename.startswith(stdlib):
+        filename = filename[len(stdlib):]
+    elif filename.startswith(os.getcwd() + os.sep):
+        filename = os.path.relpath(filename)
+    return f"{filename}:{lineno}" if lineno is not None else filename
+
+
+def _mb(n_bytes: Optional[float]) -> Optional[float]:
+    return round(n_bytes / 1e6, 3) if n_bytes is not None else None
+
+
+class MemoryProfiler:
+    """
+    Admin-triggered memory profiling for the serving process
+    
+    tracemalloc is off unless started, since tracing every allocation slows
+    the request path. While it runs, `snapshot_diff()` returns the allocation
+    sites that grew most since the previous snapshot (or since start), and
+    `stage()` blocks in the predict pipeline record how much traced memory
+    each stage keeps and peaks at, and how many blocks it leaves allocated.
+    Stage figures come from process-wide counters, so they are approximate
+    when stages run at the same time on several threads.
+    
+    `memory_report()` works without tracing: RSS by mapping (anonymous,
+    libraries, mapped files), the malloc heap, and the size of each
+    registered subsystem's objects.
+    """
+    
+    def __init__(self, frames: Optional[int] = None, top_n: Optional[int] = None):
+        self.frames = frames or settings.profiling_frames
+        self.top_n = top_n or settings.profiling_top_n
+        # Subsystem name -> callable returning the bytes it holds (None if unknown)
+        self.subsystems: Dict[str, Callable[[], Optional[int]]] = {}
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._previous_at: Optional[float] = None
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self.started_at: Optional[float] = None
+        self.snapshots = 0
+    
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+    
+    def start(self, frames: Optional[int] = None) -> Dict[str, Any]:
+        """Start tracemalloc (no-op if it is already tracing) and take the baseline snapshot"""
+        if not self.tracing:
+            tracemalloc.start(frames or self.frames)
+            with self._lock:
+                self._stages = {}
+            self.started_at = time.time()
+            self._previous = self._take()
+            self._previous_at = self.started_at
+            logger.warning(f"tracemalloc started with {tracemalloc.get_traceback_limit()} frame(s)")
+        return self.status()
+    
+    def stop(self) -> Dict[str, Any]:
+        """Stop tracemalloc and free its traces; stage figures are kept until the next start"""
+        status = self.status()
+        if self.tracing:
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+        self._previous = None
+        self._previous_at = None
+        self.started_at = None
+        status["tracing"] = False
+        return status
+    
+    def _take(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ))
+    
+    def snapshot_diff(self, top_n: Optional[int] = None, group_by: str = "lineno") -> Dict[str, Any]:
+        """
+        Top allocation sites by growth since the previous snapshot
+        
+        Args:
+            top_n: Number of sites to return (default: PROFILING_TOP_N)
+            group_by: "lineno", "filename" or "traceback" (needs frames > 1 for full stacks)
+        
+        Returns:
+            Traced totals and the sites with the largest size change, each with
+            size and block count now and their change
+        """
+        if not self.tracing:
+            raise RuntimeError("tracemalloc is not running (start profiling first)")
+        if group_by not in ("lineno", "filename", "traceback"):
+            raise ValueError(f"group_by must be lineno, filename or traceback, not {group_by!r}")
+        current = self._take()
+        now = time.time()
+        stats = current.compare_to(self._previous, group_by)
+        previous_at = self._previous_at
+        self._previous, self._previous_at = current, now
+        self.snapshots += 1
+        
+        top = []
+        for stat in stats[:top_n or self.top_n]:
+            frame = stat.traceback[0]
+            entry = {
+                "site": _site(frame.filename, None if group_by == "filename" else frame.lineno),
+                "size_kb": round(stat.size / 1024, 1),
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "count": stat.count,
+                "count_diff": stat.count_diff
+            }
+            if group_by == "traceback":
+                entry["traceback"] = [_site(f.filename, f.lineno) for f in stat.traceback]
+            top.append(entry)
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            "interval_seconds": round(now - previous_at, 1) if previous_at is not None else None,
+            "group_by": group_by,
+            "traced_mb": _mb(traced),
+            "peak_mb": _mb(peak),
+            "top": top
+        }
+    
+    def stage(self, name: str):
+        """Context manager measuring a predict pipeline stage while tracing (free otherwise)"""
+        if not tracemalloc.is_tracing():
+            return _NO_STAGE
+        return self._measure(name)
+    
+    @contextmanager
+    def _measure(self, name: str):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        blocks = sys.getallocatedblocks()
+        try:
+            yield
+        finally:
+            after, peak = tracemalloc.get_traced_memory()
+            self.record_stage(name, after - before, max(0, peak - before), sys.getallocatedblocks() - blocks)
+    
+    def record_stage(self, name: str, net_bytes: int, peak_bytes: int, net_blocks: int):
+        """Add one measured run of a stage"""
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = {"calls": 0, "net_bytes": 0, "peak_bytes": 0, "max_peak_bytes": 0, "net_blocks": 0}
+            stats["calls"] += 1
+            stats["net_bytes"] += net_bytes
+            stats["peak_bytes"] += peak_bytes
+            stats["max_peak_bytes"] = max(stats["max_peak_bytes"], peak_bytes)
+            stats["net_blocks"] += net_blocks
+    
+    def stage_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage means: traced bytes kept and peak above the start, and blocks left allocated"""
+        with self._lock:
+            stages = {name: dict(stats) for name, stats in self._stages.items()}
+        return {
+            name: {
+                "calls": int(stats["calls"]),
+                "mean_net_kb": round(stats["net_bytes"] / stats["calls"] / 1024, 2),
+                "mean_peak_kb": round(stats["peak_bytes"] / stats["calls"] / 1024, 2),
+                "max_peak_kb": round(stats["max_peak_bytes"] / 1024, 2),
+                "mean_net_blocks": round(stats["net_blocks"] / stats["calls"], 2)
+            }
+            for name, stats in stages.items()
+        }
+    
+    def status(self) -> Dict[str, Any]:
+        traced, peak = tracemalloc.get_traced_memory() if self.tracing else (None, None)
+        return {
+            "tracing": self.tracing,
+            "frames": tracemalloc.get_traceback_limit() if self.tracing else None,
+            "started_at": self.started_at,
+            "traced_mb": _mb(traced),
+            "peak_mb": _mb(peak),
+            "tracemalloc_overhead_mb": _mb(tracemalloc.get_tracemalloc_memory()) if self.tracing else None,
+            "snapshots": self.snapshots,
+            "stages": self.stage_stats()
+        }
+    
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Where this process's memory is
+        
+        Returns:
+            RSS and its split by mapping, the malloc heap in use, the bytes
+            held by each registered subsystem, the part of anonymous RSS no
+            subsystem accounts for, and the tracing status with stage figures
+        """
+        rss = resident_memory_bytes()
+        mappings = mapping_resident_bytes()
+        subsystems: Dict[str, Optional[float]] = {}
+        for name, source in self.subsystems.items():
+            try:
+                subsystems[name] = _mb(source())
+            except Exception as e:
+                logger.debug(f"Memory source {name} failed: {e}")
+                subsystems[name] = None
+        attributed = sum(mb for mb in subsystems.values() if mb is not None)
+        anonymous = mappings.get("anonymous")
+        return {
+            "rss_mb": _mb(rss),
+            "malloc_heap_mb": _mb(heap_in_use_bytes()),
+            "python_blocks": sys.getallocatedblocks(),
+            "mappings_mb": {name: _mb(size) for name, size in list(mappings.items())[:10]},
+            "subsystems_mb": subsystems,
+            "unattributed_anonymous_mb": round(_mb(anonymous) - attributed, 3) if anonymous is not None else None,
+            "profiling": self.status()
+        }
+
+
+# Global memory profiler instance
+memory_profiler = MemoryProfiler()
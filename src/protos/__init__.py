@@ -0,0 +1 @@
+"""Protocol buffer definitions and generated gRPC code"""
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: src/protos/prediction.proto
+# Protobuf Python Version: 4.25.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1bsrc/protos/prediction.proto\x12\rprediction.v1\"6\n\x0ePackedFeatures\x12\x14\n\x0cnum_features\x18\x01 \x01(\r\x12\x0e\n\x06values\x18\x02 \x01(\x0c\"e\n\x0b\x43ompactRows\x12\x0c\n\x04\x61ges\x18\x01 \x03(\r\x12\x0f\n\x07genders\x18\x02 \x03(\r\x12\x13\n\x0boccupations\x18\x03 \x03(\x11\x12\x0e\n\x06genres\x18\x04 \x03(\r\x12\x12\n\naggregates\x18\x05 \x01(\x0c\"\xb6\x01\n\x0ePredictRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x10\n\x08user_ids\x18\x02 \x03(\x03\x12\x11\n\tmovie_ids\x18\x03 \x03(\x03\x12\x31\n\x08\x66\x65\x61tures\x18\x04 \x01(\x0b\x32\x1d.prediction.v1.PackedFeaturesH\x00\x12-\n\x07\x63ompact\x18\x05 \x01(\x0b\x32\x1a.prediction.v1.CompactRowsH\x00\x42\t\n\x07payload\"l\n\x0fPredictResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x13\n\x0bpredictions\x18\x02 \x03(\x02\x12\x15\n\rmodel_version\x18\x03 \x01(\t\x12\x19\n\x11inference_time_ms\x18\x04 \x01(\x01\x32\xb1\x01\n\x11PredictionService\x12H\n\x07Predict\x12\x1d.prediction.v1.PredictRequest\x1a\x1e.prediction.v1.PredictResponse\x12R\n\rPredictStream\x12\x1d.prediction.v1.PredictRequest\x1a\x1e.prediction.v1.PredictResponse(\x01\x30\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'src.protos.prediction_pb2', _globals)
+if _descriptor._USE_C_DESCRIPTORS == False:
+  DESCRIPTOR._options = None
+  _globals['_PACKEDFEATURES']._serialized_start=46
+  _globals['_PACKEDFEATURES']._serialized_end=100
+  _globals['_COMPACTROWS']._serialized_start=102
+  _globals['_COMPACTROWS']._serialized_end=203
+  _globals['_PREDICTREQUEST']._serialized_start=206
+  _globals['_PREDICTREQUEST']._serialized_end=388
+  _globals['_PREDICTRESPONSE']._serialized_start=390
+  _globals['_PREDICTRESPONSE']._serialized_end=498
+  _globals['_PREDICTIONSERVICE']._serialized_start=501
+  _globals['_PREDICTIONSERVICE']._serialized_end=678
+# @@protoc_insertion_point(module_scope)
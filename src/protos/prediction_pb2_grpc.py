@@ -0,0 +1,100 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+
+from src.protos import prediction_pb2 as src_dot_protos_dot_prediction__pb2
+
+
+class PredictionServiceStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Predict = channel.unary_unary(
+                '/prediction.v1.PredictionService/Predict',
+                request_serializer=src_dot_protos_dot_prediction__pb2.PredictRequest.SerializeToString,
+                response_deserializer=src_dot_protos_dot_prediction__pb2.PredictResponse.FromString,
+                )
+        self.PredictStream = channel.stream_stream(
+                '/prediction.v1.PredictionService/PredictStream',
+                request_serializer=src_dot_protos_dot_prediction__pb2.PredictRequest.SerializeToString,
+                response_deserializer=src_dot_protos_dot_prediction__pb2.PredictResponse.FromString,
+                )
+
+
+class PredictionServiceServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def Predict(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PredictStream(self, request_iterator, context):
+        """One response per request, in order, over a single long-lived HTTP/2 stream.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_PredictionServiceServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'Predict': grpc.unary_unary_rpc_method_handler(
+                    servicer.Predict,
+                    request_deserializer=src_dot_protos_dot_prediction__pb2.PredictRequest.FromString,
+                    response_serializer=src_dot_protos_dot_prediction__pb2.PredictResponse.SerializeToString,
+            ),
+            'PredictStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.PredictStream,
+                    request_deserializer=src_dot_protos_dot_prediction__pb2.PredictRequest.FromString,
+                    response_serializer=src_dot_protos_dot_prediction__pb2.PredictResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'prediction.v1.PredictionService', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class PredictionService(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def Predict(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/prediction.v1.PredictionService/Predict',
+            src_dot_protos_dot_prediction__pb2.PredictRequest.SerializeToString,
+            src_dot_protos_dot_prediction__pb2.PredictResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def PredictStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/prediction.v1.PredictionService/PredictStream',
+            src_dot_protos_dot_prediction__pb2.PredictRequest.SerializeToString,
+            src_dot_protos_dot_prediction__pb2.PredictResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
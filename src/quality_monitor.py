@@ -0,0 +1,309 @@
+"""Online model-quality metrics from delayed labels"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+_EPS = 1e-15
+_SHIFT_32 = np.uint64(32)
+_LOW_32 = np.uint64(0xFFFFFFFF)
+
+
+def pair_keys(user_ids: Sequence[int], movie_ids: Sequence[int]) -> np.ndarray:
+    """
+    Pack (user_id, movie_id) pairs into one uint64 key each
+    
+    Ids must be in [0, 2**32) (schemas.MAX_ID, enforced at the API edge);
+    larger ids would collide.
+    """
+    users = np.asarray(user_ids, dtype=np.int64).astype(np.uint64)
+    movies = np.asarray(movie_ids, dtype=np.int64).astype(np.uint64) & _LOW_32
+    return (users << _SHIFT_32) | movies
+
+
+def binned_auc(positives: np.ndarray, negatives: np.ndarray) -> Optional[float]:
+    """
+    ROC AUC from per-score-bin label counts (bins in ascending score order)
+    
+    Pairs within the same bin count as ties (half a win), so the result is
+    exact up to the bin width.
+    """
+    n_pos = positives.sum()
+    n_neg = negatives.sum()
+    if n_pos == 0 or n_neg == 0:
+        return None
+    negatives_below = np.cumsum(negatives) - negatives
+    return float((positives * (negatives_below + 0.5 * negatives)).sum() / (n_pos * n_neg))
+
+
+class WindowedQuality:
+    """
+    Sliding-window label statistics for one model version
+    
+    The window is a ring of time buckets; each holds per-score-bin counts of
+    positive and negative labels, the per-bin score sum and the log-loss sum.
+    Adding labels touches only the current bucket and reading sums the live
+    buckets, so memory is fixed by the window and bin counts.
+    """
+    
+    def __init__(self, window_seconds: float, bucket_seconds: float, n_bins: int):
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = max(1, int(round(window_seconds / bucket_seconds)))
+        self.n_bins = n_bins
+        self.bucket_ids = np.full(self.n_buckets, -1, dtype=np.int64)
+        self.positives = np.zeros((self.n_buckets, n_bins), dtype=np.int64)
+        self.negatives = np.zeros((self.n_buckets, n_bins), dtype=np.int64)
+        self.score_sums = np.zeros((self.n_buckets, n_bins), dtype=np.float64)
+        self.logloss_sums = np.zeros(self.n_buckets, dtype=np.float64)
+        self.total_labels = 0
+    
+    def _bucket(self, now: float) -> int:
+        bucket_id = int(now // self.bucket_seconds)
+        index = bucket_id % self.n_buckets
+        if self.bucket_ids[index] != bucket_id:
+            self.bucket_ids[index] = bucket_id
+            self.positives[index] = 0
+            self.negatives[index] = 0
+            self.score_sums[index] = 0
+            self.logloss_sums[index] = 0
+        return index
+    
+    def add(self, scores: np.ndarray, labels: np.ndarray, now: float):
+        """Add labeled predictions (scores are probabilities, labels 0/1)"""
+        index = self._bucket(now)
+        bins = np.minimum((scores * self.n_bins).astype(np.int64), self.n_bins - 1)
+        positive = labels.astype(bool)
+        self.positives[index] += np.bincount(bins[positive], minlength=self.n_bins)
+        self.negatives[index] += np.bincount(bins[~positive], minlength=self.n_bins)
+        self.score_sums[index] += np.bincount(bins, weights=scores, minlength=self.n_bins)
+        clipped = np.clip(scores, _EPS, 1 - _EPS)
+        self.logloss_sums[index] -= np.where(positive, np.log(clipped), np.log1p(-clipped)).sum()
+        self.total_labels += len(scores)
+    
+    def summary(self, now: float, calibration_bins: int) -> Dict[str, Any]:
+        """AUC, log-loss, positive rate and calibration over the window"""
+        live = (int(now // self.bucket_seconds) - self.bucket_ids) < self.n_buckets
+        live &= self.bucket_ids >= 0
+        positives = self.positives[live].sum(axis=0)
+        negatives = self.negatives[live].sum(axis=0)
+        score_sums = self.score_sums[live].sum(axis=0)
+        counts = positives + negatives
+        n_labels = int(counts.sum())
+        if n_labels == 0:
+            return {"labels": 0, "total_labels": self.total_labels}
+        
+        # Calibration buckets are groups of adjacent score bins
+        group = np.arange(self.n_bins) * calibration_bins // self.n_bins
+        group_counts = np.bincount(group, weights=counts, minlength=calibration_bins)
+        group_positives = np.bincount(group, weights=positives, minlength=calibration_bins)
+        group_scores = np.bincount(group, weights=score_sums, minlength=calibration_bins)
+        calibration = [
+            {
+                "bucket": f"{b / calibration_bins:.2f}-{(b + 1) / calibration_bins:.2f}",
+                "labels": int(group_counts[b]),
+                "mean_prediction": round(float(group_scores[b] / group_counts[b]), 4),
+                "positive_rate": round(float(group_positives[b] / group_counts[b]), 4)
+            }
+            for b in range(calibration_bins) if group_counts[b]
+        ]
+        mean_prediction = float(score_sums.sum() / n_labels)
+        positive_rate = float(positives.sum() / n_labels)
+        auc = binned_auc(positives, negatives)
+        return {
+            "labels": n_labels,
+            "total_labels": self.total_labels,
+            "positive_rate": round(positive_rate, 4),
+            "mean_prediction": round(mean_prediction, 4),
+            "auc": round(auc, 4) if auc is not None else None,
+            "logloss": round(float(self.logloss_sums[live].sum() / n_labels), 4),
+            # Expected calibration error over the calibration buckets
+            "ece": round(float(np.abs(group_scores - group_positives).sum() / n_labels), 4),
+            "calibration": calibration
+        }
+
+
+class QualityMonitor:
+    """
+    Joins delayed labels to recent predictions and tracks quality per model version
+    
+    Served predictions go into a fixed-size ring of arrays (pair key, score,
+    model version, time); a dict maps each (user_id, movie_id) to its latest
+    slot and is pruned as slots are overwritten, so memory is bounded by the
+    ring capacity. A label that finds its prediction still in the ring is
+    added to that model version's sliding window; later labels for the same
+    prediction are ignored.
+    """
+    
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        window_seconds: Optional[float] = None,
+        bucket_seconds: Optional[float] = None,
+        n_bins: Optional[int] = None,
+        calibration_bins: Optional[int] = None,
+        max_versions: int = 4
+    ):
+        self.enabled = settings.enable_quality_monitor
+        self.capacity = capacity or settings.quality_buffer_size
+        self.window_seconds = window_seconds or settings.quality_window_seconds
+        self.bucket_seconds = bucket_seconds or settings.quality_bucket_seconds
+        self.n_bins = n_bins or settings.quality_score_bins
+        self.calibration_bins = calibration_bins or settings.quality_calibration_bins
+        self.max_versions = max_versions
+        
+        self.keys = np.zeros(self.capacity, dtype=np.uint64)
+        self.scores = np.zeros(self.capacity, dtype=np.float32)
+        self.times = np.zeros(self.capacity, dtype=np.float64)
+        self.versions = np.full(self.capacity, -1, dtype=np.int32)
+        self.labeled = np.zeros(self.capacity, dtype=bool)
+        self._slots: Dict[int, int] = {}
+        self._next = 0
+        self._version_codes: Dict[str, int] = {}
+        self._version_names: List[str] = []
+        self._windows: Dict[str, WindowedQuality] = {}
+        self._lock = threading.Lock()
+        
+        self.predictions_recorded = 0
+        self.labels_matched = 0
+        self.labels_unmatched = 0
+        self.labels_duplicate = 0
+    
+    def _version_code(self, model_version: str) -> int:
+        code = self._version_codes.get(model_version)
+        if code is None:
+            code = len(self._version_names)
+            self._version_codes[model_version] = code
+            self._version_names.append(model_version)
+        return code
+    
+    def record(
+        self,
+        user_ids: Sequence[int],
+        movie_ids: Sequence[int],
+        predictions: Sequence[float],
+        model_version: str,
+        now: Optional[float] = None
+    ):
+        """
+        Remember served predictions so later labels can be joined to them
+        
+        Args:
+            user_ids: User id per row
+            movie_ids: Movie id per row
+            predictions: Probability per row
+            model_version: Version of the model that produced them
+            now: Current time (for testing)
+        """
+        keys = pair_keys(user_ids, movie_ids)
+        n_rows = len(keys)
+        if n_rows == 0:
+            return
+        if n_rows > self.capacity:
+            keys = keys[-self.capacity:]
+            predictions = predictions[-self.capacity:]
+            n_rows = self.capacity
+        now = now or time.time()
+        with self._lock:
+            slots = (self._next + np.arange(n_rows)) % self.capacity
+            self._next = int(slots[-1] + 1) % self.capacity
+            
+            # Forget the pairs whose slots are about to be overwritten
+            slots_list = slots.tolist()
+            slot_of = self._slots
+            for old_key, slot in zip(self.keys[slots].tolist(), slots_list):
+                if slot_of.get(old_key) == slot:
+                    del slot_of[old_key]
+            
+            self.keys[slots] = keys
+            self.scores[slots] = predictions
+            self.times[slots] = now
+            self.versions[slots] = self._version_code(model_version)
+            self.labeled[slots] = False
+            slot_of.update(zip(keys.tolist(), slots_list))
+            self.predictions_recorded += n_rows
+    
+    def label(
+        self,
+        user_ids: Sequence[int],
+        movie_ids: Sequence[int],
+        labels: Sequence[int],
+        now: Optional[float] = None
+    ) -> int:
+        """
+        Join observed outcomes to their predictions and update the windows
+        
+        Args:
+            user_ids: User id per label
+            movie_ids: Movie id per label
+            labels: Outcome per label (1 = liked)
+            now: Current time (for testing)
+        
+        Returns:
+            Number of labels matched to a prediction
+        """
+        keys = pair_keys(user_ids, movie_ids).tolist()
+        labels = np.asarray(labels, dtype=np.int8)
+        now = now or time.time()
+        with self._lock:
+            get = self._slots.get
+            slots = np.fromiter((get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+            found = slots >= 0
+            self.labels_unmatched += int((~found).sum())
+            
+            # Keep the first label per prediction (also within this call)
+            slots, first = np.unique(slots, return_index=True)
+            fresh = (slots >= 0) & ~self.labeled[np.maximum(slots, 0)]
+            slots, labels = slots[fresh], labels[first[fresh]]
+            self.labels_duplicate += int(found.sum()) - len(slots)
+            if len(slots) == 0:
+                return 0
+            self.labeled[slots] = True
+            self.labels_matched += len(slots)
+            
+            versions = self.versions[slots]
+            scores = self.scores[slots].astype(np.float64)
+            for code in np.unique(versions).tolist():
+                mask = versions == code
+                self._window(self._version_names[code]).add(scores[mask], labels[mask], now)
+            return len(slots)
+    
+    def _window(self, model_version: str) -> WindowedQuality:
+        window = self._windows.get(model_version)
+        if window is None:
+            if len(self._windows) >= self.max_versions:
+                # Drop the version whose window was updated least recently
+                stale = min(self._windows, key=lambda v: self._windows[v].bucket_ids.max())
+                del self._windows[stale]
+            window = WindowedQuality(self.window_seconds, self.bucket_seconds, self.n_bins)
+            self._windows[model_version] = window
+        return window
+    
+    def get_metrics(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Per-version sliding-window quality and join statistics for the /metrics endpoint"""
+        now = now or time.time()
+        with self._lock:
+            buffered = min(self.predictions_recorded, self.capacity)
+            oldest = float(self.times[self._next if buffered == self.capacity else 0]) if buffered else None
+            return {
+                "window_seconds": self.window_seconds,
+                "buffered_predictions": buffered,
+                "buffer_span_seconds": round(now - oldest, 1) if oldest is not None else None,
+                "predictions_recorded": self.predictions_recorded,
+                "labels_matched": self.labels_matched,
+                "labels_unmatched": self.labels_unmatched,
+                "labels_duplicate": self.labels_duplicate,
+                "versions": {
+                    version: window.summary(now, self.calibration_bins)
+                    for version, window in self._windows.items()
+                }
+            }
+
+
+# Global quality monitor instance
+quality_monitor = QualityMonitor()
@@ -0,0 +1,246 @@
+"""Threshold-quantized feature matrices and tree scoring on bin codes"""
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# LightGBM decision_type bit layout and zero tolerance (include/LightGBM/tree.h, meta.h)
+CATEGORICAL_MASK = 1
+DEFAULT_LEFT_MASK = 2
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+ZERO_THRESHOLD = 1e-35
+
+
+def _parse_trees(model_string: str) -> List[Dict[str, np.ndarray]]:
+    """Read the per-tree arrays from a LightGBM text model"""
+    trees = []
+    for block in model_string.split('\nTree=')[1:]:
+        block = block.split('\nend of trees')[0]
+        fields = dict(line.split('=', 1) for line in block.split('\n')[1:] if '=' in line)
+        if fields.get('is_linear', '0') != '0':
+            raise ValueError("Linear trees are not supported")
+        
+        def array(name, dtype):
+            value = fields.get(name, '').strip()
+            return np.array(value.split(' '), dtype=dtype) if value else np.empty(0, dtype=dtype)
+        
+        trees.append({
+            'split_feature': array('split_feature', np.int64),
+            'threshold': array('threshold', np.float64),
+            'decision_type': array('decision_type', np.int64),
+            'left_child': array('left_child', np.int64),
+            'right_child': array('right_child', np.int64),
+            'leaf_value': array('leaf_value', np.float64),
+            'cat_boundaries': array('cat_boundaries', np.int64),
+            'cat_threshold': array('cat_threshold', np.uint32),
+        })
+    return trees
+
+
+class QuantizedModel:
+    """
+    Binary LightGBM ensemble evaluated on per-feature bin codes
+    
+    Every numerical split compares a feature with one of a finite set of
+    thresholds, so replacing each value by its position among the sorted
+    unique thresholds of its feature (`searchsorted`) preserves every split
+    decision: x <= t_j exactly when code(x) <= j. One extra code marks NaN, and
+    a zero bin is split out for features that have zero-as-missing splits.
+    Categorical features keep their category as the code (plus one), with 0
+    for negative, missing or unseen values, which always go right.
+    
+    Each internal node stores a small go-left lookup table indexed by the code
+    of its feature, so traversal is integer gathers regardless of split type,
+    missing-value handling or categorical bitsets. The codes fit in uint8 when
+    every feature has fewer than 256 bins (uint16 otherwise), so feature
+    matrices shrink 4x (2x) against float32.
+    """
+    
+    def __init__(self, model_string: str, n_features: int, sigmoid: float = 1.0):
+        trees = _parse_trees(model_string)
+        self.n_features = n_features
+        self.n_trees = len(trees)
+        self.sigmoid = sigmoid
+        
+        # Per-feature bins from every threshold/category used in the ensemble
+        split_features = np.concatenate([t['split_feature'] for t in trees])
+        split_thresholds = np.concatenate([t['threshold'] for t in trees])
+        decisions = np.concatenate([t['decision_type'] for t in trees])
+        numerical = (decisions & CATEGORICAL_MASK) == 0
+        zero_missing = np.zeros(n_features, dtype=bool)
+        zero_missing[split_features[numerical & ((decisions >> 2) & 3 == MISSING_ZERO)]] = True
+        categories: List[set] = [set() for _ in range(n_features)]
+        for tree in trees:
+            for i in np.flatnonzero(tree['decision_type'] & CATEGORICAL_MASK):
+                categories[tree['split_feature'][i]].update(self._bitset_categories(tree, int(tree['threshold'][i])))
+        self.categorical = np.array([bool(c) for c in categories])
+        if self.categorical[split_features[numerical]].any():
+            raise ValueError("Features with both numerical and categorical splits are not supported")
+        
+        self.thresholds: List[np.ndarray] = []
+        self.n_codes = np.ones(n_features, dtype=np.int64)
+        self.nan_code = np.zeros(n_features, dtype=np.int64)
+        self.zero_code = np.zeros(n_features, dtype=np.int64)
+        for feature in range(n_features):
+            if self.categorical[feature]:
+                self.thresholds.append(np.empty(0))
+                self.n_codes[feature] = max(categories[feature]) + 2
+                continue
+            values = split_thresholds[numerical & (split_features == feature)]
+            if zero_missing[feature]:
+                # Bin (nextafter(-eps), eps] is exactly LightGBM's IsZero range
+                values = np.append(values, [np.nextafter(-ZERO_THRESHOLD, -np.inf), ZERO_THRESHOLD])
+            sorted_values = np.unique(values)
+            self.thresholds.append(sorted_values)
+            self.nan_code[feature] = len(sorted_values) + 1
+            self.n_codes[feature] = len(sorted_values) + 2
+            self.zero_code[feature] = np.searchsorted(sorted_values, 0.0, side='left')
+        self.code_dtype = np.uint8 if self.n_codes.max() <= 256 else np.uint16
+        
+        self._build_nodes(trees)
+    
+    @staticmethod
+    def _bitset_categories(tree: Dict[str, np.ndarray], cat_index: int) -> List[int]:
+        start, end = tree['cat_boundaries'][cat_index], tree['cat_boundaries'][cat_index + 1]
+        words = tree['cat_threshold'][start:end]
+        return [w * 32 + b for w, word in enumerate(words) for b in range(32) if (int(word) >> b) & 1]
+    
+    def _build_nodes(self, trees: List[Dict[str, np.ndarray]]):
+        """Flatten all trees into global node arrays with one go-left table per node"""
+        lefts, rights, leaf_values, roots = [], [], [], []
+        node_base = leaf_base = 0
+        for tree in trees:
+            n_nodes = len(tree['split_feature'])
+            roots.append(node_base if n_nodes else ~leaf_base)
+            # Children: internal nodes are >= 0, leaves are ~global leaf index
+            for child, out in ((tree['left_child'], lefts), (tree['right_child'], rights)):
+                out.append(np.where(child >= 0, child + node_base, ~(~child + leaf_base)))
+            leaf_values.append(tree['leaf_value'])
+            node_base += n_nodes
+            leaf_base += len(tree['leaf_value'])
+        
+        self.node_feature = np.concatenate([t['split_feature'] for t in trees]).astype(np.int64)
+        self.left = np.concatenate(lefts).astype(np.int64)
+        self.right = np.concatenate(rights).astype(np.int64)
+        self.leaf_value = np.concatenate(leaf_values)
+        self.roots = np.array(roots, dtype=np.int64)
+        thresholds = np.concatenate([t['threshold'] for t in trees])
+        decisions = np.concatenate([t['decision_type'] for t in trees])
+        
+        sizes = self.n_codes[self.node_feature]
+        self.lut_offset = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        self.lut = np.zeros(int(sizes.sum()), dtype=bool)
+        
+        # Numerical nodes, one feature at a time: left for codes <= j
+        default_left = (decisions & DEFAULT_LEFT_MASK) > 0
+        missing_type = (decisions >> 2) & 3
+        numerical = (decisions & CATEGORICAL_MASK) == 0
+        for feature in np.unique(self.node_feature[numerical]):
+            nodes = np.flatnonzero(numerical & (self.node_feature == feature))
+            n_codes = int(self.n_codes[feature])
+            j = np.searchsorted(self.thresholds[feature], thresholds[nodes], side='left')
+            table = np.arange(n_codes)[None, :] <= j[:, None]
+            nan_code, zero_code = self.nan_code[feature], self.zero_code[feature]
+            nan_default = missing_type[nodes] == MISSING_NAN
+            zero_default = missing_type[nodes] == MISSING_ZERO
+            # Without NaN-as-missing, NaN is treated as zero; zero-as-missing takes the default
+            table[:, nan_code] = np.where(nan_default | zero_default, default_left[nodes], zero_code <= j)
+            table[zero_default, zero_code] = default_left[nodes][zero_default]
+            self.lut[self.lut_offset[nodes][:, None] + np.arange(n_codes)] = table
+        
+        # Categorical nodes: left for categories in the node's bitset
+        tree_sizes = [len(t['split_feature']) for t in trees]
+        tree_of_node = np.repeat(np.arange(len(trees)), tree_sizes)
+        local_index = np.arange(len(self.node_feature)) - np.repeat(np.cumsum([0] + tree_sizes[:-1]), tree_sizes)
+        for node in np.flatnonzero(~numerical):
+            tree = trees[tree_of_node[node]]
+            for category in self._bitset_categories(tree, int(tree['threshold'][local_index[node]])):
+                self.lut[self.lut_offset[node] + category + 1] = True
+    
+    def quantize(self, features: np.ndarray) -> np.ndarray:
+        """
+        Convert a float feature matrix into bin codes
+        
+        Args:
+            features: Array of shape (n_samples, n_features)
+        
+        Returns:
+            uint8/uint16 array of the same shape
+        """
+        features = np.asarray(features)
+        codes = np.zeros(features.shape, dtype=self.code_dtype)
+        for feature in range(self.n_features):
+            column = features[:, feature].astype(np.float64)
+            if self.categorical[feature]:
+                with np.errstate(invalid='ignore'):
+                    values = np.trunc(column)
+                    valid = (values >= 0) & (values < self.n_codes[feature] - 1)
+                codes[valid, feature] = values[valid] + 1
+            elif self.n_codes[feature] > 1:
+                column_codes = np.searchsorted(self.thresholds[feature], column, side='left')
+                column_codes[np.isnan(column)] = self.nan_code[feature]
+                codes[:, feature] = column_codes
+        return codes
+    
+    def predict_raw_codes(self, codes: np.ndarray, chunk_size: int = 4096) -> np.ndarray:
+        """
+        Raw scores (sum of leaf values) for a matrix of bin codes
+        
+        Args:
+            codes: Output of quantize()
+            chunk_size: Rows traversed together (keeps the working set in cache)
+        
+        Returns:
+            float64 array of shape (n_samples,)
+        """
+        n_rows = len(codes)
+        raw = np.empty(n_rows, dtype=np.float64)
+        for start in range(0, n_rows, chunk_size):
+            chunk = codes[start:start + chunk_size]
+            n = len(chunk)
+            node = np.tile(self.roots, n)
+            code_base = np.repeat(np.arange(n, dtype=np.int64) * self.n_features, self.n_trees)
+            flat_codes = chunk.reshape(-1)
+            active = np.flatnonzero(node >= 0)
+            while active.size:
+                current = node[active]
+                code = flat_codes[code_base[active] + self.node_feature[current]]
+                go_left = self.lut[self.lut_offset[current] + code]
+                current = np.where(go_left, self.left[current], self.right[current])
+                node[active] = current
+                active = active[current >= 0]
+            raw[start:start + n] = self.leaf_value[~node].reshape(n, self.n_trees).sum(axis=1)
+        return raw
+    
+    def predict_codes(self, codes: np.ndarray) -> np.ndarray:
+        """Prediction probabilities for a matrix of bin codes"""
+        return 1.0 / (1.0 + np.exp(-self.sigmoid * self.predict_raw_codes(codes)))
+    
+    def memory_bytes(self) -> int:
+        """Size of the node, lookup-table and leaf arrays"""
+        arrays = [self.node_feature, self.left, self.right, self.lut_offset, self.lut, self.leaf_value, self.roots]
+        return int(sum(a.nbytes for a in arrays) + sum(t.nbytes for t in self.thresholds))
+
+
+def build_quantized_model(booster) -> Optional[QuantizedModel]:
+    """
+    Build a QuantizedModel for a loaded Booster
+    
+    Returns:
+        The quantized model, or None for models it does not support
+        (non-binary objectives, linear trees, mixed split types)
+    """
+    try:
+        if booster.params.get('objective') != 'binary':
+            logger.info("Quantized scoring is only available for binary models")
+            return None
+        return QuantizedModel(
+            booster.model_to_string(),
+            booster.num_feature(),
+            sigmoid=float(booster.params.get('sigmoid', 1.0))
+        )
+    except Exception as e:
+        logger.warning(f"Could not build quantized model: {e}")
+        return None
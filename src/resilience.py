@@ -0,0 +1,400 @@
+"""Circuit breakers, call timeouts and a local spool for downstream AWS calls"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from src.aws import get_client
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    
+    Closed: calls pass. After `failure_threshold` consecutive failures the
+    breaker opens and calls are rejected without being attempted. Once
+    `reset_seconds` have passed, one probe call is let through (half-open): its
+    success closes the breaker, its failure opens it again.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Whether a call may be attempted now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+    
+    def record_success(self) -> bool:
+        """Record a successful call; returns True if this closed the breaker"""
+        with self._lock:
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.opened_at = None
+                return True
+            return False
+    
+    def record_failure(self) -> bool:
+        """Record a failed or timed-out call; returns True if this opened the breaker"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self.opened_at = self.clock()
+                self.times_opened += 1
+                return True
+            return False
+
+
+class LocalSpool:
+    """
+    Append-only JSON-lines file holding records that could not be delivered
+    
+    Bounded by `max_bytes`; records beyond it are dropped and counted.
+    """
+    
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.records_spooled = 0
+        self.records_dropped = 0
+        self._lock = threading.Lock()
+    
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+    
+    def append(self, record: Any) -> bool:
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self.size() + len(line) > self.max_bytes:
+                self.records_dropped += 1
+                return False
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(line)
+            self.records_spooled += 1
+            return True
+    
+    def drain(self, handler: Callable[[Any], Any]) -> int:
+        """
+        Hand spooled records to `handler` in order
+        
+        Stops at the first record the handler fails on (raises or returns
+        False); it and the records after it stay in the spool, ahead of any
+        spooled while the replay ran.
+        
+        Returns:
+            Number of records delivered
+        """
+        with self._lock:
+            replay_path = f"{self.path}.replay"
+            try:
+                os.replace(self.path, replay_path)
+            except FileNotFoundError:
+                return 0
+        with open(replay_path) as f:
+            lines = f.readlines()
+        delivered = 0
+        for line in lines:
+            try:
+                ok = handler(json.loads(line)) is not False
+            except Exception as e:
+                logger.debug(f"Spool replay to {self.path} failed: {e}")
+                ok = False
+            if not ok:
+                break
+            delivered += 1
+        remaining = lines[delivered:]
+        if remaining:
+            with self._lock:
+                # Records spooled during the replay are newer than the ones it could not deliver
+                try:
+                    with open(self.path) as f:
+                        remaining += f.readlines()
+                except FileNotFoundError:
+                    pass
+                with open(replay_path, 'w') as f:
+                    f.writelines(remaining)
+                os.replace(replay_path, self.path)
+        else:
+            os.unlink(replay_path)
+        return delivered
+
+
+class Dependency:
+    """
+    Guarded, asynchronous access to one downstream service
+    
+    Calls are handed to a small dedicated thread pool with a bounded queue, so
+    the request path never waits on the service. A call that fails or runs
+    past `timeout_ms` counts against the circuit breaker; a call still running
+    past its timeout is counted the moment the next call is submitted, not when
+    it finally returns. Calls are not cancelled, so AWS calls should go through
+    `client()`, whose connect/read timeouts come from `timeout_ms` and end a
+    hung call (freeing its worker) close to the budget. While the breaker is open or the queue is full, calls
+    are not attempted: in "fail_fast" mode their records are dropped, in
+    "spool" mode they are appended to a local spool that is replayed once the
+    service recovers. Failed calls are spooled the same way.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        replay: Optional[Callable[[Any], Any]] = None,
+        mode: Optional[str] = None,
+        timeout_ms: Optional[float] = None,
+        failure_threshold: Optional[int] = None,
+        reset_seconds: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        workers: Optional[int] = None,
+        spool_dir: Optional[str] = None,
+        spool_max_mb: Optional[float] = None
+    ):
+        self.name = name
+        self.replay = replay
+        self.mode = mode or os.getenv(f"RESILIENCE_MODE_{name.upper()}") or settings.resilience_mode
+        self.timeout_ms = timeout_ms or float(
+            os.getenv(f"RESILIENCE_TIMEOUT_MS_{name.upper()}", settings.resilience_timeout_ms)
+        )
+        self.max_pending = max_pending or settings.resilience_max_pending
+        self.breaker = CircuitBreaker(
+            failure_threshold or settings.resilience_failure_threshold,
+            settings.resilience_reset_seconds if reset_seconds is None else reset_seconds
+        )
+        self.spool = LocalSpool(
+            os.path.join(spool_dir or settings.resilience_spool_dir, f"{name}.jsonl"),
+            int((spool_max_mb or settings.resilience_spool_max_mb) * 1024 * 1024)
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or settings.resilience_workers, thread_name_prefix=f"dep-{name}"
+        )
+        self._lock = threading.Lock()
+        self._in_flight: Dict[int, float] = {}
+        self._timed_out: set = set()
+        self._next_call = 0
+        self._replaying = False
+        self._next_replay = 0.0
+        
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.shed = 0
+        self.replayed = 0
+        self.last_error: Optional[str] = None
+    
+    def client(self, service: str):
+        """
+        Shared boto3 client for calls made through this dependency
+        
+        Args:
+            service: AWS service name
+        
+        Returns:
+            boto3 client whose connect/read timeouts are bounded by `timeout_ms`
+        """
+        return get_client(service, timeout_seconds=self.timeout_ms / 1000)
+    
+    def _expire_in_flight(self):
+        """Count calls running past their timeout as failures, once each"""
+        deadline = time.monotonic() - self.timeout_ms / 1000
+        expired = [call_id for call_id, started in self._in_flight.items()
+                   if started < deadline and call_id not in self._timed_out]
+        for call_id in expired:
+            self._timed_out.add(call_id)
+            self.timeouts += 1
+            self.last_error = f"call exceeded {self.timeout_ms:.0f}ms"
+            if self.breaker.record_failure():
+                logger.warning(f"Circuit for {self.name} opened: {self.last_error}")
+    
+    def _degrade(self, record: Any):
+        if record is not None and self.mode == "spool":
+            self.spool.append(record)
+    
+    def submit(self, fn: Callable[..., Any], *args, record: Any = None) -> bool:
+        """
+        Run fn(*args) in the background if the dependency is healthy
+        
+        Args:
+            fn: The call; raising or returning False counts as a failure
+            args: Its arguments
+            record: JSON-serializable payload to spool if the call is not
+                attempted or fails (replayed later through `replay`)
+        
+        Returns:
+            True if the call was queued, False if it was rejected or shed
+        """
+        with self._lock:
+            self._expire_in_flight()
+            if not self.breaker.allow():
+                self.rejected += 1
+                queued = False
+            elif len(self._in_flight) >= self.max_pending:
+                self.shed += 1
+                queued = False
+            else:
+                call_id = self._next_call
+                self._next_call += 1
+                self._in_flight[call_id] = time.monotonic()
+                queued = True
+        if not queued:
+            self._degrade(record)
+            return False
+        self._executor.submit(self._run, call_id, fn, args, record)
+        return True
+    
+    def _run(self, call_id: int, fn: Callable[..., Any], args: tuple, record: Any):
+        started = time.monotonic()
+        # Time spent queued counts against the budget too
+        with self._lock:
+            started = self._in_flight.get(call_id, started)
+        error = None
+        try:
+            ok = fn(*args) is not False
+            if not ok:
+                error = "call returned failure"
+        except Exception as e:
+            ok = False
+            error = f"{type(e).__name__}: {e}"
+        elapsed_ms = (time.monotonic() - started) * 1000
+        
+        with self._lock:
+            self._in_flight.pop(call_id, None)
+            already_counted = call_id in self._timed_out
+            self._timed_out.discard(call_id)
+            self.calls += 1
+            if ok and elapsed_ms <= self.timeout_ms:
+                self.successes += 1
+                closed = self.breaker.record_success()
+                if closed:
+                    logger.info(f"Circuit for {self.name} closed")
+            else:
+                closed = False
+                if ok:
+                    error = f"call took {elapsed_ms:.0f}ms (budget {self.timeout_ms:.0f}ms)"
+                    if not already_counted:
+                        self.timeouts += 1
+                else:
+                    self.failures += 1
+                self.last_error = error
+                if not already_counted and self.breaker.record_failure():
+                    logger.warning(f"Circuit for {self.name} opened: {error}")
+            # Replay the spool once the service is healthy again (at most once per reset period)
+            start_replay = (
+                ok and self.replay is not None and not self._replaying and self.breaker.state == CLOSED
+                and (closed or time.monotonic() >= self._next_replay) and self.spool.size() > 0
+            )
+            if start_replay:
+                self._replaying = True
+                self._next_replay = time.monotonic() + self.breaker.reset_seconds
+        if not ok:
+            logger.debug(f"{self.name} call failed: {error}")
+            self._degrade(record)
+        if start_replay:
+            self._executor.submit(self._replay_spool)
+    
+    def _replay_spool(self):
+        try:
+            delivered = self.spool.drain(self.replay)
+            self.replayed += delivered
+            if delivered:
+                logger.info(f"Replayed {delivered} spooled {self.name} records")
+        except Exception as e:
+            logger.error(f"Spool replay for {self.name} failed: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._replaying = False
+    
+    def wait_idle(self, timeout_seconds: float = 5.0) -> bool:
+        """Wait for queued calls to finish (tests and shutdown); returns False on timeout"""
+        deadline = time.monotonic() + timeout_seconds
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._in_flight and not self._replaying:
+                    return True
+            time.sleep(0.005)
+        return False
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Breaker state, call outcomes and spool size"""
+        with self._lock:
+            self._expire_in_flight()
+            return {
+                "state": self.breaker.state,
+                "mode": self.mode,
+                "timeout_ms": self.timeout_ms,
+                "in_flight": len(self._in_flight),
+                "calls": self.calls,
+                "successes": self.successes,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "shed": self.shed,
+                "times_opened": self.breaker.times_opened,
+                "last_error": self.last_error,
+                "spooled": self.spool.records_spooled,
+                "spool_dropped": self.spool.records_dropped,
+                "spool_bytes": self.spool.size(),
+                "replayed": self.replayed
+            }
+
+
+# Registry of downstream dependencies by name (one breaker per service)
+_dependencies: Dict[str, Dependency] = {}
+_registry_lock = threading.Lock()
+
+
+def dependency(name: str, replay: Optional[Callable[[Any], Any]] = None) -> Dependency:
+    """Get the shared Dependency for a service, creating it on first use"""
+    with _registry_lock:
+        dep = _dependencies.get(name)
+        if dep is None:
+            dep = Dependency(name, replay)
+            _dependencies[name] = dep
+        elif replay is not None and dep.replay is None:
+            dep.replay = replay
+        return dep
+
+
+def dependency_states() -> Dict[str, str]:
+    """Breaker state of every registered dependency (for /health)"""
+    return {name: dep.breaker.state for name, dep in list(_dependencies.items())}
+
+
+def get_metrics() -> Dict[str, Any]:
+    """Metrics of every registered dependency (for /metrics)"""
+    return {name: dep.get_metrics() for name, dep in list(_dependencies.items())}
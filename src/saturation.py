@@ -0,0 +1,238 @@
+"""Event-loop lag, in-flight work and CPU saturation monitoring for load-aware readiness"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import settings
+from src.threading_policy import available_cpus
+
+logger = logging.getLogger(__name__)
+
+
+class SaturationMonitor:
+    """
+    Tracks how saturated this worker is and decides whether it should take traffic
+    
+    A timer on the event loop sleeps `interval_ms` at a time; how late it
+    wakes up is the loop lag, i.e. how long callbacks (and every request)
+    currently wait behind synchronous work on the loop. Each tick also samples
+    process and event-loop-thread CPU time. In-flight requests are counted by
+    InFlightMiddleware (and the gRPC handler), and queue depths are read from
+    the registered `queue_sources`.
+    
+    The worker is saturated when, over the last `window_seconds`, the
+    largest loop lag, the in-flight count, the total queue depth or the CPU
+    utilization is above its threshold (a threshold of 0 disables that
+    signal). It stays saturated until every signal is back below
+    `recovery_ratio` times its threshold, so readiness does not flap.
+    """
+    
+    def __init__(
+        self,
+        interval_ms: Optional[float] = None,
+        window_seconds: Optional[float] = None,
+        max_loop_lag_ms: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+        max_queue_depth: Optional[int] = None,
+        max_cpu_utilization: Optional[float] = None,
+        recovery_ratio: float = 0.8,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.enabled = settings.enable_saturation_monitor
+        self.interval_ms = interval_ms or settings.saturation_interval_ms
+        self.window_seconds = window_seconds or settings.saturation_window_seconds
+        self.thresholds = {
+            "loop_lag_ms": settings.saturation_max_loop_lag_ms if max_loop_lag_ms is None else max_loop_lag_ms,
+            "in_flight": settings.saturation_max_in_flight if max_in_flight is None else max_in_flight,
+            "queue_depth": settings.saturation_max_queue_depth if max_queue_depth is None else max_queue_depth,
+            "cpu_utilization": (
+                settings.saturation_max_cpu_utilization if max_cpu_utilization is None else max_cpu_utilization
+            )
+        }
+        self.recovery_ratio = recovery_ratio
+        self.clock = clock
+        self.cpus = available_cpus()
+        self.queue_sources: Dict[str, Callable[[], int]] = {}
+        
+        self.in_flight = 0
+        self.in_flight_peak = 0
+        # (time, lag ms) per tick and (time, process CPU s, loop thread CPU s) samples
+        self._lags: deque = deque()
+        self._cpu: deque = deque()
+        self._task: Optional[asyncio.Task] = None
+        self.saturated = False
+        self.reasons: List[str] = []
+        self.transitions = 0
+        self.saturated_since: Optional[float] = None
+        self.saturated_seconds = 0.0
+    
+    @contextmanager
+    def track(self):
+        """Count a request as in flight for the duration of the block"""
+        self.in_flight += 1
+        if self.in_flight > self.in_flight_peak:
+            self.in_flight_peak = self.in_flight
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+    
+    def start(self):
+        """Start the lag timer on the running event loop"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        interval = self.interval_ms / 1000
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            now = self.clock()
+            self.record_lag(max(0.0, (loop.time() - started - interval) * 1000), now)
+            # thread_time() here is the CPU time of the event-loop thread itself
+            self.record_cpu(now, time.process_time(), time.thread_time())
+    
+    def _trim(self, samples: deque, now: float):
+        while samples and samples[0][0] < now - self.window_seconds:
+            samples.popleft()
+    
+    def record_lag(self, lag_ms: float, now: Optional[float] = None):
+        """Add one loop-lag measurement"""
+        now = self.clock() if now is None else now
+        self._lags.append((now, lag_ms))
+        self._trim(self._lags, now)
+    
+    def record_cpu(self, now: float, process_seconds: float, loop_seconds: float):
+        """Add one CPU-time sample (cumulative seconds)"""
+        self._cpu.append((now, process_seconds, loop_seconds))
+        # Keep one sample older than the window so utilization covers all of it
+        while len(self._cpu) > 2 and self._cpu[1][0] < now - self.window_seconds:
+            self._cpu.popleft()
+    
+    def queue_depth(self) -> Dict[str, int]:
+        depths = {}
+        for name, source in self.queue_sources.items():
+            try:
+                depths[name] = int(source())
+            except Exception as e:
+                logger.debug(f"Queue depth source {name} failed: {e}")
+        return depths
+    
+    def cpu_utilization(self) -> Tuple[Optional[float], Optional[float]]:
+        """Process and event-loop-thread CPU use over the window, in cores"""
+        if len(self._cpu) < 2:
+            return None, None
+        (t0, process0, loop0), (t1, process1, loop1) = self._cpu[0], self._cpu[-1]
+        if t1 <= t0:
+            return None, None
+        return (process1 - process0) / (t1 - t0), (loop1 - loop0) / (t1 - t0)
+    
+    def signals(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Current value of every saturation signal"""
+        now = self.clock() if now is None else now
+        self._trim(self._lags, now)
+        lags = [lag for _, lag in self._lags]
+        process_cores, _ = self.cpu_utilization()
+        return {
+            "loop_lag_ms": max(lags) if lags else 0.0,
+            "in_flight": self.in_flight,
+            "queue_depth": sum(self.queue_depth().values()),
+            # Fraction of the cores this worker may use
+            "cpu_utilization": process_cores / self.cpus if process_cores is not None else 0.0
+        }
+    
+    def evaluate(self, now: Optional[float] = None) -> bool:
+        """
+        Update and return the saturated state
+        
+        Returns:
+            True if the worker should stop receiving new traffic
+        """
+        now = self.clock() if now is None else now
+        signals = self.signals(now)
+        limit = 1.0 if not self.saturated else self.recovery_ratio
+        reasons = [
+            f"{name} {signals[name]:.3g} over {threshold:g}"
+            for name, threshold in self.thresholds.items()
+            if threshold and signals[name] > threshold * limit
+        ]
+        saturated = bool(reasons)
+        if saturated != self.saturated:
+            self.transitions += 1
+            if saturated:
+                self.saturated_since = now
+                logger.warning("Worker saturated, reporting not ready: " + "; ".join(reasons))
+            else:
+                self.saturated_seconds += now - self.saturated_since
+                self.saturated_since = None
+                logger.info("Worker no longer saturated, reporting ready")
+        self.saturated = saturated
+        self.reasons = reasons
+        return saturated
+    
+    def get_metrics(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Loop lag, in-flight work, queue depths, CPU use and readiness state for the /metrics endpoint"""
+        now = self.clock() if now is None else now
+        self.evaluate(now)
+        lags = np.array([lag for _, lag in self._lags]) if self._lags else None
+        process_cores, loop_cores = self.cpu_utilization()
+        return {
+            "saturated": self.saturated,
+            "reasons": self.reasons,
+            "thresholds": dict(self.thresholds),
+            "window_seconds": self.window_seconds,
+            "loop_lag_ms": {
+                "last": round(float(lags[-1]), 3) if lags is not None else None,
+                "p50": round(float(np.percentile(lags, 50)), 3) if lags is not None else None,
+                "p99": round(float(np.percentile(lags, 99)), 3) if lags is not None else None,
+                "max": round(float(lags.max()), 3) if lags is not None else None
+            },
+            "in_flight": self.in_flight,
+            "in_flight_peak": self.in_flight_peak,
+            "queue_depth": self.queue_depth(),
+            "cpu": {
+                "available_cores": self.cpus,
+                "process_seconds": round(time.process_time(), 3),
+                "process_cores": round(process_cores, 3) if process_cores is not None else None,
+                "loop_thread_cores": round(loop_cores, 3) if loop_cores is not None else None
+            },
+            "transitions": self.transitions,
+            "saturated_seconds": round(
+                self.saturated_seconds + (now - self.saturated_since if self.saturated_since is not None else 0.0), 1
+            )
+        }
+
+
+class InFlightMiddleware:
+    """ASGI middleware counting HTTP requests in flight (probes and metrics excluded)"""
+    
+    def __init__(self, app, monitor: SaturationMonitor, exclude_paths: Sequence[str] = ("/health", "/ready", "/metrics")):
+        self.app = app
+        self.monitor = monitor
+        self.exclude_paths = frozenset(exclude_paths)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        with self.monitor.track():
+            await self.app(scope, receive, send)
+
+
+# Global saturation monitor instance
+saturation_monitor = SaturationMonitor()
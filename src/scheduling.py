@@ -0,0 +1,231 @@
+"""Deadline-aware priority scheduling and load shedding for inference work"""
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first
+PRIORITIES = {"interactive": 0, "bulk": 1}
+PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be served before its deadline"""
+    
+    def __init__(self, message: str, retry_after_seconds: int):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+class DeadlineExceeded(Exception):
+    """Raised when queued work expires before it starts"""
+
+
+def parse_priority(value: Optional[str], default: str = "interactive") -> int:
+    """
+    Parse a priority class name from a request header
+    
+    Args:
+        value: Header value ("interactive" or "bulk"), or None for the default
+        default: Class used when the header is absent
+    
+    Returns:
+        Numeric priority (lower is served first)
+    """
+    name = (value or default).strip().lower()
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{value}', expected one of {sorted(PRIORITIES)}")
+    return PRIORITIES[name]
+
+
+def parse_deadline(timeout_ms: Optional[float], now: Optional[float] = None) -> Optional[float]:
+    """
+    Convert a relative timeout into an absolute monotonic deadline
+    
+    Args:
+        timeout_ms: Client timeout in milliseconds, or None to use the configured default
+        now: Arrival time on the time.monotonic() clock
+    
+    Returns:
+        Deadline on the time.monotonic() clock, or None when there is no deadline
+    """
+    if timeout_ms is None:
+        timeout_ms = settings.scheduler_default_timeout_ms or None
+    if timeout_ms is None:
+        return None
+    if timeout_ms <= 0:
+        raise ValueError("Request timeout must be positive")
+    return (time.monotonic() if now is None else now) + timeout_ms / 1000.0
+
+
+class PriorityScheduler:
+    """
+    Runs inference work on a bounded thread pool in priority/deadline order
+    
+    Interactive work is always dispatched before bulk work, and within a class
+    the earliest deadline goes first. Requests whose estimated queue wait would
+    overrun their deadline are rejected up front, and queued work that expires
+    while waiting is dropped before it runs, so saturated workers only spend CPU
+    on responses somebody is still waiting for.
+    
+    All bookkeeping happens on the event loop; only `fn` runs on the pool.
+    """
+    
+    def __init__(self, max_concurrency: Optional[int] = None, max_queue: Optional[int] = None,
+                 ewma_alpha: float = 0.2, enabled: Optional[bool] = None):
+        self.enabled = settings.enable_scheduler if enabled is None else enabled
+        self.max_concurrency = max(1, max_concurrency or settings.scheduler_max_concurrency)
+        self.max_queue = max_queue or settings.scheduler_max_queue
+        self.ewma_alpha = ewma_alpha
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queue: List[list] = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._running_ms = 0.0
+        self._tasks = set()
+        self._queued_ms = {priority: 0.0 for priority in PRIORITY_NAMES}
+        # Service time per unit of cost (one feature row), per class
+        self._ms_per_unit: Dict[int, Optional[float]] = {priority: None for priority in PRIORITY_NAMES}
+        self._stats = {
+            name: {"submitted": 0, "completed": 0, "shed": 0, "expired": 0}
+            for name in PRIORITIES
+        }
+    
+    def _estimate_ms(self, priority: int, cost: float) -> float:
+        """Estimated service time of a job from the class EWMA (falling back to the other class)"""
+        per_unit = self._ms_per_unit[priority]
+        if per_unit is None:
+            known = [v for v in self._ms_per_unit.values() if v is not None]
+            per_unit = min(known) if known else 0.0
+        return per_unit * cost
+    
+    def estimated_wait_ms(self, priority: int) -> float:
+        """Estimated time before a new job of this priority would start"""
+        if self._running < self.max_concurrency and not self._queue:
+            return 0.0
+        ahead_ms = sum(ms for p, ms in self._queued_ms.items() if p <= priority)
+        # Running jobs are on average half done
+        return (ahead_ms + self._running_ms / 2) / self.max_concurrency
+    
+    async def run(self, fn: Callable[[], Any], priority: int = PRIORITIES["interactive"],
+                  deadline: Optional[float] = None, cost: float = 1.0) -> Any:
+        """
+        Schedule `fn` and wait for its result
+        
+        Args:
+            fn: Blocking callable doing the featurization and inference
+            priority: Value from PRIORITIES
+            deadline: Absolute time.monotonic() deadline, or None
+            cost: Relative size of the job (number of rows)
+        
+        Returns:
+            Return value of fn
+        
+        Raises:
+            Overloaded: The deadline cannot be met or the queue is full
+            DeadlineExceeded: The deadline passed while the job was queued
+        """
+        if not self.enabled:
+            return fn()
+        
+        name = PRIORITY_NAMES[priority]
+        self._stats[name]["submitted"] += 1
+        estimate_ms = self._estimate_ms(priority, cost)
+        wait_ms = self.estimated_wait_ms(priority)
+        retry_after = max(1, math.ceil((wait_ms + estimate_ms) / 1000.0))
+        
+        if len(self._queue) >= self.max_queue:
+            self._stats[name]["shed"] += 1
+            raise Overloaded("Prediction queue is full", retry_after)
+        if deadline is not None and time.monotonic() + (wait_ms + estimate_ms) / 1000.0 > deadline:
+            self._stats[name]["shed"] += 1
+            raise Overloaded(
+                f"Estimated queue wait {wait_ms:.1f}ms exceeds the request deadline", retry_after
+            )
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = [priority, deadline if deadline is not None else math.inf, next(self._seq), estimate_ms, cost, fn, future]
+        heapq.heappush(self._queue, entry)
+        self._queued_ms[priority] += estimate_ms
+        self._dispatch()
+        return await future
+    
+    def _dispatch(self):
+        """Start queued jobs while workers are free, dropping expired ones"""
+        while self._queue and self._running < self.max_concurrency:
+            priority, deadline, _, estimate_ms, cost, fn, future = heapq.heappop(self._queue)
+            self._queued_ms[priority] -= estimate_ms
+            if future.done():
+                continue
+            if time.monotonic() > deadline:
+                self._stats[PRIORITY_NAMES[priority]]["expired"] += 1
+                future.set_exception(DeadlineExceeded("Request deadline passed while queued"))
+                continue
+            self._running += 1
+            self._running_ms += estimate_ms
+            task = asyncio.ensure_future(self._execute(priority, estimate_ms, cost, fn, future))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _execute(self, priority: int, estimate_ms: float, cost: float, fn: Callable[[], Any], future):
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="inference")
+        start = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(self._executor, fn)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            per_unit = elapsed_ms / max(cost, 1e-9)
+            previous = self._ms_per_unit[priority]
+            self._ms_per_unit[priority] = per_unit if previous is None else (
+                self.ewma_alpha * per_unit + (1 - self.ewma_alpha) * previous
+            )
+            self._stats[PRIORITY_NAMES[priority]]["completed"] += 1
+            if not future.done():
+                future.set_result(result)
+        finally:
+            self._running -= 1
+            self._running_ms -= estimate_ms
+            self._dispatch()
+    
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a worker"""
+        return len(self._queue)
+    
+    def shutdown(self):
+        """Stop the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get queue depth, service-time estimates and per-class outcome counters"""
+        return {
+            "enabled": self.enabled,
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "queue_depth": self.queue_depth,
+            "service_ms_per_row": {
+                PRIORITY_NAMES[p]: round(v, 4) if v is not None else None
+                for p, v in self._ms_per_unit.items()
+            },
+            "classes": {name: dict(stats) for name, stats in self._stats.items()}
+        }
+
+
+# Global scheduler instance
+scheduler = PriorityScheduler()
@@ -1,13 +1,32 @@
 """Pydantic schemas for request/response validation"""
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field, validator
+from typing_extensions import Annotated
+from pydantic import BaseModel, Field, validator, field_validator, model_validator
 import numpy as np
 
+# Compact wire format: bit i of the genre mask is COMPACT_GENRES[i], and the
+# aggregate array holds COMPACT_AGGREGATES in this order (model feature order)
+COMPACT_GENRES = [
+    'Action', 'Adventure', 'Animation', "Children's", 'Comedy', 'Crime',
+    'Documentary', 'Drama', 'Fantasy', 'Film-Noir', 'Horror', 'Musical',
+    'Mystery', 'Romance', 'Sci-Fi', 'Thriller', 'War', 'Western'
+]
+COMPACT_AGGREGATES = [
+    'user_total_ratings', 'user_liked_ratings', 'movie_total_ratings',
+    'movie_liked_ratings', 'occupation_movie_total', 'occupation_movie_liked',
+    'user_genre_total', 'user_genre_liked', 'user_like_rate',
+    'user_genre_like_rate', 'movie_like_rate', 'occupation_like_rate',
+    'release_year'
+]
+
+# User and movie ids are packed into one 64-bit key per pair (32 bits each)
+MAX_ID = 1 << 32
+
 
 class PredictionRequest(BaseModel):
     """Request schema for model predictions"""
-    user_id: int = Field(..., description="User ID")
-    movie_id: int = Field(..., description="Movie ID")
+    user_id: int = Field(..., ge=0, lt=MAX_ID, description="User ID")
+    movie_id: int = Field(..., ge=0, lt=MAX_ID, description="Movie ID")
     age: int = Field(..., ge=1, le=100, description="User age")
     gender: str = Field(..., pattern="^[MF]$", description="User gender (M or F)")
     occupation_new: str = Field(..., description="User occupation")
@@ -112,6 +131,55 @@ class BatchPredictionRequest(BaseModel):
         }
 
 
+class CompactPredictionRequest(BaseModel):
+    """
+    Compact columnar request schema for high-QPS callers
+    
+    One entry per row in each list. Genres are a bitmask (bit i = COMPACT_GENRES[i]),
+    gender and occupation are the model's category codes, and the aggregates are
+    positional in COMPACT_AGGREGATES order (use 0 for missing rates/years).
+    """
+    user_ids: List[Annotated[int, Field(ge=0, lt=MAX_ID)]] = Field(..., min_length=1, max_length=10000)
+    movie_ids: List[Annotated[int, Field(ge=0, lt=MAX_ID)]]
+    ages: List[Annotated[int, Field(ge=1, le=100)]]
+    genders: List[Annotated[int, Field(ge=0, le=1)]] = Field(..., description="0=F, 1=M")
+    occupations: List[Annotated[int, Field(ge=-1, le=7)]] = Field(
+        ..., description="Occupation category code (model pandas_categorical order), -1 = unknown"
+    )
+    genres: List[Annotated[int, Field(ge=0, lt=1 << len(COMPACT_GENRES))]]
+    aggregates: List[List[float]]
+    
+    @model_validator(mode='after')
+    def check_lengths(self):
+        n = len(self.user_ids)
+        for name in ('movie_ids', 'ages', 'genders', 'occupations', 'genres', 'aggregates'):
+            if len(getattr(self, name)) != n:
+                raise ValueError(f"{name} must have {n} entries, one per row")
+        if any(len(row) != len(COMPACT_AGGREGATES) for row in self.aggregates):
+            raise ValueError(f"Each aggregates row must have {len(COMPACT_AGGREGATES)} values")
+        return self
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "user_ids": [259],
+                "movie_ids": [298],
+                "ages": [21],
+                "genders": [1],
+                "occupations": [6],
+                "genres": [65538],
+                "aggregates": [[2, 2, 0, 0, 2, 2, 5, 5, 1.0, 1.0, 0.0, 1.0, 1997.0]]
+            }
+        }
+
+
+class CompactPredictionResponse(BaseModel):
+    """Response schema for compact predictions (probabilities in request row order)"""
+    predictions: List[float]
+    model_version: str
+    total_time_ms: float
+
+
 class PredictionResponse(BaseModel):
     """Response schema for model predictions"""
     user_id: int
@@ -129,12 +197,102 @@ class BatchPredictionResponse(BaseModel):
     avg_time_per_prediction_ms: float
 
 
+class FeatureContribution(BaseModel):
+    """Contribution of one feature to a prediction (log-odds)"""
+    feature: str
+    value: Optional[float] = None
+    contribution: float
+
+
+class ExplanationResponse(BaseModel):
+    """Response schema for prediction explanations"""
+    user_id: int
+    movie_id: int
+    prediction: float = Field(..., ge=0.0, le=1.0, description="Predicted probability")
+    base_value: float = Field(..., description="Expected raw score (log-odds) over the training data")
+    contributions: List[FeatureContribution] = Field(
+        ..., description="Top features by absolute contribution; base_value plus all contributions is the raw score"
+    )
+    model_version: str
+
+
+class BatchExplanationResponse(BaseModel):
+    """Response schema for batch explanations"""
+    explanations: List[ExplanationResponse]
+    cached_rows: int
+    total_time_ms: float
+
+
+class FeedbackEvent(BaseModel):
+    """A rating event used to update the online aggregate features"""
+    user_id: int = Field(..., ge=0, lt=MAX_ID, description="User ID")
+    movie_id: int = Field(..., ge=0, lt=MAX_ID, description="Movie ID")
+    liked: bool = Field(..., description="Whether the user liked the movie")
+    occupation_new: Optional[str] = Field(None, description="User occupation (updates the occupation aggregates)")
+    genres: List[str] = Field(default_factory=list, description="Movie genres (updates the user-genre aggregates)")
+    
+    @field_validator('genres')
+    def check_genres(cls, genres):
+        unknown = [g for g in genres if g not in COMPACT_GENRES]
+        if unknown:
+            raise ValueError(f"Unknown genres {unknown}")
+        return genres
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "user_id": 259,
+                "movie_id": 298,
+                "liked": True,
+                "occupation_new": "student",
+                "genres": ["Adventure", "War"]
+            }
+        }
+
+
+class FeedbackResponse(BaseModel):
+    """Response schema for feedback ingestion"""
+    accepted: int
+    rejected: int = 0
+    errors: List[str] = Field(default_factory=list, description="First rejected lines and their errors")
+
+
+class LabelEvent(BaseModel):
+    """Observed outcome of a served prediction"""
+    user_id: int = Field(..., ge=0, lt=MAX_ID, description="User ID")
+    movie_id: int = Field(..., ge=0, lt=MAX_ID, description="Movie ID")
+    liked: bool = Field(..., description="Whether the user liked the movie")
+
+
+class LabelBatch(BaseModel):
+    """Batch of delayed labels"""
+    labels: List[LabelEvent] = Field(..., description="Observed outcomes")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "labels": [
+                    {"user_id": 259, "movie_id": 298, "liked": True},
+                    {"user_id": 260, "movie_id": 299, "liked": False}
+                ]
+            }
+        }
+
+
+class LabelResponse(BaseModel):
+    """Response schema for label ingestion"""
+    received: int
+    matched: int = Field(..., description="Labels joined to a prediction still held by the quality monitor")
+
+
 class HealthResponse(BaseModel):
     """Health check response"""
     status: str
     model_loaded: bool
     model_version: Optional[str] = None
     environment: str
+    dependencies: Optional[Dict[str, str]] = Field(None, description="Circuit-breaker state per downstream service")
+    saturation: Optional[List[str]] = Field(None, description="Thresholds exceeded while the worker reports saturated")
 
 
 class MetricsResponse(BaseModel):
@@ -146,4 +304,16 @@ class MetricsResponse(BaseModel):
     p99_inference_time_ms: float
     error_rate: float
     requests_per_second: float
+    feature_drift: Optional[Dict[str, Any]] = None
+    scheduler: Optional[Dict[str, Any]] = None
+    explanations: Optional[Dict[str, Any]] = None
+    feature_store: Optional[Dict[str, Any]] = None
+    coalescing: Optional[Dict[str, Any]] = None
+    threading: Optional[Dict[str, Any]] = None
+    capture: Optional[Dict[str, Any]] = None
+    quality: Optional[Dict[str, Any]] = None
+    score_table: Optional[Dict[str, Any]] = None
+    admission: Optional[Dict[str, Any]] = None
+    saturation: Optional[Dict[str, Any]] = None
+    resilience: Optional[Dict[str, Any]] = None
 
@@ -0,0 +1,307 @@
+"""Precomputed scores for hot (user, movie) pairs, served from a memory-mapped file"""
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from src.config import settings
+from src.feature_extractor import FeatureExtractor
+from src.quality_monitor import pair_keys
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SCORETB1"
+# Fixed-size header (magic, JSON metadata, padding) so the arrays after it are page aligned
+HEADER_BYTES = 4096
+
+
+def _splitmix64(z: np.ndarray) -> np.ndarray:
+    z = z + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+# One odd multiplier per feature column, fixed by construction so every process agrees
+_COLUMN_MULTIPLIERS = _splitmix64(np.arange(len(FeatureExtractor.FEATURE_ORDER), dtype=np.uint64)) | np.uint64(1)
+
+
+def row_fingerprints(features: np.ndarray) -> np.ndarray:
+    """
+    64-bit fingerprint of each feature row
+    
+    Rows are compared as float32, so the JSON and compact request paths agree.
+    The fingerprint is the sum of each column's value bits times a per-column
+    odd multiplier (mod 2**64), so rows differing in a single column never
+    collide.
+    """
+    bits = np.ascontiguousarray(features, dtype=np.float32).view(np.uint32).astype(np.uint64)
+    return bits @ _COLUMN_MULTIPLIERS[:bits.shape[1]]
+
+
+def write_score_table(
+    path: str,
+    user_ids: Sequence[int],
+    movie_ids: Sequence[int],
+    fingerprints: np.ndarray,
+    scores: np.ndarray,
+    model_version: str,
+    score_dtype: str = "float32"
+) -> Dict[str, Any]:
+    """
+    Write a score table file (atomically, via a temporary file)
+    
+    Layout: a HEADER_BYTES header, then the sorted uint64 pair keys, the
+    uint64 row fingerprints and the scores, each starting on a page boundary.
+    The first entry wins when a pair occurs more than once.
+    
+    Args:
+        path: Output file
+        user_ids, movie_ids: Pair of each entry
+        fingerprints: row_fingerprints() of the feature row each entry was scored on
+        scores: Model probability of each entry
+        model_version: Version of the model that produced the scores
+        score_dtype: "float32" or "float16"
+    
+    Returns:
+        The header metadata
+    """
+    if score_dtype not in ("float16", "float32"):
+        raise ValueError(f"Unsupported score dtype: {score_dtype}")
+    keys = pair_keys(user_ids, movie_ids)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    order = order[first]
+    arrays = [
+        keys[first],
+        np.asarray(fingerprints, dtype=np.uint64)[order],
+        np.asarray(scores)[order].astype(score_dtype)
+    ]
+    
+    offsets = []
+    offset = HEADER_BYTES
+    for array in arrays:
+        offsets.append(offset)
+        offset += -(-array.nbytes // mmap.PAGESIZE) * mmap.PAGESIZE
+    meta = {
+        "model_version": model_version,
+        "entries": int(len(arrays[0])),
+        "score_dtype": score_dtype,
+        "created_at": time.time(),
+        "keys_offset": offsets[0],
+        "fingerprints_offset": offsets[1],
+        "scores_offset": offsets[2]
+    }
+    header = MAGIC + json.dumps(meta).encode()
+    if len(header) > HEADER_BYTES:
+        raise ValueError("Score table metadata does not fit in the header")
+    
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(header.ljust(HEADER_BYTES, b"\0"))
+        for array, array_offset in zip(arrays, offsets):
+            f.seek(array_offset)
+            f.write(array.tobytes())
+        f.truncate(offset)
+    os.replace(tmp_path, path)
+    return meta
+
+
+class _Mapped(NamedTuple):
+    keys: np.ndarray
+    fingerprints: np.ndarray
+    scores: np.ndarray
+    meta: Dict[str, Any]
+    file_id: tuple
+
+
+def _map_file(path: str) -> _Mapped:
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a score table")
+    meta = json.loads(bytes(buffer[len(MAGIC):HEADER_BYTES]).rstrip(b"\0"))
+    n = meta["entries"]
+    # The arrays are views of the mapping: pages are read on demand and shared by every process mapping the file
+    return _Mapped(
+        keys=np.frombuffer(buffer, dtype=np.uint64, count=n, offset=meta["keys_offset"]),
+        fingerprints=np.frombuffer(buffer, dtype=np.uint64, count=n, offset=meta["fingerprints_offset"]),
+        scores=np.frombuffer(buffer, dtype=meta["score_dtype"], count=n, offset=meta["scores_offset"]),
+        meta=meta,
+        file_id=(stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    )
+
+
+class ScoreTable:
+    """
+    Answers hot (user, movie) pairs from a precomputed, memory-mapped score table
+    
+    Each row's pair key is binary-searched in the sorted key array. A found
+    entry is used only if the table was built by the model version now being
+    served and the row's feature fingerprint equals the one it was scored on,
+    so a request whose features differ from the precomputed ones (or any row
+    after a model change) is scored live. Rows without a usable entry are
+    passed to the live predict function in one call.
+    
+    The file is re-mapped when it is replaced on disk (checked at most every
+    `check_interval_seconds`) or on `load()`.
+    """
+    
+    def __init__(self, path: Optional[str] = None, check_interval_seconds: Optional[float] = None):
+        self.enabled = settings.enable_score_table
+        self.path = path if path is not None else settings.score_table_path
+        self.check_interval_seconds = (
+            settings.score_table_check_interval_seconds
+            if check_interval_seconds is None else check_interval_seconds
+        )
+        self._table: Optional[_Mapped] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        
+        self.rows = 0
+        self.hits = 0
+        self.key_misses = 0
+        self.fingerprint_mismatches = 0
+        self.version_mismatches = 0
+        self.loads = 0
+    
+    def load(self, path: Optional[str] = None) -> bool:
+        """
+        Map the score table file, replacing the current mapping
+        
+        Returns:
+            True if the table was mapped
+        """
+        path = path or self.path
+        try:
+            table = _map_file(path)
+        except FileNotFoundError:
+            logger.info(f"No score table at {path}")
+            return False
+        except Exception as e:
+            logger.error(f"Error mapping score table {path}: {e}", exc_info=True)
+            return False
+        # The previous mapping is released once in-flight lookups drop their reference
+        self._table = table
+        self.path = path
+        self.loads += 1
+        logger.info(
+            f"Score table mapped: {table.meta['entries']} entries for model {table.meta['model_version']}"
+        )
+        return True
+    
+    def _refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval_seconds
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        table = self._table
+        if table is None or (stat.st_ino, stat.st_mtime_ns, stat.st_size) != table.file_id:
+            self.load()
+    
+    def lookup(self, features: np.ndarray, user_ids: Sequence[int], movie_ids: Sequence[int],
+               model_version: Optional[str]):
+        """
+        Find precomputed scores for the rows of a feature matrix
+        
+        Returns:
+            (hit mask, scores) with scores valid where the mask is True, or
+            None if there is no table for this model version
+        """
+        table = self._table
+        if table is None or not len(table.keys):
+            return None
+        if table.meta["model_version"] != model_version:
+            with self._lock:
+                self.version_mismatches += len(features)
+            return None
+        keys = pair_keys(user_ids, movie_ids)
+        positions = np.searchsorted(table.keys, keys)
+        np.minimum(positions, len(table.keys) - 1, out=positions)
+        hit = table.keys[positions] == keys
+        n_found = int(hit.sum())
+        if n_found:
+            # Only rows whose pair is in the table are fingerprinted
+            candidates = np.flatnonzero(hit)
+            hit[candidates] = row_fingerprints(features[candidates]) == table.fingerprints[positions[candidates]]
+        n_hits = int(hit.sum())
+        scores = table.scores[positions].astype(np.float64)
+        with self._lock:
+            self.rows += len(keys)
+            self.hits += n_hits
+            self.key_misses += len(keys) - n_found
+            self.fingerprint_mismatches += n_found - n_hits
+        return hit, scores
+    
+    def predict(
+        self,
+        features: np.ndarray,
+        user_ids: Sequence[int],
+        movie_ids: Sequence[int],
+        model_version: Optional[str],
+        predict_fn: Callable[[np.ndarray], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Score rows from the table where possible and the rest with predict_fn
+        
+        Args:
+            features: Feature array of shape (n_samples, n_features)
+            user_ids: User ID of each row
+            movie_ids: Movie ID of each row
+            model_version: Version of the model predict_fn uses
+            predict_fn: Live scoring, called once with the rows the table cannot answer
+        
+        Returns:
+            Prediction probabilities in row order
+        """
+        if not self.enabled or len(features) == 0:
+            return predict_fn(features)
+        self._refresh()
+        result = self.lookup(features, user_ids, movie_ids, model_version)
+        if result is None:
+            return predict_fn(features)
+        hit, predictions = result
+        if hit.all():
+            return predictions
+        if hit.any():
+            miss = ~hit
+            predictions[miss] = predict_fn(features[miss])
+            return predictions
+        return predict_fn(features)
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Table size, version and hit rates for the /metrics endpoint"""
+        table = self._table
+        with self._lock:
+            return {
+                "path": self.path,
+                "loaded": table is not None,
+                "model_version": table.meta["model_version"] if table is not None else None,
+                "entries": table.meta["entries"] if table is not None else 0,
+                "score_dtype": table.meta["score_dtype"] if table is not None else None,
+                "built_at": table.meta["created_at"] if table is not None else None,
+                "rows": self.rows,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.rows, 4) if self.rows else None,
+                "key_misses": self.key_misses,
+                "fingerprint_mismatches": self.fingerprint_mismatches,
+                "version_mismatches": self.version_mismatches,
+                "loads": self.loads
+            }
+
+
+# Global score table instance
+score_table = ScoreTable()
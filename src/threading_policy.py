@@ -0,0 +1,189 @@
+"""CPU quota detection and per-batch-size LightGBM thread-count policy"""
+import bisect
+import logging
+import math
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def cgroup_cpu_quota(root: str = CGROUP_ROOT) -> Optional[float]:
+    """
+    Read the container CPU limit from cgroups
+    
+    Args:
+        root: cgroup filesystem mount point
+    
+    Returns:
+        CPU limit in cores (e.g. 1.5), or None if the cgroup sets no limit
+    """
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open(os.path.join(root, "cpu.max")) as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1: quota of -1 means unlimited
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as f:
+            quota = int(f.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus(root: str = CGROUP_ROOT) -> int:
+    """Cores this process can actually use: CPU affinity capped by the cgroup quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota(root)
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+
+def sample_features(model_string: str, n_rows: int, seed: int = 0) -> np.ndarray:
+    """
+    Draw feature rows within the training ranges recorded in a LightGBM model
+    
+    Numeric features ("[lo:hi]") are uniform over their range, categorical ones
+    ("a:b:c") uniform over their training values; constant features are 0.
+    """
+    line = next(l for l in model_string.split('\n') if l.startswith('feature_infos='))
+    rng = np.random.default_rng(seed)
+    columns = []
+    for info in line.split('=', 1)[1].split(' '):
+        if info.startswith('['):
+            lo, hi = (float(v) for v in info[1:-1].split(':'))
+            columns.append(rng.uniform(lo, hi, n_rows))
+        elif info == 'none':
+            columns.append(np.zeros(n_rows))
+        else:
+            columns.append(rng.choice([float(v) for v in info.split(':')], n_rows))
+    return np.column_stack(columns).astype(np.float32)
+
+
+class ThreadPolicy:
+    """
+    Chooses the LightGBM num_threads for each predict call by batch size
+    
+    The cores the container may use (the cgroup quota, not the host core
+    count OpenMP would otherwise pick) are shared by `concurrent_callers`
+    predict calls that can run at once: the inference workers plus the
+    explanation workers. Each call gets at most its share, `threads_per_call`,
+    so concurrent large batches do not oversubscribe the quota. Before
+    calibration every call uses that share. The start-up calibration times
+    every thread count up to it at a range of batch sizes and keeps the
+    fastest per size; a call then uses the entry of the largest calibrated
+    batch size not above its row count.
+    """
+    
+    def __init__(self, max_threads: Optional[int] = None, concurrent_callers: Optional[int] = None):
+        self.cpu_quota = cgroup_cpu_quota()
+        self.max_threads = max_threads or settings.lgbm_max_threads or available_cpus()
+        if concurrent_callers is None:
+            inference_workers = settings.scheduler_max_concurrency if settings.enable_scheduler else 1
+            concurrent_callers = inference_workers + settings.explain_max_concurrency
+        self.concurrent_callers = max(1, concurrent_callers)
+        self.threads_per_call = max(1, self.max_threads // self.concurrent_callers)
+        self._batch_sizes: List[int] = []
+        self._threads: List[int] = []
+        self.table: List[Dict[str, Any]] = []
+        self.calibration_ms: Optional[float] = None
+    
+    def threads_for(self, n_rows: int) -> int:
+        """Thread count for a predict call on n_rows rows"""
+        if not self._batch_sizes:
+            return self.threads_per_call
+        index = bisect.bisect_right(self._batch_sizes, n_rows) - 1
+        return self._threads[max(index, 0)]
+    
+    def calibrate(
+        self,
+        predict_fn: Callable[[np.ndarray, int], Any],
+        features: np.ndarray,
+        batch_sizes: Optional[Sequence[int]] = None,
+        repeats: int = 5,
+        timer: Callable[[], float] = time.perf_counter
+    ) -> List[Dict[str, Any]]:
+        """
+        Benchmark thread counts per batch size and install the fastest
+        
+        Args:
+            predict_fn: predict_fn(features, num_threads) scoring a matrix
+            features: Sample rows (at least the largest batch size)
+            batch_sizes: Batch sizes to time (default: settings.thread_calibration_batch_sizes)
+            repeats: Timed runs per setting (the median is used)
+            timer: Clock, replaceable in tests
+        
+        Returns:
+            The policy table: one entry per batch size with the chosen thread
+            count and the median milliseconds of every candidate
+        """
+        start = time.perf_counter()
+        batch_sizes = sorted(set(batch_sizes or settings.thread_calibration_batch_sizes))
+        limit = self.threads_per_call
+        candidates = sorted({1, limit} | {t for t in (2, 4, 8, 16, 32) if t < limit})
+        table = []
+        for batch_size in batch_sizes:
+            batch = features[:batch_size]
+            timings = {}
+            for threads in candidates:
+                predict_fn(batch, threads)
+                runs = []
+                for _ in range(repeats):
+                    t0 = timer()
+                    predict_fn(batch, threads)
+                    runs.append((timer() - t0) * 1000)
+                timings[threads] = float(np.median(runs))
+            best = min(timings, key=timings.get)
+            table.append({
+                "batch_size": batch_size,
+                "threads": best,
+                "ms_by_threads": {str(t): round(ms, 4) for t, ms in timings.items()}
+            })
+        self.table = table
+        self._batch_sizes = [entry["batch_size"] for entry in table]
+        self._threads = [entry["threads"] for entry in table]
+        self.calibration_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"Thread policy calibrated in {self.calibration_ms:.0f}ms "
+            f"(max {limit} threads per call, {self.concurrent_callers} concurrent callers): "
+            + ", ".join(f"{e['batch_size']} rows -> {e['threads']}" for e in table)
+        )
+        return table
+    
+    def calibrate_model(self, booster: Any) -> List[Dict[str, Any]]:
+        """Calibrate on rows sampled from the model's own feature ranges"""
+        batch_sizes = settings.thread_calibration_batch_sizes
+        features = sample_features(booster.model_to_string(), max(batch_sizes))
+        return self.calibrate(lambda x, threads: booster.predict(x, num_threads=threads), features, batch_sizes)
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """CPU limits and the calibration table for the /metrics endpoint"""
+        return {
+            "cpu_quota": self.cpu_quota,
+            "max_threads": self.max_threads,
+            "concurrent_callers": self.concurrent_callers,
+            "threads_per_call": self.threads_per_call,
+            "calibrated": bool(self.table),
+            "calibration_ms": round(self.calibration_ms, 1) if self.calibration_ms is not None else None,
+            "policy": self.table
+        }
+
+
+# Global thread policy instance
+thread_policy = ThreadPolicy()
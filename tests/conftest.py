@@ -0,0 +1,5 @@
+"""Shared test setup"""
+from src.model_loader import model_loader
+
+# Load the model once up front, as the API lifespan does at startup
+model_loader.load()
@@ -0,0 +1,175 @@
+"""Unit tests for the model admission gate"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src import model_loader as model_loader_module
+from src.admission import ACCEPTED, FLAGGED, REJECTED, AdmissionGate, model_structure
+from src.model_loader import ModelLoader, model_loader
+
+
+class StandIn:
+    """Loaded-model stand-in with a configurable per-call delay and memory"""
+    
+    def __init__(self, version, delay_seconds=0.0, memory_mb=3.0):
+        self.model = model_loader.model
+        self.model_version = version
+        self.delay_seconds = delay_seconds
+        self.memory_bytes = None if memory_mb is None else int(memory_mb * 1e6)
+    
+    def measure_memory(self):
+        return self.memory_bytes
+    
+    def predict(self, features):
+        time.sleep(self.delay_seconds)
+        return np.zeros(len(features))
+
+
+class OverlapRecordingGate(AdmissionGate):
+    """Gate that records overlapping evaluations and the models it compared"""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.active = 0
+        self.max_active = 0
+        self.pairs = []
+        self._lock = threading.Lock()
+    
+    def evaluate(self, candidate, current=None, features=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(0.05)
+            self.pairs.append((current.model, candidate.model))
+            return super().evaluate(candidate, current, features)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_same_model_is_accepted_and_reports_comparable_memory():
+    """Test a fresh load of the serving model passes against it and measures the same memory"""
+    candidate = ModelLoader()
+    candidate.load()
+    gate = AdmissionGate(mode="enforce", batch_sizes=[100, 1], repeats=10, latency_budgets_ms={})
+    report = gate.evaluate(candidate, model_loader)
+    assert report["decision"] == ACCEPTED and report["reasons"] == []
+    assert [entry["batch_size"] for entry in report["latency"]] == [1, 100]
+    assert report["structure"]["candidate"]["trees"] == 73
+    assert report["structure"]["candidate"] == model_structure(model_loader.model)
+    
+    memory = report["memory"]
+    assert memory["candidate_mb"] > 0
+    assert abs(memory["candidate_mb"] - memory["current_mb"]) < 0.1 * memory["current_mb"]
+
+
+def test_memory_slack_absorbs_ratio_on_small_models_and_unmeasured_heap_skips_checks():
+    """Test a ratio over the limit but within the slack passes, and missing heap figures are not judged"""
+    features = np.zeros((1, 34))
+    # Latency is left out: a single run of a no-op predict is too noisy to compare
+    gate = AdmissionGate(mode="enforce", batch_sizes=[1], repeats=1, latency_budgets_ms={}, max_latency_ratio=1e6,
+                         max_memory_ratio=2.0, memory_slack_mb=16, max_memory_mb=100)
+    current = StandIn("v1", memory_mb=1)
+    assert gate.evaluate(StandIn("v2", memory_mb=10), current, features=features)["decision"] == ACCEPTED
+    
+    report = gate.evaluate(StandIn("v3", memory_mb=20), current, features=features)
+    assert report["decision"] == REJECTED and "vs 1.0MB for the current model" in report["reasons"][0]
+    
+    report = gate.evaluate(StandIn("v4", memory_mb=None), StandIn("v1", memory_mb=None), features=features)
+    assert report["decision"] == ACCEPTED
+    assert report["memory"]["candidate_mb"] is None and report["memory"]["current_mb"] is None
+
+
+def test_first_load_is_judged_on_absolute_budgets_only():
+    """Test that without a current model there is no ratio, only the p99 and memory budgets"""
+    gate = AdmissionGate(mode="enforce", batch_sizes=[10], repeats=5,
+                         latency_budgets_ms={10: 1.0}, max_memory_mb=100)
+    report = gate.evaluate(StandIn("v1", delay_seconds=0.002, memory_mb=150), None, features=np.zeros((10, 34)))
+    assert report["decision"] == REJECTED and len(report["reasons"]) == 2
+    assert "p50_ratio" not in report["latency"][0] and report["current_version"] is None
+
+
+def test_candidate_failing_on_reference_rows_is_rejected(tmp_path):
+    """Test a candidate that raises is rejected, and a short reference set is tiled up to the largest batch"""
+    reference_path = str(tmp_path / "reference.npy")
+    np.save(reference_path, np.zeros((3, 34), dtype=np.float32))
+    gate = AdmissionGate(mode="enforce", batch_sizes=[1, 10], repeats=1, latency_budgets_ms={},
+                         reference_path=reference_path)
+    assert gate.reference_features(model_loader.model).shape == (10, 34)
+    
+    def predict(features):
+        raise ValueError("feature count mismatch")
+    
+    broken = StandIn("v2")
+    broken.predict = predict
+    report = gate.evaluate(broken, StandIn("v1"))
+    assert report["decision"] == REJECTED and report["latency"] == []
+    assert report["reasons"] == ["candidate failed on the reference rows: feature count mismatch"]
+
+
+def test_warn_mode_installs_flagged_candidate(monkeypatch):
+    """Test warn mode installs a regressing candidate and keeps its report, where enforce mode does not"""
+    loader = ModelLoader()
+    loader.load()
+    model = loader.model
+    strict = dict(batch_sizes=[1], repeats=3, latency_budgets_ms={}, max_latency_ratio=0.01)
+    
+    monkeypatch.setattr(model_loader_module, "admission_gate", AdmissionGate(mode="enforce", **strict))
+    installed, report = loader.reload_model()
+    assert installed is False and report["decision"] == REJECTED and loader.model is model
+    
+    gate = AdmissionGate(mode="warn", **strict)
+    monkeypatch.setattr(model_loader_module, "admission_gate", gate)
+    installed, report = loader.reload_model()
+    assert installed is True and loader.model is not model and report["decision"] == FLAGGED
+    assert report["reasons"] and gate.get_metrics()["decisions"][FLAGGED] == 1
+    assert loader.last_admission is report
+
+
+def test_concurrent_reloads_are_benchmarked_one_at_a_time(monkeypatch):
+    """Test overlapping reloads are benchmarked one after another, each against the model the previous one installed"""
+    loader = ModelLoader()
+    loader.load()
+    gate = OverlapRecordingGate(mode="enforce", batch_sizes=[1], repeats=3, latency_budgets_ms={},
+                                max_latency_ratio=100)
+    monkeypatch.setattr(model_loader_module, "admission_gate", gate)
+    
+    served = loader.model
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda _: loader.reload_model(), range(3)))
+    assert [installed for installed, _ in results] == [True, True, True]
+    assert gate.max_active == 1 and gate.decisions[ACCEPTED] == 3
+    # Each candidate was compared with the model the previous reload installed
+    for current, candidate in gate.pairs:
+        assert current is served
+        served = candidate
+    assert loader.model is served
+
+
+def test_concurrent_reloads_each_return_their_own_report(monkeypatch):
+    """Test that of two overlapping reloads, the rejected caller gets its rejection and the other its acceptance"""
+    class FirstRejectedGate(AdmissionGate):
+        def evaluate(self, candidate, current=None, features=None):
+            self.max_latency_ratio = 0.01 if self.decisions[REJECTED] == 0 else 100
+            time.sleep(0.05)
+            return super().evaluate(candidate, current, features)
+    
+    loader = ModelLoader()
+    loader.load()
+    monkeypatch.setattr(model_loader_module, "admission_gate",
+                        FirstRejectedGate(mode="enforce", batch_sizes=[1], repeats=3, latency_budgets_ms={}))
+    start = threading.Barrier(2)
+    
+    def reload():
+        start.wait()
+        return loader.reload_model()
+    
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = [future.result() for future in [pool.submit(reload) for _ in range(2)]]
+    assert sorted((installed, report["decision"]) for installed, report in results) == [
+        (False, REJECTED), (True, ACCEPTED)
+    ]
+    assert results[0][1] is not results[1][1]
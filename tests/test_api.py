@@ -82,3 +82,245 @@ def test_predict():
         assert "prediction_class" in data
         assert 0 <= data["prediction"] <= 1
 
+
+
+def test_predict_compact():
+    """Test compact endpoint matches the named-field batch endpoint"""
+    request_data = {
+        "user_ids": [259, 260],
+        "movie_ids": [298, 299],
+        "ages": [21, 35],
+        "genders": [1, 0],
+        "occupations": [6, 2],
+        "genres": [(1 << 1) | (1 << 16), 1 << 7],
+        "aggregates": [
+            [2, 2, 0, 0, 2, 2, 5, 5, 1.0, 1.0, 0.0, 1.0, 1997.0],
+            [40, 10, 120, 60, 300, 100, 20, 8, 0.25, 0.4, 0.5, 0.33, 1994.0]
+        ]
+    }
+    batch_data = {"predictions": [
+        {
+            "user_id": 259, "movie_id": 298, "age": 21, "gender": "M", "occupation_new": "student",
+            "release_year": 1997.0, "Adventure": 1, "War": 1,
+            "user_total_ratings": 2, "user_liked_ratings": 2, "occupation_movie_total": 2,
+            "occupation_movie_liked": 2, "user_genre_total": 5, "user_genre_liked": 5,
+            "user_like_rate": 1.0, "user_genre_like_rate": 1.0, "movie_like_rate": None,
+            "occupation_like_rate": 1.0
+        },
+        {
+            "user_id": 260, "movie_id": 299, "age": 35, "gender": "F", "occupation_new": "engineer",
+            "release_year": 1994.0, "Drama": 1,
+            "user_total_ratings": 40, "user_liked_ratings": 10, "movie_total_ratings": 120,
+            "movie_liked_ratings": 60, "occupation_movie_total": 300, "occupation_movie_liked": 100,
+            "user_genre_total": 20, "user_genre_liked": 8, "user_like_rate": 0.25,
+            "user_genre_like_rate": 0.4, "movie_like_rate": 0.5, "occupation_like_rate": 0.33
+        }
+    ]}
+    
+    response = client.post("/predict/compact", json=request_data)
+    assert response.status_code in [200, 503]
+    if response.status_code == 200:
+        predictions = response.json()["predictions"]
+        expected = [p["prediction"] for p in client.post("/predict/batch", json=batch_data).json()["predictions"]]
+        assert predictions == pytest.approx(expected)
+
+
+def test_predict_scheduling_headers():
+    """Test priority/timeout headers are accepted and invalid ones rejected"""
+    response = client.post("/predict/compact", headers={"X-Priority": "urgent"}, json={
+        "user_ids": [1], "movie_ids": [1], "ages": [30], "genders": [0], "occupations": [0],
+        "genres": [0], "aggregates": [[0] * 13]
+    })
+    assert response.status_code in [400, 503]
+    
+    response = client.post(
+        "/predict/compact", headers={"X-Priority": "interactive", "X-Request-Timeout-Ms": "5000"},
+        json={
+            "user_ids": [1], "movie_ids": [1], "ages": [30], "genders": [0], "occupations": [0],
+            "genres": [0], "aggregates": [[0] * 13]
+        }
+    )
+    assert response.status_code in [200, 503]
+
+
+def test_ready_after_startup():
+    """Test readiness is reported once the lifespan has loaded and warmed up the model"""
+    with TestClient(app) as started:
+        response = started.get("/ready")
+        assert response.status_code in [200, 503]
+        data = response.json()
+        assert data["status"] in ["ready", "starting"]
+        assert (response.status_code == 200) == data["model_loaded"]
+
+
+def test_explain():
+    """Test explanation endpoint returns top-N named contributions"""
+    request_data = {
+        "user_id": 259, "movie_id": 298, "age": 21, "gender": "M", "occupation_new": "student",
+        "release_year": 1997.0, "Adventure": 1, "War": 1, "user_total_ratings": 2,
+        "user_liked_ratings": 2, "user_like_rate": 1.0
+    }
+    response = client.post("/explain?top_n=3", json=request_data)
+    assert response.status_code in [200, 503]
+    if response.status_code == 200:
+        data = response.json()
+        assert len(data["contributions"]) == 3
+        predicted = client.post("/predict", json=request_data).json()["prediction"]
+        assert data["prediction"] == pytest.approx(predicted)
+        
+        batch = client.post("/explain/batch", json={"predictions": [request_data, request_data]}).json()
+        assert len(batch["explanations"]) == 2
+        assert batch["cached_rows"] == 2
+        assert "explanations" in client.get("/metrics").json()
+
+
+def test_feedback(monkeypatch, tmp_path):
+    """Test feedback events are ingested singly and as NDJSON"""
+    from src.feature_store import FeatureStore
+    store = FeatureStore(snapshot_path=str(tmp_path / "store.npz"))
+    monkeypatch.setattr("src.api.feature_store", store)
+    
+    assert client.post("/feedback", json={"user_id": 1, "movie_id": 2, "liked": True}).status_code == 503
+    
+    store.enabled = True
+    response = client.post("/feedback", json={"user_id": 1, "movie_id": 2, "liked": True, "genres": ["War"]})
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 1
+    
+    body = '{"user_id": 1, "movie_id": 3, "liked": false}\n\n{"user_id": 1}\n{"user_id": 2, "movie_id": 2, "liked": true}\n'
+    response = client.post("/feedback/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["accepted"], data["rejected"]) == (2, 1)
+    assert data["errors"][0].startswith("line 3")
+    assert store.get_metrics()["keys"] == {"users": 2, "movies": 2, "occupation_movies": 0, "user_genres": 1}
+    assert client.get("/metrics").json()["feature_store"]["events_ingested"] == 3
+    
+    # Oversized bodies are refused, whether or not they declare their length
+    from src.config import settings
+    monkeypatch.setattr(settings, "feedback_max_body_mb", 100 / (1024 * 1024))
+    headers = {"Content-Type": "application/x-ndjson"}
+    assert client.post("/feedback/bulk", content=body * 3, headers=headers).status_code == 413
+    chunks = (body.encode() for _ in range(3))
+    assert client.post("/feedback/bulk", content=chunks, headers=headers).status_code == 413
+    assert store.get_metrics()["events_ingested"] == 3
+
+
+
+def test_prediction_capture(monkeypatch):
+    """Test served predictions are offered to the capture policy when S3 logging is on"""
+    from src.data_pipeline import CapturePolicy, PredictionCapture
+    capture = PredictionCapture(
+        CapturePolicy(default_rate=1.0, endpoint_rates={}, version_rates={}, low_confidence_margin=0.0),
+        reservoir_size=0, flush_rows=1000, writer=lambda rows, partition_time: True
+    )
+    monkeypatch.setattr("src.api.prediction_capture", capture)
+    monkeypatch.setattr("src.api.settings.s3_bucket", "test-bucket")
+    
+    request_data = {
+        "user_ids": [259, 260], "movie_ids": [298, 299], "ages": [21, 35], "genders": [1, 0],
+        "occupations": [6, 2], "genres": [2, 128], "aggregates": [[0.0] * 13, [0.0] * 13]
+    }
+    response = client.post("/predict/compact", json=request_data)
+    assert response.status_code in [200, 503]
+    if response.status_code == 200:
+        metrics = client.get("/metrics").json()["capture"]
+        assert metrics["rows_seen"] == 2
+        assert metrics["rows_captured"]["sample"] == 2
+        rows = [row for _, batch in capture.take() for row in batch]
+        assert [row["user_id"] for row in rows] == [259, 260]
+        assert [row["prediction"] for row in rows] == response.json()["predictions"]
+
+
+def test_labels(monkeypatch):
+    """Test delayed labels are joined to recorded predictions and reported in /metrics"""
+    from src.quality_monitor import QualityMonitor
+    monitor = QualityMonitor(capacity=100)
+    monitor.enabled = True
+    monkeypatch.setattr("src.api.quality_monitor", monitor)
+    monitor.record([259, 260], [298, 299], [0.7, 0.4], "v1")
+    
+    body = {"labels": [{"user_id": 259, "movie_id": 298, "liked": True}, {"user_id": 1, "movie_id": 1, "liked": False}]}
+    response = client.post("/labels", json=body)
+    assert response.status_code == 200
+    assert response.json() == {"received": 2, "matched": 1}
+    
+    quality = client.get("/metrics").json()["quality"]
+    assert quality["labels_matched"] == 1 and quality["labels_unmatched"] == 1
+    assert quality["versions"]["v1"]["positive_rate"] == 1.0
+
+
+def test_reload_rejected_by_admission_gate(monkeypatch):
+    """Test a rejected reload returns 409 with the gate's report"""
+    from src.admission import AdmissionGate
+    gate = AdmissionGate(mode="enforce", batch_sizes=[1], repeats=3, max_latency_ratio=0.01)
+    monkeypatch.setattr("src.model_loader.admission_gate", gate)
+    monkeypatch.setattr("src.api.admission_gate", gate)
+    response = client.post("/model/reload")
+    assert response.status_code == 409
+    data = response.json()
+    assert data["status"] == "rejected"
+    assert data["admission"]["decision"] == "rejected"
+    assert client.get("/metrics").json()["admission"]["decisions"]["rejected"] == 1
+
+
+def test_ready_reports_saturation(monkeypatch):
+    """Test /ready returns 503 with the reasons while the worker is saturated"""
+    from src.saturation import saturation_monitor
+    monkeypatch.setattr(app.state, "ready", True, raising=False)
+    saturation_monitor.record_lag(10 * saturation_monitor.thresholds["loop_lag_ms"])
+    try:
+        response = client.get("/ready")
+        assert response.status_code == 503
+        data = response.json()
+        assert data["status"] == "saturated" and data["saturation"][0].startswith("loop_lag_ms")
+    finally:
+        saturation_monitor._lags.clear()
+        saturation_monitor.evaluate()
+    assert client.get("/ready").status_code == 200
+
+
+def test_admin_profiling_endpoints(monkeypatch):
+    """Test profiling needs the admin token and reports snapshots, stages and memory"""
+    from src.config import settings
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    assert client.post("/admin/profiling/start").status_code == 401
+    assert client.get("/admin/memory", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.get("/admin/profiling/snapshot", headers=headers).status_code == 409
+    
+    assert client.post("/admin/profiling/start", headers=headers).json()["tracing"] is True
+    try:
+        row = {
+            "user_id": 259, "movie_id": 298, "age": 21, "gender": "M", "occupation_new": "student",
+            "release_year": 1997.0, "Adventure": 1, "War": 1, "user_total_ratings": 2,
+            "user_liked_ratings": 2, "user_like_rate": 1.0
+        }
+        body = {"predictions": [row] * 20}
+        assert client.post("/predict/batch", json=body).status_code == 200
+        snapshot = client.get("/admin/profiling/snapshot?top=5&group_by=traceback", headers=headers).json()
+        assert len(snapshot["top"]) == 5 and "traceback" in snapshot["top"][0]
+        report = client.get("/admin/memory", headers=headers).json()
+        assert report["rss_mb"] > 0 and report["subsystems_mb"]["model"] > 0
+        assert {"features", "model", "response"} <= set(report["profiling"]["stages"])
+    finally:
+        status_after = client.post("/admin/profiling/stop", headers=headers).json()
+    assert status_after["tracing"] is False
+    
+    monkeypatch.setattr(settings, "admin_token", None)
+    assert client.get("/admin/memory", headers=headers).status_code == 403
+
+
+def test_out_of_range_ids_rejected():
+    """Test ids outside [0, 2**32) get a 422 instead of overflowing the pair keys"""
+    row = {"user_id": 2 ** 63, "movie_id": 298, "age": 21, "gender": "M", "occupation_new": "student"}
+    assert client.post("/predict", json=row).status_code == 422
+    assert client.post("/predict", json=dict(row, user_id=2 ** 32)).status_code == 422
+    assert client.post("/predict", json=dict(row, user_id=259, movie_id=-1)).status_code == 422
+    assert client.post("/labels", json={"labels": [{"user_id": 2 ** 63, "movie_id": 1, "liked": True}]}).status_code == 422
+    assert client.post("/feedback", json={"user_id": 1, "movie_id": 2 ** 40, "liked": True}).status_code == 422
+    compact = {
+        "user_ids": [2 ** 32], "movie_ids": [298], "ages": [21], "genders": [1], "occupations": [6],
+        "genres": [0], "aggregates": [[0] * 13]
+    }
+    assert client.post("/predict/compact", json=compact).status_code == 422
@@ -0,0 +1,121 @@
+"""Unit tests for the on-disk model artifact cache"""
+import hashlib
+import io
+import os
+
+import pytest
+
+from src import model_loader as model_loader_module
+from src.artifact_cache import ArtifactCache, ChecksumMismatch
+
+pytest.importorskip("botocore")
+from botocore.exceptions import EndpointConnectionError  # noqa: E402
+
+
+class StubS3:
+    """In-memory S3 client supporting HEAD and ranged, ETag-pinned GETs"""
+    
+    def __init__(self, body: bytes):
+        self.put(body)
+        self.heads = 0
+        self.gets = []
+        self.offline = False
+        self.corrupt = False
+    
+    def put(self, body: bytes):
+        self.body = body
+        self.etag = f'"{hashlib.md5(body).hexdigest()}"'
+    
+    def head_object(self, Bucket, Key, **kwargs):
+        if self.offline:
+            raise EndpointConnectionError(endpoint_url="http://stub")
+        self.heads += 1
+        return {"ETag": self.etag, "ContentLength": len(self.body)}
+    
+    def get_object(self, Bucket, Key, Range, IfMatch, **kwargs):
+        assert IfMatch == self.etag
+        start, end = (int(v) for v in Range.split('=')[1].split('-'))
+        self.gets.append((start, end))
+        data = self.body[start:end + 1]
+        if self.corrupt:
+            data = bytes(len(data))
+        return {"Body": io.BytesIO(data)}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache with tiny parts so small bodies are fetched in several ranges"""
+    return ArtifactCache(cache_dir=str(tmp_path), part_size_bytes=1000, max_workers=4, max_entries=1)
+
+
+def test_miss_downloads_in_parallel_ranges_then_hits(cache):
+    """Test a miss downloads all ranges and an unchanged object is then read from disk"""
+    body = os.urandom(4500)
+    s3 = StubS3(body)
+    
+    path, version = cache.fetch(s3, "bucket", "model.txt")
+    assert version == s3.etag
+    assert open(path, 'rb').read() == body
+    assert sorted(s3.gets) == [(0, 999), (1000, 1999), (2000, 2999), (3000, 3999), (4000, 4499)]
+    
+    s3.gets.clear()
+    assert cache.fetch(s3, "bucket", "model.txt") == (path, version)
+    assert s3.gets == []
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not [f for f in os.listdir(cache.cache_dir) if f.endswith('.tmp')]
+
+
+def test_changed_object_is_downloaded_and_old_entry_evicted(cache):
+    """Test a new ETag is a miss and only max_entries entries are kept"""
+    s3 = StubS3(b"version one")
+    first_path, _ = cache.fetch(s3, "bucket", "model.txt")
+    s3.put(b"version two, a little longer")
+    second_path, version = cache.fetch(s3, "bucket", "model.txt")
+    assert version == s3.etag
+    assert open(second_path, 'rb').read() == b"version two, a little longer"
+    assert not os.path.exists(first_path)
+
+
+def test_checksum_mismatch_leaves_nothing_behind(cache):
+    """Test a corrupt download is rejected and never renamed into the cache"""
+    s3 = StubS3(b"model bytes")
+    s3.corrupt = True
+    with pytest.raises(ChecksumMismatch):
+        cache.fetch(s3, "bucket", "model.txt")
+    assert os.listdir(cache.cache_dir) == []
+
+
+def test_corrupt_cache_entry_is_redownloaded(cache):
+    """Test a cached file that no longer matches its manifest is fetched again"""
+    s3 = StubS3(b"model bytes")
+    path, _ = cache.fetch(s3, "bucket", "model.txt")
+    with open(path, 'r+b') as f:
+        f.write(b"X")
+    s3.gets.clear()
+    path, _ = cache.fetch(s3, "bucket", "model.txt")
+    assert open(path, 'rb').read() == b"model bytes"
+    assert s3.gets
+
+
+def test_offline_uses_last_cached_copy(cache):
+    """Test the cached copy is used when S3 cannot be reached"""
+    s3 = StubS3(b"model bytes")
+    path, version = cache.fetch(s3, "bucket", "model.txt")
+    s3.offline = True
+    assert cache.fetch(s3, "bucket", "model.txt") == (path, version)
+    with pytest.raises(EndpointConnectionError):
+        cache.fetch(s3, "bucket", "other.txt")
+
+
+def test_model_loader_loads_from_cache(cache, monkeypatch):
+    """Test the model loader takes the model and its version from the cache"""
+    with open("model.txt", 'rb') as f:
+        s3 = StubS3(f.read())
+    monkeypatch.setattr(model_loader_module, "artifact_cache", cache)
+    monkeypatch.setattr(model_loader_module, "get_client", lambda service: s3)
+    
+    loader = model_loader_module.ModelLoader()
+    model = loader._load_model_from_s3("bucket", "models/model.txt")
+    assert model is not None
+    assert loader.model_version == s3.etag
+    assert s3.heads == 1
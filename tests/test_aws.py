@@ -0,0 +1,61 @@
+"""Unit tests for the shared AWS client factory"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import aws
+from src.config import settings
+
+pytest.importorskip("boto3")
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients(monkeypatch):
+    """Offline credentials and no shared clients before and after each test"""
+    monkeypatch.setattr(settings, "aws_access_key_id", "test")
+    monkeypatch.setattr(settings, "aws_secret_access_key", "test")
+    aws.reset_clients()
+    yield
+    aws.reset_clients()
+
+
+def test_client_config_from_settings(monkeypatch):
+    """Test pool size, retries, timeouts and keep-alive come from Settings"""
+    monkeypatch.setattr(settings, "aws_max_pool_connections", 64)
+    client = aws.get_client('s3')
+    config = client.meta.config
+    assert config.max_pool_connections == 64
+    assert config.retries["mode"] == settings.aws_retry_mode
+    assert config.retries["total_max_attempts"] == settings.aws_max_attempts
+    assert config.connect_timeout == settings.aws_connect_timeout_seconds
+    assert config.read_timeout == settings.aws_read_timeout_seconds
+    assert config.tcp_keepalive == settings.aws_tcp_keepalive
+
+
+def test_clients_are_shared_across_threads():
+    """Test every thread gets the same client per service"""
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(lambda _: aws.get_client('logs'), range(32)))
+    assert len({id(client) for client in clients}) == 1
+    assert aws.get_client('cloudwatch') is not clients[0]
+
+
+def test_endpoint_override(monkeypatch):
+    """Test the global and per-service endpoint overrides for local stand-ins"""
+    monkeypatch.setattr(settings, "aws_endpoint_url", "http://localhost:4566")
+    monkeypatch.setenv("AWS_ENDPOINT_URL_S3", "http://localhost:9000")
+    assert aws.get_client('athena').meta.endpoint_url == "http://localhost:4566"
+    assert aws.get_client('s3').meta.endpoint_url == "http://localhost:9000"
+
+
+def test_dependency_client_times_out_within_its_budget(tmp_path):
+    """Test a guarded dependency's client ends hung calls near timeout_ms instead of botocore's defaults"""
+    from src.resilience import Dependency
+    
+    dep = Dependency("s3", timeout_ms=1500, spool_dir=str(tmp_path))
+    config = dep.client('s3').meta.config
+    assert config.read_timeout == 1.5
+    assert config.connect_timeout == min(settings.aws_connect_timeout_seconds, 1.5)
+    assert config.retries["total_max_attempts"] == 1
+    assert dep.client('s3') is not aws.get_client('s3')
+    assert dep.client('s3') is dep.client('s3')
@@ -0,0 +1,55 @@
+"""Unit tests for request coalescing and batch deduplication"""
+import asyncio
+import numpy as np
+import pytest
+
+from src.coalescing import BatchDeduplicator, SingleFlight, unique_rows
+
+
+def test_unique_rows_scatter_back():
+    """Test distinct rows, including NaN rows, are found and map back to every row"""
+    features = np.array([[1, 2], [3, np.nan], [1, 2], [3, np.nan], [5, 6]], dtype=np.float32)
+    first, inverse = unique_rows(features)
+    assert len(first) == 3
+    np.testing.assert_array_equal(features[first][inverse], features)
+
+
+def test_deduplicated_predictions_match():
+    """Test only distinct rows are scored and duplicates are counted"""
+    features = np.repeat(np.arange(12, dtype=np.float32).reshape(4, 3), 3, axis=0)
+    scored = []
+    
+    def predict(x):
+        scored.append(len(x))
+        return x.sum(axis=1)
+    
+    deduplicator = BatchDeduplicator(enabled=True, min_rows=2)
+    np.testing.assert_array_equal(deduplicator.predict(predict, features), features.sum(axis=1))
+    assert scored == [4]
+    assert deduplicator.get_metrics()["duplicate_rows_saved"] == 8
+
+
+def test_single_flight_shares_concurrent_calls():
+    """Test concurrent identical calls run once and share results and errors"""
+    flight = SingleFlight(enabled=True)
+    calls = []
+    
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if value == "bad":
+            raise ValueError(value)
+        return value
+    
+    async def main():
+        results = await asyncio.gather(*[flight.run("a", lambda: work("a")) for _ in range(5)])
+        with pytest.raises(ValueError):
+            await asyncio.gather(flight.run("b", lambda: work("bad")), flight.run("b", lambda: work("bad")))
+        # Calls after the first one finished are not coalesced
+        await flight.run("a", lambda: work("a"))
+        return results
+    
+    assert asyncio.run(main()) == ["a"] * 5
+    assert calls == ["a", "bad", "a"]
+    metrics = flight.get_metrics()
+    assert (metrics["calls"], metrics["coalesced"], metrics["in_flight"]) == (8, 5, 0)
@@ -0,0 +1,427 @@
+"""Unit tests for data pipeline"""
+import asyncio
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import pytest
+
+from src import data_pipeline
+from src.config import settings
+from src.data_pipeline import (
+    AthenaQueryClient, AthenaQueryError, format_athena_parameter,
+    build_partition_predicate, build_predictions_query
+)
+
+
+class StubAthenaClient:
+    """Local stand-in for the boto3 Athena client"""
+    
+    def __init__(self, rows, page_size=2, polls_until_done=2, final_state="SUCCEEDED"):
+        self.rows = rows
+        self.page_size = page_size
+        self.polls_until_done = polls_until_done
+        self.final_state = final_state
+        self.started = []
+        self.polls = 0
+        # Threads each API call ran on
+        self.threads = set()
+    
+    def start_query_execution(self, **kwargs):
+        self.threads.add(threading.get_ident())
+        self.started.append(kwargs)
+        return {"QueryExecutionId": f"qe-{len(self.started)}"}
+    
+    def get_query_execution(self, QueryExecutionId):
+        self.threads.add(threading.get_ident())
+        self.polls += 1
+        state = self.final_state if self.polls >= self.polls_until_done else "RUNNING"
+        return {"QueryExecution": {
+            "QueryExecutionId": QueryExecutionId,
+            "Status": {"State": state, "StateChangeReason": "stub"},
+            "ResultConfiguration": {"OutputLocation": f"s3://bucket/athena-results/{QueryExecutionId}.csv"}
+        }}
+    
+    def get_paginator(self, operation):
+        assert operation == "get_query_results"
+        return self
+    
+    def paginate(self, QueryExecutionId):
+        self.threads.add(threading.get_ident())
+        header = {"Data": [{"VarCharValue": "user_id"}, {"VarCharValue": "prediction"}, {"VarCharValue": "gender"}]}
+        data = [
+            {"Data": [{"VarCharValue": str(user_id)}, {"VarCharValue": str(prediction)}, {"VarCharValue": gender}]}
+            for user_id, prediction, gender in self.rows
+        ]
+        metadata = {"ColumnInfo": [
+            {"Name": "user_id", "Type": "bigint"},
+            {"Name": "prediction", "Type": "double"},
+            {"Name": "gender", "Type": "varchar"}
+        ]}
+        rows = [header] + data
+        for i in range(0, len(rows), self.page_size):
+            yield {"ResultSet": {"Rows": rows[i:i + self.page_size], "ResultSetMetadata": metadata}}
+
+
+def make_client(stub, **kwargs):
+    return AthenaQueryClient(
+        client=stub, database="analytics", output_location="s3://bucket/athena-results/",
+        poll_initial_delay=0.001, poll_max_delay=0.002, **kwargs
+    )
+
+
+def test_format_athena_parameter():
+    """Test parameter literals are quoted and escaped"""
+    assert format_athena_parameter(42) == "42"
+    assert format_athena_parameter(0.5) == "0.5"
+    assert format_athena_parameter("O'Brien") == "'O''Brien'"
+    assert format_athena_parameter(True) == "true"
+
+
+def test_execute_binds_parameters_and_paginates():
+    """Test queries are parameterized and results are streamed across pages"""
+    rows = [(259, 0.75, "M"), (260, 0.25, "F"), (261, 0.5, "M"), (262, 0.1, "F")]
+    stub = StubAthenaClient(rows, page_size=2)
+    client = make_client(stub)
+    
+    results = asyncio.run(client.execute("SELECT * FROM t WHERE user_id = ? AND gender = ?", [259, "M'; DROP"]))
+    
+    request = stub.started[0]
+    assert request["ExecutionParameters"] == ["259", "'M''; DROP'"]
+    assert "DROP" not in request["QueryString"]
+    assert request["QueryExecutionContext"] == {"Database": "analytics"}
+    assert [r["user_id"] for r in results] == [259, 260, 261, 262]
+    assert results[0] == {"user_id": 259, "prediction": 0.75, "gender": "M"}
+    assert stub.polls >= 2, "Should poll until the query succeeds"
+
+
+def test_execute_keeps_api_calls_off_the_event_loop():
+    """Test start, polls and result pages run in the executor, not on the loop thread"""
+    stub = StubAthenaClient([(1, 0.5, "M")], polls_until_done=3)
+    client = make_client(stub)
+    
+    async def main():
+        loop_thread = threading.get_ident()
+        ticks = 0
+        
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+        
+        task = asyncio.ensure_future(ticker())
+        rows = await client.execute("SELECT 1")
+        task.cancel()
+        return loop_thread, ticks, rows
+    
+    loop_thread, ticks, rows = asyncio.run(main())
+    assert rows == [{"user_id": 1, "prediction": 0.5, "gender": "M"}]
+    assert stub.threads and loop_thread not in stub.threads
+    assert ticks > 3, "The loop should keep running other tasks while the query runs"
+
+
+def test_execute_uses_result_cache():
+    """Test repeated queries are served from the cache without a new execution"""
+    stub = StubAthenaClient([(1, 0.5, "M")])
+    client = make_client(stub, cache_ttl_seconds=60)
+    
+    first = client.execute_sync("SELECT * FROM t WHERE user_id = ?", [1])
+    second = client.execute_sync("SELECT * FROM t WHERE user_id = ?", [1])
+    client.execute_sync("SELECT * FROM t WHERE user_id = ?", [2])
+    
+    assert first == second
+    assert len(stub.started) == 2, "Only distinct queries should reach Athena"
+    assert client.cache_hits == 1
+
+
+def test_failed_query_raises():
+    """Test failed queries surface as AthenaQueryError"""
+    stub = StubAthenaClient([], final_state="FAILED", polls_until_done=1)
+    client = make_client(stub)
+    
+    with pytest.raises(AthenaQueryError):
+        asyncio.run(client.execute("SELECT 1"))
+
+
+def test_prediction_queries_raise_instead_of_returning_nothing(monkeypatch):
+    """Test query failures and blocking calls from a running loop raise, while coroutines get the async variant"""
+    stub = StubAthenaClient([(1, 0.5, "M")], polls_until_done=1)
+    monkeypatch.setattr(data_pipeline, "athena_query_client", make_client(stub))
+    monkeypatch.setattr(data_pipeline, "get_athena_client", lambda: stub)
+    monkeypatch.setattr(settings, "athena_database", "analytics")
+    monkeypatch.setattr(settings, "athena_table", "model_predictions")
+    window = dict(start_date="2024-12-01", end_date="2024-12-01")
+    
+    assert data_pipeline.query_predictions_from_athena(**window, user_id=1)[0]["user_id"] == 1
+    
+    async def handler():
+        with pytest.raises(RuntimeError, match="await execute"):
+            data_pipeline.query_predictions_from_athena(**window, user_id=2)
+        return await data_pipeline.query_predictions_from_athena_async(**window, user_id=3)
+    
+    assert asyncio.run(handler())[0]["user_id"] == 1
+    assert len(stub.started) == 2, "The blocked call must not reach Athena"
+    
+    stub.final_state = "FAILED"
+    with pytest.raises(AthenaQueryError):
+        data_pipeline.query_predictions_from_athena(**window, user_id=4)
+
+
+def _matches(predicate, parameters, dt):
+    """Evaluate a partition predicate for one hour"""
+    values = iter(parameters)
+    expr = re.sub(r"\?", lambda _: str(next(values)), predicate)
+    expr = re.sub(r"(\w+) BETWEEN (\d+) AND (\d+)", r"(\2 <= \1 <= \3)", expr)
+    expr = expr.replace(" = ", " == ").replace("AND", "and").replace("OR", "or")
+    return eval(expr, {}, {"year": dt.year, "month": dt.month, "day": dt.day, "hour": dt.hour})
+
+
+@pytest.mark.parametrize("start,end", [
+    ("2024-12-30T22:00", "2025-01-02T01:00"),
+    ("2024-01-01", "2025-12-31"),
+    ("2024-02-05T03:00", "2024-03-01T00:00"),
+    ("2024-02-29T23:00", "2024-02-29T23:00"),
+])
+def test_partition_predicate_covers_exact_window(start, end):
+    """Test the partition predicate selects exactly the hours in the window"""
+    predicate, parameters = build_partition_predicate(start, end)
+    first = datetime.fromisoformat(start)
+    last = datetime.fromisoformat(end) if "T" in end else datetime.fromisoformat(end).replace(hour=23)
+    
+    dt = first - timedelta(days=3)
+    while dt <= last + timedelta(days=3):
+        assert _matches(predicate, parameters, dt) == (first <= dt <= last), dt
+        dt += timedelta(hours=1)
+
+
+def test_build_predictions_query_projects_columns():
+    """Test column projection, user filter and rejection of unknown columns"""
+    query, parameters = build_predictions_query(
+        "analytics", "model_predictions", "2024-12-01", "2024-12-01",
+        user_id=259, columns=["user_id", "prediction"]
+    )
+    assert query.startswith("SELECT user_id, prediction FROM analytics.model_predictions WHERE")
+    assert "date" not in query
+    assert parameters[-1] == 259
+    
+    with pytest.raises(ValueError):
+        build_predictions_query("analytics", "model_predictions", columns=["user_id; DROP TABLE x"])
+
+
+def _write_small_files(store, hour, n_files, rows_per_file):
+    """Write small per-request Parquet files like save_prediction_to_s3 does"""
+    import pandas as pd
+    from src.data_pipeline import partition_prefix
+    
+    prefix = partition_prefix(hour)
+    user_id = 1000
+    for i in range(n_files):
+        records = []
+        for _ in range(rows_per_file):
+            user_id = (user_id * 7919) % 997
+            records.append({"user_id": user_id, "movie_id": i, "prediction": 0.5, "timestamp": float(i)})
+        store.put(f"{prefix}prediction_{i:04d}.parquet", pd.DataFrame(records).to_parquet(index=False))
+    return prefix
+
+
+def test_compaction_merges_sorted_zstd_files(tmp_path):
+    """Test a closed partition is merged into sorted, zstd-compressed files"""
+    import pyarrow.parquet as pq
+    from src.data_pipeline import LocalObjectStore, compact_prediction_partition, list_partition_files
+    
+    store = LocalObjectStore(str(tmp_path))
+    hour = datetime(2024, 12, 1, 10)
+    _write_small_files(store, hour, n_files=20, rows_per_file=5)
+    
+    result = compact_prediction_partition(store, hour, target_rows_per_file=60, now=datetime(2024, 12, 1, 12))
+    
+    assert result["status"] == "compacted"
+    assert result["input_files"] == 20 and result["output_files"] == 2
+    files = list_partition_files(store, hour)
+    assert len(files) == 2, "Only compacted files should remain"
+    tables = [pq.read_table(tmp_path / f) for f in files]
+    user_ids = [u for t in tables for u in t.column("user_id").to_pylist()]
+    assert len(user_ids) == 100
+    assert user_ids == sorted(user_ids), "Rows should be sorted by user_id"
+    metadata = pq.ParquetFile(tmp_path / files[0]).metadata
+    assert metadata.row_group(0).column(0).compression == "ZSTD"
+
+
+def test_compaction_skips_open_partition(tmp_path):
+    """Test the current hour is never compacted"""
+    from src.data_pipeline import LocalObjectStore, compact_prediction_partition
+    
+    store = LocalObjectStore(str(tmp_path))
+    hour = datetime(2024, 12, 1, 10)
+    _write_small_files(store, hour, n_files=3, rows_per_file=2)
+    
+    result = compact_prediction_partition(store, hour, now=datetime(2024, 12, 1, 10, 30))
+    assert result["status"] == "skipped"
+
+
+def test_compaction_recovers_after_commit(tmp_path, monkeypatch):
+    """Test an interrupted swap is hidden from readers and finished by the next run"""
+    from src import data_pipeline
+    from src.data_pipeline import LocalObjectStore, compact_prediction_partition, list_partition_files
+    
+    store = LocalObjectStore(str(tmp_path))
+    hour = datetime(2024, 12, 1, 10)
+    _write_small_files(store, hour, n_files=4, rows_per_file=3)
+    now = datetime(2024, 12, 1, 12)
+    
+    def crash(*args):
+        raise RuntimeError("crashed after commit")
+    
+    monkeypatch.setattr(data_pipeline, "_finish_swap", crash)
+    with pytest.raises(RuntimeError):
+        compact_prediction_partition(store, hour, now=now)
+    
+    # Readers see only the staged output, never inputs and output together
+    files = list_partition_files(store, hour)
+    assert len(files) == 1 and "_staging" in files[0]
+    
+    monkeypatch.undo()
+    result = compact_prediction_partition(store, hour, now=now)
+    assert result["status"] == "recovered"
+    files = list_partition_files(store, hour)
+    assert len(files) == 1 and "compacted_" in files[0]
+
+
+def test_compaction_swap_never_lists_rows_twice(tmp_path):
+    """Test a raw prefix listing (as Athena does) never shows inputs and outputs together"""
+    from src.data_pipeline import LocalObjectStore, S3ObjectStore, compact_prediction_partition
+    
+    class ListingStore(LocalObjectStore):
+        """Checks the raw listing after every copy into the partition"""
+        
+        def copy(self, source, dest):
+            super().copy(source, dest)
+            live = [k for k in self.list(prefix) if k.endswith(".parquet") and "_staging" not in k]
+            assert not any("prediction_" in k for k in live), "inputs still listed next to an output"
+            copies.append(dest)
+    
+    copies = []
+    store = ListingStore(str(tmp_path))
+    hour = datetime(2024, 12, 1, 10)
+    prefix = _write_small_files(store, hour, n_files=6, rows_per_file=4)
+    compact_prediction_partition(store, hour, target_rows_per_file=10, now=datetime(2024, 12, 1, 12))
+    assert len(copies) == 3
+    
+    class StubS3:
+        def __init__(self):
+            self.calls = []
+        
+        def copy_object(self, **kwargs):
+            self.calls.append(kwargs)
+    
+    stub = StubS3()
+    S3ObjectStore(bucket="b", client=stub).copy("p/_staging/a.parquet", "p/a.parquet")
+    assert stub.calls == [{"Bucket": "b", "Key": "p/a.parquet", "CopySource": {"Bucket": "b", "Key": "p/_staging/a.parquet"}}]
+
+
+def test_capture_sampling_is_deterministic_per_user():
+    """Test users are kept or dropped consistently at the configured rates"""
+    from src.data_pipeline import CapturePolicy
+    
+    policy = CapturePolicy(
+        default_rate=0.2, endpoint_rates={"predict_batch": 0.05}, version_rates={"canary": 1.0},
+        low_confidence_margin=0.0
+    )
+    user_ids = list(range(20000))
+    predictions = [0.9] * len(user_ids)
+    sampled, always = policy.select("predict", "v1", user_ids, predictions)
+    assert len(always) == 0
+    assert abs(len(sampled) / len(user_ids) - 0.2) < 0.02
+    assert list(policy.select("predict", "v1", user_ids, predictions)[0]) == list(sampled)
+    # A user sampled at 5% is also sampled at 20%
+    assert set(policy.select("predict_batch", "v1", user_ids, predictions)[0]) <= set(sampled)
+    assert len(policy.select("predict_batch", "canary", user_ids, predictions)[0]) == len(user_ids)
+
+
+def test_capture_always_keeps_low_confidence_and_errors():
+    """Test low-confidence rows and failed requests bypass sampling"""
+    from src.data_pipeline import CapturePolicy, PredictionCapture
+    
+    written = []
+    capture = PredictionCapture(
+        CapturePolicy(default_rate=0.0, endpoint_rates={}, version_rates={}, low_confidence_margin=0.05),
+        reservoir_size=0, flush_rows=100, writer=lambda rows, partition_time: written.append(rows) or True
+    )
+    built = []
+    
+    def make_row(i):
+        built.append(i)
+        return {"row": i}
+    
+    kept = capture.record("predict_batch", "v1", [1, 2, 3], [0.9, 0.52, 0.1], make_row)
+    capture.record_error({"row": "failed"})
+    assert kept == 1 and built == [1]
+    assert capture.flush() == 2
+    assert [(r["row"], r["capture_reason"], r["sample_weight"]) for r in written[0]] == [
+        (1, "low_confidence", 1.0), ("failed", "error", 1.0)
+    ]
+
+
+def test_capture_reservoir_per_hour():
+    """Test each hour keeps a bounded reservoir, written to its own partition once the hour ends"""
+    from src.data_pipeline import CapturePolicy, PredictionCapture
+    
+    written = []
+    capture = PredictionCapture(
+        CapturePolicy(default_rate=1.0, endpoint_rates={}, version_rates={}, low_confidence_margin=0.0),
+        reservoir_size=50, writer=lambda rows, partition_time: written.append((partition_time, rows)) or True,
+        seed=0
+    )
+    hour = datetime(2024, 12, 1, 10, tzinfo=timezone.utc).timestamp()
+    for start in range(0, 1000, 100):
+        capture.record("predict", "v1", list(range(start, start + 100)), [0.9] * 100,
+                       lambda i, start=start: {"user_id": start + i}, now=hour + 60)
+    assert not capture.flush_due(now=hour + 120)
+    assert capture.flush(now=hour + 120) == 0
+    
+    assert capture.flush_due(now=hour + 3600)
+    assert capture.flush(now=hour + 3600) == 50
+    partition_time, rows = written[0]
+    assert partition_time == datetime(2024, 12, 1, 10)
+    assert len({r["user_id"] for r in rows}) == 50
+    assert all(r["sample_weight"] == 1000 / 50 for r in rows)
+
+
+def test_capture_flush_due_while_requests_add_reservoirs():
+    """Test the flush check can run while request threads keep creating reservoirs"""
+    from src.data_pipeline import CapturePolicy, PredictionCapture
+    
+    capture = PredictionCapture(
+        CapturePolicy(default_rate=1.0, endpoint_rates={}, version_rates={}, low_confidence_margin=0.0),
+        reservoir_size=1, flush_rows=10 ** 9, flush_interval_seconds=1e9, writer=lambda rows, partition_time: True
+    )
+    hour = datetime(2024, 12, 1, 10, tzinfo=timezone.utc).timestamp()
+    stop = threading.Event()
+    
+    def check():
+        checks = 0
+        while not stop.is_set():
+            # Every reservoir belongs to the current hour, so nothing is due
+            assert not capture.flush_due(now=hour + 60)
+            checks += 1
+        return checks
+    
+    def record(worker):
+        for i in range(2000):
+            capture.record("predict", f"v{worker}-{i}", [i], [0.9], lambda j: {"user_id": j}, now=hour + 60)
+    
+    # Switch threads as often as possible so the check overlaps reservoir inserts
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            checker = pool.submit(check)
+            for future in [pool.submit(record, worker) for worker in range(4)]:
+                future.result()
+            stop.set()
+            assert checker.result() > 0
+    finally:
+        sys.setswitchinterval(interval)
+    assert len(capture._reservoirs) == 8000
@@ -0,0 +1,54 @@
+"""Unit tests for prediction explanations"""
+import numpy as np
+import pytest
+
+from src.model_loader import model_loader
+from src.feature_extractor import FeatureExtractor
+from src.explainer import ContributionExplainer, top_contributions
+
+
+@pytest.fixture
+def features():
+    """Feature rows with a duplicate and a missing value"""
+    rng = np.random.default_rng(0)
+    rows = rng.uniform(0, 1, size=(4, len(FeatureExtractor.FEATURE_ORDER))).astype(np.float32)
+    rows[:, 0] = [21, 35, 50, 21]
+    rows[3] = rows[0]
+    rows[2, -1] = np.nan
+    return rows
+
+
+@pytest.mark.skipif(not model_loader.model_loaded, reason="Model not loaded")
+def test_contributions_sum_to_prediction(features):
+    """Test contributions plus base value reproduce the model's probability"""
+    explainer = ContributionExplainer(max_cache_entries=100)
+    contributions, cached = explainer.contributions(features)
+    
+    assert contributions.shape == (4, features.shape[1] + 1)
+    assert cached == 0
+    probabilities = 1.0 / (1.0 + np.exp(-contributions.sum(axis=1)))
+    np.testing.assert_allclose(probabilities, model_loader.predict(features), rtol=1e-6)
+    np.testing.assert_array_equal(contributions[0], contributions[3])
+
+
+@pytest.mark.skipif(not model_loader.model_loaded, reason="Model not loaded")
+def test_contributions_are_cached(features):
+    """Test repeated rows are served from the cache"""
+    explainer = ContributionExplainer(max_cache_entries=100)
+    first, _ = explainer.contributions(features)
+    second, cached = explainer.contributions(features[[1, 0]])
+    
+    assert cached == 2
+    np.testing.assert_array_equal(second, first[[1, 0]])
+    assert explainer.get_cache_stats()["cache_entries"] == 3
+
+
+def test_top_contributions_sorted_by_magnitude():
+    """Test top-N selection orders features by absolute contribution"""
+    contributions = np.array([[0.1, -0.5, 0.3, 0.0, -1.0]])
+    features = np.array([[1.0, np.nan, 3.0, 4.0]])
+    
+    top = top_contributions(contributions, features, ["a", "b", "c", "d"], top_n=2)
+    assert [item["feature"] for item in top[0]] == ["b", "c"]
+    assert top[0][0] == {"feature": "b", "value": None, "contribution": -0.5}
+    assert len(top_contributions(contributions, features, ["a", "b", "c", "d"], top_n=10)[0]) == 4
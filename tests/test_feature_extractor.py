@@ -109,3 +109,61 @@ def test_none_values_handling():
     assert features is not None, "Features should be extracted even with None values"
     assert not np.isnan(features).any(), "Features should not contain NaN values"
 
+
+
+def to_compact(requests):
+    """Encode PredictionRequests in the compact columnar format"""
+    from src.schemas import COMPACT_GENRES, COMPACT_AGGREGATES
+    
+    payload = {k: [] for k in ("user_ids", "movie_ids", "ages", "genders", "occupations", "genres", "aggregates")}
+    for request in requests:
+        data = request.model_dump(by_alias=True)
+        payload["user_ids"].append(request.user_id)
+        payload["movie_ids"].append(request.movie_id)
+        payload["ages"].append(request.age)
+        payload["genders"].append(feature_extractor.gender_map[request.gender])
+        payload["occupations"].append(feature_extractor.occupation_map.get(request.occupation_new, -1))
+        payload["genres"].append(sum(1 << i for i, genre in enumerate(COMPACT_GENRES) if data[genre]))
+        payload["aggregates"].append([data[name] or 0.0 for name in COMPACT_AGGREGATES])
+    return payload
+
+
+def test_extract_compact_features_matches_named_schema():
+    """Test compact decoding produces the same matrix as the named-field schema"""
+    from src.schemas import CompactPredictionRequest
+    
+    requests = [
+        PredictionRequest(
+            user_id=259, movie_id=298, age=21, gender="M", occupation_new="student",
+            release_year=1997.0, Adventure=1, War=1, Western=1, user_total_ratings=2,
+            user_liked_ratings=2, user_like_rate=1.0, occupation_like_rate=0.5
+        ),
+        PredictionRequest(
+            user_id=260, movie_id=299, age=25, gender="F", occupation_new="pilot",
+            Action=1, **{"Film-Noir": 1, "Sci-Fi": 1}, movie_like_rate=None
+        )
+    ]
+    compact = CompactPredictionRequest(**to_compact(requests))
+    
+    expected = feature_extractor.extract_batch_features(requests)
+    features = feature_extractor.extract_compact_features(compact)
+    
+    assert features.dtype == np.float32
+    np.testing.assert_array_equal(features, expected)
+
+
+def test_compact_request_rejects_mismatched_columns():
+    """Test column lengths and aggregate width are validated"""
+    from pydantic import ValidationError
+    from src.schemas import CompactPredictionRequest
+    
+    with pytest.raises(ValidationError):
+        CompactPredictionRequest(
+            user_ids=[1, 2], movie_ids=[1], ages=[20, 30], genders=[0, 1],
+            occupations=[0, 1], genres=[0, 0], aggregates=[[0.0] * 13, [0.0] * 13]
+        )
+    with pytest.raises(ValidationError):
+        CompactPredictionRequest(
+            user_ids=[1], movie_ids=[1], ages=[20], genders=[0],
+            occupations=[0], genres=[1 << 18], aggregates=[[0.0] * 13]
+        )
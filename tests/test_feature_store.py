@@ -0,0 +1,95 @@
+"""Unit tests for the online aggregate feature store"""
+import numpy as np
+import pytest
+
+from src.feature_extractor import FeatureExtractor
+from src.feature_store import FeatureStore, CounterTable
+from src.schemas import FeedbackEvent, COMPACT_GENRES
+
+COLUMNS = {name: i for i, name in enumerate(FeatureExtractor.FEATURE_ORDER)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Enabled store with a few events for user 1 / movie 10"""
+    store = FeatureStore(snapshot_path=str(tmp_path / "store.npz"), snapshot_interval_seconds=0)
+    store.enabled = True
+    store.record_events([
+        FeedbackEvent(user_id=1, movie_id=10, liked=True, occupation_new="student", genres=["Action", "War"]),
+        FeedbackEvent(user_id=1, movie_id=11, liked=False, occupation_new="student", genres=["Action"]),
+        FeedbackEvent(user_id=2, movie_id=10, liked=True, occupation_new="student", genres=["Comedy"]),
+        FeedbackEvent(user_id=1, movie_id=10, liked=True)
+    ])
+    return store
+
+
+def feature_rows(n):
+    """Feature rows for student users rating an Action/War movie, with historical aggregates of 7"""
+    features = np.full((n, len(COLUMNS)), 7.0, dtype=np.float32)
+    features[:, COLUMNS['occupation_new']] = FeatureExtractor.OCCUPATION_CATEGORIES.index('student')
+    features[:, [COLUMNS[g] for g in COMPACT_GENRES]] = 0
+    features[:, COLUMNS['Action']] = 1
+    features[:, COLUMNS['War']] = 1
+    return features
+
+
+def test_enrich_derives_aggregates(store):
+    """Test counters are added to the request aggregates and rates are derived from the sums"""
+    features = store.enrich(feature_rows(2), user_ids=[1, 99], movie_ids=[10, 99])
+    row = features[0]
+    assert row[COLUMNS['user_total_ratings']] == 7 + 3
+    assert row[COLUMNS['user_liked_ratings']] == 7 + 2
+    assert row[COLUMNS['user_like_rate']] == pytest.approx(9 / 10)
+    assert row[COLUMNS['movie_total_ratings']] == 7 + 3
+    assert row[COLUMNS['movie_like_rate']] == pytest.approx(1.0)
+    assert row[COLUMNS['occupation_movie_total']] == 7 + 2
+    # Action seen twice (one like) and War once (one like)
+    assert row[COLUMNS['user_genre_total']] == 7 + 3
+    assert row[COLUMNS['user_genre_like_rate']] == pytest.approx(9 / 10)
+    # Unknown keys keep what the request sent
+    assert (features[1, [COLUMNS['user_total_ratings'], COLUMNS['movie_like_rate']]] == 7.0).all()
+
+
+def test_new_events_extend_historical_aggregates(tmp_path):
+    """Test one feedback event moves a user with 600 historical ratings to 601, not to 1"""
+    store = FeatureStore(snapshot_path=str(tmp_path / "store.npz"))
+    store.enabled = True
+    store.record(user_id=5, movie_id=20, liked=False)
+    features = feature_rows(1)
+    features[0, COLUMNS['user_total_ratings']] = 600
+    features[0, COLUMNS['user_liked_ratings']] = 450
+    features[0, COLUMNS['user_like_rate']] = 0.75
+    features[0, COLUMNS['movie_total_ratings']] = 0
+    features[0, COLUMNS['movie_liked_ratings']] = 0
+    row = store.enrich(features, user_ids=[5], movie_ids=[20])[0]
+    assert row[COLUMNS['user_total_ratings']] == 601 and row[COLUMNS['user_liked_ratings']] == 450
+    assert row[COLUMNS['user_like_rate']] == pytest.approx(450 / 601)
+    # A movie with no history gets exactly the store's counts
+    assert row[COLUMNS['movie_total_ratings']] == 1 and row[COLUMNS['movie_like_rate']] == 0.0
+
+
+def test_snapshot_round_trip(store):
+    """Test a snapshot restores identical counters"""
+    assert store.snapshot_due()
+    assert store.snapshot()
+    assert not store.snapshot_due()
+    
+    restored = FeatureStore(snapshot_path=store.snapshot_path)
+    restored.enabled = True
+    assert restored.restore()
+    assert restored.events_ingested == store.events_ingested
+    np.testing.assert_array_equal(
+        restored.enrich(feature_rows(3), [1, 2, 3], [10, 11, 12]),
+        store.enrich(feature_rows(3), [1, 2, 3], [10, 11, 12])
+    )
+
+
+def test_counter_table_grows():
+    """Test tables keep their counts when the backing array is resized"""
+    table = CounterTable(2, capacity=2)
+    for key in range(5):
+        row = table.row(key)
+        table.counts[row, 0] += key
+    assert len(table) == 5
+    np.testing.assert_array_equal(table.counts[table.lookup([4, 0, 9]).clip(0), 0], [4, 0, 0])
+    assert table.lookup([9])[0] == -1
@@ -0,0 +1,122 @@
+"""Tests for the gRPC scoring service"""
+import asyncio
+import grpc
+import numpy as np
+import pytest
+
+from src.grpc_service import InvalidRequest, create_grpc_server, decode_features, request_rows
+from src.model_loader import model_loader
+from src.protos import prediction_pb2, prediction_pb2_grpc
+
+
+def make_features(n):
+    rng = np.random.default_rng(0)
+    features = np.zeros((n, 34), dtype=np.float32)
+    features[:, 0] = rng.integers(7, 70, n)
+    features[:, 1] = rng.integers(0, 2, n)
+    features[:, 20] = rng.integers(0, 8, n)
+    features[:, 21] = rng.integers(2, 600, n)
+    features[:, 29:33] = rng.random((n, 4))
+    features[:, 33] = 1997.0
+    return features
+
+
+def run_with_server(coro_fn):
+    """Start the gRPC server on a free localhost port and run coro_fn(stub)"""
+    async def main():
+        server, port = create_grpc_server(port=0, host="127.0.0.1")
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+                return await coro_fn(prediction_pb2_grpc.PredictionServiceStub(channel))
+        finally:
+            await server.stop(None)
+    return asyncio.run(main())
+
+
+@pytest.mark.skipif(not model_loader.model_loaded, reason="Model not loaded")
+def test_grpc_unary_predict():
+    """Test unary Predict with packed features matches ModelLoader.predict"""
+    features = make_features(5)
+    
+    async def call(stub):
+        return await stub.Predict(prediction_pb2.PredictRequest(
+            request_id="r1",
+            features=prediction_pb2.PackedFeatures(num_features=34, values=features.astype('<f4').tobytes())
+        ))
+    
+    response = run_with_server(call)
+    assert response.request_id == "r1"
+    np.testing.assert_allclose(response.predictions, model_loader.predict(features), rtol=1e-6)
+    assert response.model_version == model_loader.model_version
+
+
+@pytest.mark.skipif(not model_loader.model_loaded, reason="Model not loaded")
+def test_grpc_streaming_predict():
+    """Test bidirectional streaming returns one ordered reply per request"""
+    features = make_features(3)
+    
+    async def call(stub):
+        async def requests():
+            for i in range(3):
+                yield prediction_pb2.PredictRequest(
+                    request_id=str(i),
+                    features=prediction_pb2.PackedFeatures(num_features=34, values=features[i:i + 1].tobytes())
+                )
+        return [response async for response in stub.PredictStream(requests())]
+    
+    responses = run_with_server(call)
+    assert [r.request_id for r in responses] == ["0", "1", "2"]
+    expected = model_loader.predict(features)
+    for i, response in enumerate(responses):
+        assert response.predictions[0] == pytest.approx(expected[i], rel=1e-6)
+
+
+def test_grpc_rejects_malformed_features():
+    """Test malformed packed features return INVALID_ARGUMENT"""
+    async def call(stub):
+        return await stub.Predict(prediction_pb2.PredictRequest(
+            features=prediction_pb2.PackedFeatures(num_features=34, values=b"\x00" * 10)
+        ))
+    
+    with pytest.raises(grpc.aio.AioRpcError) as exc_info:
+        run_with_server(call)
+    assert exc_info.value.code() in (grpc.StatusCode.INVALID_ARGUMENT, grpc.StatusCode.UNAVAILABLE)
+
+
+def test_request_rows_counts_payload_rows():
+    """Test scheduling cost comes from the payload, with or without user_ids"""
+    packed = prediction_pb2.PackedFeatures(num_features=34, values=make_features(250).tobytes())
+    assert request_rows(prediction_pb2.PredictRequest(features=packed)) == 250
+    compact = prediction_pb2.CompactRows(ages=[21] * 7, genders=[1] * 7, occupations=[6] * 7, genres=[0] * 7)
+    assert request_rows(prediction_pb2.PredictRequest(compact=compact)) == 7
+    assert request_rows(prediction_pb2.PredictRequest()) == 0
+
+
+def test_grpc_rejects_out_of_range_ids():
+    """Test ids that cannot be packed into a 64-bit pair key are rejected"""
+    packed = prediction_pb2.PackedFeatures(num_features=34, values=make_features(1).tobytes())
+    for ids in ({"user_ids": [1 << 32], "movie_ids": [1]}, {"user_ids": [1], "movie_ids": [-1]}):
+        with pytest.raises(InvalidRequest):
+            decode_features(prediction_pb2.PredictRequest(features=packed, **ids))
+    assert len(decode_features(prediction_pb2.PredictRequest(features=packed, user_ids=[(1 << 32) - 1]))) == 1
+
+
+@pytest.mark.skipif(not model_loader.model_loaded, reason="Model not loaded")
+def test_grpc_compact_rows_match_packed_features():
+    """Test compact rows are decoded by the shared feature extractor"""
+    aggregates = np.array([[2, 2, 0, 0, 2, 2, 5, 5, 1.0, 1.0, 0.0, 1.0, 1997.0]], dtype='<f4')
+    
+    async def call(stub):
+        return await stub.Predict(prediction_pb2.PredictRequest(
+            compact=prediction_pb2.CompactRows(
+                ages=[21], genders=[1], occupations=[6], genres=[(1 << 1) | (1 << 16)],
+                aggregates=aggregates.tobytes()
+            )
+        ))
+    
+    response = run_with_server(call)
+    features = np.zeros((1, 34), dtype=np.float32)
+    features[0, [0, 1, 3, 18, 20]] = [21, 1, 1, 1, 6]
+    features[0, 21:] = aggregates[0]
+    assert response.predictions[0] == pytest.approx(model_loader.predict(features)[0], rel=1e-6)
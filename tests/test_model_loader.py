@@ -87,3 +87,30 @@ def test_model_file_exists():
     model_path = "model.txt"
     assert os.path.exists(model_path), f"Model file should exist at {model_path}"
 
+
+
+def test_predict_cascade():
+    """Test cascade scoring finishes only rows inside the uncertainty band"""
+    import numpy as np
+    
+    if not model_loader.model_loaded:
+        pytest.skip("Model not loaded, skipping cascade test")
+    
+    rng = np.random.default_rng(0)
+    features = rng.uniform(0, 1, size=(200, 34)).astype(np.float32)
+    features[:, 0] = rng.integers(7, 71, size=200)
+    features[:, 33] = rng.integers(1922, 1999, size=200)
+    full = model_loader.predict(features)
+    
+    # A band wider than any margin reproduces full scoring
+    predictions, finished = model_loader.predict_cascade(features, 10, band=1e9, return_mask=True)
+    np.testing.assert_allclose(predictions, full, rtol=1e-9)
+    assert finished.all()
+    
+    # A zero band keeps every row at its first-stage score
+    partial = model_loader.model.predict(features, num_iteration=10)
+    np.testing.assert_allclose(model_loader.predict_cascade(features, 10, band=0.0), partial, rtol=1e-9)
+    
+    predictions, finished = model_loader.predict_cascade(features, 10, band=0.5, return_mask=True)
+    np.testing.assert_allclose(predictions[finished], full[finished], rtol=1e-9)
+    np.testing.assert_allclose(predictions[~finished], partial[~finished], rtol=1e-9)
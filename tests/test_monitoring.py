@@ -0,0 +1,168 @@
+"""Unit tests for monitoring"""
+import os
+
+import numpy as np
+import pytest
+
+from src.monitoring import FeatureDriftMonitor
+
+FEATURE_NAMES = ["age", "gender", "user_like_rate"]
+FEATURE_INFOS = {
+    "age": {"min_value": 7, "max_value": 70, "values": []},
+    "gender": {"min_value": -1, "max_value": 1, "values": [-1, 1, 0]},
+    "user_like_rate": {"min_value": 0, "max_value": 1, "values": []},
+}
+
+
+@pytest.fixture
+def monitor():
+    """Enabled drift monitor over FEATURE_NAMES with 10 bins and no stored baseline"""
+    monitor = FeatureDriftMonitor(n_bins=10, interval_seconds=1e9, min_rows=100, baseline_path="")
+    monitor.enabled = True
+    monitor.configure(FEATURE_NAMES, FEATURE_INFOS)
+    return monitor
+
+
+def sample(rng, n, age_mean=30.0):
+    return np.column_stack([
+        rng.normal(age_mean, 8, n),
+        rng.integers(0, 2, n),
+        rng.random(n)
+    ]).astype(np.float32)
+
+
+def test_drift_detected_on_shifted_feature(monitor):
+    """Test PSI rises only for the feature whose distribution moved"""
+    rng = np.random.default_rng(0)
+    monitor.update(sample(rng, 5000))
+    monitor.compute()  # first full window becomes the baseline
+    # Update in small batches to exercise the row buffer
+    for _ in range(50):
+        monitor.update(sample(rng, 100, age_mean=55.0))
+    result = monitor.compute()
+    
+    assert result["age"]["psi"] > 0.5, "Shifted feature should drift"
+    assert result["gender"]["psi"] < 0.05
+    assert result["user_like_rate"]["psi"] < 0.05
+    assert monitor.get_metrics()["drifted_features"] == ["age"]
+
+
+def test_histogram_bins_match_feature_infos(monitor):
+    """Test out-of-range values and unseen categories land in their own bins"""
+    features = np.array([[5.0, 1.0, 0.5], [80.0, 3.0, 0.5], [np.nan, 0.0, 1.0]], dtype=np.float32)
+    monitor.update(features)
+    monitor._flush()
+    
+    counts = monitor._counts
+    age = counts[0:12]
+    assert age[0] == 2 and age[-1] == 1, "Underflow/NaN and overflow bins"
+    gender = counts[monitor._offsets[2]:]
+    assert list(gender) == [1, 1, 1], "F, M and unseen category"
+
+
+def test_constant_features_are_skipped_and_columns_keep_their_positions():
+    """Test features missing from feature_infos are not monitored and the others still read their own column"""
+    monitor = FeatureDriftMonitor(n_bins=10, interval_seconds=1e9, min_rows=100, baseline_path="")
+    monitor.enabled = True
+    monitor.configure(["gender", "constant", "age"], FEATURE_INFOS)
+    assert monitor.feature_names == ["age", "gender"]
+    
+    monitor.update(np.array([[1.0, 42.0, 69.0], [0.0, 42.0, 7.0]], dtype=np.float32))
+    monitor._flush()
+    age, gender = monitor._counts[:12], monitor._counts[12:]
+    assert age[1] == 1 and age[10] == 1 and age.sum() == 2
+    assert list(gender) == [1, 1, 0]
+
+
+def test_large_batch_bypasses_buffer_without_reordering_buffered_rows():
+    """Test a batch over buffer_rows is counted directly after the rows already buffered"""
+    rng = np.random.default_rng(2)
+    small, large = sample(rng, 10), sample(rng, 300)
+    # min_rows above the rows seen, so no window is taken as a baseline in between
+    monitor, reference = (
+        FeatureDriftMonitor(n_bins=10, interval_seconds=1e9, min_rows=1000, baseline_path="") for _ in range(2)
+    )
+    for drift_monitor in (monitor, reference):
+        drift_monitor.enabled = True
+        drift_monitor.configure(FEATURE_NAMES, FEATURE_INFOS)
+    monitor.update(small)
+    monitor.update(large)
+    monitor._flush()
+    reference.update(np.vstack([small, large]))
+    reference._flush()
+    np.testing.assert_array_equal(monitor._counts, reference._counts)
+    assert monitor._counts.sum() == 310 * 3 and monitor.rows_observed == 310
+
+
+def test_short_windows_accumulate_until_min_rows_then_persist_the_baseline(tmp_path):
+    """Test windows under min_rows are kept, and the first full one is stored and reloaded on configure"""
+    rng = np.random.default_rng(3)
+    path = str(tmp_path / "baseline.json")
+    monitor = FeatureDriftMonitor(n_bins=10, interval_seconds=1e9, min_rows=100, baseline_path=path)
+    monitor.enabled = True
+    monitor.configure(FEATURE_NAMES, FEATURE_INFOS)
+    
+    monitor.update(sample(rng, 60))
+    assert monitor.compute() == {} and not monitor.get_metrics()["baseline_ready"]
+    assert monitor._counts.sum() == 60 * 3 and not os.path.exists(path)
+    monitor.update(sample(rng, 60))
+    monitor.compute()
+    assert monitor.get_metrics()["baseline_ready"] and monitor._counts.sum() == 0
+    assert monitor._baseline.sum() == 120 * 3
+    
+    restarted = FeatureDriftMonitor(n_bins=10, interval_seconds=1e9, min_rows=100, baseline_path=path)
+    restarted.configure(FEATURE_NAMES, FEATURE_INFOS)
+    np.testing.assert_array_equal(restarted._baseline, monitor._baseline)
+
+
+def test_stored_baseline_with_other_bins_or_features(monitor, tmp_path):
+    """Test a baseline built with other bins is ignored and one from another feature set loads the shared features"""
+    rng = np.random.default_rng(1)
+    monitor.update(sample(rng, 2000))  # first update computes: the window becomes the baseline
+    assert monitor._baseline.sum() == 2000 * 3
+    path = str(tmp_path / "baseline.json")
+    monitor.save_baseline(path)
+    
+    coarser = FeatureDriftMonitor(n_bins=5, interval_seconds=1e9, min_rows=100, baseline_path="")
+    coarser.configure(FEATURE_NAMES, FEATURE_INFOS)
+    coarser.load_baseline(path)
+    assert not coarser.get_metrics()["baseline_ready"]
+    
+    infos = dict(FEATURE_INFOS, tenure_days={"min_value": 0, "max_value": 3650, "values": []})
+    retrained = FeatureDriftMonitor(n_bins=10, interval_seconds=1e9, min_rows=100, baseline_path="")
+    retrained.configure(["age", "tenure_days", "gender"], infos)
+    retrained.load_baseline(path)
+    age, tenure = slice(0, 12), slice(12, 24)
+    np.testing.assert_array_equal(retrained._baseline[age], monitor._baseline[age])
+    assert retrained._baseline[tenure].sum() == 0
+    np.testing.assert_array_equal(retrained._baseline[24:], monitor._baseline[monitor._offsets[2]:])
+
+
+def test_feature_missing_from_stored_baseline_is_not_reported_until_captured(monitor, tmp_path, caplog):
+    """Test a feature a new model added is left out of drift until the next full window becomes its baseline"""
+    rng = np.random.default_rng(4)
+    path = str(tmp_path / "baseline.json")
+    monitor.update(sample(rng, 2000))
+    monitor.save_baseline(path)
+    
+    def rows(n):
+        return np.column_stack([sample(rng, n), rng.uniform(0, 3650, n)]).astype(np.float32)
+    
+    infos = dict(FEATURE_INFOS, tenure_days={"min_value": 0, "max_value": 3650, "values": []})
+    retrained = FeatureDriftMonitor(n_bins=10, interval_seconds=1e9, min_rows=100, baseline_path=path)
+    retrained.enabled = True
+    with caplog.at_level("WARNING", logger="src.monitoring"):
+        retrained.configure(FEATURE_NAMES + ["tenure_days"], infos)
+    assert "tenure_days" in caplog.text
+    assert retrained.get_metrics()["features_without_baseline"] == ["tenure_days"]
+    
+    retrained.update(rows(1000))  # first update computes: tenure_days gets its baseline
+    assert set(retrained.last_result) == {"age", "user_like_rate", "gender"}
+    assert retrained.get_metrics()["features_without_baseline"] == []
+    retrained.update(rows(1000))
+    result = retrained.compute()
+    assert result["tenure_days"]["psi"] < 0.05 and retrained.get_metrics()["drifted_features"] == []
+    
+    restarted = FeatureDriftMonitor(n_bins=10, interval_seconds=1e9, min_rows=100, baseline_path=path)
+    restarted.configure(FEATURE_NAMES + ["tenure_days"], infos)
+    assert restarted.get_metrics()["features_without_baseline"] == []
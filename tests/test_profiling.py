@@ -0,0 +1,67 @@
+"""Unit tests for on-demand memory profiling"""
+from collections import deque
+
+import numpy as np
+import pytest
+
+from src.profiling import MemoryProfiler, mapping_resident_bytes, object_bytes
+
+
+class Holder:
+    def __init__(self):
+        self.times = deque(float(i) for i in range(1000))
+        self.table = np.zeros(10000)
+        self.view = np.zeros(50000)[:10]
+
+
+def test_object_bytes_counts_owned_buffers_once():
+    """Test arrays are counted by the buffer they own and shared objects once"""
+    holder = Holder()
+    size = object_bytes(holder)
+    assert 80000 + 1000 * 24 < size < 80000 + 1000 * 24 + 20000
+    holder.alias = holder.table
+    assert object_bytes(holder) - size < 200
+
+
+def test_stages_and_snapshot_diff():
+    """Test stage figures and the snapshot diff show what a stage kept"""
+    profiler = MemoryProfiler(frames=1, top_n=5)
+    kept = []
+    with profiler.stage("off"):
+        kept.append(np.zeros(10))
+    profiler.start()
+    try:
+        for _ in range(2):
+            with profiler.stage("fill"):
+                kept.append(np.zeros(100000))
+                transient = np.zeros(400000)
+                del transient
+        diff = profiler.snapshot_diff()
+        assert diff["top"][0]["size_diff_kb"] >= 1500 and "test_profiling.py" in diff["top"][0]["site"]
+        # The next diff starts from this snapshot
+        assert all(abs(site["size_diff_kb"]) < 100 for site in profiler.snapshot_diff()["top"])
+        with pytest.raises(ValueError):
+            profiler.snapshot_diff(group_by="module")
+    finally:
+        status = profiler.stop()
+    fill = status["stages"]["fill"]
+    assert "off" not in status["stages"] and fill["calls"] == 2
+    assert 750 < fill["mean_net_kb"] < 900 and fill["max_peak_kb"] > 3500
+    with pytest.raises(RuntimeError):
+        profiler.snapshot_diff()
+
+
+def test_mapping_resident_bytes_groups_smaps(tmp_path):
+    """Test RSS is grouped into anonymous memory, stacks and files"""
+    smaps = tmp_path / "smaps"
+    smaps.write_text(
+        "55d0-55d1 rw-p 00000000 00:00 0 [heap]\nRss: 100 kB\nPss: 100 kB\n"
+        "7f00-7f01 rw-p 00000000 00:00 0 \nRss: 20 kB\n"
+        "7f01-7f02 r--s 00000000 08:01 42 /data/score_table.bin\nRss: 300 kB\n"
+        "7f02-7f03 r-xp 00000000 08:01 43 /usr/lib/lib_lightgbm.so\nRss: 50 kB\n"
+        "7ffc-7ffd rw-p 00000000 00:00 0 [stack]\nRss: 8 kB\n"
+    )
+    assert mapping_resident_bytes(str(smaps)) == {
+        "score_table.bin": 300 * 1024, "anonymous": 120 * 1024, "lib_lightgbm.so": 50 * 1024, "[stack]": 8 * 1024
+    }
+    assert mapping_resident_bytes(str(tmp_path / "missing")) == {}
@@ -0,0 +1,61 @@
+"""Unit tests for the online quality monitor"""
+import numpy as np
+import pytest
+
+from src.quality_monitor import QualityMonitor, binned_auc
+
+
+def test_binned_auc_matches_pairwise_auc():
+    """Test the binned AUC equals the exact AUC when scores fall in distinct bins"""
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 2, 500)
+    scores = np.clip(0.3 * labels + rng.uniform(0, 0.7, 500), 0, 0.999)
+    
+    n_bins = 100000
+    bins = (scores * n_bins).astype(int)
+    positives = np.bincount(bins[labels == 1], minlength=n_bins)
+    negatives = np.bincount(bins[labels == 0], minlength=n_bins)
+    
+    pos, neg = scores[labels == 1], scores[labels == 0]
+    exact = ((pos[:, None] > neg[None, :]).sum() + 0.5 * (pos[:, None] == neg[None, :]).sum()) / (len(pos) * len(neg))
+    assert binned_auc(positives, negatives) == pytest.approx(exact, abs=1e-3)
+
+
+def test_labels_join_latest_prediction_once():
+    """Test labels match the latest prediction per pair, only once, and evicted pairs are unmatched"""
+    monitor = QualityMonitor(capacity=4, window_seconds=600, bucket_seconds=60, n_bins=10, calibration_bins=2)
+    monitor.record([1, 2], [10, 20], np.array([0.9, 0.2]), "v1", now=1000)
+    monitor.record([1], [10], np.array([0.8]), "v2", now=1001)
+    
+    assert monitor.label([1, 1, 2], [10, 10, 20], [1, 1, 0], now=1002) == 2
+    assert monitor.label([2], [20], [1], now=1003) == 0
+    assert (monitor.labels_matched, monitor.labels_duplicate) == (2, 2)
+    versions = monitor.get_metrics(now=1004)["versions"]
+    assert versions["v2"]["labels"] == 1 and versions["v2"]["positive_rate"] == 1.0
+    assert versions["v1"]["labels"] == 1 and versions["v1"]["mean_prediction"] == pytest.approx(0.2)
+    
+    # Three more predictions overwrite the oldest slots, including (2, 20)
+    monitor.record([3, 4, 5], [30, 40, 50], np.array([0.5, 0.5, 0.5]), "v1", now=1005)
+    assert monitor.label([2, 5], [20, 50], [0, 1], now=1006) == 1
+    assert monitor.labels_unmatched == 1
+    assert len(monitor._slots) == 4
+
+
+def test_window_metrics_and_expiry():
+    """Test AUC, log-loss and calibration over the window, and that old buckets expire"""
+    monitor = QualityMonitor(capacity=1000, window_seconds=300, bucket_seconds=60, n_bins=100, calibration_bins=10)
+    users = np.arange(400)
+    scores = np.where(users % 2 == 0, 0.8, 0.3)
+    monitor.record(users, users, scores, "v1", now=0)
+    monitor.label(users[:200], users[:200], (users[:200] % 2 == 0).astype(int), now=10)
+    
+    summary = monitor.get_metrics(now=20)["versions"]["v1"]
+    assert summary["auc"] == 1.0
+    assert summary["logloss"] == pytest.approx(-(np.log(0.8) + np.log(0.7)) / 2, rel=1e-4)
+    assert [(b["bucket"], b["labels"]) for b in summary["calibration"]] == [("0.30-0.40", 100), ("0.80-0.90", 100)]
+    
+    # Perfectly wrong labels a few minutes later; the first bucket then leaves the window
+    monitor.label(users[200:], users[200:], (users[200:] % 2 == 1).astype(int), now=200)
+    assert monitor.get_metrics(now=210)["versions"]["v1"]["auc"] == 0.5
+    late = monitor.get_metrics(now=320)["versions"]["v1"]
+    assert late["auc"] == 0.0 and late["labels"] == 200 and late["total_labels"] == 400
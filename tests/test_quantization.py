@@ -0,0 +1,76 @@
+"""Unit tests for threshold-quantized scoring"""
+import numpy as np
+import pytest
+
+from src.model_loader import model_loader
+from src.quantization import QuantizedModel, build_quantized_model
+
+
+@pytest.fixture
+def features():
+    """Feature rows covering missing, zero, negative and unseen categorical values"""
+    rng = np.random.default_rng(0)
+    rows = rng.uniform(0, 1, size=(2000, model_loader.model.num_feature())).astype(np.float32)
+    rows[:, 0] = rng.integers(7, 71, size=len(rows))
+    rows[:, 1] = rng.integers(-1, 3, size=len(rows))
+    rows[:, 20] = rng.integers(-2, 40, size=len(rows))
+    rows[::7, 20] = np.nan
+    rows[::5, -1] = np.nan
+    rows[::3, -2] = 0.0
+    return rows
+
+
+@pytest.mark.skipif(not model_loader.model_loaded, reason="Model not loaded")
+def test_quantized_predictions_match_booster(features):
+    """Test scoring on codes reproduces Booster.predict"""
+    quantized = model_loader.quantized_model
+    assert quantized is not None
+    
+    codes = model_loader.quantize(features)
+    assert codes.dtype == np.uint8
+    assert codes.shape == features.shape
+    np.testing.assert_allclose(
+        model_loader.predict_quantized(codes), model_loader.model.predict(features), rtol=0, atol=1e-12
+    )
+    # Chunking must not change the result
+    np.testing.assert_allclose(
+        quantized.predict_raw_codes(codes, chunk_size=7),
+        model_loader.model.predict(features, raw_score=True),
+        rtol=0, atol=1e-12
+    )
+
+
+def test_zero_as_missing_and_categorical_splits():
+    """Test zero-as-missing splits and categorical bitsets on a small trained model"""
+    lgb = pytest.importorskip("lightgbm")
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(3000, 3))
+    X[:, 2] = rng.integers(0, 40, size=len(X))
+    X[::4, 0] = 0.0
+    X[::9, 1] = np.nan
+    y = ((X[:, 0] > 0.1) ^ (X[:, 2] % 3 == 0) | (np.nan_to_num(X[:, 1]) > 1)).astype(int)
+    booster = lgb.train(
+        {"objective": "binary", "zero_as_missing": True, "num_leaves": 15, "min_data_per_group": 5,
+         "cat_smooth": 1, "verbose": -1},
+        lgb.Dataset(X, y, categorical_feature=[2]),
+        num_boost_round=10
+    )
+    
+    quantized = build_quantized_model(booster)
+    assert isinstance(quantized, QuantizedModel)
+    test = rng.normal(size=(1000, 3))
+    test[:, 2] = rng.integers(-3, 60, size=len(test))
+    test[::3, 0] = 0.0
+    test[::5, 0] = 1e-40
+    test[::7, 1] = np.nan
+    np.testing.assert_allclose(
+        quantized.predict_codes(quantized.quantize(test)), booster.predict(test), rtol=0, atol=1e-12
+    )
+
+
+def test_unsupported_models_are_skipped():
+    """Test non-binary objectives get no quantizer"""
+    lgb = pytest.importorskip("lightgbm")
+    X = np.random.default_rng(2).normal(size=(200, 2))
+    booster = lgb.train({"objective": "regression", "verbose": -1}, lgb.Dataset(X, X[:, 0]), num_boost_round=2)
+    assert build_quantized_model(booster) is None
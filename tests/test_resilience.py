@@ -0,0 +1,162 @@
+"""Unit tests for circuit breakers and the downstream dependency wrapper"""
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from src.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, Dependency, LocalSpool
+
+
+class SlowStandIn:
+    """Local stand-in for an AWS API that can be made slow or failing"""
+    
+    def __init__(self):
+        self.latency_seconds = 0.0
+        self.failing = False
+        # Calls accepted before the stand-in starts failing (None: unlimited)
+        self.fail_after: Optional[int] = None
+        self.received = []
+        self._lock = threading.Lock()
+    
+    def put(self, record):
+        time.sleep(self.latency_seconds)
+        with self._lock:
+            if self.fail_after is not None:
+                self.failing = self.failing or self.fail_after <= 0
+                self.fail_after -= 1
+            if self.failing:
+                raise ConnectionError("stand-in unavailable")
+            self.received.append(record)
+        return True
+
+
+def test_circuit_breaker_transitions():
+    """Test the breaker opens after consecutive failures and closes after a successful probe"""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10, clock=lambda: now[0])
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.record_failure() is False and breaker.record_failure() is False
+    assert breaker.record_failure() is True
+    assert breaker.state == OPEN and not breaker.allow()
+    
+    now[0] = 10.0
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # one probe at a time
+    assert breaker.record_failure() is True and breaker.state == OPEN
+    
+    now[0] = 20.0
+    assert breaker.allow()
+    assert breaker.record_success() is True and breaker.state == CLOSED
+
+
+def test_slow_dependency_never_blocks_callers_and_recovers_from_spool(tmp_path):
+    """Test calls return immediately while the stand-in hangs, then spooled records are replayed in order"""
+    stand_in = SlowStandIn()
+    dep = Dependency(
+        "standin", replay=stand_in.put, mode="spool", timeout_ms=50, failure_threshold=2,
+        reset_seconds=0.2, max_pending=100, workers=2, spool_dir=str(tmp_path)
+    )
+    stand_in.latency_seconds = 0.5
+    
+    submit_ms = []
+    for i in range(40):
+        start = time.perf_counter()
+        dep.submit(stand_in.put, i, record=i)
+        submit_ms.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)
+    assert np.percentile(submit_ms, 99) < 5
+    
+    metrics = dep.get_metrics()
+    assert metrics["state"] == OPEN
+    assert metrics["timeouts"] >= 2 and metrics["rejected"] > 0
+    assert metrics["spooled"] == metrics["rejected"] + metrics["shed"]
+    
+    # The service recovers; after the reset period a probe closes the circuit
+    stand_in.latency_seconds = 0.0
+    assert dep.wait_idle()
+    time.sleep(0.25)
+    assert dep.submit(stand_in.put, "probe", record="probe")
+    assert dep.wait_idle()
+    assert dep.breaker.state == CLOSED
+    # Late calls still delivered, rejected ones replayed from the spool: nothing lost or duplicated
+    delivered = [r for r in stand_in.received if r != "probe"]
+    assert sorted(delivered) == list(range(40))
+    assert delivered[-metrics["spooled"]:] == sorted(delivered[-metrics["spooled"]:])
+    assert dep.replayed == metrics["spooled"] and dep.spool.size() == 0
+
+
+def test_fail_fast_drops_and_failures_open_circuit(tmp_path):
+    """Test failing calls open the circuit and fail-fast mode keeps nothing"""
+    stand_in = SlowStandIn()
+    stand_in.failing = True
+    dep = Dependency(
+        "standin", replay=stand_in.put, mode="fail_fast", failure_threshold=2, reset_seconds=60,
+        spool_dir=str(tmp_path)
+    )
+    for i in range(2):
+        dep.submit(stand_in.put, i, record=i)
+        assert dep.wait_idle()
+    assert dep.breaker.state == OPEN
+    assert dep.submit(stand_in.put, 2, record=2) is False
+    metrics = dep.get_metrics()
+    assert (metrics["failures"], metrics["rejected"], metrics["spooled"]) == (2, 1, 0)
+    assert "stand-in unavailable" in metrics["last_error"]
+
+
+def test_spool_replay_resumes_after_the_breaker_reopens(tmp_path):
+    """Test a replay cut short by a relapse keeps its remainder, and the next recovery delivers everything once, in order"""
+    stand_in = SlowStandIn()
+    stand_in.failing = True
+    dep = Dependency(
+        "standin", replay=stand_in.put, mode="spool", timeout_ms=1000, failure_threshold=2,
+        reset_seconds=0.1, workers=1, spool_dir=str(tmp_path)
+    )
+    for i in range(6):
+        dep.submit(stand_in.put, i, record=i)
+        assert dep.wait_idle()
+    assert dep.breaker.state == OPEN and dep.get_metrics()["spooled"] == 6
+    
+    # Recovers for the probe and two replayed records, then fails again
+    stand_in.failing = False
+    stand_in.fail_after = 3
+    time.sleep(0.15)
+    assert dep.submit(stand_in.put, "probe", record="probe")
+    assert dep.wait_idle()
+    assert stand_in.received == ["probe", 0, 1] and dep.replayed == 2
+    for record in ("a", "b"):
+        dep.submit(stand_in.put, record, record=record)
+        assert dep.wait_idle()
+    assert dep.breaker.state == OPEN and dep.breaker.times_opened == 2
+    
+    stand_in.failing = False
+    stand_in.fail_after = None
+    time.sleep(0.15)
+    assert dep.submit(stand_in.put, "probe", record="probe")
+    assert dep.wait_idle()
+    assert dep.breaker.state == CLOSED
+    assert [r for r in stand_in.received if r != "probe"] == [0, 1, 2, 3, 4, 5, "a", "b"]
+    assert dep.replayed == 8 and dep.spool.size() == 0
+
+
+def test_spool_keeps_undelivered_records_ahead_of_ones_spooled_during_replay(tmp_path):
+    """Test records spooled while a replay runs stay behind the ones it could not deliver, and the size bound drops extras"""
+    spool = LocalSpool(str(tmp_path / "standin.jsonl"), max_bytes=64)
+    for i in range(3):
+        assert spool.append(i)
+    
+    def handler(record):
+        if record == 1:
+            spool.append("late")  # a live call failing while the replay runs
+            return False
+        return True
+    
+    assert spool.drain(handler) == 1
+    seen = []
+    assert spool.drain(lambda record: seen.append(record)) == 3
+    assert seen == [1, 2, "late"] and spool.size() == 0
+    
+    while spool.append("x" * 10):
+        pass
+    assert spool.records_dropped == 1 and spool.size() <= 64
@@ -0,0 +1,120 @@
+"""Unit tests for saturation monitoring and load-aware readiness"""
+import asyncio
+import time
+
+from src.saturation import InFlightMiddleware, SaturationMonitor
+
+
+def test_loop_lag_saturates_with_hysteresis():
+    """Test lag over the threshold saturates, and recovery needs lag below the recovery ratio"""
+    clock = [0.0]
+    monitor = SaturationMonitor(window_seconds=10, max_loop_lag_ms=100, clock=lambda: clock[0])
+    monitor.record_lag(20)
+    assert not monitor.evaluate()
+    monitor.record_lag(150)
+    assert monitor.evaluate() and monitor.reasons[0].startswith("loop_lag_ms 150")
+    # Old spike leaves the window, but 90ms is above 0.8 x 100ms
+    clock[0] = 11.0
+    monitor.record_lag(90)
+    assert monitor.evaluate()
+    clock[0] = 22.0
+    monitor.record_lag(50)
+    assert not monitor.evaluate()
+    metrics = monitor.get_metrics()
+    assert metrics["transitions"] == 2 and metrics["saturated_seconds"] == 22.0
+
+
+def test_recovery_waits_for_every_signal():
+    """Test a worker saturated by one signal stays saturated while another sits between recovery level and limit"""
+    clock = [0.0]
+    monitor = SaturationMonitor(window_seconds=10, max_loop_lag_ms=100, max_in_flight=10, clock=lambda: clock[0])
+    monitor.record_lag(500)
+    monitor.in_flight = 9  # under its limit, so not a reason to saturate
+    assert monitor.evaluate() and monitor.reasons == ["loop_lag_ms 500 over 100"]
+    
+    clock[0] = 11.0
+    monitor.record_lag(10)
+    assert monitor.evaluate() and monitor.reasons == ["in_flight 9 over 10"]
+    monitor.in_flight = 8
+    assert not monitor.evaluate() and monitor.transitions == 2
+    # Open intervals count towards saturated_seconds too
+    monitor.record_lag(500)
+    assert monitor.evaluate()
+    clock[0] = 14.0
+    assert monitor.get_metrics()["saturated_seconds"] == 14.0
+
+
+def test_in_flight_and_queue_depth_thresholds():
+    """Test in-flight requests and registered queue depths are counted against their limits"""
+    monitor = SaturationMonitor(window_seconds=10, max_in_flight=2, max_queue_depth=5)
+    depth = [3]
+    monitor.queue_sources = {"inference": lambda: depth[0], "broken": lambda: 1 / 0}
+    with monitor.track(), monitor.track():
+        assert not monitor.evaluate()
+        with monitor.track():
+            assert monitor.evaluate() and monitor.reasons == ["in_flight 3 over 2"]
+    assert not monitor.evaluate() and monitor.in_flight == 0 and monitor.in_flight_peak == 3
+    depth[0] = 6
+    assert monitor.evaluate() and monitor.get_metrics()["queue_depth"] == {"inference": 6}
+
+
+def test_cpu_utilization_is_a_share_of_available_cores_over_the_window():
+    """Test CPU use is divided by the worker's cores and starts from the last sample before the window"""
+    monitor = SaturationMonitor(window_seconds=10, max_cpu_utilization=0.9, clock=lambda: 0.0)
+    monitor.cpus = 2
+    assert monitor.cpu_utilization() == (None, None) and not monitor.evaluate(0.0)
+    
+    monitor.record_cpu(0.0, 100.0, 50.0)
+    monitor.record_cpu(5.0, 109.5, 54.0)
+    process_cores, loop_cores = monitor.cpu_utilization()
+    assert round(process_cores, 3) == 1.9 and round(loop_cores, 3) == 0.8
+    assert monitor.evaluate(5.0) and monitor.reasons == ["cpu_utilization 0.95 over 0.9"]
+    
+    # The busy stretch ages out; the sample at 5s stays as the start of the window
+    monitor.record_cpu(16.0, 110.5, 54.5)
+    monitor.record_cpu(20.0, 111.5, 55.0)
+    assert [sample[0] for sample in monitor._cpu] == [5.0, 16.0, 20.0]
+    assert not monitor.evaluate(20.0)
+
+
+def test_middleware_skips_probes_and_releases_failed_requests():
+    """Test probe paths are not counted and a request that raises still leaves the in-flight count"""
+    monitor = SaturationMonitor()
+    seen = []
+    
+    async def app(scope, receive, send):
+        seen.append((scope.get("path"), monitor.in_flight))
+        if scope.get("path") == "/fail":
+            raise RuntimeError("handler failed")
+    
+    middleware = InFlightMiddleware(app, monitor)
+    
+    async def main():
+        for scope in ({"type": "lifespan"}, {"type": "http", "path": "/ready"},
+                      {"type": "http", "path": "/metrics"}, {"type": "http", "path": "/predict"}):
+            await middleware(scope, None, None)
+        try:
+            await middleware({"type": "http", "path": "/fail"}, None, None)
+        except RuntimeError:
+            pass
+    
+    asyncio.run(main())
+    assert seen == [(None, 0), ("/ready", 0), ("/metrics", 0), ("/predict", 1), ("/fail", 1)]
+    assert monitor.in_flight == 0 and monitor.in_flight_peak == 1
+
+
+def test_blocking_call_on_loop_shows_up_as_lag():
+    """Test synchronous work on the event loop is measured as loop lag"""
+    monitor = SaturationMonitor(interval_ms=10, window_seconds=10, max_loop_lag_ms=100)
+    monitor.enabled = True
+    
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+    
+    asyncio.run(main())
+    assert monitor.get_metrics()["loop_lag_ms"]["max"] >= 150
+    assert monitor.saturated
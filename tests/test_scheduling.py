@@ -0,0 +1,92 @@
+"""Unit tests for deadline-aware scheduling"""
+import asyncio
+import threading
+import time
+import pytest
+
+from src.scheduling import (
+    PriorityScheduler, PRIORITIES, Overloaded, DeadlineExceeded, parse_priority, parse_deadline
+)
+
+INTERACTIVE = PRIORITIES["interactive"]
+BULK = PRIORITIES["bulk"]
+
+
+def test_parse_headers():
+    """Test priority names and timeouts are validated"""
+    assert parse_priority(None) == INTERACTIVE
+    assert parse_priority("Bulk") == BULK
+    assert parse_priority(None, "bulk") == BULK
+    with pytest.raises(ValueError):
+        parse_priority("urgent")
+    assert parse_deadline(250, now=10.0) == pytest.approx(10.25)
+    with pytest.raises(ValueError):
+        parse_deadline(-1)
+
+
+def test_interactive_runs_before_bulk():
+    """Test queued interactive work overtakes earlier bulk work"""
+    scheduler = PriorityScheduler(max_concurrency=1, enabled=True)
+    release = threading.Event()
+    order = []
+    
+    def job(name):
+        def fn():
+            if name == "blocker":
+                release.wait(5)
+            order.append(name)
+            return name
+        return fn
+    
+    async def main():
+        blocker = asyncio.ensure_future(scheduler.run(job("blocker"), BULK))
+        await asyncio.sleep(0.01)
+        bulk = asyncio.ensure_future(scheduler.run(job("bulk"), BULK))
+        interactive = asyncio.ensure_future(scheduler.run(job("interactive"), INTERACTIVE))
+        await asyncio.sleep(0.01)
+        release.set()
+        return await asyncio.gather(blocker, bulk, interactive)
+    
+    assert asyncio.run(main()) == ["blocker", "bulk", "interactive"]
+    assert order == ["blocker", "interactive", "bulk"]
+    scheduler.shutdown()
+
+
+def test_expired_work_is_dropped_before_running():
+    """Test work whose deadline passes in the queue never runs"""
+    scheduler = PriorityScheduler(max_concurrency=1, enabled=True)
+    ran = []
+    
+    async def main():
+        blocker = asyncio.ensure_future(scheduler.run(lambda: time.sleep(0.05), BULK))
+        await asyncio.sleep(0.005)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.run(lambda: ran.append(1), INTERACTIVE, deadline=time.monotonic() + 0.01)
+        await blocker
+    
+    asyncio.run(main())
+    assert ran == []
+    assert scheduler.get_metrics()["classes"]["interactive"]["expired"] == 1
+    scheduler.shutdown()
+
+
+def test_sheds_when_estimated_wait_exceeds_deadline():
+    """Test requests that cannot meet their deadline are rejected up front"""
+    scheduler = PriorityScheduler(max_concurrency=1, enabled=True)
+    
+    async def main():
+        # Teach the service-time estimate, then occupy the only worker
+        await scheduler.run(lambda: time.sleep(0.05), BULK)
+        blocker = asyncio.ensure_future(scheduler.run(lambda: time.sleep(0.05), BULK))
+        await asyncio.sleep(0.005)
+        with pytest.raises(Overloaded) as excinfo:
+            await scheduler.run(lambda: None, BULK, deadline=time.monotonic() + 0.01)
+        await blocker
+        return excinfo.value
+    
+    error = asyncio.run(main())
+    assert error.retry_after_seconds >= 1
+    metrics = scheduler.get_metrics()
+    assert metrics["classes"]["bulk"]["shed"] == 1
+    assert metrics["service_ms_per_row"]["bulk"] > 0
+    scheduler.shutdown()
@@ -0,0 +1,79 @@
+"""Unit tests for the memory-mapped score table"""
+import os
+
+import numpy as np
+
+from src.model_loader import model_loader
+from src.score_table import ScoreTable, row_fingerprints, write_score_table
+
+
+def make_table(tmp_path, model_version="v1", score_dtype="float32"):
+    """Table of users 1-3 x movies 10-12 with score = (user * 10 + movie) / 1000"""
+    rng = np.random.default_rng(0)
+    user_ids = np.repeat([1, 2, 3], 3)
+    movie_ids = np.tile([10, 11, 12], 3)
+    features = rng.random((9, 34))
+    scores = (user_ids * 10 + movie_ids) / 1000
+    path = str(tmp_path / "scores.bin")
+    write_score_table(path, user_ids, movie_ids, row_fingerprints(features), scores, model_version, score_dtype)
+    table = ScoreTable(path=path, check_interval_seconds=0)
+    table.enabled = True
+    assert table.load()
+    return table, features, user_ids, movie_ids, scores
+
+
+def test_lookup_hits_only_matching_pairs_and_features(tmp_path):
+    """Test a hit needs the pair, the same feature row and the same model version"""
+    table, features, user_ids, movie_ids, scores = make_table(tmp_path)
+    rows = features[[0, 4, 8, 5]].copy()
+    rows[3, 7] += 1.0  # same pair as row 5, different features
+    hit, found = table.lookup(np.vstack([rows, features[:1]]), [1, 2, 3, 2, 9], [10, 11, 12, 12, 10], "v1")
+    assert hit.tolist() == [True, True, True, False, False]
+    np.testing.assert_allclose(found[:3], scores[[0, 4, 8]], rtol=1e-6)
+    assert table.lookup(rows, [1, 2, 3, 2], [10, 11, 12, 12], "v2") is None
+    metrics = table.get_metrics()
+    assert (metrics["hits"], metrics["key_misses"], metrics["fingerprint_mismatches"]) == (3, 1, 1)
+    assert metrics["version_mismatches"] == 4 and metrics["entries"] == 9
+
+
+def test_predict_scores_only_misses_live(tmp_path):
+    """Test misses go to the live model in one call and results keep row order"""
+    table, features, user_ids, movie_ids, scores = make_table(tmp_path, score_dtype="float16")
+    live_calls = []
+    
+    def live(rows):
+        live_calls.append(len(rows))
+        return np.full(len(rows), -1.0)
+    
+    predictions = table.predict(features[[2, 0]], [1, 5], [12, 10], "v1", live)
+    assert live_calls == [1]
+    assert predictions[0] == np.float16(scores[2]) and predictions[1] == -1.0
+    table.predict(features[:2], [1, 1], [10, 11], "v1", live)
+    assert live_calls == [1]
+
+
+def test_replaced_file_is_remapped(tmp_path):
+    """Test a table rebuilt for a new model version is picked up from disk"""
+    table, features, user_ids, movie_ids, scores = make_table(tmp_path)
+    write_score_table(table.path, [7], [70], row_fingerprints(features[:1]), [0.25], "v2")
+    os.utime(table.path, ns=(0, 0))
+    prediction = table.predict(features[:1], [7], [70], "v2", lambda rows: np.zeros(len(rows)))
+    assert prediction[0] == 0.25
+    assert table.get_metrics()["model_version"] == "v2" and table.loads == 2
+
+
+def test_table_matches_live_model(tmp_path):
+    """Test scores served from the table equal the model's own predictions"""
+    rng = np.random.default_rng(1)
+    features = rng.integers(0, 2, (50, 34)).astype(np.float64)
+    user_ids, movie_ids = np.arange(50), np.arange(50) % 7
+    path = str(tmp_path / "scores.bin")
+    write_score_table(path, user_ids, movie_ids, row_fingerprints(features),
+                      model_loader.predict(features), model_loader.model_version)
+    table = ScoreTable(path=path)
+    table.enabled = True
+    table.load()
+    predictions = table.predict(features, user_ids, movie_ids, model_loader.model_version,
+                                lambda rows: np.zeros(len(rows)))
+    assert table.hits == 50
+    np.testing.assert_allclose(predictions, model_loader.predict(features), rtol=1e-6)
@@ -0,0 +1,87 @@
+"""Unit tests for the LightGBM thread-count policy"""
+import numpy as np
+
+from src import model_loader as model_loader_module
+from src.model_loader import model_loader
+from src.threading_policy import ThreadPolicy, cgroup_cpu_quota, sample_features
+
+
+def test_cgroup_cpu_quota(tmp_path):
+    """Test cgroup v2 and v1 CPU limits are read, and unlimited is None"""
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+    assert cgroup_cpu_quota(str(tmp_path)) == 1.5
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert cgroup_cpu_quota(str(tmp_path)) is None
+    
+    (tmp_path / "cpu.max").unlink()
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("200000\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    assert cgroup_cpu_quota(str(tmp_path)) == 2.0
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+    assert cgroup_cpu_quota(str(tmp_path)) is None
+
+
+def test_calibration_picks_fastest_per_batch_size():
+    """Test small batches get one thread and large batches the most threads"""
+    clock = [0.0]
+    
+    def predict(features, threads):
+        # Fixed cost per extra thread, row work split across threads
+        clock[0] += 1.0 * (threads - 1) + 0.01 * len(features) / threads
+    
+    policy = ThreadPolicy(max_threads=4, concurrent_callers=1)
+    assert policy.threads_for(1) == 4
+    table = policy.calibrate(predict, np.zeros((1000, 3)), batch_sizes=[1, 100, 1000], timer=lambda: clock[0])
+    assert [entry["threads"] for entry in table] == [1, 1, 4]
+    assert set(table[0]["ms_by_threads"]) == {"1", "2", "4"}
+    assert policy.threads_for(1) == 1
+    assert policy.threads_for(500) == 1
+    assert policy.threads_for(50000) == 4
+    assert policy.get_metrics()["calibrated"]
+
+
+def test_threads_are_shared_between_concurrent_callers():
+    """Test concurrent workers together never get more threads than the quota allows"""
+    clock = [0.0]
+    
+    def predict(features, threads):
+        clock[0] += 0.01 * len(features) / threads
+    
+    policy = ThreadPolicy(max_threads=8, concurrent_callers=3)
+    assert policy.threads_per_call == 2 and policy.threads_for(100000) == 2
+    table = policy.calibrate(predict, np.zeros((1000, 3)), batch_sizes=[1000], timer=lambda: clock[0])
+    assert set(table[0]["ms_by_threads"]) == {"1", "2"}
+    assert policy.threads_for(1000) * policy.concurrent_callers <= policy.max_threads
+    # More callers than cores still leaves every call one thread
+    assert ThreadPolicy(max_threads=2, concurrent_callers=5).threads_for(10) == 1
+
+
+def test_calibrate_model():
+    """Test calibration runs against the loaded model"""
+    rows = sample_features(model_loader.model.model_to_string(), 10)
+    assert rows.shape == (10, model_loader.model.num_feature())
+    policy = ThreadPolicy(max_threads=2, concurrent_callers=1)
+    table = policy.calibrate(
+        lambda x, threads: model_loader.model.predict(x, num_threads=threads), rows, batch_sizes=[1, 10], repeats=1
+    )
+    assert [entry["batch_size"] for entry in table] == [1, 10]
+    assert all(entry["threads"] in (1, 2) for entry in table)
+
+
+def test_predict_and_contributions_use_the_per_call_thread_cap(monkeypatch):
+    """Test scoring and explanation calls both pass the policy's thread count to LightGBM"""
+    booster = model_loader.model
+    calls = []
+    
+    class RecordingBooster:
+        def predict(self, features, **kwargs):
+            calls.append(kwargs)
+            return booster.predict(features, **kwargs)
+    
+    monkeypatch.setattr(model_loader_module, "thread_policy", ThreadPolicy(max_threads=4, concurrent_callers=2))
+    monkeypatch.setattr(model_loader, "model", RecordingBooster())
+    rows = sample_features(booster.model_to_string(), 3)
+    model_loader.predict(rows)
+    assert model_loader.predict_contributions(rows).shape == (3, booster.num_feature() + 1)
+    assert [call.get("num_threads") for call in calls] == [2, 2] and calls[1]["pred_contrib"] is True